@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: BSD-3-Clause
+# bench_build: Build performance benchmarks for the Squishy gateware
+#
+# This is normally run with `nox -s bench_build`, any extra arguments after `--` are passed through.
+#
+# Each design is elaborated (and optionally synthesized) in its own worker process so the peak
+# RSS numbers are not polluted by the designs that came before it. The results are appended to
+# a JSON history file and compared against a stored baseline, if there is one.
+
+import sys
+import json
+import resource
+
+from argparse    import ArgumentParser, ArgumentDefaultsHelpFormatter, SUPPRESS
+from datetime    import datetime, timezone
+from pathlib     import Path
+from subprocess  import run, PIPE
+from time        import perf_counter
+from typing      import Any, Callable
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Metrics where a larger number is worse, along with the minimum absolute change we care about,
+# this stops a 2ms elaboration getting flagged because it took 3ms this time around.
+REGRESSION_METRICS = {
+	'elaborate': 0.05,
+	'rtl'      : 0.05,
+	'synth'    : 1.0,
+	'pnr'      : 1.0,
+	'rss_self' : 4096,
+	'rss_tools': 4096,
+}
+
+def _applet_names() -> list[str]:
+	from squishy.actions.applet import Applet
+
+	return [ apl['name'] for apl in Applet().applets ]
+
+def _squishy_top(applet_name: str):
+	from squishy.actions.applet import Applet
+	from squishy.core.device    import SquishyHardwareDevice
+	from squishy.gateware       import Squishy
+	from squishy.gateware.platform.rev1 import SquishyRev1
+
+	action = Applet()
+	parser = ArgumentParser()
+	action.register_args(parser)
+	args = parser.parse_args([ applet_name ])
+
+	apl    = next(filter(lambda a: a['name'] == applet_name, action.applets))
+	applet = apl['instance'].init_applet(args)
+	if applet is None:
+		return None
+
+	platform = SquishyRev1()
+	return Squishy(
+		revision    = platform.revision,
+		uart_config = {
+			'enabled'  : args.enable_uart,
+			'baud'     : args.baud,
+			'parity'   : args.parity,
+			'data_bits': args.data_bits,
+		},
+		usb_config  = {
+			'vid'          : platform.usb_vid,
+			'pid'          : platform.usb_pid_app,
+			'manufacturer' : platform.usb_mfr,
+			'serial_number': SquishyHardwareDevice.make_serial(),
+			'product'      : platform.usb_prod[platform.usb_pid_app],
+			'webusb'       : {
+				'enabled': args.enable_webusb,
+				'url'    : args.webusb_url,
+			}
+		},
+		scsi_config = {
+			'version'    : applet.scsi_version,
+			'vid'        : platform.scsi_vid,
+			'did'        : args.scsi_did,
+			'arbitrating': args.scsi_arbitrating,
+			'is_device'  : args.scsi_device,
+		},
+		applet      = applet
+	)
+
+def _bootloader():
+	from squishy.core.device               import SquishyHardwareDevice
+	from squishy.gateware.bootloader.rev1 import Bootloader
+
+	return Bootloader(serial_number = SquishyHardwareDevice.make_serial())
+
+def _core_wrapper(make_submodules: Callable[[], dict[str, Any]]):
+	from torii import Elaboratable, Module, ClockDomain
+
+	# The cores expect to be run inside the `Squishy` top-level which provides the USB clock domain
+	class CoreBench(Elaboratable):
+		def elaborate(self, platform) -> Module:
+			m = Module()
+
+			m.domains.usb = ClockDomain()
+
+			for name, submodule in make_submodules().items():
+				m.submodules[name] = submodule
+
+			return m
+
+	return CoreBench()
+
+def _dfu_handler():
+	from squishy.gateware.bootloader.dfu import DFURequestHandler
+
+	return _core_wrapper(lambda: {
+		'dfu': DFURequestHandler(configuration = 1, interface = 0, resource_name = ('spi_flash_1x', 0))
+	})
+
+def _spi_flash():
+	from torii.lib.fifo                 import AsyncFIFO
+	from squishy.gateware.core.flash    import SPIFlash
+	from squishy.gateware.platform.rev1 import SquishyRev1
+
+	def make_submodules() -> dict[str, Any]:
+		geometry = SquishyRev1.flash['geometry']
+		fifo = AsyncFIFO(width = 8, depth = geometry.erase_size, r_domain = 'sync', w_domain = 'usb')
+		return {
+			'fifo' : fifo,
+			'flash': SPIFlash(
+				flash_resource = ('spi_flash_1x', 0),
+				flash_geometry = geometry,
+				fifo           = fifo,
+				erase_cmd      = SquishyRev1.flash['commands']['erase'],
+			),
+		}
+
+	return _core_wrapper(make_submodules)
+
+def designs() -> dict[str, tuple[Callable[[], Any], bool]]:
+	'''
+	Get all of the designs we know how to benchmark.
+
+	Returns
+	-------
+	dict[str, tuple[Callable[[], Any], bool]]
+		The design name mapped to a factory for the elaboratable, and if the design is a
+		complete top-level that can be taken through synthesis and PnR.
+
+	'''
+
+	return {
+		'bootloader-rev1': (_bootloader, True),
+		**{
+			f'applet-{name}': ((lambda name = name: _squishy_top(name)), True)
+			for name in _applet_names()
+		},
+		'core-dfu'      : (_dfu_handler, False),
+		'core-spi_flash': (_spi_flash, False),
+	}
+
+def _rss() -> dict[str, int]:
+	# ru_maxrss is in KiB on Linux but bytes on macOS, normalise to KiB
+	scale = 1024 if sys.platform == 'darwin' else 1
+	return {
+		'rss_self' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+		'rss_tools': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+	}
+
+def bench_design(name: str, build_dir: Path, synth: bool) -> dict[str, Any] | None:
+	'''
+	Benchmark a single design in the current process.
+
+	Parameters
+	----------
+	name : str
+		The name of the design from :py:func:`designs`.
+
+	build_dir : pathlib.Path
+		The directory to run the toolchain in.
+
+	synth : bool
+		Run synthesis and PnR as well as elaboration.
+
+	Returns
+	-------
+	dict[str, Any] | None
+		The measurements for the design, or None if the design can not be built.
+
+	Raises
+	------
+	RuntimeError
+		If the design was built but no toolchain stages were recorded for it.
+
+	'''
+
+	from torii.hdl.ir                   import Fragment
+	from squishy.core.build             import run_build_plan
+	from squishy.gateware.platform.rev1 import SquishyRev1
+
+	factory, synthesizable = designs()[name]
+
+	platform = SquishyRev1()
+
+	start = perf_counter()
+	elab  = factory()
+	if elab is None:
+		return None
+
+	fragment  = Fragment.get(elab, platform)
+	elaborate = perf_counter() - start
+
+	start = perf_counter()
+	plan  = platform.prepare(fragment, name, verbose = True)
+	rtl   = perf_counter() - start
+
+	result: dict[str, Any] = {
+		'elaborate': round(elaborate, 3),
+		'rtl'      : round(rtl, 3),
+	}
+
+	if synth and synthesizable:
+		run_build_plan(plan, build_dir / name, name)
+		with (build_dir / name / f'{name}.stages.json').open('r') as f:
+			summary = json.load(f)
+
+		# Without any stages every toolchain metric would read as zero, and never regress
+		if not summary['stages']:
+			raise RuntimeError(f'The build of \'{name}\' recorded no toolchain stages in its stages.json')
+
+		def tool_time(prefix: str) -> float:
+			return round(sum(
+				stage['duration'] for stage in summary['stages'] if stage['tool'].startswith(prefix)
+			), 3)
+
+		result['synth']       = tool_time('yosys')
+		result['pnr']         = tool_time('nextpnr')
+		result['fmax']        = summary['fmax']
+		result['utilisation'] = {
+			bel: util['used'] for bel, util in summary['utilisation'].items()
+		}
+
+	result.update(_rss())
+	return result
+
+def run_worker(name: str, build_dir: Path, synth: bool) -> dict[str, Any] | None:
+	'''
+	Run :py:func:`bench_design` in a fresh interpreter.
+
+	Returns
+	-------
+	dict[str, Any] | None
+		The measurements for the design, or None if the design can not be built.
+
+	Raises
+	------
+	RuntimeError
+		If the worker process fails.
+
+	'''
+
+	cmd = [
+		sys.executable, __file__, '--worker', name, '--build-dir', str(build_dir)
+	]
+	if synth:
+		cmd.append('--synth')
+
+	proc = run(cmd, stdout = PIPE, text = True)
+	if proc.returncode != 0:
+		raise RuntimeError(f'Benchmark worker for \'{name}\' failed with exit status {proc.returncode}')
+
+	return json.loads(proc.stdout.splitlines()[-1])
+
+def find_regressions(
+	results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], threshold: float
+) -> list[str]:
+	'''
+	Compare a set of results against a baseline.
+
+	A metric has regressed if it is more than ``threshold`` percent worse than the baseline, and the
+	absolute change is more than the noise floor in :py:data:`REGRESSION_METRICS`. Resource usage
+	is treated as having regressed if it grows at all past the threshold, and fmax if it drops.
+
+	Parameters
+	----------
+	results : dict[str, dict[str, Any]]
+		The results for this run, keyed by design name.
+
+	baseline : dict[str, dict[str, Any]]
+		The baseline results, keyed by design name.
+
+	threshold : float
+		The percentage change that is allowed before something is a regression.
+
+	Returns
+	-------
+	list[str]
+		A description of each regression found.
+
+	'''
+
+	regressions = []
+	limit = 1 + threshold / 100
+
+	for design, metrics in results.items():
+		base = baseline.get(design)
+		if base is None:
+			continue
+
+		for metric, floor in REGRESSION_METRICS.items():
+			if metric not in metrics or metric not in base:
+				continue
+
+			old, new = base[metric], metrics[metric]
+			if new > old * limit and (new - old) > floor:
+				regressions.append(f'{design}: {metric} {old} -> {new}')
+
+		for bel, old in base.get('utilisation', {}).items():
+			new = metrics.get('utilisation', {}).get(bel)
+			if new is not None and new > old * limit:
+				regressions.append(f'{design}: {bel} {old} -> {new}')
+
+		for clock, old in base.get('fmax', {}).items():
+			new = metrics.get('fmax', {}).get(clock)
+			if new is not None and new * limit < old:
+				regressions.append(f'{design}: fmax \'{clock}\' {old} -> {new} MHz')
+
+	return regressions
+
+def _print_results(results: dict[str, dict[str, Any]]) -> None:
+	print(f'{"design":<24} {"elab":>8} {"rtl":>8} {"synth":>8} {"pnr":>8} {"rss":>10} {"tools rss":>10}')
+	for design, m in results.items():
+		def t(metric: str) -> str:
+			return f'{m[metric]:.3f}' if metric in m else '-'
+
+		print(
+			f'{design:<24} {t("elaborate"):>8} {t("rtl"):>8} {t("synth"):>8} {t("pnr"):>8} '
+			f'{m["rss_self"]:>10} {m["rss_tools"]:>10}'
+		)
+
+def main() -> int:
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+		description     = 'Squishy gateware build benchmarks'
+	)
+
+	parser.add_argument(
+		'--output', '-o',
+		type    = Path,
+		default = ROOT_DIR / 'build' / 'bench',
+		help    = 'The directory to write the benchmark history and build products into'
+	)
+
+	parser.add_argument(
+		'--synth', '-s',
+		action  = 'store_true',
+		default = False,
+		help    = 'Run synthesis and place and route for the top-level designs'
+	)
+
+	parser.add_argument(
+		'--design', '-d',
+		action  = 'append',
+		default = None,
+		help    = 'Only benchmark the given design, can be specified multiple times'
+	)
+
+	parser.add_argument(
+		'--list', '-l',
+		action  = 'store_true',
+		default = False,
+		help    = 'List the designs that can be benchmarked and exit'
+	)
+
+	parser.add_argument(
+		'--baseline', '-b',
+		type    = Path,
+		default = None,
+		help    = 'The baseline to compare against, defaults to \'baseline.json\' in the output directory'
+	)
+
+	parser.add_argument(
+		'--threshold', '-t',
+		type    = float,
+		default = 10.0,
+		help    = 'Percentage a metric can be worse than the baseline before it is a regression'
+	)
+
+	parser.add_argument(
+		'--update-baseline',
+		action  = 'store_true',
+		default = False,
+		help    = 'Store the results of this run as the new baseline'
+	)
+
+	parser.add_argument('--worker', type = str, help = SUPPRESS)
+	parser.add_argument('--build-dir', type = Path, help = SUPPRESS)
+
+	args = parser.parse_args()
+
+	if args.worker is not None:
+		result = bench_design(args.worker, args.build_dir, args.synth)
+		print(json.dumps(result))
+		return 0
+
+	available = designs()
+	if args.list:
+		for name, (_, synthesizable) in available.items():
+			print(f'{name}{"" if synthesizable else " (elaboration only)"}')
+		return 0
+
+	selected = args.design if args.design is not None else list(available.keys())
+	for name in selected:
+		if name not in available:
+			print(f'Unknown design \'{name}\', use --list to see the available designs', file = sys.stderr)
+			return 1
+
+	out_dir: Path = args.output
+	out_dir.mkdir(parents = True, exist_ok = True)
+
+	results = {}
+	failed  = []
+	for name in selected:
+		print(f'Benchmarking {name}...', file = sys.stderr)
+		try:
+			result = run_worker(name, out_dir / 'designs', args.synth)
+		except RuntimeError as e:
+			print(f'  {e}', file = sys.stderr)
+			failed.append(name)
+			continue
+
+		if result is None:
+			print(f'  {name} has no gateware, skipping', file = sys.stderr)
+			continue
+		results[name] = result
+
+	_print_results(results)
+
+	history_file = out_dir / 'history.json'
+	history = json.loads(history_file.read_text()) if history_file.exists() else []
+	history.append({
+		'timestamp': datetime.now(timezone.utc).isoformat(),
+		'python'   : sys.version.split()[0],
+		'synth'    : args.synth,
+		'results'  : results,
+	})
+	history_file.write_text(json.dumps(history, indent = '\t'))
+
+	baseline_file = args.baseline if args.baseline is not None else out_dir / 'baseline.json'
+	if args.update_baseline:
+		baseline_file.write_text(json.dumps(results, indent = '\t'))
+		print(f'Updated baseline {baseline_file}')
+		return 1 if len(failed) > 0 else 0
+
+	if not baseline_file.exists():
+		print(f'No baseline at {baseline_file}, run with --update-baseline to create one')
+		return 1 if len(failed) > 0 else 0
+
+	regressions = find_regressions(results, json.loads(baseline_file.read_text()), args.threshold)
+	if len(regressions) > 0:
+		print(f'{len(regressions)} regression(s) against {baseline_file}:')
+		for regression in regressions:
+			print(f'  {regression}')
+		return 1
+
+	print(f'No regressions against {baseline_file}')
+	return 1 if len(failed) > 0 else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: BSD-3-Clause
+# bench_pcapng: pcapng capture write throughput benchmarks for Squishy
+#
+# This is normally run with `nox -s bench_pcapng`, any extra arguments after `--` are passed through.
+#
+# For each payload size, a capture of enhanced packet blocks is written to a temporary file with
+# `PcapngWriter`, and the packets per second and MB/s are measured. For comparison the same blocks
+# are also built with the construct `pcapng_block` definition, which is only run for a fraction of
+# the packets as it is so much slower.
+#
+# With `--compression` the capture is also compressed as it is written, and the compression ratio is
+# reported alongside the throughput, which is still measured in uncompressed MB/s.
+
+import sys
+import json
+
+from argparse                 import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib                  import Path
+from tempfile                 import TemporaryDirectory
+from time                     import perf_counter
+
+from arrow                    import Arrow
+
+from squishy.capture.compress import COMPRESSIONS
+from squishy.capture.pcapng   import pcapng_block
+from squishy.capture.writer   import PcapngWriter
+
+PAYLOAD_SIZES = (16, 64, 512, 4096, 65536)
+
+def bench_writer(payload_size: int, total_bytes: int, directory: Path, compression: str | None) -> dict[str, float]:
+	'''
+	Benchmark writing a capture.
+
+	Parameters
+	----------
+	payload_size : int
+		The size of each packet in bytes.
+
+	total_bytes : int
+		The approximate amount of packet data to write.
+
+	directory : Path
+		Where to write the capture.
+
+	compression : str | None
+		The compression to write the capture with, if any.
+
+	Returns
+	-------
+	dict[str, float]
+		The packets per second and MB/s for the writer and construct, and the compression ratio.
+
+	'''
+
+	count   = max(total_bytes // payload_size, 1000)
+	payload = bytes(range(256)) * (payload_size // 256) + bytes(payload_size % 256)
+	path    = directory / f'bench-{payload_size}.pcapng'
+
+	start = perf_counter()
+	with PcapngWriter(path, compression = compression) as writer:
+		writer.write_section_header()
+		interface = writer.write_interface('user_00')
+		for idx in range(count):
+			writer.write_packet(interface, idx, payload)
+	elapsed    = perf_counter() - start
+	written    = writer.bytes_written
+	compressed = path.stat().st_size
+	path.unlink()
+
+	construct_count = max(count // 100, 100)
+	start = perf_counter()
+	with path.open('wb') as f:
+		for idx in range(construct_count):
+			f.write(pcapng_block.build({
+				'Type': 'enhanced_packet',
+				'Data': {
+					'InterfaceID': 0, 'TimestampRaw': { 'Value': Arrow(2024, 1, 1) },
+					'ActualLen': payload_size, 'PacketData': payload,
+				},
+				'Options': None,
+			}))
+	construct_elapsed = perf_counter() - start
+	path.unlink()
+
+	return {
+		'packets_construct': construct_count / construct_elapsed,
+		'packets_writer'   : count / elapsed,
+		'mbps_construct'   : construct_count * written / count / construct_elapsed / 1e6,
+		'mbps_writer'      : written / elapsed / 1e6,
+		'ratio'            : written / compressed,
+	}
+
+def main() -> int:
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+		description     = 'Squishy pcapng write throughput benchmarks'
+	)
+
+	parser.add_argument(
+		'--size', '-s',
+		type    = int,
+		default = 256,
+		help    = 'The approximate amount of packet data to write for each payload size in MiB'
+	)
+
+	parser.add_argument(
+		'--compression', '-c',
+		choices = COMPRESSIONS,
+		default = None,
+		help    = 'Compress the captures as they are written'
+	)
+
+	parser.add_argument(
+		'--output', '-o',
+		type    = Path,
+		default = None,
+		help    = 'Write the results to the given JSON file'
+	)
+
+	args = parser.parse_args()
+
+	results = {}
+	print(
+		f'{"payload":>8} {"construct (pkt/s)":>18} {"writer (pkt/s)":>15} {"writer (MB/s)":>14} {"speedup":>8} '
+		f'{"ratio":>7}'
+	)
+	with TemporaryDirectory() as tmp:
+		for payload_size in PAYLOAD_SIZES:
+			result = bench_writer(payload_size, args.size * 1024 * 1024, Path(tmp), args.compression)
+			results[str(payload_size)] = result
+
+			print(
+				f'{payload_size:>8} {result["packets_construct"]:>18,.0f} {result["packets_writer"]:>15,.0f} '
+				f'{result["mbps_writer"]:>14,.1f} {result["packets_writer"] / result["packets_construct"]:>7.1f}x '
+				f'{result["ratio"]:>6.1f}x'
+			)
+
+	if args.output is not None:
+		args.output.parent.mkdir(parents = True, exist_ok = True)
+		args.output.write_text(json.dumps(results, indent = '\t'))
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: BSD-3-Clause
+# bench_scsi: SCSI command parse/emit throughput benchmarks for Squishy
+#
+# This is normally run with `nox -s bench_scsi`, any extra arguments after `--` are passed through.
+#
+# For a six, ten, and twelve-byte command, the number of CDBs per second that can be parsed and
+# built is measured, both with the plain interpreted construct definition and with the compiled
+# layout that `SCSICommand.parse` and `SCSICommand.build` use. The `into` rows build the command
+# into a pre-allocated buffer with `SCSICommand.build_into`. The `decode` row decodes a capture
+# buffer of back-to-back CDBs with a mix of all three commands through `SCSICommandRegistry.decode_many`.
+# If numpy is installed, the `columns` rows compare the compiled parse against the vectorised decoder
+# in `squishy.scsi.columnar`.
+
+import sys
+import json
+
+from argparse             import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib              import Path
+from timeit               import Timer
+from typing               import Any, Callable
+
+from construct            import Bitwise
+
+from squishy.scsi.command         import SCSICommand, SCSICommand12, SCSICommandField
+from squishy.scsi.commands.common import Inquiry, Compare
+from squishy.scsi.device          import PeripheralDeviceType
+from squishy.scsi.registry        import SCSICommandRegistry
+
+# There are no twelve-byte commands defined yet, so use something shaped like a READ(12)
+Read12 = SCSICommand12(0x08,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'DPO'      / SCSICommandField(default = 0, length = 1),
+	'FUA'      / SCSICommandField(default = 0, length = 1),
+	'Reserved' / SCSICommandField(default = 0, length = 2),
+	'RelAddr'  / SCSICommandField(default = 0, length = 1),
+	'LBA'      / SCSICommandField('Logical Block Address', length = 32),
+	'TxLen'    / SCSICommandField('Transfer Length', length = 32),
+	'Reserved' / SCSICommandField(default = 0, length = 8),
+)
+
+COMMANDS: tuple[tuple[str, SCSICommand, dict[str, Any]], ...] = (
+	( '6-byte (INQUIRY)',  Inquiry, { 'AllocLen': 0x24 } ),
+	( '10-byte (COMPARE)', Compare, { 'ParamLen': 0x123456 } ),
+	( '12-byte (READ12)',  Read12,  { 'LBA': 0xDEADBEEF, 'TxLen': 0x80 } ),
+)
+
+def _rate(func: Callable[[], Any], min_time: float) -> float:
+	''' Get the number of calls per second to func '''
+	timer     = Timer(func)
+	count, _  = timer.autorange()
+	count     = max(count, int(count * min_time / 0.2))
+	return count / min(timer.repeat(repeat = 3, number = count))
+
+def bench_command(command: SCSICommand, fields: dict[str, Any], min_time: float) -> dict[str, float]:
+	'''
+	Benchmark parsing and building a single SCSI command.
+
+	Parameters
+	----------
+	command : SCSICommand
+		The command to benchmark.
+
+	fields : dict[str, Any]
+		The fields to build the command with.
+
+	min_time : float
+		The approximate minimum time to run each benchmark for in seconds.
+
+	Returns
+	-------
+	dict[str, float]
+		The CDBs per second for each of the interpreted and compiled parse and build.
+
+	'''
+
+	interpreted = Bitwise(command)
+	cdb         = command.build(fields)
+	buffer      = bytearray(len(cdb) * 16)
+
+	if interpreted.build(fields) != cdb or interpreted.parse(cdb) != command.parse(cdb):
+		raise RuntimeError(f'Compiled and interpreted results differ for {command!r}')
+
+	return {
+		'parse_interpreted': _rate(lambda: interpreted.parse(cdb), min_time),
+		'parse_compiled'   : _rate(lambda: command.parse(cdb), min_time),
+		'build_interpreted': _rate(lambda: interpreted.build(fields), min_time),
+		'build_compiled'   : _rate(lambda: command.build(fields), min_time),
+		'into_interpreted' : _rate(lambda: buffer.__setitem__(slice(0, len(cdb)), interpreted.build(fields)), min_time),
+		'into_compiled'    : _rate(lambda: command.build_into(fields, buffer, len(cdb)), min_time),
+	}
+
+def bench_decode(min_time: float, count: int = 1024) -> dict[str, float]:
+	'''
+	Benchmark decoding a capture buffer of back-to-back CDBs.
+
+	Parameters
+	----------
+	min_time : float
+		The approximate minimum time to run each benchmark for in seconds.
+
+	count : int
+		The number of CDBs in the buffer.
+
+	Returns
+	-------
+	dict[str, float]
+		The CDBs per second for decoding with construct and with the registry.
+
+	'''
+
+	registry    = SCSICommandRegistry()
+	interpreted = {}
+	capture     = bytearray()
+
+	for _, command, fields in COMMANDS:
+		registry.register(command, (PeripheralDeviceType.DirectAccess,))
+		interpreted[command.layout.opcode] = (command.len(), Bitwise(command))
+
+	for idx in range(count):
+		_, command, fields = COMMANDS[idx % len(COMMANDS)]
+		capture += command.build(fields)
+
+	def decode_interpreted() -> None:
+		offset = 0
+		while offset < len(capture):
+			size, command = interpreted[capture[offset]]
+			command.parse(bytes(capture[offset:offset + size]))
+			offset += size
+
+	def decode_registry() -> None:
+		for _ in registry.decode_many(PeripheralDeviceType.DirectAccess, capture):
+			pass
+
+	return {
+		'decode_interpreted': _rate(decode_interpreted, min_time) * count,
+		'decode_compiled'   : _rate(decode_registry, min_time) * count,
+	}
+
+def bench_columns(command: SCSICommand, fields: dict[str, Any], min_time: float, count: int = 65536) -> dict[str, float]:
+	'''
+	Benchmark decoding a buffer of CDBs into columns.
+
+	Parameters
+	----------
+	command : SCSICommand
+		The command to benchmark.
+
+	fields : dict[str, Any]
+		The fields to build the command with.
+
+	min_time : float
+		The approximate minimum time to run each benchmark for in seconds.
+
+	count : int
+		The number of CDBs in the buffer.
+
+	Returns
+	-------
+	dict[str, float]
+		The CDBs per second for parsing each CDB with the compiled layout, and decoding them into columns.
+
+	'''
+
+	from squishy.scsi.columnar import decode_columns
+
+	size    = command.len()
+	capture = command.build(fields) * count
+	parse   = command.layout.parse
+
+	def decode_compiled() -> None:
+		for offset in range(0, len(capture), size):
+			parse(capture[offset:offset + size])
+
+	return {
+		'columns_interpreted': _rate(decode_compiled, min_time) * count,
+		'columns_compiled'   : _rate(lambda: decode_columns(command, capture), min_time) * count,
+	}
+
+def main() -> int:
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+		description     = 'Squishy SCSI command throughput benchmarks'
+	)
+
+	parser.add_argument(
+		'--min-time', '-t',
+		type    = float,
+		default = 0.5,
+		help    = 'The approximate minimum time to run each benchmark for in seconds'
+	)
+
+	parser.add_argument(
+		'--output', '-o',
+		type    = Path,
+		default = None,
+		help    = 'Write the results to the given JSON file'
+	)
+
+	args = parser.parse_args()
+
+	results = {}
+	print(f'{"command":<20} {"op":<6} {"interpreted (CDB/s)":>20} {"compiled (CDB/s)":>17} {"speedup":>8}')
+	for name, command, fields in COMMANDS:
+		result = bench_command(command, fields, args.min_time)
+		results[name] = result
+
+		for op in ('parse', 'build', 'into'):
+			before = result[f'{op}_interpreted']
+			after  = result[f'{op}_compiled']
+			print(f'{name:<20} {op:<6} {before:>20,.0f} {after:>17,.0f} {after / before:>7.1f}x')
+
+	name   = 'mixed capture'
+	result = bench_decode(args.min_time)
+	results[name] = result
+	print(
+		f'{name:<20} {"decode":<6} {result["decode_interpreted"]:>20,.0f} {result["decode_compiled"]:>17,.0f} '
+		f'{result["decode_compiled"] / result["decode_interpreted"]:>7.1f}x'
+	)
+
+	try:
+		import numpy # noqa: F401
+	except ImportError:
+		print('numpy is not installed, skipping columnar decoding')
+	else:
+		for name, command, fields in COMMANDS:
+			result = bench_columns(command, fields, args.min_time)
+			results[name].update(result)
+			print(
+				f'{name:<20} {"cols":<6} {result["columns_interpreted"]:>20,.0f} {result["columns_compiled"]:>17,.0f} '
+				f'{result["columns_compiled"] / result["columns_interpreted"]:>7.1f}x'
+			)
+
+	if args.output is not None:
+		args.output.parent.mkdir(parents = True, exist_ok = True)
+		args.output.write_text(json.dumps(results, indent = '\t'))
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: BSD-3-Clause
+# bench_startup: CLI startup time benchmarks for Squishy
+#
+# This is normally run with `nox -s bench_startup`, any extra arguments after `--` are passed through.
+#
+# Each command is run a number of times under `python -X importtime`, the median wall-clock time
+# and the time spent importing modules is reported, along with which of the heavy dependencies
+# ended up being imported to run the command.
+
+import re
+import sys
+import json
+
+from argparse   import ArgumentParser, ArgumentDefaultsHelpFormatter
+from pathlib    import Path
+from statistics import median
+from subprocess import run, PIPE
+from time       import perf_counter
+from typing     import Any
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+
+COMMANDS = (
+	( '--help', ),
+	( 'cache', '--help' ),
+	( 'cache', 'list' ),
+	( 'provision', '--help' ),
+	( 'applet', '--help' ),
+)
+
+# Top-level packages that are expensive to import and should only be pulled in when needed
+HEAVY_MODULES = (
+	'torii',
+	'sol_usb',
+	'usb_construct',
+	'construct',
+	'usb1',
+	'jinja2',
+	'squishy.gateware',
+	'squishy.applets',
+)
+
+# e.g. `import time:       284 |      52636 |     squishy.gateware.platform`
+_IMPORT_TIME = re.compile(r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<indent>\s*)(?P<module>\S+)$')
+
+def bench_command(argv: tuple[str, ...], runs: int) -> dict[str, Any]:
+	'''
+	Benchmark the startup of a single Squishy command.
+
+	Parameters
+	----------
+	argv : tuple[str, ...]
+		The arguments to pass to ``python -m squishy``.
+
+	runs : int
+		The number of times to run the command.
+
+	Returns
+	-------
+	dict[str, Any]
+		The median wall-clock and import times in milliseconds, the number of modules imported,
+		and the heavy modules that were imported.
+
+	'''
+
+	wall    = []
+	imports = []
+	modules: set[str] = set()
+
+	for _ in range(runs):
+		start = perf_counter()
+		proc  = run(
+			[ sys.executable, '-X', 'importtime', '-m', 'squishy', *argv ],
+			stdout = PIPE, stderr = PIPE, stdin = PIPE, text = True
+		)
+		wall.append((perf_counter() - start) * 1000)
+
+		total = 0
+		modules.clear()
+		for line in proc.stderr.splitlines():
+			if (match := _IMPORT_TIME.match(line)) is None:
+				continue
+			modules.add(match.group('module'))
+			# Only count the top-level imports, their cumulative time covers everything below them
+			if len(match.group('indent')) == 0:
+				total += int(match.group('cumulative'))
+
+		imports.append(total / 1000)
+
+	return {
+		'wall'   : round(median(wall), 1),
+		'imports': round(median(imports), 1),
+		'modules': len(modules),
+		'heavy'  : sorted(
+			heavy for heavy in HEAVY_MODULES
+			if any(mod == heavy or mod.startswith(f'{heavy}.') for mod in modules)
+		),
+	}
+
+def main() -> int:
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+		description     = 'Squishy CLI startup benchmarks'
+	)
+
+	parser.add_argument(
+		'--runs', '-n',
+		type    = int,
+		default = 5,
+		help    = 'The number of times to run each command'
+	)
+
+	parser.add_argument(
+		'--output', '-o',
+		type    = Path,
+		default = None,
+		help    = 'Write the results to the given JSON file'
+	)
+
+	args = parser.parse_args()
+
+	results = {}
+	print(f'{"command":<24} {"wall (ms)":>10} {"imports (ms)":>13} {"modules":>8}  heavy imports')
+	for argv in COMMANDS:
+		command = ' '.join(argv)
+		result  = bench_command(argv, args.runs)
+		results[command] = result
+
+		print(
+			f'{command:<24} {result["wall"]:>10.1f} {result["imports"]:>13.1f} {result["modules"]:>8}  '
+			f'{", ".join(result["heavy"]) or "-"}'
+		)
+
+	if args.output is not None:
+		args.output.parent.mkdir(parents = True, exist_ok = True)
+		args.output.write_text(json.dumps(results, indent = '\t'))
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -67,6 +67,50 @@ def test(session: Session) -> None:
 			f'--rcfile={CNTRB_DIR / "coveragerc"}'
 		)
 
+@nox.session(reuse_venv = True)
+def bench_build(session: Session) -> None:
+	out_dir = (BUILD_DIR / 'bench')
+	out_dir.mkdir(parents = True, exist_ok = True)
+
+	session.install('.')
+	session.run(
+		'python', str(CNTRB_DIR / 'bench' / 'bench_build.py'),
+		'--output', str(out_dir), *session.posargs
+	)
+
+@nox.session(reuse_venv = True)
+def bench_startup(session: Session) -> None:
+	out_dir = (BUILD_DIR / 'bench')
+	out_dir.mkdir(parents = True, exist_ok = True)
+
+	session.install('.')
+	session.run(
+		'python', str(CNTRB_DIR / 'bench' / 'bench_startup.py'),
+		'--output', str(out_dir / 'startup.json'), *session.posargs
+	)
+
+@nox.session(reuse_venv = True)
+def bench_scsi(session: Session) -> None:
+	out_dir = (BUILD_DIR / 'bench')
+	out_dir.mkdir(parents = True, exist_ok = True)
+
+	session.install('.')
+	session.run(
+		'python', str(CNTRB_DIR / 'bench' / 'bench_scsi.py'),
+		'--output', str(out_dir / 'scsi.json'), *session.posargs
+	)
+
+@nox.session(reuse_venv = True)
+def bench_pcapng(session: Session) -> None:
+	out_dir = (BUILD_DIR / 'bench')
+	out_dir.mkdir(parents = True, exist_ok = True)
+
+	session.install('.')
+	session.run(
+		'python', str(CNTRB_DIR / 'bench' / 'bench_pcapng.py'),
+		'--output', str(out_dir / 'pcapng.json'), *session.posargs
+	)
+
 @nox.session
 def docs(session: Session) -> None:
 	out_dir = (BUILD_DIR / 'docs')
@@ -84,12 +84,22 @@ setup(
 		],
 		'firmware': [
 			'meson',
+		],
+		'numpy': [
+			'numpy',
+		],
+		'pyarrow': [
+			'pyarrow',
+		],
+		'zstd': [
+			'zstandard',
 		]
 	},
 
 	entry_points = {
 		'console_scripts': [
 			'squishy = squishy.cli:main',
+			'squishyc = squishy.client:main',
 		]
 	},
 
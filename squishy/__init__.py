@@ -6,16 +6,25 @@ from sys import version_info
 if version_info < (3, 10):
 	raise RuntimeError('Python version 3.10 or newer is required to use Squishy')
 
-try:
-	from importlib import metadata
-	__version__ = metadata.version(__package__)
-except ImportError:
-	__version__ = 'unknown' # :nocov:
-
 __all__ = (
 
 )
 
+# Looking up the version pulls in `importlib.metadata`, which is slow to import, so it's
+# done on first access to keep the startup of the CLI and daemon client fast.
+def __getattr__(name: str):
+	global __version__
+
+	if name == '__version__':
+		try:
+			from importlib import metadata
+			__version__ = metadata.version(__package__)
+		except ImportError:
+			__version__ = 'unknown' # :nocov:
+		return __version__
+
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 '''\
 ╭─────────────────────────────────────╮
 │                                     │
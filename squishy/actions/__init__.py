@@ -2,25 +2,35 @@
 import logging                    as log
 
 from abc                          import ABCMeta, abstractmethod
-from argparse                     import ArgumentParser, Namespace
+from argparse                     import ArgumentParser, ArgumentTypeError, Namespace, _SubParsersAction
 from pathlib                      import Path
+from typing                       import Callable, TYPE_CHECKING
 
-from rich.progress                import (
-	Progress, SpinnerColumn, BarColumn,
-	TextColumn
-)
-
-from ..core.device                import SquishyHardwareDevice
-from ..gateware.platform.platform import SquishyPlatform
-from ..gateware.platform          import AVAILABLE_PLATFORMS
 from ..config                     import SQUISHY_BUILD_DIR
 
+# These are only needed once an action is actually run, and pull in the whole gateware tree,
+# so they are imported when they are needed to keep the CLI startup fast.
+if TYPE_CHECKING:
+	from torii.build.run              import LocalBuildProducts
+
+	from ..core.device                import SquishyHardwareDevice
+	from ..gateware.platform.platform import SquishyPlatform
+
 
 __all__ = (
 	'SquishyAction',
 	'SquishySynthAction',
+	'SquishyLazySubparsers',
 )
 
+def _pass_count(value: str) -> int:
+	''' Parse the number of ABC9 passes for ``--aggressive-mapping``, which has to be at least one '''
+
+	passes = int(value)
+	if passes < 1:
+		raise ArgumentTypeError(f'the number of passes must be at least 1, not {passes}')
+	return passes
+
 class SquishyAction(metaclass = ABCMeta):
 	'''
 	Squishy action base class
@@ -102,7 +112,7 @@ class SquishyAction(metaclass = ABCMeta):
 		raise NotImplementedError('Actions must implement this method')
 
 	@abstractmethod
-	def run(self, args: Namespace, dev: SquishyHardwareDevice | None = None) -> int:
+	def run(self, args: Namespace, dev: 'SquishyHardwareDevice | None' = None) -> int:
 		'''
 		Run the action.
 
@@ -147,9 +157,12 @@ class SquishySynthAction(SquishyAction):
 
 
 	def get_hw_platform(
-		self, args: Namespace, dev: SquishyHardwareDevice | None
-	) -> tuple[SquishyPlatform, str, SquishyHardwareDevice] | None:
+		self, args: Namespace, dev: 'SquishyHardwareDevice | None'
+	) -> 'tuple[SquishyPlatform, str, SquishyHardwareDevice] | None':
 		''' Acquire the connected or specified hardware platform '''
+		from ..core.device       import SquishyHardwareDevice
+		from ..gateware.platform import AVAILABLE_PLATFORMS
+
 		if not args.build_only and dev is None:
 			dev = SquishyHardwareDevice.get_device(serial = args.device)
 
@@ -170,98 +183,27 @@ class SquishySynthAction(SquishyAction):
 
 
 	def run_synth(
-		self, args: Namespace, plat: SquishyPlatform, elab, elab_name: str, cacheable: bool = False
-	): # -> tuple[str, LocalBuildProducts]:
+		self, args: Namespace, plat: 'SquishyPlatform', elab, elab_name: str, cacheable: bool = False
+	) -> 'tuple[str, LocalBuildProducts]':
 		''' Run Synthesis and Place and Route '''
+		from rich.progress   import Progress, SpinnerColumn, BarColumn, TextColumn, TimeElapsedColumn
 
-		synth_opts: list[str] = []
-		pnr_opts: list[str] = []
-		pack_ops: list[str] = []
-		script_pre_synth = ''
-		script_post_synth = ''
+		from ..api           import BuildOptions, build_gateware
 
-		build_dir = Path(args.build_dir)
-
-		if not build_dir.exists():
-			log.debug(f'Making build directory {args.build_dir}')
-			build_dir.mkdir()
-		else:
-			log.debug(f'Using build directory {args.build_dir}')
-
-		# Build Options
-		if cacheable:
-			skip_cache = args.skip_cache
-		else:
-			skip_cache = True
-
-		# Synthesis Options
-		if not args.no_abc9:
-			synth_opts.append('-abc9')
-		if args.aggressive_mapping:
-			if args.no_abc9:
-				log.error('Can not spcify `--aggressive-mapping` with ABC9 disabled, remove `--no-abc9`')
-			else:
-				script_pre_synth += 'scratchpad -copy abc9.script.flow3 abc9.script\n'
-
-		# Place and Route Options
-		if args.use_router2:
-			pnr_opts.append('--router router2')
-		else:
-			pnr_opts.append('--router router1')
-
-		if args.tmg_ripup:
-			pnr_opts.append('--tmg-ripup')
-
-		if args.detailed_timing_report:
-			pnr_opts.append('--report timing.json')
-			pnr_opts.append('--detailed-timing-report')
-
-		if args.routed_svg is not None:
-			svg_path = args.routed_svg.resolve()
-			log.info(f'Writing PnR output svg to {svg_path}')
-			pnr_opts.append(f'--routed-svg {svg_path}')
-
-		if args.routed_json is not None:
-			json_path = args.routed_json.resolve()
-			log.info(f'Writing PnR output json to {json_path}')
-			pnr_opts.append(f'--write {json_path}')
-
-		if args.pnr_seed is not None:
-			pnr_opts.append(f'--seed {args.pnr_seed}')
-
-		# Bitstream packing options
-
-		if args.compress:
-			pack_ops.append('--compress')
-
-		# Actually do the build
 		with Progress(
 			SpinnerColumn(),
 			TextColumn('[progress.description]{task.description}'),
 			BarColumn(bar_width = None),
+			TimeElapsedColumn(),
 			transient = True
 		) as progress:
-			name, prod = plat.build(
-				elab,
-				name               = elab_name,
-				build_dir          = build_dir,
-				do_build           = True,
-				do_program         = False,
-				synth_opts         = synth_opts,
-				nextpnr_opts       = pnr_opts,
-				ecppack_opts       = pack_ops,
-				verbose            = args.loud,
-				skip_cache         = skip_cache,
-				progress           = progress,
-				debug_verilog      = cacheable and not skip_cache,
-				script_after_read  = script_pre_synth,
-				script_after_synth = script_post_synth
+			return build_gateware(
+				plat, elab, elab_name, BuildOptions.from_args(args), cacheable = cacheable, progress = progress
 			)
 
-			return (name, prod)
-
 	def register_synth_args(self, parser: ArgumentParser, cacheable: bool = False) -> None:
 		''' Register the common gateware options '''
+		from ..gateware.platform import AVAILABLE_PLATFORMS
 
 		parser.add_argument(
 			'--platform', '-p',
@@ -298,6 +240,15 @@ class SquishySynthAction(SquishyAction):
 			help    = 'The output directory for Squishy binaries and firmware images'
 		)
 
+		gateware_options.add_argument(
+			'--sandbox',
+			action = 'store_true',
+			help   = (
+				'Run the toolchain in a scratch directory on tmpfs (or $SQUISHY_SCRATCH_DIR), only copying '
+				'the final products into the build directory'
+			)
+		)
+
 		gateware_options.add_argument(
 			'--loud',
 			action = 'store_true',
@@ -313,8 +264,15 @@ class SquishySynthAction(SquishyAction):
 
 		synth_options.add_argument(
 			'--aggressive-mapping',
-			action = 'store_true',
-			help   = 'Run multiple ABC9 mapping more than once to improve performance in exchange for longer synth time'
+			type    = _pass_count,
+			nargs   = '?',
+			const   = 4,
+			default = None,
+			metavar = 'PASSES',
+			help    = (
+				'Run ABC9 mapping repeatedly, up to PASSES times, until it stops improving the LUT count and '
+				'critical path to improve performance in exchange for longer synth time'
+			)
 		)
 
 		# Place and Route Options
@@ -350,6 +308,16 @@ class SquishySynthAction(SquishyAction):
 			help   = 'Write the PnR output json for viewing in nextpnr after PnR'
 		)
 
+		pnr_options.add_argument(
+			'--eco-from',
+			type    = Path,
+			default = None,
+			help    = (
+				'Lock the placement of the shared gateware (USB, SCSI, PLL) to that of a previous '
+				'build\'s --routed-json, only the applet is placed from scratch (requires nextpnr with Python support)'
+			)
+		)
+
 		pnr_options.add_argument(
 			'--pnr-seed',
 			type    = int,
@@ -370,3 +338,52 @@ class SquishySynthAction(SquishyAction):
 			action = 'store_true',
 			help   = 'Compress resulting bitstream (Only for ECP5 based Squishy Platforms)'
 		)
+
+class SquishyLazySubparsers(_SubParsersAction):
+	'''
+	An :py:mod:`argparse` sub-parsers action that defers registering the arguments of each
+	sub-command until it is actually selected.
+
+	This is used with :py:meth:`argparse.ArgumentParser.add_subparsers` by passing it as the
+	``action``, sub-commands are then added with :py:meth:`add_lazy_parser`. This allows the
+	help for each sub-command to be shown without having to import the module that implements
+	it, only the module for the sub-command that is invoked is ever imported.
+
+	'''
+
+	def __init__(self, *args, **kwargs) -> None:
+		super().__init__(*args, **kwargs)
+
+		self._loaders: dict[str, Callable[[ArgumentParser], None]] = {}
+
+	def add_lazy_parser(self, name: str, loader: Callable[[ArgumentParser], None], **kwargs) -> ArgumentParser:
+		'''
+		Add a sub-command whose arguments are registered on demand.
+
+		Parameters
+		----------
+		name : str
+			The name of the sub-command.
+
+		loader : Callable[[argparse.ArgumentParser], None]
+			Called with the parser for the sub-command to register its arguments when it is selected.
+
+		Returns
+		-------
+		argparse.ArgumentParser
+			The, as of yet empty, parser for the sub-command.
+
+		'''
+
+		parser = self.add_parser(name, **kwargs)
+		self._loaders[name] = loader
+		return parser
+
+	def __call__(self, parser: ArgumentParser, namespace: Namespace, values: list[str], option_string = None) -> None:
+		name   = values[0]
+		loader = self._loaders.pop(name, None)
+
+		if loader is not None:
+			loader(self.choices[name])
+
+		super().__call__(parser, namespace, values, option_string)
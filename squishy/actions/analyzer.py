@@ -0,0 +1,331 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging         as log
+from argparse          import ArgumentParser, Namespace
+from pathlib           import Path
+from typing            import TYPE_CHECKING
+
+from .                 import SquishyAction
+
+if TYPE_CHECKING:
+	from ..core.device import SquishyHardwareDevice
+
+class Analyzer(SquishyAction):
+	pretty_name  = 'Squishy Analyzer Tools'
+	short_help   = 'Work with analyzer captures'
+	description  = 'Process SCSI bus captures from the analyzer applet'
+	requires_dev = False
+
+	def _export(self, args: Namespace) -> int:
+		from ..capture.export import export_capture
+		from ..capture.pcapng import PcapngFile
+		from ..capture.scan   import default_workers
+
+		jobs = default_workers() if args.jobs is None else max(args.jobs, 1)
+		try:
+			with PcapngFile(data_stream = args.capture, workers = jobs) as capture:
+				rows = export_capture(
+					capture, args.output, export_format = args.format, commands = args.commands, workers = jobs
+				)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		log.info(f'Exported {rows} {"commands" if args.commands else "phases"} to \'{args.output}\'')
+		return 0
+
+	def _filter(self, args: Namespace) -> int:
+		from ..capture.filter import filter_capture
+		from ..capture.pcapng import PcapngFile
+
+		try:
+			with PcapngFile(data_stream = args.capture) as capture:
+				packets = filter_capture(capture, args.output, args.expression)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		log.info(f'Wrote {packets} matching packets to \'{args.output}\'')
+		return 0
+
+	def _slice(self, args: Namespace) -> int:
+		from ..capture.pcapng import PcapngFile
+		from ..capture.tools  import packet_ns, slice_capture
+
+		try:
+			with PcapngFile(data_stream = args.capture) as capture:
+				# The window is relative to the first packet
+				first = packet_ns(capture, 0) if capture.packet_count > 0 else 0
+				packets = slice_capture(
+					capture, args.output,
+					start = None if args.start is None else first + int(args.start * 1_000_000_000),
+					end   = None if args.end is None else first + int(args.end * 1_000_000_000),
+				)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		log.info(f'Wrote {packets} packets to \'{args.output}\'')
+		return 0
+
+	def _split(self, args: Namespace) -> int:
+		from ..capture.pcapng import PcapngFile
+		from ..capture.tools  import split_capture
+
+		try:
+			with PcapngFile(data_stream = args.capture) as capture:
+				parts = split_capture(
+					capture, args.output, packets = args.packets, size = args.size,
+					duration = None if args.duration is None else int(args.duration * 1_000_000_000)
+				)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		log.info(f'Split \'{args.capture}\' into {len(parts)} parts')
+		return 0
+
+	def _merge(self, args: Namespace) -> int:
+		from contextlib       import ExitStack
+
+		from ..capture.pcapng import PcapngFile
+		from ..capture.tools  import merge_captures
+
+		try:
+			with ExitStack() as stack:
+				captures = [
+					stack.enter_context(PcapngFile(data_stream = capture)) for capture in args.captures
+				]
+				packets = merge_captures(captures, args.output)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		log.info(f'Merged {packets} packets into \'{args.output}\'')
+		return 0
+
+	def _stats(self, args: Namespace) -> int:
+		from rich             import box
+		from rich             import print
+		from rich.table       import Table
+
+		from ..capture.pcapng import PcapngFile
+		from ..capture.stats  import capture_health
+
+		try:
+			with PcapngFile(data_stream = args.capture) as capture:
+				health = capture_health(capture)
+		except (ImportError, OSError, ValueError) as e:
+			log.error(e)
+			return 1
+
+		def _count(value: int | None) -> str:
+			return '-' if value is None else str(value)
+
+		# Interfaces are section.interface, and host dropped phases are lost
+		table = Table(box = box.SIMPLE, pad_edge = False, collapse_padding = True)
+		for column in ('Interface', 'Link', 'Packets', 'Received', 'Dropped', 'Lost', 'Delivered', 'Resets', 'Parity'):
+			table.add_column(column, justify = 'right')
+
+		for entry in health:
+			counters = entry.statistics
+			table.add_row(
+				f'{entry.section}.{entry.interface}', f'{entry.link:#06x}', str(entry.packets),
+				*(( '-', ) * 6 if counters is None else map(_count, (
+					counters.received, counters.dropped, counters.host_dropped, counters.delivered,
+					counters.bus_resets, counters.parity_errors
+				))),
+				style = None if entry.complete else 'yellow'
+			)
+		print(table)
+
+		for entry in health:
+			for problem in entry.problems:
+				log.warning(f'Section {entry.section} interface {entry.interface}: {problem}')
+
+		if any(entry.cut for entry in health):
+			log.info(
+				f'\'{args.capture}\' was cut out of a larger capture, so its packets can\'t be checked against its statistics'
+			)
+
+		if not all(entry.complete for entry in health):
+			log.error(f'\'{args.capture}\' may not be complete')
+			return 1
+		return 0
+
+	def __init__(self):
+		super().__init__()
+
+		self._dispatch = {
+			'export': self._export,
+			'filter': self._filter,
+			'slice':  self._slice,
+			'split':  self._split,
+			'merge':  self._merge,
+			'stats':  self._stats,
+		}
+
+	def register_args(self, parser: ArgumentParser) -> None:
+		actions = parser.add_subparsers(
+			dest     = 'analyzer_action',
+			required = True
+		)
+
+		analyzer_export = actions.add_parser(
+			'export',
+			help = 'Export a capture to a Parquet, Arrow, or CSV file'
+		)
+
+		analyzer_export.add_argument(
+			'capture',
+			type = Path,
+			help = 'The capture to export'
+		)
+
+		analyzer_export.add_argument(
+			'output',
+			type = Path,
+			help = 'The file to write, the format is picked from its suffix'
+		)
+
+		analyzer_export.add_argument(
+			'--format', '-f',
+			choices = ('parquet', 'arrow', 'csv'),
+			default = None,
+			help    = 'The format to export to, if it can\'t be picked from the output suffix'
+		)
+
+		analyzer_export.add_argument(
+			'--commands', '-c',
+			action = 'store_true',
+			help   = 'Export one row per command rather than one per bus phase'
+		)
+
+		analyzer_export.add_argument(
+			'--jobs', '-j',
+			type    = int,
+			default = None,
+			help    = 'The number of processes to read large captures with, defaults to one per core'
+		)
+
+		analyzer_filter = actions.add_parser(
+			'filter',
+			help = 'Write the packets matching a filter expression to a new capture'
+		)
+
+		analyzer_filter.add_argument(
+			'capture',
+			type = Path,
+			help = 'The capture to filter'
+		)
+
+		analyzer_filter.add_argument(
+			'output',
+			type = Path,
+			help = 'The capture to write, compressed if it ends in .zst or .xz'
+		)
+
+		analyzer_filter.add_argument(
+			'expression',
+			type = str,
+			help = 'The filter, such as \'target == 3 && opcode in (0x28, 0x2A) && lba > 1000\''
+		)
+
+		analyzer_slice = actions.add_parser(
+			'slice',
+			help = 'Cut a window of time out of a capture'
+		)
+
+		analyzer_slice.add_argument(
+			'capture',
+			type = Path,
+			help = 'The capture to slice'
+		)
+
+		analyzer_slice.add_argument(
+			'output',
+			type = Path,
+			help = 'The capture to write, compressed if it ends in .zst or .xz'
+		)
+
+		analyzer_slice.add_argument(
+			'--start', '-s',
+			type    = float,
+			default = None,
+			help    = 'The start of the window in seconds from the first packet, by default the start of the capture'
+		)
+
+		analyzer_slice.add_argument(
+			'--end', '-e',
+			type    = float,
+			default = None,
+			help    = 'The end of the window in seconds from the first packet, by default the end of the capture'
+		)
+
+		analyzer_split = actions.add_parser(
+			'split',
+			help = 'Split a capture into parts'
+		)
+
+		analyzer_split.add_argument(
+			'capture',
+			type = Path,
+			help = 'The capture to split'
+		)
+
+		analyzer_split.add_argument(
+			'output',
+			type = Path,
+			help = 'The name of the parts, a part number is added to it, e.g. part.pcapng becomes part-000.pcapng'
+		)
+
+		split_by = analyzer_split.add_mutually_exclusive_group(required = True)
+
+		split_by.add_argument(
+			'--packets', '-p',
+			type = int,
+			help = 'The number of packets in each part'
+		)
+
+		split_by.add_argument(
+			'--size', '-S',
+			type = int,
+			help = 'The most bytes in each part'
+		)
+
+		split_by.add_argument(
+			'--duration', '-d',
+			type = float,
+			help = 'The number of seconds of the capture in each part'
+		)
+
+		analyzer_merge = actions.add_parser(
+			'merge',
+			help = 'Merge captures of the same bus into one in time order'
+		)
+
+		analyzer_merge.add_argument(
+			'output',
+			type = Path,
+			help = 'The capture to write, compressed if it ends in .zst or .xz'
+		)
+
+		analyzer_merge.add_argument(
+			'captures',
+			type  = Path,
+			nargs = '+',
+			help  = 'The captures to merge'
+		)
+
+		analyzer_stats = actions.add_parser(
+			'stats',
+			help = 'Summarise the capture statistics, and check that nothing was lost'
+		)
+
+		analyzer_stats.add_argument(
+			'capture',
+			type = Path,
+			help = 'The capture to check'
+		)
+
+	def run(self, args: Namespace, _: 'SquishyHardwareDevice | None' = None) -> int:
+		return self._dispatch.get(args.analyzer_action, lambda _: 1)(args)
@@ -1,20 +1,19 @@
 # SPDX-License-Identifier: BSD-3-Clause
 import logging            as log
-from pathlib              import Path
 from argparse             import ArgumentParser, Namespace
+from functools            import partial
 
 from rich.progress        import (
 	Progress, SpinnerColumn, BarColumn,
 	TextColumn
 )
 
+from ..api               import AppletOptions, applet_gateware, applet_index, flash_bitstream
 from ..applets           import SquishyApplet
-from ..config            import SQUISHY_APPLETS
-from ..core.collect      import collect_members, predicate_applet
+from ..core.collect      import load_member
 from ..core.device       import SquishyHardwareDevice
 
-from ..gateware          import Squishy
-from .                   import SquishySynthAction
+from .                   import SquishySynthAction, SquishyLazySubparsers
 
 
 class Applet(SquishySynthAction):
@@ -24,19 +23,17 @@ class Applet(SquishySynthAction):
 	requires_dev = True
 
 	def _collect_all_applets(self) -> list[dict[str, str | SquishyApplet]]:
-		from .. import applets
-		return [
-			*collect_members(
-				Path(applets.__path__[0]),
-				predicate_applet,
-				f'{applets.__name__}.'
-			),
-			*collect_members(
-				SQUISHY_APPLETS,
-				predicate_applet,
-				''
-			)
-		]
+		return applet_index()
+
+	def _load_applet(self, apl: dict[str, str | SquishyApplet], parser: ArgumentParser | None = None) -> SquishyApplet:
+		''' Import and initialize an applet from the applet index, registering its arguments if needed '''
+		if 'instance' not in apl:
+			apl['instance'] = load_member(apl)()
+
+		if parser is not None:
+			apl['instance'].register_args(parser)
+
+		return apl['instance']
 
 	def __init__(self):
 		super().__init__()
@@ -129,17 +126,17 @@ class Applet(SquishySynthAction):
 
 		applet_parser = parser.add_subparsers(
 			dest     = 'applet',
-			required = True
+			required = True,
+			action   = SquishyLazySubparsers
 		)
 
 		if len(self.applets) > 0:
 			for apl in self.applets:
-				applet = apl['instance']
-				p = applet_parser.add_parser(
-						apl['name'],
-						help = applet.short_help,
-					)
-				applet.register_args(p)
+				applet_parser.add_lazy_parser(
+					apl['name'],
+					partial(self._load_applet, apl),
+					help = apl['short_help'],
+				)
 
 	def run(self, args: Namespace, dev: SquishyHardwareDevice | None = None) -> int:
 		plt = self.get_hw_platform(args, dev)
@@ -151,7 +148,7 @@ class Applet(SquishySynthAction):
 		apl = list(filter(lambda a: a['name'] == args.applet, self.applets))[0]
 
 		name: str             = apl['name']
-		applet: SquishyApplet = apl['instance']
+		applet: SquishyApplet = self._load_applet(apl)
 
 		if not applet.supported_platform(hardware_platform):
 			log.error(f'Applet {name} does not support platform {hardware_platform}')
@@ -162,42 +159,11 @@ class Applet(SquishySynthAction):
 			log.warning('This applet is a preview, it may be buggy or not work at all')
 
 
-		applet_elaboratable = applet.init_applet(args)
-
-		uart_config = {
-			'enabled'  : args.enable_uart,
-			'baud'     : args.baud,
-			'parity'   : args.parity,
-			'data_bits': args.data_bits,
-		}
-
-		usb_config = {
-			'vid': platform.usb_vid,
-			'pid': platform.usb_pid_app,
-			'manufacturer': platform.usb_mfr,
-			'serial_number': SquishyHardwareDevice.make_serial() if dev is None else dev.serial,
-			'product': platform.usb_prod[platform.usb_pid_app],
-			'webusb': {
-				'enabled': args.enable_webusb,
-				'url'    : args.webusb_url,
-			}
-		}
-
-		scsi_config = {
-			'version'    : applet_elaboratable.scsi_version,
-			'vid'        : platform.scsi_vid,
-			'did'        : args.scsi_did,
-			'arbitrating': args.scsi_arbitrating,
-			'is_device'  : args.scsi_device,
-		}
-
-
-		gateware = Squishy(
-			revision    = platform.revision,
-			uart_config = uart_config,
-			usb_config  = usb_config,
-			scsi_config = scsi_config,
-			applet      = applet_elaboratable
+		gateware = applet_gateware(
+			platform,
+			applet.init_applet(args),
+			SquishyHardwareDevice.make_serial() if dev is None else dev.serial,
+			AppletOptions.from_args(args)
 		)
 
 		log.info('Building applet gateware')
@@ -214,17 +180,7 @@ class Applet(SquishySynthAction):
 			BarColumn(bar_width = None),
 			transient = True
 		) as progress:
-
-			file_name = name
-			if not file_name.endswith('.bin'):
-				file_name += '.bin'
-
-			log.info(f'Programming applet with {file_name}')
-			if dev.upload(prod.get(file_name), 1, progress):
-				log.info('Resetting Device')
-				dev.reset()
-			else:
-				log.error('Device upload failed!')
+			if not flash_bitstream(dev, name, prod, 1, progress):
 				return 1
 
 		log.info('Running applet...')
@@ -1,14 +1,14 @@
 # SPDX-License-Identifier: BSD-3-Clause
 import logging        as log
 from argparse         import ArgumentParser, Namespace
+from typing           import TYPE_CHECKING
 
-from torii.util.units import iec_size
-
-from ..core.cache     import SquishyBitstreamCache
-from ..core.device    import SquishyHardwareDevice
-from ..config         import SQUISHY_CACHE, SQUISHY_APPLET_CACHE, SQUISHY_BUILD_DIR
+from ..config         import SQUISHY_CACHE
 from .                import SquishyAction
 
+if TYPE_CHECKING:
+	from ..core.device import SquishyHardwareDevice
+
 class Cache(SquishyAction):
 	pretty_name  = 'Squishy Cache Utility'
 	short_help   = 'Manage the Squishy cache'
@@ -16,24 +16,18 @@ class Cache(SquishyAction):
 	requires_dev = False
 
 	def _list_cache(self, args: Namespace) -> int:
-		applet_size = 0
-		build_size  = 0
-
-		applet_items = list(SQUISHY_APPLET_CACHE.rglob('*.*'))
-		build_items  = list(SQUISHY_BUILD_DIR.rglob('*.*'))
+		from torii.util.units import iec_size
 
-		for i in applet_items:
-			applet_size += i.stat().st_size
+		from ..api            import cache_usage
 
-		for i in build_items:
-			build_size += i.stat().st_size
+		usage        = cache_usage()
+		applet_items = usage.applet_files
+		build_items  = usage.build_files
 
-		total = applet_size + build_size
+		log.info(f'Squishy applet cache contains {len(applet_items)} bitstream files totaling {iec_size(usage.applet_size)}')
+		log.info(f'Squishy build cache contains {len(build_items)} files totaling {iec_size(usage.build_size)}')
 
-		log.info(f'Squishy applet cache contains {len(applet_items)} bitstream files totaling {iec_size(applet_size)}')
-		log.info(f'Squishy build cache contains {len(build_items)} files totaling {iec_size(build_size)}')
-
-		log.info(f'Total cache size is {iec_size(total)}')
+		log.info(f'Total cache size is {iec_size(usage.total_size)}')
 
 		if args.list_cache_items:
 			log.warning('Printing cache tree, as --list-cache-items was passed')
@@ -66,15 +60,12 @@ class Cache(SquishyAction):
 		return 0
 
 	def _clear_cache(self, args: Namespace) -> int:
-		from rich.prompt import Confirm
-		from shutil      import rmtree
+		from rich.prompt   import Confirm
+
+		from ..api         import clear_cache
 
 		if Confirm.ask('Are you sure you want to clear the cache?'):
-			bc = SquishyBitstreamCache(False)
-			bc.flush()
-			log.info('Flushing build cache')
-			rmtree(SQUISHY_BUILD_DIR)
-			SQUISHY_BUILD_DIR.mkdir()
+			clear_cache()
 			return 0
 		else:
 			log.info('Aborted')
@@ -110,5 +101,5 @@ class Cache(SquishyAction):
 			help = 'clear cache'
 		)
 
-	def run(self, args: Namespace, _: SquishyHardwareDevice | None = None) -> int:
+	def run(self, args: Namespace, _: 'SquishyHardwareDevice | None' = None) -> int:
 		return self._dispatch.get(args.cache_action, lambda _: 1)(args)
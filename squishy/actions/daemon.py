@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging         as log
+from argparse          import ArgumentParser, Namespace
+from pathlib           import Path
+from typing            import Callable, TYPE_CHECKING
+
+from ..config          import SQUISHY_DAEMON_SOCKET
+from ..core.daemon     import SquishyDaemon, daemon_request
+from ..core.exceptions import SquishyException
+from .                 import SquishyAction
+
+if TYPE_CHECKING:
+	from ..core.device import SquishyHardwareDevice
+
+class Daemon(SquishyAction):
+	pretty_name  = 'Squishy Daemon'
+	short_help   = 'Run the Squishy daemon'
+	description  = 'Run a persistent Squishy daemon that keeps devices open for the squishyc client'
+	requires_dev = False
+
+	def _start(self, args: Namespace) -> int:
+		try:
+			SquishyDaemon(args.socket, args.idle_timeout).serve()
+		except SquishyException as e:
+			log.error(e)
+			return 1
+		return 0
+
+	def _request(self, args: Namespace, op: str) -> int:
+		try:
+			for message in daemon_request(args.socket, { 'op': op }):
+				if message['type'] == 'result':
+					result = message
+		except SquishyException as e:
+			log.error(e)
+			return 1
+
+		if op == 'ping':
+			log.info(
+				f'Squishy daemon {result["version"]} running as pid {result["pid"]}, up for {result["uptime"]:.0f}s'
+			)
+		elif op == 'shutdown':
+			log.info('Squishy daemon stopped')
+
+		return int(result['status'])
+
+	def __init__(self) -> None:
+		super().__init__()
+
+		self._dispatch: dict[str, Callable[[Namespace], int]] = {
+			'start' : self._start,
+			'status': lambda args: self._request(args, 'ping'),
+			'stop'  : lambda args: self._request(args, 'shutdown'),
+		}
+
+	def register_args(self, parser: ArgumentParser) -> None:
+		parser.add_argument(
+			'--socket', '-s',
+			type    = Path,
+			default = SQUISHY_DAEMON_SOCKET,
+			help    = 'The UNIX socket the daemon listens on'
+		)
+
+		actions = parser.add_subparsers(
+			dest     = 'daemon_action',
+			required = True
+		)
+
+		daemon_start = actions.add_parser(
+			'start',
+			help = 'Start the daemon in the foreground'
+		)
+
+		daemon_start.add_argument(
+			'--idle-timeout',
+			type    = float,
+			default = None,
+			help    = 'Shut down after this many seconds without a request'
+		)
+
+		actions.add_parser(
+			'status',
+			help = 'Check if the daemon is running'
+		)
+
+		actions.add_parser(
+			'stop',
+			help = 'Stop the daemon'
+		)
+
+	def run(self, args: Namespace, _: 'SquishyHardwareDevice | None' = None) -> int:
+		action = self._dispatch.get(args.daemon_action)
+		return 1 if action is None else action(args)
@@ -11,6 +11,7 @@ from rich.progress       import (
 	TextColumn
 )
 
+from ..api               import flash_bitstream
 from ..core.device       import SquishyHardwareDevice
 from ..core.flash        import FlashGeometry
 
@@ -141,15 +142,6 @@ class Provision(SquishySynthAction):
 			BarColumn(bar_width = None),
 			transient = True
 		) as progress:
-			file_name = name
-			if not file_name.endswith('.bin'):
-				file_name += '.bin'
-
-			log.info(f'Programming bootloader with {file_name}')
-			if dev.upload(prod.get(file_name), 0, progress):
-				log.info('Resetting Device')
-				dev.reset()
-			else:
-				log.error('Device upload failed!')
+			if not flash_bitstream(dev, name, prod, 0, progress):
 				return 1
 		return 0
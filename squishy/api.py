@@ -0,0 +1,874 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging          as log
+
+from argparse           import ArgumentParser, Namespace
+from dataclasses        import dataclass, fields
+from pathlib            import Path
+from typing             import Any, Mapping, TYPE_CHECKING
+
+from .config            import SQUISHY_APPLETS, SQUISHY_APPLET_CACHE, SQUISHY_BUILD_DIR, SQUISHY_CACHE
+from .core.exceptions   import SquishyException, SquishyAppletError, SquishyBuildError, SquishyDeviceError
+
+# Like the CLI actions, the gateware and USB machinery is only imported once it's needed
+if TYPE_CHECKING:
+	from rich.progress                import Progress
+	from torii.build.run              import LocalBuildProducts
+
+	from .applets                     import SquishyApplet
+	from .core.cache                  import SquishyBitstreamCache
+	from .core.device                 import SquishyHardwareDevice
+	from .gateware                    import AppletElaboratable, Squishy
+	from .gateware.platform.platform  import SquishyPlatform
+
+__all__ = (
+	'BuildOptions',
+	'AppletOptions',
+	'CacheUsage',
+
+	'SquishySession',
+
+	'build_gateware',
+	'applet_gateware',
+	'flash_bitstream',
+	'applet_index',
+	'cache_usage',
+	'clear_cache',
+)
+
+__doc__ = '''\
+
+This module contains the programmatic API for building gateware, flashing it onto a Squishy, and
+running applets, all of which is what the ``squishy`` CLI actions are built on top of.
+
+The options for each operation are passed as plain dataclasses rather than :py:class:`argparse.Namespace`
+objects, and a :py:class:`SquishySession` holds on to the target platform, the bitstream cache,
+and the device, so a long running process can run many jobs without having to set them up each time.
+
+.. code-block:: python
+
+	from squishy.api import SquishySession, BuildOptions
+
+	with SquishySession('rev2', serial = 'ABCDEF01') as session:
+		session.run_applet('analyzer', { 'some_option': 1 }, BuildOptions(pnr_seed = 4))
+
+'''
+
+@dataclass
+class BuildOptions:
+	'''
+	Gateware build options, these mirror the ``Gateware``, ``Synthesis``, ``Place and Route``,
+	and ``Packing`` CLI options.
+
+	Attributes
+	----------
+	build_dir : pathlib.Path
+		The output directory for the build products.
+
+	skip_cache : bool
+		Skip the bitstream cache lookup and the caching of the resulting bitstream.
+
+	sandbox : bool
+		Run the toolchain in a scratch directory on tmpfs.
+
+	loud : bool
+		Echo the toolchain output.
+
+	abc9 : bool
+		Use Yosys' ABC9.
+
+	aggressive_mapping : int | None
+		If set, the maximum number of ABC9 mapping passes to explore.
+
+	use_router2 : bool
+		Use nextpnr's ``router2`` rather than ``router1``.
+
+	tmg_ripup : bool
+		Use the timing-driven ripup router.
+
+	detailed_timing_report : bool
+		Have nextpnr output a detailed net timing report.
+
+	routed_svg : pathlib.Path | None
+		Write a render of the routing to this SVG.
+
+	routed_json : pathlib.Path | None
+		Write the PnR output json to this file.
+
+	eco_from : pathlib.Path | None
+		Re-use the placement of the shared gateware from this routed json.
+
+	pnr_seed : int | None
+		The PnR seed to use.
+
+	compress : bool
+		Compress the resulting bitstream.
+
+	'''
+
+	build_dir: Path                  = SQUISHY_BUILD_DIR
+	skip_cache: bool                 = False
+	sandbox: bool                    = False
+	loud: bool                       = False
+
+	abc9: bool                       = True
+	aggressive_mapping: int | None   = None
+
+	use_router2: bool                = False
+	tmg_ripup: bool                  = False
+	detailed_timing_report: bool     = False
+	routed_svg: Path | None          = None
+	routed_json: Path | None         = None
+	eco_from: Path | None            = None
+	pnr_seed: int | None             = 0
+
+	compress: bool                   = False
+
+	@classmethod
+	def from_args(cls, args: Namespace) -> 'BuildOptions':
+		''' Get the build options from the arguments registered by :py:meth:`SquishySynthAction.register_synth_args` '''
+		return cls(
+			build_dir              = Path(args.build_dir),
+			skip_cache             = getattr(args, 'skip_cache', False),
+			sandbox                = args.sandbox,
+			loud                   = args.loud,
+			abc9                   = not args.no_abc9,
+			aggressive_mapping     = args.aggressive_mapping,
+			use_router2            = args.use_router2,
+			tmg_ripup              = args.tmg_ripup,
+			detailed_timing_report = args.detailed_timing_report,
+			routed_svg             = args.routed_svg,
+			routed_json            = args.routed_json,
+			eco_from               = args.eco_from,
+			pnr_seed               = args.pnr_seed,
+			compress               = args.compress,
+		)
+
+@dataclass
+class AppletOptions:
+	'''
+	Options for the Squishy gateware wrapped around an applet, these mirror the ``USB``,
+	``Debug UART``, and ``SCSI`` applet CLI options.
+
+	Attributes
+	----------
+	enable_webusb : bool
+		Enable the experimental WebUSB descriptors.
+
+	webusb_url : str
+		The location URL to encode in the device descriptor.
+
+	scsi_did : int
+		The SCSI Device ID to use.
+
+	scsi_arbitrating : bool
+		Enable SCSI Bus arbitration.
+
+	scsi_device : bool
+		Set the SCSI bus to be a device rather than an initiator.
+
+	enable_uart : bool
+		Enable the debug UART.
+
+	baud : int
+		The rate at which to run the debug UART.
+
+	data_bits : int
+		The data bits to use for the UART.
+
+	parity : str
+		The parity mode for the debug UART.
+
+	'''
+
+	enable_webusb: bool    = False
+	webusb_url: str        = 'https://localhost'
+
+	scsi_did: int          = 0x01
+	scsi_arbitrating: bool = False
+	scsi_device: bool      = False
+
+	enable_uart: bool      = False
+	baud: int              = 9600
+	data_bits: int         = 8
+	parity: str            = 'none'
+
+	@classmethod
+	def from_args(cls, args: Namespace) -> 'AppletOptions':
+		''' Get the applet options from the arguments registered by the ``applet`` action '''
+		return cls(**{ f.name: getattr(args, f.name) for f in fields(cls) })
+
+@dataclass
+class CacheUsage:
+	'''
+	The contents of the Squishy cache.
+
+	Attributes
+	----------
+	applet_files : list[pathlib.Path]
+		The files in the bitstream cache.
+
+	applet_size : int
+		The size of the bitstream cache in bytes.
+
+	build_files : list[pathlib.Path]
+		The files in the build directory.
+
+	build_size : int
+		The size of the build directory in bytes.
+
+	'''
+
+	applet_files: list[Path]
+	applet_size: int
+	build_files: list[Path]
+	build_size: int
+
+	@property
+	def total_size(self) -> int:
+		''' The total size of the cache in bytes '''
+		return self.applet_size + self.build_size
+
+def _null_progress() -> 'Progress':
+	from rich.progress import Progress
+	return Progress(disable = True)
+
+def build_gateware(
+	platform: 'SquishyPlatform', elaboratable, name: str, options: BuildOptions | None = None, *,
+	cacheable: bool = True, progress: 'Progress | None' = None
+) -> 'tuple[str, LocalBuildProducts]':
+	'''
+	Run Synthesis and Place and Route.
+
+	Parameters
+	----------
+	platform : squishy.gateware.platform.platform.SquishyPlatform
+		The platform to build for, as platforms can only be built once, this must be a fresh instance.
+
+	elaboratable : torii.hdl.ir.Elaboratable
+		The design to build.
+
+	name : str
+		The name of the design.
+
+	options : BuildOptions | None
+		The build options, if not set the defaults are used.
+
+	cacheable : bool
+		If the resulting bitstream can be cached.
+
+	progress : rich.progress.Progress | None
+		The progress display to show the build stages on, if not set nothing is shown.
+
+	Returns
+	-------
+	tuple[str, torii.build.run.LocalBuildProducts]
+		The name of the resulting bitstream, and the build products.
+
+	'''
+
+	from .core.build import write_placement_lock
+
+	if options is None:
+		options = BuildOptions()
+
+	synth_opts: list[str] = []
+	pnr_opts: list[str] = []
+	pack_ops: list[str] = []
+	script_pre_synth = ''
+	script_post_synth = ''
+
+	build_dir = Path(options.build_dir)
+
+	if not build_dir.exists():
+		log.debug(f'Making build directory {build_dir}')
+		build_dir.mkdir(parents = True)
+	else:
+		log.debug(f'Using build directory {build_dir}')
+
+	# Build Options
+	skip_cache = options.skip_cache or not cacheable
+
+	# Synthesis Options
+	if options.abc9:
+		synth_opts.append('-abc9')
+	abc9_passes = None
+	if options.aggressive_mapping is not None:
+		if not options.abc9:
+			log.error('Can not spcify `--aggressive-mapping` with ABC9 disabled, remove `--no-abc9`')
+		elif options.aggressive_mapping < 1:
+			log.error(f'`--aggressive-mapping` needs at least 1 pass, not {options.aggressive_mapping}, ignoring it')
+		else:
+			abc9_passes = options.aggressive_mapping
+
+	# Place and Route Options
+	if options.use_router2:
+		pnr_opts.append('--router router2')
+	else:
+		pnr_opts.append('--router router1')
+
+	if options.tmg_ripup:
+		pnr_opts.append('--tmg-ripup')
+
+	if options.detailed_timing_report:
+		pnr_opts.append('--report timing.json')
+		pnr_opts.append('--detailed-timing-report')
+
+	if options.routed_svg is not None:
+		svg_path = Path(options.routed_svg).resolve()
+		log.info(f'Writing PnR output svg to {svg_path}')
+		pnr_opts.append(f'--routed-svg {svg_path}')
+
+	if options.routed_json is not None:
+		json_path = Path(options.routed_json).resolve()
+		log.info(f'Writing PnR output json to {json_path}')
+		pnr_opts.append(f'--write {json_path}')
+
+	if options.pnr_seed is not None:
+		pnr_opts.append(f'--seed {options.pnr_seed}')
+
+	if options.eco_from is not None:
+		shared_submodules: tuple[str, ...] = getattr(elaboratable, 'shared_submodules', ())
+		eco_json = Path(options.eco_from).resolve()
+
+		if len(shared_submodules) == 0:
+			log.error(f'\'{name}\' has no shared submodules, unable to re-use placement, ignoring `--eco-from`')
+		elif not eco_json.exists():
+			log.error(f'Routed json \'{eco_json}\' does not exist, ignoring `--eco-from`')
+		else:
+			lock_script = (build_dir / f'{name}.eco.py').resolve()
+			try:
+				locked = write_placement_lock(eco_json, lock_script, shared_submodules)
+			except SquishyBuildError as e:
+				log.error(f'{e}, ignoring `--eco-from`')
+			else:
+				log.info(f'Re-using placement of {locked} cells in {", ".join(shared_submodules)} from {eco_json}')
+				pnr_opts.append(f'--pre-place {lock_script}')
+
+	# Bitstream packing options
+	if options.compress:
+		pack_ops.append('--compress')
+
+	if progress is None:
+		progress = _null_progress()
+
+	return platform.build(
+		elaboratable,
+		name               = name,
+		build_dir          = build_dir,
+		do_build           = True,
+		do_program         = False,
+		synth_opts         = synth_opts,
+		nextpnr_opts       = pnr_opts,
+		ecppack_opts       = pack_ops,
+		verbose            = options.loud,
+		sandbox            = options.sandbox,
+		abc9_passes        = abc9_passes,
+		skip_cache         = skip_cache,
+		progress           = progress,
+		debug_verilog      = cacheable and not skip_cache,
+		script_after_read  = script_pre_synth,
+		script_after_synth = script_post_synth
+	)
+
+def applet_gateware(
+	platform: 'SquishyPlatform', applet: 'AppletElaboratable', serial_number: str,
+	options: AppletOptions | None = None
+) -> 'Squishy':
+	'''
+	Wrap an applet in the Squishy gateware for the given platform.
+
+	Parameters
+	----------
+	platform : squishy.gateware.platform.platform.SquishyPlatform
+		The target platform.
+
+	applet : squishy.gateware.AppletElaboratable
+		The applet gateware, as returned by :py:meth:`squishy.applets.SquishyApplet.init_applet`.
+
+	serial_number : str
+		The USB serial number of the device.
+
+	options : AppletOptions | None
+		The USB, UART, and SCSI options, if not set the defaults are used.
+
+	Returns
+	-------
+	squishy.gateware.Squishy
+		The top-level gateware.
+
+	'''
+
+	from .gateware import Squishy
+
+	if options is None:
+		options = AppletOptions()
+
+	return Squishy(
+		revision    = platform.revision,
+		uart_config = {
+			'enabled'  : options.enable_uart,
+			'baud'     : options.baud,
+			'parity'   : options.parity,
+			'data_bits': options.data_bits,
+		},
+		usb_config  = {
+			'vid': platform.usb_vid,
+			'pid': platform.usb_pid_app,
+			'manufacturer': platform.usb_mfr,
+			'serial_number': serial_number,
+			'product': platform.usb_prod[platform.usb_pid_app],
+			'webusb': {
+				'enabled': options.enable_webusb,
+				'url'    : options.webusb_url,
+			}
+		},
+		scsi_config = {
+			'version'    : applet.scsi_version,
+			'vid'        : platform.scsi_vid,
+			'did'        : options.scsi_did,
+			'arbitrating': options.scsi_arbitrating,
+			'is_device'  : options.scsi_device,
+		},
+		applet      = applet
+	)
+
+def flash_bitstream(
+	dev: 'SquishyHardwareDevice', name: str, products: 'LocalBuildProducts', slot: int,
+	progress: 'Progress | None' = None, reset: bool = True
+) -> bool:
+	'''
+	Upload a built bitstream into a slot on the device.
+
+	Parameters
+	----------
+	dev : squishy.core.device.SquishyHardwareDevice
+		The device to upload to.
+
+	name : str
+		The name of the bitstream, as returned by :py:func:`build_gateware`.
+
+	products : torii.build.run.LocalBuildProducts
+		The build products containing the bitstream.
+
+	slot : int
+		The slot to upload the bitstream into.
+
+	progress : rich.progress.Progress | None
+		The progress display to show the upload on, if not set nothing is shown.
+
+	reset : bool
+		Reset the device once the upload is done.
+
+	Returns
+	-------
+	bool
+		If the upload was successful.
+
+	'''
+
+	if not name.endswith('.bin'):
+		name += '.bin'
+
+	if progress is None:
+		progress = _null_progress()
+
+	log.info(f'Programming slot {slot} with {name}')
+	if not dev.upload(products.get(name), slot, progress):
+		log.error('Device upload failed!')
+		return False
+
+	if reset:
+		log.info('Resetting Device')
+		dev.reset()
+
+	return True
+
+def applet_index() -> list[dict[str, Any]]:
+	'''
+	Get the index of all of the available applets.
+
+	This covers the bundled applets, any applets in the Squishy applet directory, and any
+	applets registered with the ``squishy.applets`` entry point group.
+
+	Returns
+	-------
+	list[dict[str, Any]]
+		The applet entries, which can be loaded with :py:func:`squishy.core.collect.load_member`.
+
+	'''
+
+	from .               import applets
+	from .core.collect   import collect_member_index, predicate_applet
+
+	return collect_member_index(
+		SQUISHY_CACHE / 'discovery.json', (
+			(Path(applets.__path__[0]), f'{applets.__name__}.'),
+			(SQUISHY_APPLETS, ''),
+		),
+		predicate_applet,
+		('short_help',),
+		entry_point_group = 'squishy.applets'
+	)
+
+def cache_usage(build_dir: Path = SQUISHY_BUILD_DIR) -> CacheUsage:
+	'''
+	Get the contents and size of the Squishy bitstream cache and build directory.
+
+	Parameters
+	----------
+	build_dir : pathlib.Path
+		The build directory.
+
+	Returns
+	-------
+	CacheUsage
+		The cache contents.
+
+	'''
+
+	applet_files = list(SQUISHY_APPLET_CACHE.rglob('*.*'))
+	build_files  = list(Path(build_dir).rglob('*.*'))
+
+	return CacheUsage(
+		applet_files = applet_files,
+		applet_size  = sum(f.stat().st_size for f in applet_files),
+		build_files  = build_files,
+		build_size   = sum(f.stat().st_size for f in build_files),
+	)
+
+def clear_cache(build_dir: Path = SQUISHY_BUILD_DIR) -> None:
+	'''
+	Flush the Squishy bitstream cache and empty the build directory.
+
+	Parameters
+	----------
+	build_dir : pathlib.Path
+		The build directory.
+
+	'''
+
+	from shutil       import rmtree
+
+	from .core.cache  import SquishyBitstreamCache
+
+	SquishyBitstreamCache(False).flush()
+	log.info('Flushing build cache')
+	rmtree(build_dir, ignore_errors = True)
+	Path(build_dir).mkdir(parents = True)
+
+class SquishySession:
+	'''
+	A Squishy build and flash session.
+
+	The session holds the target platform, a single bitstream cache shared by every build, the
+	device if one is used, and the applets that have been loaded, so they are only set up once
+	no matter how many jobs are run.
+
+	Parameters
+	----------
+	platform : str | type[SquishyPlatform] | None
+		The target platform, either the name, e.g. ``'rev2'``, or the platform class. If not set
+		the platform is picked based on the revision of the device.
+
+	device : squishy.core.device.SquishyHardwareDevice | None
+		The device to use, if not set it is opened when first needed.
+
+	serial : str | None
+		The serial number of the device to open, if not set the only attached device is used.
+
+	cache : squishy.core.cache.SquishyBitstreamCache | None
+		The bitstream cache to use, if not set a new one is created.
+
+	Raises
+	------
+	SquishyException
+		If the platform is unknown.
+
+	'''
+
+	def __init__(
+		self, platform: 'str | type[SquishyPlatform] | None' = None, *,
+		device: 'SquishyHardwareDevice | None' = None, serial: str | None = None,
+		cache: 'SquishyBitstreamCache | None' = None
+	) -> None:
+		from .core.cache         import SquishyBitstreamCache
+		from .gateware.platform  import AVAILABLE_PLATFORMS
+
+		self._device = device
+		self._serial = serial
+		self.cache   = SquishyBitstreamCache() if cache is None else cache
+
+		self._applet_index: list[dict[str, Any]] | None = None
+		self._applet_defaults: dict[str, dict[str, Any]] = {}
+
+		if platform is None:
+			platform = f'rev{self.device.rev}'
+
+		if isinstance(platform, str):
+			if platform not in AVAILABLE_PLATFORMS:
+				raise SquishyException(
+					f'Unknown hardware platform \'{platform}\', expected one of {", ".join(AVAILABLE_PLATFORMS.keys())}'
+				)
+
+			self.platform_name = platform
+			self.platform_type = AVAILABLE_PLATFORMS[platform]
+		else:
+			self.platform_type = platform
+			self.platform_name = next(
+				(name for name, plat in AVAILABLE_PLATFORMS.items() if plat is platform), platform.__name__
+			)
+
+		# The platform metadata (USB IDs, flash layout, etc) is queried from this instance, the
+		# builds themselves need a fresh instance each, as Torii only lets a platform be prepared once.
+		self.platform = self.new_platform()
+
+	def __enter__(self) -> 'SquishySession':
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+	def close(self) -> None:
+		''' Release the device, if one was opened '''
+		self._device = None
+
+	@property
+	def device(self) -> 'SquishyHardwareDevice':
+		'''
+		The device for this session, it is opened on first use and re-opened if it goes away.
+
+		Raises
+		------
+		SquishyDeviceError
+			If the device could not be opened.
+
+		'''
+
+		from .core.device import SquishyHardwareDevice
+
+		if self._device is not None and self._device.is_alive():
+			return self._device
+
+		self._device = SquishyHardwareDevice.get_device(serial = self._serial)
+		if self._device is None:
+			raise SquishyDeviceError('Unable to open Squishy device')
+
+		return self._device
+
+	def new_platform(self) -> 'SquishyPlatform':
+		''' Get a new instance of the target platform that shares the cache of this session '''
+		return self.platform_type(cache = self.cache)
+
+	def build(
+		self, elaboratable, name: str, options: BuildOptions | None = None, *,
+		cacheable: bool = True, progress: 'Progress | None' = None
+	) -> 'tuple[str, LocalBuildProducts]':
+		'''
+		Build the given gateware for the session platform.
+
+		See :py:func:`build_gateware` for the parameters.
+
+		'''
+
+		return build_gateware(
+			self.new_platform(), elaboratable, name, options, cacheable = cacheable, progress = progress
+		)
+
+	def flash(
+		self, name: str, products: 'LocalBuildProducts', slot: int, progress: 'Progress | None' = None,
+		reset: bool = True
+	) -> bool:
+		'''
+		Upload a built bitstream onto the session device.
+
+		See :py:func:`flash_bitstream` for the parameters.
+
+		'''
+
+		return flash_bitstream(self.device, name, products, slot, progress, reset)
+
+	def load_applet(self, applet: 'str | SquishyApplet') -> 'SquishyApplet':
+		'''
+		Load an applet by name.
+
+		Parameters
+		----------
+		applet : str | squishy.applets.SquishyApplet
+			The name of the applet, or an already loaded applet, which is passed through.
+
+		Returns
+		-------
+		squishy.applets.SquishyApplet
+			The applet instance.
+
+		Raises
+		------
+		SquishyAppletError
+			If there is no applet with the given name.
+
+		'''
+
+		from .core.collect import load_member
+
+		if not isinstance(applet, str):
+			return applet
+
+		if self._applet_index is None:
+			self._applet_index = applet_index()
+
+		apl = next((apl for apl in self._applet_index if apl['name'] == applet), None)
+		if apl is None:
+			raise SquishyAppletError(f'Unknown applet \'{applet}\'')
+
+		if 'instance' not in apl:
+			apl['instance'] = load_member(apl)()
+
+		return apl['instance']
+
+	def applet_args(self, applet: 'str | SquishyApplet', args: Mapping[str, Any] | Namespace | None = None) -> Namespace:
+		'''
+		Get the arguments to pass to an applet.
+
+		Parameters
+		----------
+		applet : str | squishy.applets.SquishyApplet
+			The applet.
+
+		args : Mapping[str, Any] | argparse.Namespace | None
+			The applet options, a namespace is passed through as-is, otherwise any options not
+			given are set to the applets defaults.
+
+		Returns
+		-------
+		argparse.Namespace
+			The applet arguments.
+
+		'''
+
+		if isinstance(args, Namespace):
+			return args
+
+		applet = self.load_applet(applet)
+		key    = type(applet).__qualname__
+
+		# The defaults are only looked up once per applet, rather than building a parser every time
+		if key not in self._applet_defaults:
+			parser = ArgumentParser(add_help = False)
+			applet.register_args(parser)
+			self._applet_defaults[key] = vars(parser.parse_args([]))
+
+		return Namespace(**{ **self._applet_defaults[key], **(args or {}) })
+
+	def build_applet(
+		self, applet: 'str | SquishyApplet', args: Mapping[str, Any] | Namespace | None = None,
+		options: BuildOptions | None = None, applet_options: AppletOptions | None = None, *,
+		serial_number: str | None = None, progress: 'Progress | None' = None
+	) -> 'tuple[str, LocalBuildProducts]':
+		'''
+		Build the gateware for an applet.
+
+		Parameters
+		----------
+		applet : str | squishy.applets.SquishyApplet
+			The applet to build.
+
+		args : Mapping[str, Any] | argparse.Namespace | None
+			The applet options, see :py:meth:`applet_args`.
+
+		options : BuildOptions | None
+			The build options.
+
+		applet_options : AppletOptions | None
+			The USB, UART, and SCSI options.
+
+		serial_number : str | None
+			The USB serial number, if not set the serial number of the device is used if
+			there is one, otherwise a new one is made.
+
+		progress : rich.progress.Progress | None
+			The progress display to show the build stages on.
+
+		Returns
+		-------
+		tuple[str, torii.build.run.LocalBuildProducts]
+			The name of the resulting bitstream, and the build products.
+
+		Raises
+		------
+		SquishyAppletError
+			If the applet is unknown, or does not support the platform.
+
+		'''
+
+		from .core.device import SquishyHardwareDevice
+
+		applet = self.load_applet(applet)
+
+		if not applet.supported_platform(self.platform_name):
+			raise SquishyAppletError(
+				f'Applet {applet.pretty_name} does not support platform {self.platform_name}, '
+				f'supported platform(s) {applet.hardware_rev}'
+			)
+
+		if applet.preview:
+			log.warning('This applet is a preview, it may be buggy or not work at all')
+
+		if serial_number is None:
+			serial_number = SquishyHardwareDevice.make_serial() if self._device is None else self._device.serial
+
+		gateware = applet_gateware(
+			self.platform, applet.init_applet(self.applet_args(applet, args)), serial_number, applet_options
+		)
+
+		return self.build(gateware, 'squishy_applet', options, cacheable = True, progress = progress)
+
+	def run_applet(
+		self, applet: 'str | SquishyApplet', args: Mapping[str, Any] | Namespace | None = None,
+		options: BuildOptions | None = None, applet_options: AppletOptions | None = None, *,
+		progress: 'Progress | None' = None
+	) -> int:
+		'''
+		Build an applet, flash it onto the device and run it.
+
+		See :py:meth:`build_applet` for the parameters.
+
+		Returns
+		-------
+		int
+			The return code of the applet.
+
+		Raises
+		------
+		SquishyAppletError
+			If the applet is unknown, or does not support the platform.
+
+		SquishyDeviceError
+			If the device could not be opened or flashed.
+
+		'''
+
+		applet = self.load_applet(applet)
+		args   = self.applet_args(applet, args)
+		dev    = self.device
+
+		name, prod = self.build_applet(
+			applet, args, options, applet_options, serial_number = dev.serial, progress = progress
+		)
+
+		if not self.flash(name, prod, 1, progress):
+			raise SquishyDeviceError('Device upload failed')
+
+		log.info('Running applet...')
+		return applet.run(dev, args)
+
+	def cache_usage(self, build_dir: Path = SQUISHY_BUILD_DIR) -> CacheUsage:
+		''' Get the contents of the cache, see :py:func:`cache_usage` '''
+		return cache_usage(build_dir)
+
+	def clear_cache(self, build_dir: Path = SQUISHY_BUILD_DIR) -> None:
+		''' Flush the cache, see :py:func:`clear_cache` '''
+		from .core.cache import SquishyBitstreamCache
+
+		clear_cache(build_dir)
+		# Flushing removes the cache tree, so it needs to be set up again for the next build
+		self.cache = SquishyBitstreamCache(tree_depth = self.cache.tree_depth, cache_rtl = self.cache.cache_rtl)
@@ -0,0 +1,11 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+__doc__ = '''\
+
+This package contains the tooling for working with captures from the analyzer applet, reading
+and writing pcapng captures, and indexing, filtering, exporting, and cutting them up.
+
+None of it depends on the gateware or on talking to a device, so it is cheap to import from
+the ``squishy analyzer`` actions, and can be used on machines without the toolchain or libusb.
+
+'''
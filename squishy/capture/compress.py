@@ -0,0 +1,559 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging as log
+import lzma
+
+from array       import array
+from bisect      import bisect_right
+from collections import OrderedDict
+from io          import SEEK_CUR, SEEK_END, SEEK_SET, BytesIO, RawIOBase, UnsupportedOperation
+from os          import PathLike
+from pathlib     import Path
+from queue       import Queue
+from struct      import Struct
+from threading   import Thread
+from typing      import BinaryIO
+
+__all__ = (
+	'COMPRESSIONS',
+	'DEFAULT_FRAME_SIZE',
+	'CompressedReader',
+	'CompressedWriter',
+	'compression_for_path',
+	'detect_compression',
+)
+
+__doc__ = '''\
+
+This module contains transparent, seekable compression for pcapng captures.
+
+Captures are compressed as a series of independent frames of about :py:data:`DEFAULT_FRAME_SIZE`
+bytes each, so that any offset in the capture can be read by only decompressing the frame it is in.
+This keeps the block offsets of :py:class:`squishy.capture.pcapng.PcapngIndex` valid for
+compressed captures, as they are always offsets into the uncompressed capture.
+
+Two formats are supported:
+
+``zstd``
+	Zstandard frames followed by a seek table in the `Zstandard seekable format`_, which can
+	still be decompressed by the regular ``zstd`` tool. This needs the optional :py:mod:`zstandard`
+	package, install it with ``pip install squishy[zstd]``.
+
+``xz``
+	One xz stream per frame, which can still be decompressed by the regular ``xz`` tool. The
+	frames are found from the index at the end of each stream, so no extra seek table is needed.
+	It compresses better than ``zstd`` but is far too slow to keep up with a busy bus, so it is
+	better suited to archiving captures than writing them live.
+
+Frames are compressed on a worker thread by :py:class:`CompressedWriter`, so a long capture can
+be compressed as it is being written without holding up the writer.
+
+.. _Zstandard seekable format: https://github.com/facebook/zstd/blob/dev/contrib/seekable_format/zstd_seekable_compression_format.md
+
+'''
+
+COMPRESSIONS = ('zstd', 'xz')
+''' The supported compression formats '''
+
+DEFAULT_FRAME_SIZE = 4 * 1024 * 1024
+''' The default amount of uncompressed data in each frame '''
+
+SUFFIXES = {
+	'.zst': 'zstd',
+	'.xz':  'xz',
+}
+
+ZSTD_MAGIC           = b'\x28\xB5\x2F\xFD'
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+ZSTD_SEEKABLE_MAGIC  = 0x8F92EAB1
+XZ_MAGIC             = b'\xFD7zXZ\x00'
+XZ_FOOTER_MAGIC      = b'YZ'
+
+# Magic, Frame_Size
+_zstd_skippable = Struct('<II')
+# Compressed_Size, Decompressed_Size
+_zstd_entry     = Struct('<II')
+# Number_Of_Frames, Seek_Table_Descriptor, Seekable_Magic_Number
+_zstd_footer    = Struct('<IBI')
+# CRC32, Backward Size, Stream Flags, Magic
+_xz_footer      = Struct('<II2s2s')
+
+_XZ_STREAM_HEADER = 12
+
+def _zstandard():
+	try:
+		import zstandard
+	except ImportError:
+		raise ImportError(
+			'Zstandard compressed captures require zstandard, install it with `pip install squishy[zstd]`'
+		) from None
+	return zstandard
+
+def detect_compression(header: bytes) -> str | None:
+	'''
+	Detect the compression of a capture from its first few bytes.
+
+	Parameters
+	----------
+	header : bytes
+		At least the first 6 bytes of the capture.
+
+	Returns
+	-------
+	str | None
+		The compression format, or ``None`` if the capture is not compressed.
+
+	'''
+
+	if header.startswith(ZSTD_MAGIC):
+		return 'zstd'
+	# An empty seekable zstd capture is only the seek table, which is a skippable frame
+	if len(header) >= 4 and int.from_bytes(header[:4], 'little') & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC & 0xFFFFFFF0:
+		return 'zstd'
+	if header.startswith(XZ_MAGIC):
+		return 'xz'
+	return None
+
+def compression_for_path(path: str | PathLike) -> str | None:
+	'''
+	Get the compression format implied by the suffix of a path.
+
+	Parameters
+	----------
+	path : str | PathLike
+		The path to the capture, e.g. ``capture.pcapng.zst``.
+
+	Returns
+	-------
+	str | None
+		The compression format, or ``None`` if the suffix is not a compressed one.
+
+	'''
+
+	return SUFFIXES.get(Path(path).suffix.lower())
+
+def _xz_varint(data: bytes, offset: int) -> tuple[int, int]:
+	value = 0
+	shift = 0
+	while True:
+		if offset >= len(data):
+			raise ValueError('Truncated xz index')
+		byte = data[offset]
+		offset += 1
+		value |= (byte & 0x7F) << shift
+		if not byte & 0x80:
+			return (value, offset)
+		shift += 7
+
+def _xz_frames(stream: BinaryIO, size: int) -> list[tuple[int, int, int]]:
+	frames: list[tuple[int, int, int]] = []
+
+	end = size
+	while end > 0:
+		stream.seek(end - 4, SEEK_SET)
+		# Skip over any stream padding between the streams
+		if stream.read(4) == b'\x00\x00\x00\x00':
+			end -= 4
+			continue
+
+		if end < _XZ_STREAM_HEADER + _xz_footer.size:
+			raise ValueError(f'Truncated xz stream ending at offset {end}')
+
+		stream.seek(end - _xz_footer.size, SEEK_SET)
+		_, backward_size, _, magic = _xz_footer.unpack(stream.read(_xz_footer.size))
+		if magic != XZ_FOOTER_MAGIC:
+			raise ValueError(f'Invalid xz stream footer at offset {end - _xz_footer.size}')
+
+		index_size  = (backward_size + 1) * 4
+		index_start = end - _xz_footer.size - index_size
+		stream.seek(index_start, SEEK_SET)
+		index = stream.read(index_size)
+		if len(index) != index_size or index[0] != 0x00:
+			raise ValueError(f'Invalid xz index at offset {index_start}')
+
+		count, offset = _xz_varint(index, 1)
+		blocks_size   = 0
+		decompressed  = 0
+		for _ in range(count):
+			unpadded, offset = _xz_varint(index, offset)
+			uncompressed, offset = _xz_varint(index, offset)
+			blocks_size  += (unpadded + 3) & ~3
+			decompressed += uncompressed
+
+		start = index_start - blocks_size - _XZ_STREAM_HEADER
+		if start < 0:
+			raise ValueError(f'Invalid xz index at offset {index_start}')
+
+		frames.append((start, end - start, decompressed))
+		end = start
+
+	frames.reverse()
+	return frames
+
+def _zstd_frames(stream: BinaryIO, size: int) -> list[tuple[int, int, int]] | None:
+	if size < _zstd_skippable.size + _zstd_footer.size:
+		return None
+
+	stream.seek(size - _zstd_footer.size, SEEK_SET)
+	count, descriptor, magic = _zstd_footer.unpack(stream.read(_zstd_footer.size))
+	if magic != ZSTD_SEEKABLE_MAGIC:
+		return None
+
+	# The optional checksum follows each entry
+	entry_size  = _zstd_entry.size + (4 if descriptor & 0x80 else 0)
+	table_size  = count * entry_size
+	table_start = size - _zstd_footer.size - table_size - _zstd_skippable.size
+	if table_start < 0:
+		raise ValueError('Invalid zstd seek table')
+
+	stream.seek(table_start, SEEK_SET)
+	skippable_magic, frame_size = _zstd_skippable.unpack(stream.read(_zstd_skippable.size))
+	if skippable_magic != ZSTD_SKIPPABLE_MAGIC or frame_size != table_size + _zstd_footer.size:
+		raise ValueError('Invalid zstd seek table')
+
+	table  = stream.read(table_size)
+	frames = []
+	offset = 0
+	for entry in range(count):
+		compressed, decompressed = _zstd_entry.unpack_from(table, entry * entry_size)
+		frames.append((offset, compressed, decompressed))
+		offset += compressed
+
+	if offset != table_start:
+		raise ValueError('The zstd seek table does not match the size of the capture')
+
+	return frames
+
+class CompressedReader(RawIOBase):
+	'''
+	A read-only, seekable view of the uncompressed contents of a compressed capture.
+
+	Only the frames that are read from are decompressed, and the most recently used ones are
+	kept around so reading the blocks of a capture in order only decompresses each frame once.
+
+	Parameters
+	----------
+	stream : BinaryIO
+		The compressed capture, which must be seekable.
+
+	compression : str | None
+		The compression format, by default it is detected from the start of the stream.
+
+	cache_frames : int
+		The number of decompressed frames to keep.
+
+	Raises
+	------
+	ValueError
+		If the stream is not compressed, or its frames can not be found.
+
+	'''
+
+	def __init__(self, stream: BinaryIO, compression: str | None = None, *, cache_frames: int = 4) -> None:
+		super().__init__()
+
+		self._stream = stream
+		self._cache: OrderedDict[int, bytes] = OrderedDict()
+		self._cache_frames = max(cache_frames, 1)
+
+		start = stream.tell()
+		stream.seek(0, SEEK_END)
+		size = stream.tell()
+		stream.seek(start, SEEK_SET)
+
+		if compression is None:
+			compression = detect_compression(stream.read(len(XZ_MAGIC)))
+			stream.seek(start, SEEK_SET)
+			if compression is None:
+				raise ValueError('The capture is not compressed')
+
+		if compression == 'xz':
+			frames = _xz_frames(stream, size)
+			self._decompress = self._decompress_xz
+		elif compression == 'zstd':
+			zstandard = _zstandard()
+			self._decompressor = zstandard.ZstdDecompressor()
+			self._decompress = self._decompress_zstd
+
+			frames = _zstd_frames(stream, size)
+			if frames is None:
+				log.warning('The zstd capture has no seek table, so all of it will be decompressed to read it')
+				stream.seek(0, SEEK_SET)
+				whole = self._decompressor.stream_reader(stream, read_across_frames = True).readall()
+				frames = [ (0, size, len(whole)) ]
+				self._cache[0] = whole
+		else:
+			raise ValueError(f'Unknown compression \'{compression}\', expected one of {", ".join(COMPRESSIONS)}')
+
+		self.compression = compression
+
+		self._sources = array('Q', (frame[0] for frame in frames))
+		self._lengths = array('Q', (frame[1] for frame in frames))
+		self._offsets = array('Q')
+		total = 0
+		for _, _, decompressed in frames:
+			self._offsets.append(total)
+			total += decompressed
+		self._size = total
+		self._pos  = 0
+
+		# The current frame, so sequential reads don't need to look it up every time
+		self._current: tuple[int, int, bytes] = (0, 0, b'')
+
+	@property
+	def frames(self) -> int:
+		''' The number of compressed frames '''
+		return len(self._offsets)
+
+	def _decompress_xz(self, data: bytes, size: int) -> bytes:
+		return lzma.decompress(data, format = lzma.FORMAT_XZ)
+
+	def _decompress_zstd(self, data: bytes, size: int) -> bytes:
+		return self._decompressor.decompress(data, max_output_size = size)
+
+	def _frame(self, number: int) -> bytes:
+		data = self._cache.get(number)
+		if data is not None:
+			self._cache.move_to_end(number)
+			return data
+
+		self._stream.seek(self._sources[number], SEEK_SET)
+		compressed = self._stream.read(self._lengths[number])
+		end  = self._offsets[number + 1] if number + 1 < len(self._offsets) else self._size
+		data = self._decompress(compressed, end - self._offsets[number])
+		if len(data) != end - self._offsets[number]:
+			raise ValueError(f'Frame {number} decompressed to {len(data)} bytes rather than {end - self._offsets[number]}')
+
+		self._cache[number] = data
+		if len(self._cache) > self._cache_frames:
+			self._cache.popitem(last = False)
+		return data
+
+	def read(self, size: int | None = -1) -> bytes:
+		if size is None or size < 0:
+			size = self._size - self._pos
+
+		parts: list[bytes] = []
+		while size > 0 and self._pos < self._size:
+			start, end, data = self._current
+			if not start <= self._pos < end:
+				number = bisect_right(self._offsets, self._pos) - 1
+				data   = self._frame(number)
+				start  = self._offsets[number]
+				end    = start + len(data)
+				self._current = (start, end, data)
+
+			begin = self._pos - start
+			chunk = data[begin:begin + size]
+			parts.append(chunk)
+			self._pos += len(chunk)
+			size      -= len(chunk)
+
+		if len(parts) == 1:
+			return parts[0]
+		return b''.join(parts)
+
+	def readall(self) -> bytes:
+		return self.read()
+
+	def readinto(self, buffer) -> int:
+		data = self.read(len(buffer))
+		buffer[:len(data)] = data
+		return len(data)
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+		if whence == SEEK_SET:
+			position = offset
+		elif whence == SEEK_CUR:
+			position = self._pos + offset
+		elif whence == SEEK_END:
+			position = self._size + offset
+		else:
+			raise ValueError(f'Invalid whence {whence}')
+
+		if position < 0:
+			raise ValueError(f'Negative seek position {position}')
+		self._pos = position
+		return position
+
+	def tell(self) -> int:
+		return self._pos
+
+	def fileno(self) -> int:
+		# The uncompressed contents can't be memory-mapped
+		raise UnsupportedOperation('fileno')
+
+	def close(self) -> None:
+		self._cache.clear()
+		self._current = (0, 0, b'')
+		super().close()
+
+class CompressedWriter:
+	'''
+	A write-only stream that compresses everything written to it into seekable frames.
+
+	The data is gathered into frames of ``frame_size`` bytes, which are compressed and written
+	out on a worker thread. At most ``queue_depth`` frames are waiting to be compressed at once, after
+	that :py:meth:`write` blocks until the worker catches up.
+
+	Parameters
+	----------
+	stream : str | PathLike | BinaryIO
+		The path to write the compressed capture to, or a stream to write it to.
+
+	compression : str
+		The compression format, one of :py:data:`COMPRESSIONS`.
+
+	frame_size : int
+		The amount of uncompressed data in each frame.
+
+	level : int | None
+		The compression level, by default the default level of the format.
+
+	queue_depth : int
+		The number of frames that can be waiting to be compressed.
+
+	Raises
+	------
+	ValueError
+		If the compression format is unknown.
+
+	ImportError
+		If the compression format needs a package that is not installed.
+
+	'''
+
+	def __init__(
+		self, stream: str | PathLike | BinaryIO, compression: str = 'zstd', *,
+		frame_size: int = DEFAULT_FRAME_SIZE, level: int | None = None, queue_depth: int = 4
+	) -> None:
+		if compression == 'xz':
+			preset = lzma.PRESET_DEFAULT if level is None else level
+			self._compress = lambda data: lzma.compress(data, format = lzma.FORMAT_XZ, preset = preset)
+		elif compression == 'zstd':
+			zstandard  = _zstandard()
+			compressor = zstandard.ZstdCompressor(level = 3 if level is None else level, write_content_size = True)
+			self._compress = compressor.compress
+		else:
+			raise ValueError(f'Unknown compression \'{compression}\', expected one of {", ".join(COMPRESSIONS)}')
+
+		if isinstance(stream, (str, PathLike)):
+			self._stream = Path(stream).open('wb')
+			self._owned  = True
+		else:
+			self._stream = stream
+			self._owned  = False
+
+		self.compression = compression
+		self.frame_size  = frame_size
+		self.closed      = False
+
+		self._frame  = bytearray()
+		self._frames: list[tuple[int, int]] = []
+		self._error: BaseException | None = None
+		self._queue: Queue[bytes | None] = Queue(maxsize = max(queue_depth, 1))
+		self._worker = Thread(target = self._run, name = 'squishy-compress', daemon = True)
+		self._worker.start()
+
+	def _run(self) -> None:
+		while (frame := self._queue.get()) is not None:
+			# Keep draining the queue after a failure so the writer never blocks on it
+			if self._error is not None:
+				continue
+			try:
+				compressed = self._compress(frame)
+				self._stream.write(compressed)
+				self._frames.append((len(compressed), len(frame)))
+			except BaseException as e:
+				self._error = e
+
+	def _check(self) -> None:
+		if self._error is not None:
+			raise self._error
+		if self.closed:
+			raise ValueError('Write to a closed CompressedWriter')
+
+	def write(self, data: bytes | bytearray | memoryview) -> int:
+		'''
+		Write data to the current frame, queuing it to be compressed once it is full.
+
+		Parameters
+		----------
+		data : bytes | bytearray | memoryview
+			The data to write.
+
+		Returns
+		-------
+		int
+			The number of bytes written.
+
+		'''
+
+		self._check()
+		self._frame += data
+
+		size = self.frame_size
+		if len(self._frame) >= size:
+			# Large writes are split up so the frames stay small enough to seek within
+			with memoryview(self._frame) as frame:
+				full = len(frame) - len(frame) % size
+				for start in range(0, full, size):
+					self._queue.put(bytes(frame[start:start + size]))
+				remainder = bytearray(frame[full:])
+			self._frame = remainder
+		return len(data)
+
+	def flush(self) -> None:
+		''' Check the worker has not failed, partial frames are kept until they fill up or the writer is closed '''
+		self._check()
+
+	def fileno(self) -> int:
+		raise UnsupportedOperation('fileno')
+
+	def close(self) -> None:
+		'''
+		Compress the last frame, wait for the worker to finish, and write the seek table.
+
+		Raises
+		------
+		BaseException
+			Any error raised while compressing or writing a frame.
+
+		'''
+
+		if self.closed:
+			return
+		self.closed = True
+
+		if self._frame:
+			self._queue.put(bytes(self._frame))
+			self._frame = bytearray()
+		self._queue.put(None)
+		self._worker.join()
+
+		try:
+			if self._error is None and self.compression == 'zstd':
+				table = BytesIO()
+				for compressed, decompressed in self._frames:
+					table.write(_zstd_entry.pack(compressed, decompressed))
+				table.write(_zstd_footer.pack(len(self._frames), 0, ZSTD_SEEKABLE_MAGIC))
+				self._stream.write(_zstd_skippable.pack(ZSTD_SKIPPABLE_MAGIC, table.tell()))
+				self._stream.write(table.getvalue())
+			self._stream.flush()
+		finally:
+			if self._owned:
+				self._stream.close()
+
+		if self._error is not None:
+			raise self._error
+
+	def __enter__(self) -> 'CompressedWriter':
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		self.close()
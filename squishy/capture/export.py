@@ -0,0 +1,506 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import csv
+import logging as log
+
+from itertools import chain
+from os        import PathLike
+from pathlib   import Path
+from typing    import Iterator
+
+from .pcapng   import BlockType, PcapngBlock, PcapngFile, block_header, packet_header
+from .payload  import PAYLOAD_HEADER_SIZE, SCSI_LINK_TYPES, BusPhase, NO_ID, cdb_fields, payload_header
+from .scan     import PARALLEL_THRESHOLD, ScanRange, map_ranges, split_ranges
+
+__all__ = (
+	'EXPORT_COLUMNS',
+	'EXPORT_FORMATS',
+	'export_capture',
+	'iter_commands',
+	'iter_phases',
+)
+
+__doc__ = '''\
+
+This module contains the export of SCSI captures to columnar files for analysis with tools
+like Pandas or Polars.
+
+The capture is read once, a block at a time, and each bus phase is turned into a row of plain
+values, without parsing any of the blocks with :py:mod:`construct`. The rows are either one per
+bus phase, with :py:func:`iter_phases`, or one per command from its command phase until its status
+phase, with :py:func:`iter_commands`.
+
+The columns are described by :py:data:`EXPORT_COLUMNS`, missing values, such as the status of a
+data phase, are ``None``. The ``offset`` column is the offset of the data of the phase in the
+uncompressed capture, so the data can be read back with the capture and the ``bytes`` column
+rather than being copied into the export.
+
+Parquet and Arrow IPC files require the optional :py:mod:`pyarrow` package, install it with
+``pip install squishy[pyarrow]``, CSV files can always be written.
+
+'''
+
+EXPORT_COLUMNS = (
+	('timestamp', 'When the phase or command started, in nanoseconds since the UNIX epoch'),
+	('interface', 'The interface ID of the packet within its section'),
+	('initiator', 'The SCSI ID of the initiator'),
+	('target',    'The SCSI ID of the target'),
+	('lun',       'The logical unit number'),
+	('phase',     'The bus phase, or `command` for command rows'),
+	('opcode',    'The operation code of the command'),
+	('lba',       'The logical block address from the CDB'),
+	('length',    'The transfer or allocation length from the CDB'),
+	('status',    'The status byte the command completed with'),
+	('duration',  'How long the phase or command took, in nanoseconds'),
+	('bytes',     'The number of bytes transferred in the phase, or in the data phases of the command'),
+	('packet',    'The number of the packet in the capture, for commands the command phase packet'),
+	('offset',    'The offset of the data of the packet in the uncompressed capture'),
+)
+''' The name and description of each column, in order '''
+
+EXPORT_FORMATS = {
+	'.parquet': 'parquet',
+	'.arrow':   'arrow',
+	'.feather': 'arrow',
+	'.csv':     'csv',
+}
+''' The export format for each file suffix '''
+
+_DATA_PHASES = frozenset((BusPhase.DATA_OUT, BusPhase.DATA_IN))
+
+_PHASE_NAMES = { phase.value: phase.name.lower() for phase in BusPhase }
+
+def _packets(blocks: Iterator[PcapngBlock], interfaces: tuple[tuple[int, int], ...], number: int) -> Iterator[tuple]:
+	'''
+	Iterate over the SCSI packets in a run of blocks.
+
+	Yields the packet number, interface, start and duration in nanoseconds, phase, initiator, target,
+	LUN, the offset and length of the phase data, and the raw block and offset of the data in the block.
+
+	'''
+
+	known   = list(interfaces)
+	skipped = 0
+	number -= 1
+	data_start = block_header.size + packet_header.size
+
+	for block in blocks:
+		block_type = block.type
+		if block_type == BlockType.SECTION_HEADER:
+			known = []
+			continue
+		elif block_type == BlockType.INTERFACE:
+			link = int.from_bytes(block.raw[block_header.size:block_header.size + 2], 'little')
+			known.append((link, block.ticks_per_second))
+			continue
+		elif block_type != BlockType.ENHANCED_PACKET:
+			continue
+
+		number += 1
+		raw = block.raw
+		interface, high, low, captured_len, _ = packet_header.unpack_from(raw, block_header.size)
+		if interface >= len(known):
+			skipped += 1
+			continue
+
+		link, rate = known[interface]
+		if link not in SCSI_LINK_TYPES:
+			continue
+		if captured_len < PAYLOAD_HEADER_SIZE:
+			skipped += 1
+			continue
+
+		phase, initiator, target, lun, duration = payload_header.unpack_from(raw, data_start)
+		ticks = (high << 32) | low
+		if rate == 1_000_000_000:
+			start = ticks
+		else:
+			start    = ticks * 1_000_000_000 // rate
+			duration = duration * 1_000_000_000 // rate
+
+		yield (
+			number, interface, start, duration, phase, initiator, target, lun,
+			block.offset + data_start + PAYLOAD_HEADER_SIZE, captured_len - PAYLOAD_HEADER_SIZE,
+			raw, data_start + PAYLOAD_HEADER_SIZE
+		)
+
+	if skipped:
+		log.warning(f'Skipped {skipped} packets without a SCSI payload header or a described interface')
+
+def _id(value: int) -> int | None:
+	return None if value == NO_ID else value
+
+class _PhaseState:
+	'''
+	The state carried between the phases of a capture.
+
+	When a capture is split into ranges, the phases at the start of a range that belong to a command
+	from an earlier range are recorded in ``unresolved`` so they can be filled in afterwards.
+
+	'''
+
+	__slots__ = ('commands', 'unresolved')
+
+	def __init__(self, track: bool = False) -> None:
+		self.commands: dict[tuple[int, int, int], tuple[int | None, int | None, int | None]] = {}
+		self.unresolved: dict[tuple[int, int, int], list[int]] | None = {} if track else None
+
+def _phases(packets: Iterator[tuple], state: _PhaseState) -> Iterator[tuple]:
+	commands   = state.commands
+	unresolved = state.unresolved
+	no_command = (None, None, None)
+
+	for row_number, (
+		number, interface, start, duration, phase, initiator, target, lun, offset, length, raw, data
+	) in enumerate(packets):
+		nexus  = (interface, initiator, target)
+		status = None
+
+		if phase == BusPhase.COMMAND:
+			fields = commands[nexus] = cdb_fields(raw[data:data + length])
+		else:
+			fields = commands.get(nexus)
+			if fields is None:
+				fields = no_command
+				if unresolved is not None:
+					unresolved.setdefault(nexus, []).append(row_number)
+			if phase == BusPhase.STATUS and length > 0:
+				status = raw[data]
+
+		yield (
+			start, interface, _id(initiator), _id(target), _id(lun), _PHASE_NAMES.get(phase, str(phase)),
+			*fields, status, duration, length, number, offset
+		)
+
+class _CommandState:
+	'''
+	The state carried between the commands of a capture.
+
+	``pending`` is the row of the command in progress on each nexus. When a capture is split into
+	ranges, the phases at the start of a range that belong to a command from an earlier range are
+	summed up in ``orphans`` as the bytes transferred, when the phases ended, the status, if the command
+	has finished, and how many rows came before it finished, so the command can be finished afterwards.
+	The nexuses of the orphans are added to ``finished`` in the order they finish in.
+
+	'''
+
+	__slots__ = ('pending', 'orphans', 'finished')
+
+	def __init__(self, track: bool = False) -> None:
+		self.pending: dict[tuple[int, int, int], list] = {}
+		self.orphans: dict[tuple[int, int, int], list] | None = {} if track else None
+		self.finished: list[tuple[int, int, int]] = []
+
+def _finish(row: list, status: int | None) -> tuple:
+	row[9] = status
+	return tuple(row)
+
+def _commands(packets: Iterator[tuple], state: _CommandState) -> Iterator[tuple]:
+	pending = state.pending
+	orphans = state.orphans
+	rows    = 0
+
+	for (
+		number, interface, start, duration, phase, initiator, target, lun, offset, length, raw, data
+	) in packets:
+		nexus = (interface, initiator, target)
+
+		if phase == BusPhase.COMMAND:
+			previous = pending.pop(nexus, None)
+			if previous is not None:
+				rows += 1
+				yield _finish(previous, None)
+			elif orphans is not None:
+				# A new command also finishes any command carried over from an earlier range
+				orphan = orphans.setdefault(nexus, [ 0, None, None, False, rows ])
+				if not orphan[3]:
+					orphan[3] = True
+					orphan[4] = rows
+					state.finished.append(nexus)
+
+			pending[nexus] = [
+				start, interface, _id(initiator), _id(target), _id(lun), 'command',
+				*cdb_fields(raw[data:data + length]), None, duration, 0, number, offset
+			]
+			continue
+
+		status = raw[data] if phase == BusPhase.STATUS and length > 0 else None
+
+		row = pending.get(nexus)
+		if row is None:
+			if orphans is not None:
+				orphan = orphans.setdefault(nexus, [ 0, None, None, False, rows ])
+				if not orphan[3]:
+					orphan[1] = start + duration
+					if phase in _DATA_PHASES:
+						orphan[0] += length
+					elif phase == BusPhase.STATUS:
+						orphan[2] = status
+						orphan[3] = True
+						orphan[4] = rows
+						state.finished.append(nexus)
+			continue
+
+		# Track the end of the command so far, in case it never completes
+		row[10] = start + duration - row[0]
+		if phase in _DATA_PHASES:
+			row[11] += length
+		elif phase == BusPhase.STATUS:
+			del pending[nexus]
+			rows += 1
+			yield _finish(row, status)
+
+	# Only finish the commands still in progress at the end of the capture, not the end of a range
+	if orphans is None:
+		for row in pending.values():
+			yield _finish(row, None)
+		pending.clear()
+
+def iter_phases(capture: PcapngFile) -> Iterator[tuple]:
+	'''
+	Iterate over the bus phases in a capture as export rows.
+
+	The ``opcode``, ``lba``, and ``length`` of every phase are those of the last command phase
+	between the same initiator and target, so the phases of a command can be grouped together.
+	The ``status`` is only set for status phases.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to export.
+
+	Returns
+	-------
+	Iterator[tuple]
+		A row for each phase, with the columns in the order of :py:data:`EXPORT_COLUMNS`.
+
+	'''
+
+	return _phases(_packets(capture.blocks(), (), 0), _PhaseState())
+
+def iter_commands(capture: PcapngFile) -> Iterator[tuple]:
+	'''
+	Iterate over the commands in a capture as export rows.
+
+	A command runs from its command phase until the status phase between the same initiator and
+	target. Commands that never complete are still exported, with no ``status``, once the next command
+	between the same initiator and target starts or the capture ends. The rows are in the order the
+	commands complete in.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to export.
+
+	Returns
+	-------
+	Iterator[tuple]
+		A row for each command, with the columns in the order of :py:data:`EXPORT_COLUMNS`.
+
+	'''
+
+	return _commands(_packets(capture.blocks(), (), 0), _CommandState())
+
+def _export_range(capture: PcapngFile, scan_range: ScanRange, commands: bool) -> tuple[list[tuple], object]:
+	''' Export the rows of one range of a capture, run in a worker process '''
+
+	packets = _packets(capture.blocks(scan_range.start, scan_range.end), scan_range.interfaces, scan_range.packet)
+	if commands:
+		state = _CommandState(track = True)
+		return (list(_commands(packets, state)), state)
+
+	state = _PhaseState(track = True)
+	return (list(_phases(packets, state)), state)
+
+def _export_phase_range(capture: PcapngFile, scan_range: ScanRange) -> tuple[list[tuple], _PhaseState]:
+	return _export_range(capture, scan_range, False)
+
+def _export_command_range(capture: PcapngFile, scan_range: ScanRange) -> tuple[list[tuple], _CommandState]:
+	return _export_range(capture, scan_range, True)
+
+def _range_rows(
+	capture: PcapngFile, commands: bool, ranges: list[ScanRange], workers: int | None
+) -> Iterator[list[tuple]]:
+	'''
+	Export a capture a range at a time, joining up the rows at the edges of the ranges.
+
+	The rows are exactly those of :py:func:`iter_phases` or :py:func:`iter_commands`, in the same order.
+
+	'''
+
+	if not commands:
+		context: dict[tuple[int, int, int], tuple[int | None, int | None, int | None]] = {}
+		for rows, state in map_ranges(capture, _export_phase_range, ranges, workers = workers):
+			for nexus, row_numbers in state.unresolved.items():
+				fields = context.get(nexus)
+				if fields is None:
+					continue
+				for row_number in row_numbers:
+					row = rows[row_number]
+					rows[row_number] = (*row[:6], *fields, *row[9:])
+			context.update(state.commands)
+			yield rows
+		return
+
+	carried: dict[tuple[int, int, int], list] = {}
+	for rows, state in map_ranges(capture, _export_command_range, ranges, workers = workers):
+		for nexus, orphan in state.orphans.items():
+			row = carried.get(nexus)
+			if row is None:
+				continue
+
+			transferred, end, _, _, _ = orphan
+			row[11] += transferred
+			if end is not None:
+				row[10] = end - row[0]
+
+		# Put the commands finished in this range where they would have been if it wasn't split
+		inserted = 0
+		for nexus in state.finished:
+			row = carried.pop(nexus, None)
+			if row is None:
+				continue
+
+			_, _, status, _, position = state.orphans[nexus]
+			rows.insert(position + inserted, _finish(row, status))
+			inserted += 1
+
+		carried.update(state.pending)
+		yield rows
+
+	yield [ _finish(row, None) for row in carried.values() ]
+
+class _CsvSink:
+	def __init__(self, path: Path) -> None:
+		self._file   = path.open('w', newline = '')
+		self._writer = csv.writer(self._file)
+		self._writer.writerow(name for name, _ in EXPORT_COLUMNS)
+
+	def write(self, rows: list[tuple]) -> None:
+		self._writer.writerows(rows)
+
+	def close(self) -> None:
+		self._file.close()
+
+class _ArrowSink:
+	def __init__(self, path: Path, export_format: str) -> None:
+		try:
+			import pyarrow as pa
+		except ImportError:
+			raise ImportError(
+				f'Exporting to {export_format} requires pyarrow, install it with `pip install squishy[pyarrow]`'
+			) from None
+
+		self._pa = pa
+		self._schema = pa.schema([
+			('timestamp', pa.timestamp('ns', tz = 'UTC')),
+			('interface', pa.uint32()),
+			('initiator', pa.uint8()),
+			('target',    pa.uint8()),
+			('lun',       pa.uint8()),
+			('phase',     pa.string()),
+			('opcode',    pa.uint8()),
+			('lba',       pa.uint64()),
+			('length',    pa.uint32()),
+			('status',    pa.uint8()),
+			('duration',  pa.duration('ns')),
+			('bytes',     pa.uint64()),
+			('packet',    pa.uint64()),
+			('offset',    pa.uint64()),
+		])
+
+		if export_format == 'parquet':
+			import pyarrow.parquet as pq
+			self._writer = pq.ParquetWriter(str(path), self._schema)
+			self._write  = self._writer.write_table
+		else:
+			self._writer = pa.ipc.new_file(str(path), self._schema)
+			self._write  = self._writer.write_table
+
+	def write(self, rows: list[tuple]) -> None:
+		pa = self._pa
+		columns = list(zip(*rows)) if rows else [ () ] * len(self._schema)
+		columns = [ pa.array(column, type = field.type) for column, field in zip(columns, self._schema) ]
+		self._write(pa.Table.from_arrays(columns, schema = self._schema))
+
+	def close(self) -> None:
+		self._writer.close()
+
+def export_capture(
+	capture: PcapngFile, output: str | PathLike, *, export_format: str | None = None, commands: bool = False,
+	batch_size: int = 65536, workers: int = 1
+) -> int:
+	'''
+	Export a capture to a columnar file.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to export.
+
+	output : str | PathLike
+		The file to write.
+
+	export_format : str | None
+		One of ``'parquet'``, ``'arrow'``, or ``'csv'``, by default it is picked from the suffix of
+		the output using :py:data:`EXPORT_FORMATS`.
+
+	commands : bool
+		Export a row for each command rather than each bus phase.
+
+	batch_size : int
+		The number of rows to write at a time, which is also the Parquet row group size.
+
+	workers : int
+		The number of worker processes to read the capture with, large uncompressed captures opened
+		from a path are split into ranges that are read in parallel and joined back up in order.
+
+	Returns
+	-------
+	int
+		The number of rows written.
+
+	Raises
+	------
+	ValueError
+		If the export format is unknown.
+
+	ImportError
+		If the export format needs :py:mod:`pyarrow` and it is not installed.
+
+	'''
+
+	output = Path(output)
+	if export_format is None:
+		export_format = EXPORT_FORMATS.get(output.suffix.lower())
+		if export_format is None:
+			raise ValueError(f'Unable to work out the export format from \'{output.name}\', pass the format explicitly')
+
+	if export_format == 'csv':
+		sink = _CsvSink(output)
+	elif export_format in ('parquet', 'arrow'):
+		sink = _ArrowSink(output, export_format)
+	else:
+		raise ValueError(f'Unknown export format \'{export_format}\'')
+
+	if workers > 1 and capture.path is not None and not capture.compression and capture.size >= PARALLEL_THRESHOLD:
+		rows = chain.from_iterable(_range_rows(capture, commands, split_ranges(capture, workers * 4), workers))
+	else:
+		rows = iter_commands(capture) if commands else iter_phases(capture)
+
+	total = 0
+	batch: list[tuple] = []
+	try:
+		for row in rows:
+			batch.append(row)
+			if len(batch) >= batch_size:
+				sink.write(batch)
+				total += len(batch)
+				batch = []
+
+		if batch or total == 0:
+			sink.write(batch)
+			total += len(batch)
+	finally:
+		sink.close()
+
+	return total
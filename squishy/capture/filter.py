@@ -0,0 +1,469 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging as log
+import re
+
+from os        import PathLike
+from typing    import BinaryIO, Callable, Iterator
+
+from .pcapng   import BlockType, PcapngBlock, PcapngFile, block_header, packet_header
+from .payload  import PAYLOAD_HEADER_SIZE, SCSI_LINK_TYPES, BusPhase, cdb_fields, payload_header
+from .stats    import cut_section_header
+from .writer   import PcapngWriter
+
+__all__ = (
+	'FILTER_FIELDS',
+	'PacketFilter',
+	'compile_filter',
+	'filter_capture',
+	'filter_packets',
+)
+
+__doc__ = '''\
+
+This module contains the filter expressions used to pick packets out of a SCSI capture.
+
+An expression is made up of comparisons between a field and a value, such as ``target == 3``
+or ``opcode in (0x28, 0x2A)``, combined with ``&&``, ``||``, ``!``, and parentheses, or their
+``and``, ``or``, and ``not`` spellings. Values are integers, in decimal, hex, or binary, or for
+the ``phase`` field the lowercase name of a :py:class:`squishy.capture.payload.BusPhase`.
+The fields are described by :py:data:`FILTER_FIELDS`, and mean the same as the export columns
+of the same name.
+
+.. code-block:: text
+
+	target == 3 && opcode in (0x28, 0x2A) && lba > 1000
+	phase == status && status != 0
+	interface == 1 || !(initiator == 7)
+
+The expression is compiled into Python predicates that are checked in stages, from the cheapest
+fields to the most expensive. The interface, timestamp, and packet number come straight from the
+enhanced packet block header, the phase, IDs, and duration from the payload header, and only then
+are the ``opcode``, ``lba``, and ``length`` looked up from the last CDB between the same initiator
+and target. Packets are never parsed with :py:mod:`construct`, and the matching ones are copied
+into the filtered capture byte for byte.
+
+'''
+
+_HEADER, _PAYLOAD, _COMMAND = range(3)
+
+FILTER_FIELDS = (
+	('interface', _HEADER,  'The interface ID of the packet within its section'),
+	('timestamp', _HEADER,  'When the phase started, in nanoseconds since the UNIX epoch'),
+	('packet',    _HEADER,  'The number of the packet in the capture'),
+	('phase',     _PAYLOAD, 'The bus phase'),
+	('initiator', _PAYLOAD, 'The SCSI ID of the initiator, 255 if not known'),
+	('target',    _PAYLOAD, 'The SCSI ID of the target, 255 if not known'),
+	('lun',       _PAYLOAD, 'The logical unit number, 255 if not known'),
+	('duration',  _PAYLOAD, 'How long the phase took, in nanoseconds'),
+	('bytes',     _PAYLOAD, 'The number of bytes transferred in the phase'),
+	('opcode',    _COMMAND, 'The operation code of the command the phase is part of'),
+	('lba',       _COMMAND, 'The logical block address from the CDB of the command'),
+	('length',    _COMMAND, 'The transfer or allocation length from the CDB of the command'),
+	('status',    _COMMAND, 'The status byte of a status phase'),
+)
+''' The name, stage, and description of each field '''
+
+_FIELDS = { name: stage for name, stage, _ in FILTER_FIELDS }
+
+# The fields that are only known for some phases, which never match ordering comparisons otherwise
+_OPTIONAL = frozenset(('opcode', 'lba', 'length', 'status'))
+
+# The fields that need the CDB of the command in progress
+_CONTEXT = frozenset(('opcode', 'lba', 'length'))
+
+_ARGUMENTS = tuple(
+	', '.join(name for name, stage, _ in FILTER_FIELDS if stage <= limit) for limit in (_HEADER, _PAYLOAD, _COMMAND)
+)
+
+_PHASES = { phase.name.lower(): int(phase) for phase in BusPhase }
+
+_TOKENS = re.compile(r'''
+	\s*(?:
+		(?P<number>0[xX][0-9a-fA-F_]+|0[bB][01_]+|[0-9][0-9_]*)
+		|(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+		|(?P<op>&&|\|\||==|!=|<=|>=|<|>|!|\(|\)|,)
+	)
+''', re.VERBOSE)
+
+_KEYWORDS = {
+	'and': '&&',
+	'or':  '||',
+	'not': '!',
+	'in':  'in',
+}
+
+_COMPARISONS = frozenset(('==', '!=', '<', '<=', '>', '>='))
+
+class _Parser:
+	''' A recursive descent parser turning an expression into a tree of tuples '''
+
+	def __init__(self, expression: str) -> None:
+		self.expression = expression
+		self.tokens: list[tuple[str, str | int, int]] = []
+
+		position = 0
+		while True:
+			match = _TOKENS.match(expression, position)
+			if match is None or match.end() == position:
+				if expression[position:].strip():
+					raise ValueError(f'Unexpected character \'{expression[position:].lstrip()[0]}\' at {position} in filter')
+				break
+
+			position = match.end()
+			if match['number'] is not None:
+				self.tokens.append(('value', int(match['number'], 0), match.start('number')))
+			elif match['name'] is not None:
+				name = match['name']
+				keyword = _KEYWORDS.get(name.lower())
+				if keyword is not None:
+					self.tokens.append(('op', keyword, match.start('name')))
+				else:
+					self.tokens.append(('name', name, match.start('name')))
+			else:
+				self.tokens.append(('op', match['op'], match.start('op')))
+
+		self.position = 0
+
+	def _peek(self) -> str | int | None:
+		if self.position < len(self.tokens):
+			return self.tokens[self.position][1]
+		return None
+
+	def _next(self, kind: str, what: str) -> str | int:
+		if self.position >= len(self.tokens):
+			raise ValueError(f'Expected {what} at the end of filter')
+
+		token_kind, token, offset = self.tokens[self.position]
+		if token_kind != kind:
+			raise ValueError(f'Expected {what} but found \'{token}\' at {offset} in filter')
+
+		self.position += 1
+		return token
+
+	def _expect(self, op: str) -> None:
+		if self._next('op', f'\'{op}\'') != op:
+			self.position -= 1
+			_, token, offset = self.tokens[self.position]
+			raise ValueError(f'Expected \'{op}\' but found \'{token}\' at {offset} in filter')
+
+	def parse(self) -> tuple:
+		if not self.tokens:
+			raise ValueError('Filter is empty')
+
+		node = self._or()
+		if self.position < len(self.tokens):
+			_, token, offset = self.tokens[self.position]
+			raise ValueError(f'Unexpected \'{token}\' at {offset} in filter')
+		return node
+
+	def _or(self) -> tuple:
+		terms = [ self._and() ]
+		while self._peek() == '||':
+			self.position += 1
+			terms.append(self._and())
+		return terms[0] if len(terms) == 1 else ('or', terms)
+
+	def _and(self) -> tuple:
+		terms = [ self._not() ]
+		while self._peek() == '&&':
+			self.position += 1
+			terms.append(self._not())
+		return terms[0] if len(terms) == 1 else ('and', terms)
+
+	def _not(self) -> tuple:
+		if self._peek() == '!':
+			self.position += 1
+			return ('not', self._not())
+		if self._peek() == '(':
+			self.position += 1
+			node = self._or()
+			self._expect(')')
+			return node
+		return self._comparison()
+
+	def _value(self, field: str) -> int:
+		if self.position < len(self.tokens) and self.tokens[self.position][0] == 'name':
+			_, name, offset = self.tokens[self.position]
+			phase = _PHASES.get(name.lower())
+			if field != 'phase' or phase is None:
+				raise ValueError(f'Unknown value \'{name}\' for \'{field}\' at {offset} in filter')
+			self.position += 1
+			return phase
+		return self._next('value', 'a value')
+
+	def _comparison(self) -> tuple:
+		offset = self.tokens[self.position][2] if self.position < len(self.tokens) else len(self.expression)
+		field  = self._next('name', 'a field')
+		if field not in _FIELDS:
+			raise ValueError(f'Unknown field \'{field}\' at {offset} in filter')
+
+		op = self._next('op', 'a comparison')
+		if op == 'in':
+			self._expect('(')
+			values = [ self._value(field) ]
+			while self._peek() == ',':
+				self.position += 1
+				values.append(self._value(field))
+			self._expect(')')
+			return ('in', field, tuple(values))
+
+		if op not in _COMPARISONS:
+			self.position -= 1
+			raise ValueError(f'Expected a comparison but found \'{op}\' at {self.tokens[self.position][2]} in filter')
+		return ('cmp', field, op, self._value(field))
+
+def _fields(node: tuple) -> set[str]:
+	if node[0] in ('cmp', 'in'):
+		return { node[1] }
+	if node[0] == 'not':
+		return _fields(node[1])
+	return set().union(*(_fields(term) for term in node[1]))
+
+def _source(node: tuple) -> str:
+	''' Turn a tree from the parser into a Python expression '''
+
+	kind = node[0]
+	if kind == 'cmp':
+		_, field, op, value = node
+		if field in _OPTIONAL and op not in ('==', '!='):
+			return f'({field} is not None and {field} {op} {value})'
+		return f'({field} {op} {value})'
+	elif kind == 'in':
+		_, field, values = node
+		return f'({field} in ({", ".join(str(value) for value in values)},))'
+	elif kind == 'not':
+		return f'(not {_source(node[1])})'
+	return '(' + f' {kind} '.join(_source(term) for term in node[1]) + ')'
+
+class PacketFilter:
+	'''
+	A compiled filter expression, see :py:func:`compile_filter`.
+
+	Attributes
+	----------
+	expression : str
+		The expression the filter was compiled from.
+
+	header : Callable[..., bool] | None
+		The part of the filter that only needs the enhanced packet block header, called with the
+		``interface``, ``timestamp``, and ``packet`` fields.
+
+	payload : Callable[..., bool] | None
+		The part of the filter that also needs the payload header, called with the header fields and
+		the ``phase``, ``initiator``, ``target``, ``lun``, ``duration``, and ``bytes`` fields.
+
+	command : Callable[..., bool] | None
+		The rest of the filter, called with all of the fields.
+
+	context : bool
+		If the filter needs the CDB of the command in progress for each phase.
+
+	'''
+
+	__slots__ = ('expression', 'header', 'payload', 'command', 'context')
+
+	def __init__(self, expression: str) -> None:
+		self.expression = expression
+
+		tree  = _Parser(expression).parse()
+		terms = tree[1] if tree[0] == 'and' else [ tree ]
+
+		# Split the top level terms up by the most expensive field they need
+		stages: list[list[str]] = [ [], [], [] ]
+		fields: set[str] = set()
+		for term in terms:
+			used = _fields(term)
+			fields |= used
+			stages[max(_FIELDS[field] for field in used)].append(_source(term))
+
+		self.header, self.payload, self.command = (
+			None if not sources else
+			eval(f'lambda {arguments}: {" and ".join(sources)}', { '__builtins__': {} })
+			for arguments, sources in zip(_ARGUMENTS, stages)
+		)
+		self.context = not fields.isdisjoint(_CONTEXT)
+
+	def __repr__(self) -> str:
+		return f'<PacketFilter {self.expression!r}>'
+
+def compile_filter(expression: str) -> PacketFilter:
+	'''
+	Compile a filter expression.
+
+	Parameters
+	----------
+	expression : str
+		The filter expression, see :py:mod:`squishy.capture.filter`.
+
+	Returns
+	-------
+	PacketFilter
+		The compiled filter.
+
+	Raises
+	------
+	ValueError
+		If the expression is not valid.
+
+	'''
+
+	return PacketFilter(expression)
+
+def filter_packets(
+	capture: PcapngFile, packet_filter: PacketFilter | str, *, keep: Callable[[PcapngBlock], None] | None = None
+) -> Iterator[PcapngBlock]:
+	'''
+	Iterate over the packets in a capture that match a filter.
+
+	Packets on interfaces that are not SCSI interfaces only match filters that just use the
+	``interface``, ``timestamp``, and ``packet`` fields.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to filter.
+
+	packet_filter : PacketFilter | str
+		The filter, or an expression to compile.
+
+	keep : Callable[[PcapngBlock], None] | None
+		Called with every block that isn't an enhanced packet block, in capture order, such as the
+		section headers and interface descriptions.
+
+	Returns
+	-------
+	Iterator[PcapngBlock]
+		The matching enhanced packet blocks.
+
+	'''
+
+	if isinstance(packet_filter, str):
+		packet_filter = compile_filter(packet_filter)
+
+	header    = packet_filter.header
+	payload   = packet_filter.payload
+	command   = packet_filter.command
+	context   = packet_filter.context
+	scsi_only = payload is not None or command is not None
+
+	interfaces: list[tuple[int, int]] = []
+	commands: dict[tuple[int, int, int], tuple[int | None, int | None, int | None]] = {}
+	no_command = (None, None, None)
+
+	number     = -1
+	data_start = block_header.size + packet_header.size + PAYLOAD_HEADER_SIZE
+
+	for block in capture.blocks():
+		block_type = block.type
+		if block_type != BlockType.ENHANCED_PACKET:
+			if block_type == BlockType.SECTION_HEADER:
+				interfaces = []
+				commands.clear()
+			elif block_type == BlockType.INTERFACE:
+				link = int.from_bytes(block.raw[block_header.size:block_header.size + 2], 'little')
+				interfaces.append((link, block.ticks_per_second))
+			if keep is not None:
+				keep(block)
+			continue
+
+		number += 1
+		raw = block.raw
+		interface, high, low, captured_len, _ = packet_header.unpack_from(raw, block_header.size)
+
+		if interface < len(interfaces):
+			link, rate = interfaces[interface]
+			scsi = link in SCSI_LINK_TYPES and captured_len >= PAYLOAD_HEADER_SIZE
+		else:
+			rate = 1_000_000_000
+			scsi = False
+
+		if scsi_only and not scsi:
+			continue
+
+		timestamp = (high << 32) | low
+		if rate != 1_000_000_000:
+			timestamp = timestamp * 1_000_000_000 // rate
+
+		if header is not None and not header(interface, timestamp, number):
+			# Later phases may still match, so keep track of the command they belong to
+			if context and raw[data_start - PAYLOAD_HEADER_SIZE] == BusPhase.COMMAND:
+				_, initiator, target, _, _ = payload_header.unpack_from(raw, data_start - PAYLOAD_HEADER_SIZE)
+				cdb = raw[data_start:data_start + captured_len - PAYLOAD_HEADER_SIZE]
+				commands[(interface, initiator, target)] = cdb_fields(cdb)
+			continue
+
+		if not scsi_only:
+			yield block
+			continue
+
+		phase, initiator, target, lun, duration = payload_header.unpack_from(raw, data_start - PAYLOAD_HEADER_SIZE)
+		length = captured_len - PAYLOAD_HEADER_SIZE
+		if context and phase == BusPhase.COMMAND:
+			commands[(interface, initiator, target)] = cdb_fields(raw[data_start:data_start + length])
+
+		if rate != 1_000_000_000:
+			duration = duration * 1_000_000_000 // rate
+
+		if payload is not None and not payload(interface, timestamp, number, phase, initiator, target, lun, duration, length):
+			continue
+
+		if command is not None:
+			opcode, lba, transfer = commands.get((interface, initiator, target), no_command) if context else no_command
+			status = raw[data_start] if phase == BusPhase.STATUS and length > 0 else None
+			if not command(
+				interface, timestamp, number, phase, initiator, target, lun, duration, length, opcode, lba, transfer, status
+			):
+				continue
+
+		yield block
+
+def filter_capture(
+	capture: PcapngFile, output: str | PathLike | BinaryIO, packet_filter: PacketFilter | str, *,
+	compression: str | None = None
+) -> int:
+	'''
+	Write the packets in a capture that match a filter to a new capture.
+
+	The section headers, interface descriptions, and any other blocks that are not packets are
+	all kept, so the interface IDs and timestamps of the packets stay the same. The blocks are
+	copied as they are, without being parsed, apart from the section headers, which are rewritten
+	with :py:func:`squishy.capture.stats.cut_section_header`.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to filter.
+
+	output : str | PathLike | BinaryIO
+		The path or stream to write the filtered capture to.
+
+	packet_filter : PacketFilter | str
+		The filter, or an expression to compile.
+
+	compression : str | None
+		Compress the filtered capture, see :py:class:`squishy.capture.writer.PcapngWriter`.
+
+	Returns
+	-------
+	int
+		The number of packets written.
+
+	Raises
+	------
+	ValueError
+		If the filter expression is not valid.
+
+	'''
+
+	if isinstance(packet_filter, str):
+		packet_filter = compile_filter(packet_filter)
+
+	def keep(block: PcapngBlock) -> None:
+		writer.write_block(cut_section_header(block.raw) if block.type == BlockType.SECTION_HEADER else block.raw)
+
+	with PcapngWriter(output, compression = compression) as writer:
+		for block in filter_packets(capture, packet_filter, keep = keep):
+			writer.write_block(block.raw)
+
+		log.debug(f'Kept {writer.packets} packets matching \'{packet_filter.expression}\'')
+		return writer.packets
@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from enum   import IntEnum, unique
+from struct import Struct
+
+__all__ = (
+	'BusPhase',
+	'NO_ID',
+	'PAYLOAD_HEADER_SIZE',
+	'SCSI_LINK_TYPES',
+	'cdb_fields',
+	'decode_payload',
+	'encode_payload',
+)
+
+__doc__ = '''\
+
+This module contains the layout of the packet data in the enhanced packet blocks of a SCSI capture.
+
+Each packet is one bus phase, and the packet data starts with a fixed 8 byte header describing
+the phase, followed by the bytes transferred during it, if any.
+
+.. code-block:: text
+
+	0        1           2        3     4                    8
+	+--------+-----------+--------+-----+--------------------+--------------- - -
+	| Phase  | Initiator | Target | LUN | Duration           | Data
+	+--------+-----------+--------+-----+--------------------+--------------- - -
+
+The ``Initiator``, ``Target``, and ``LUN`` are :py:data:`NO_ID` when they are not known, such as
+during arbitration. The ``Duration`` is how long the bus was in the phase for, in the same units as
+the timestamp of the packet, which is when the phase started.
+
+'''
+
+@unique
+class BusPhase(IntEnum):
+	''' The phase of the bus, the information transfer phases use the ``MSG``, ``C/D``, and ``I/O`` signals as their value '''
+
+	DATA_OUT    = 0b000
+	DATA_IN     = 0b001
+	COMMAND     = 0b010
+	STATUS      = 0b011
+	MESSAGE_OUT = 0b110
+	MESSAGE_IN  = 0b111
+
+	BUS_FREE    = 0x10
+	ARBITRATION = 0x11
+	SELECTION   = 0x12
+	RESELECTION = 0x13
+
+NO_ID = 0xFF
+''' The value of the ``Initiator``, ``Target``, or ``LUN`` when it is not known '''
+
+# Phase, Initiator, Target, LUN, Duration
+payload_header = Struct('<BBBBI')
+
+PAYLOAD_HEADER_SIZE = payload_header.size
+''' The size of the header at the start of the packet data '''
+
+SCSI_LINK_TYPES = frozenset((0x0093, 0x0094, 0x0095))
+''' The link types of the interfaces whose packets are bus phases, packets on any other interface are not '''
+
+def encode_payload(
+	phase: BusPhase, data: bytes = b'', *, initiator: int = NO_ID, target: int = NO_ID, lun: int = NO_ID,
+	duration: int = 0
+) -> bytes:
+	'''
+	Encode the packet data for a bus phase.
+
+	Parameters
+	----------
+	phase : BusPhase
+		The phase of the bus.
+
+	data : bytes
+		The bytes transferred during the phase.
+
+	initiator : int
+		The SCSI ID of the initiator.
+
+	target : int
+		The SCSI ID of the target.
+
+	lun : int
+		The logical unit number.
+
+	duration : int
+		How long the phase lasted, in the units of the timestamp of the packet.
+
+	Returns
+	-------
+	bytes
+		The packet data.
+
+	'''
+
+	return payload_header.pack(phase, initiator, target, lun, duration) + data
+
+def decode_payload(data: bytes | memoryview) -> tuple[int, int, int, int, int, memoryview]:
+	'''
+	Decode the packet data for a bus phase.
+
+	Parameters
+	----------
+	data : bytes | memoryview
+		The packet data.
+
+	Returns
+	-------
+	tuple[int, int, int, int, int, memoryview]
+		The phase, initiator, target, LUN, duration, and the bytes transferred during the phase.
+
+	Raises
+	------
+	ValueError
+		If the packet data is too short to hold the header.
+
+	'''
+
+	if len(data) < PAYLOAD_HEADER_SIZE:
+		raise ValueError(f'Packet data is {len(data)} bytes, which is too short for the {PAYLOAD_HEADER_SIZE} byte header')
+
+	phase, initiator, target, lun, duration = payload_header.unpack_from(data)
+	return (phase, initiator, target, lun, duration, memoryview(data)[PAYLOAD_HEADER_SIZE:])
+
+def cdb_fields(cdb: bytes | memoryview) -> tuple[int | None, int | None, int | None]:
+	'''
+	Get the opcode, LBA, and transfer length from a CDB.
+
+	The LBA and transfer length are found based on the group code of the opcode, so this works for
+	the usual 6, 10, 12, and 16 byte read and write style commands without decoding the whole CDB.
+
+	Parameters
+	----------
+	cdb : bytes | memoryview
+		The CDB, the data of a :py:attr:`BusPhase.COMMAND` phase.
+
+	Returns
+	-------
+	tuple[int | None, int | None, int | None]
+		The opcode, LBA, and transfer length, each ``None`` if the CDB is too short or its group
+		has no such field.
+
+	'''
+
+	if len(cdb) == 0:
+		return (None, None, None)
+
+	opcode = cdb[0]
+	group  = opcode >> 5
+	size   = len(cdb)
+
+	if group == 0 and size >= 6:
+		return (opcode, ((cdb[1] & 0x1F) << 16) | (cdb[2] << 8) | cdb[3], cdb[4])
+	elif group in (1, 2) and size >= 10:
+		return (opcode, int.from_bytes(cdb[2:6], 'big'), int.from_bytes(cdb[7:9], 'big'))
+	elif group == 5 and size >= 12:
+		return (opcode, int.from_bytes(cdb[2:6], 'big'), int.from_bytes(cdb[6:10], 'big'))
+	elif group == 4 and size >= 16:
+		return (opcode, int.from_bytes(cdb[2:10], 'big'), int.from_bytes(cdb[10:14], 'big'))
+
+	return (opcode, None, None)
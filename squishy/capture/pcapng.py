@@ -0,0 +1,1418 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging as log
+import sys
+
+from array     import array
+from bisect    import bisect_left, bisect_right
+from datetime  import datetime
+from enum      import IntEnum, unique
+from io        import SEEK_END, SEEK_SET, BytesIO, UnsupportedOperation
+from mmap      import mmap, ACCESS_READ
+from os        import PathLike
+from pathlib   import Path
+from struct    import Struct as _Struct
+from typing    import BinaryIO, Iterator
+
+from construct import (
+	Aligned, BitsInteger, BitStruct, Bytes, Check, Computed,
+	Const, CString, Default, Enum, GreedyRange, Hex, HexDump,
+	If, Int8ul, Int16ul, Int32ul, Int64sl, Int64ul, PaddedString,
+	Pass, Rebuild, RepeatUntil, Struct, Switch, len_, this
+)
+
+from .compress  import CompressedReader, detect_compression
+from .timestamp import DEFAULT_TICKS_PER_SECOND, datetime_to_ticks, ticks_to_datetime, ticks_to_datetime64, tsresol_to_ticks
+
+# We don't have a PEN, and don't want to get one so we're stealing SGIs
+block_pen = 59
+
+# We only have the user link types specified, we don't need the other as we
+# are not interested in a full pcapng reader/writer
+#
+# The following are our mappings for 'Link Type'
+#  * user_00 - SCSI-1
+#  * user_01 - SCSI-2
+#  * user_02 - SCSI-3
+#
+# Details on if it is single ended or differential, as well as if
+# it is 50, 68, or 80 pin is to be stored at metadata
+#
+# eventually we need to submit these as proper libpcap `LINKTYPE_`'s
+# but that can wait,
+
+link_type = 'Link Type' / Enum(Int16ul,
+	user_00 = 0x0093,
+	user_01 = 0x0094,
+	user_02 = 0x0095,
+	user_03 = 0x0096,
+	user_04 = 0x0097,
+	user_05 = 0x0098,
+	user_06 = 0x0099,
+	user_07 = 0x009A,
+	user_08 = 0x009B,
+	user_09 = 0x009C,
+	user_10 = 0x009D,
+	user_11 = 0x009E,
+	user_12 = 0x009F,
+	user_13 = 0x00A0,
+	user_14 = 0x00A1,
+	user_15 = 0x00A2,
+
+	usb_free_bsd = 0x00BA,
+	usb_linux = 0x00BD,
+	usb_linux_mem_mapped = 0x00DC,
+	usb_pcap = 0x00F9,
+	usb_darwin = 0x010A,
+	usb_open_vizsla = 0x0116,
+	usb_2_0 = 0x0120,
+)
+
+# Because of the limitations of some of the blocks
+# in the pcapng format, as well as the strange decisions
+# made with regards to custom blocks, we have a multi-function
+# custom block which is set to be copyied, for more details
+# see the `squishy_meta` block structure.
+block_type = 'Block Type' / Enum(Int32ul,
+	section_header  = 0x0A0D0D0A,
+	interface       = 0x00000001,
+	interface_stats = 0x00000005,
+	enhanced_packet = 0x00000006,
+
+	custom          = 0x00000BAD,
+	custom_no_copy  = 0x40000BAD,
+)
+
+@unique
+class BlockType(IntEnum):
+	''' The raw values of :py:data:`block_type`, for when the block header is read without construct '''
+
+	SECTION_HEADER  = 0x0A0D0D0A
+	INTERFACE       = 0x00000001
+	INTERFACE_STATS = 0x00000005
+	ENHANCED_PACKET = 0x00000006
+
+	CUSTOM          = 0x00000BAD
+	CUSTOM_NO_COPY  = 0x40000BAD
+
+option_type = 'Option Type' / Enum(Int16ul,
+	end     = 0x0000,
+	comment = 0x0001,
+
+	custom0 = 0x0BAC,
+	custom1 = 0x0BAD,
+	custom2 = 0x4BAC,
+	custom3 = 0x4BAD,
+)
+
+def timestamp_from_raw(this) -> int:
+	return (this.Raw.High << 32) | this.Raw.Low
+
+def timestamp_to_raw(this):
+	value = this.Value
+	# Dates are converted assuming the default resolution of a microsecond
+	if not isinstance(value, int):
+		value = datetime_to_ticks(value)
+	return {'Low': value & 0xffffffff, 'High': value >> 32}
+
+# The `Value` is the raw tick count, as the resolution of the timestamp depends on the
+# `if_tsresol` of the interface, see `squishy.capture.timestamp` to convert it.
+timestamp = 'Timestamp' / Struct(
+	'Raw' / Rebuild(Struct(
+		'High' / Hex(Int32ul),
+		'Low'  / Hex(Int32ul),
+	), timestamp_to_raw),
+	'Value' / Computed(timestamp_from_raw),
+)
+
+# This uses PaddedString because the strings encoded are not guaranteed to be NUL terminated
+# which means, if one were to use CString, it would reading past the intended EOS and into the
+# next control block structure. CString has no way to length limit the read.
+option_value = Aligned(4, Switch(
+	this.Code, {
+		option_type.end: Pass,
+		option_type.comment: PaddedString(this.Length, 'utf8'),
+
+		0x0002: Switch(this._.Type, {
+				block_type.section_header: PaddedString(this.Length, 'utf8'), # shb_hardware
+				block_type.interface: PaddedString(this.Length, 'utf8'),      # if_name
+				block_type.enhanced_packet: BitStruct(                        # epb_flags
+					'direction'   / BitsInteger(2),
+					'recept_type' / BitsInteger(3),
+					'fcs_len'     / BitsInteger(4),
+					'reserved'    / BitsInteger(7),
+					'll_errors'   / BitsInteger(16),
+				),
+				block_type.interface_stats: timestamp,						  # isb_starttime
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0003: Switch(this._.Type, {
+				block_type.section_header: PaddedString(this.Length, 'utf8'), # shb_os
+				block_type.interface: PaddedString(this.Length, 'utf8'),      # if_description
+				block_type.enhanced_packet: Bytes(this.Length),               # epb_hash
+				block_type.interface_stats: timestamp,                        # isb_endtime
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0004: Switch(this._.Type, {
+				block_type.section_header: PaddedString(this.Length, 'utf8'), # shb_userappl
+				block_type.interface: Struct(                                 # if_IPv4addr
+					'address' / Hex(Bytes(4)),
+					'mask'    / Hex(Bytes(4)),
+				),
+				block_type.enhanced_packet: Int64ul,                          # epb_dropcount
+				block_type.interface_stats: Hex(Int64ul),                     # isb_ifrecv
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0005: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(17)),                         # if_IPv6addr
+				block_type.enhanced_packet: Hex(Int64ul),                     # epb_packetid
+				block_type.interface_stats: Hex(Int64ul),                     # isb_ifdrop
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0006: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(6)),                          # if_MACaddr
+				block_type.enhanced_packet: Hex(Int64ul),                     # epb_queue
+				block_type.interface_stats: Hex(Int64ul),                     # isb_filteraccept
+
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0007: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(8)),                          # if_EUIaddr
+				block_type.enhanced_packet: Bytes(this.Length),               # epb_verdict
+				block_type.interface_stats: Hex(Int64ul),                     # isb_osdrop
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0008: Switch(this._.Type, {
+				block_type.interface: Hex(Int64ul),                           # if_speed
+				block_type.interface_stats: Hex(Int64ul),                     # isb_usrdeliv
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0009: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(1)), # if_tsresol
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000A: Switch(this._.Type, {
+				block_type.interface: Hex(Int32ul), # if_tzone
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000B: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(this.Length)), # if_filter
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000C: Switch(this._.Type, {
+				block_type.interface: PaddedString(this.Length, 'utf8'), # if_os
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000D: Switch(this._.Type, {
+				block_type.interface: Hex(Bytes(1)), # if_fcslen
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000E: Switch(this._.Type, {
+				block_type.interface: Hex(Int64ul), # if_tsoffset
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x000F: Switch(this._.Type, {
+				block_type.interface: PaddedString(this.Length, 'utf8'), # if_hardware
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0010: Switch(this._.Type, {
+				block_type.interface: Hex(Int64ul), # if_txspeed
+			},
+			HexDump(Bytes(this.Length))
+		),
+		0x0011: Switch(this._.Type, {
+				block_type.interface: Hex(Int64ul), # if_rxspeed
+			},
+			HexDump(Bytes(this.Length))
+		),
+
+		option_type.custom0: PaddedString(this.Length, 'utf8'),
+		option_type.custom1: HexDump(Bytes(this.Length)),
+		option_type.custom2: PaddedString(this.Length, 'utf8'),
+		option_type.custom3: HexDump(Bytes(this.Length)),
+	},
+	HexDump(Bytes(this.Length)),
+))
+
+def option_len(this) -> int:
+	if isinstance(this.Value, str):
+		value = CString('utf8').build(this.Value, **this)[:-1]
+	else:
+		value = option_value.build(this.Value, **this)
+	return len(value)
+
+option = 'Option' / Struct(
+	'Code'   / Hex(option_type),
+	'Length' / Rebuild(Int16ul, option_len),
+	'Value'  / If(
+		this.Length > 0,
+		option_value
+	)
+)
+
+section_header_block = 'Section Header' / Struct(
+	'BOM'     / Hex(Const(0x1A2B3C4D, Int32ul)),
+	'Version' / Struct(
+		'Major' / Const(1, Int16ul),
+		'Minor' / Const(0, Int16ul),
+	),
+	'Section Len' / Default(Int64sl, -1),
+)
+
+interface_description_block = 'Interface Description' / Struct(
+	'LinkType' / Hex(link_type),
+	'Reserved' / Hex(Const(0, Int16ul)),
+	'SnapLen'  / Hex(Int32ul),
+)
+
+def packet_data_len(this):
+	if hasattr(this, 'CapturedLen'):
+		return this.CapturedLen
+	# Handle sizeof() calculation phase
+	elif hasattr(this._.Data, 'CapturedLen'):
+		return this._.Data.CapturedLen
+	# Handle build phase
+	return len(this._.Data['PacketData'])
+
+enhanced_packet_block = 'Enhanced Packet' / Aligned(4, Struct(
+	'InterfaceID' / Hex(Int32ul),
+	'TimestampRaw' / timestamp,
+	'CapturedLen' / Rebuild(Int32ul, len_(this.PacketData)),
+	'ActualLen'   / Int32ul,
+	'PacketData'  / HexDump(Bytes(lambda this: packet_data_len(this))),
+))
+
+interface_statistics_block = 'Interface Statistics' / Struct(
+	'InterfaceID' / Hex(Int32ul),
+	'Timestamp' / timestamp,
+)
+
+squishy_bus_type = 'Bus Type' / Enum(BitsInteger(3),
+	unknown = 0b000,
+	hvd     = 0b001,
+	lvd     = 0b010,
+	se      = 0b011,
+	res0    = 0b100,
+	res1    = 0b101,
+	res2    = 0b110,
+	res3    = 0b111,
+)
+
+squishy_con_type = 'Connection Type' / Enum(BitsInteger(3),
+	unknown = 0b000,
+	fifty   = 0b001,
+	sixty   = 0b010,
+	eighty  = 0b011,
+	res0    = 0b100,
+	res1    = 0b101,
+	res2    = 0b110,
+	res3    = 0b111,
+)
+
+squishy_scsi_ver = 'SCSI Version' / Enum(BitsInteger(2),
+	unknown = 0b00,
+	scsi1   = 0b01,
+	scsi2   = 0b10,
+	scsi3   = 0b11,
+)
+
+squishy_mode = 'Squishy Mode' / Enum(Int8ul,
+	unknown    = 0x00,
+	tap        = 0x01,
+	device     = 0x02,
+	initiator  = 0x03,
+)
+
+# bus objects
+# * Bus Initiators
+# * Devices
+# * Seen
+
+squishy_meta = 'Squishy Meta' / Aligned(4, Struct(
+	'StartTimestamp'  / timestamp,			# Capture start timestamp
+	'SquishyMetadata' / Struct(
+		'SerialNumber'  / Hex(Int64ul),		# Squishy Serial Number
+		'GatewareHash'  / Hex(Bytes(20)),	# Git rev of the gateware
+		'SCSIInterface' / Struct(
+			'VID' / Hex(Int16ul),
+			'DID' / Hex(Int16ul),
+			'MODE' / squishy_mode,
+		),
+	),
+	'PythonVersion'  / BitStruct(			# Python Version
+		'Major' / BitsInteger(3), 			#  * Major: 0..7
+		'Minor' / BitsInteger(5), 			#  * Minor: 0..31
+	),
+	'BusMetadata'    / Struct(				# Bus Metadata
+		'BusInfo' / BitStruct(				#  * Attached SCSI Bus Info
+			'BusType' / squishy_bus_type,
+			'ConType' / squishy_con_type,
+			'SCSIVer' / squishy_scsi_ver,
+		),
+	)
+))
+
+options_block = RepeatUntil(
+	lambda obj, _, __: obj['Code'] == option_type.end,
+	option
+)
+
+def block_len(this) -> int:
+	if not this._building:
+		options_len = len(options_block.block(this.Options, **this))
+	else:
+		# Special case to handle the building phase *grumbles*
+		if this.Options is None:
+			options_len = 0
+		else:
+			options_len = len(options_block.build(this.Options, **this))
+
+	return (
+		this._subcons.Type.sizeof(**this) +
+		this._subcons.Data.sizeof(**this) +
+		options_len +
+		Int32ul.sizeof() * 2
+	)
+
+def options_len(this) -> int:
+	return this.Length1 - (
+		this._subcons.Type.sizeof(**this) +
+		this._subcons.Data.sizeof(**this) +
+		Int32ul.sizeof() * 2
+	)
+
+pcapng_block = 'Block' / Struct(
+	'Type'    / Hex(block_type),
+	'Length1' / Rebuild(Int32ul, block_len),
+	'Data'    / Switch(
+		this.Type, {
+			block_type.section_header: section_header_block,
+			block_type.interface: interface_description_block,
+			block_type.enhanced_packet: enhanced_packet_block,
+			block_type.interface_stats: interface_statistics_block,
+		},
+	),
+	'Size' / Computed(lambda this: this._subcons.Data.sizeof(**this)),
+	'Options' / If(
+		lambda this: options_len(this) > 0,
+		options_block
+	),
+	'Length2' / Rebuild(Int32ul, this.Length1),
+	Check(this.Length1 == this.Length2),
+)
+
+pcapng = 'Pcapng' / GreedyRange(pcapng_block)
+
+# The Type and Length1 fields at the start of every block, and the Length2 field at the end
+block_header  = _Struct('<II')
+block_trailer = _Struct('<I')
+
+# Type + Length1 + Length2
+BLOCK_OVERHEAD = block_header.size + block_trailer.size
+
+# The InterfaceID, Timestamp (High), Timestamp (Low), CapturedLen, and ActualLen fields of an enhanced packet block
+packet_header = _Struct('<IIIII')
+
+# Code + Length
+option_header = _Struct('<HH')
+
+# The offset of the options in each block type that has them, enhanced packet blocks also have the packet data first
+OPTIONS_OFFSET = {
+	BlockType.SECTION_HEADER:   24,
+	BlockType.INTERFACE:        16,
+	BlockType.ENHANCED_PACKET:  28,
+	BlockType.INTERFACE_STATS:  20,
+}
+
+# The `if_tsresol` option of interface description blocks
+IF_TSRESOL = 0x0009
+
+class PcapngBlock:
+	'''
+	A single pcapng block.
+
+	Only the block type and length are decoded when the block is read, the rest of the
+	block is parsed with :py:data:`pcapng_block` the first time :py:attr:`parsed` is accessed.
+
+	Parameters
+	----------
+	offset : int
+		The offset of the block in the capture.
+
+	block_type : int
+		The raw block type.
+
+	raw : bytes | memoryview
+		The whole block, from the Type field up to and including the Length2 field.
+
+	'''
+
+	__slots__ = ('offset', 'type', '_raw', '_parsed')
+
+	def __init__(self, offset: int, block_type: int, raw: bytes | memoryview) -> None:
+		self.offset   = offset
+		self.type     = block_type
+		self._raw     = raw
+		self._parsed  = None
+
+	@property
+	def length(self) -> int:
+		''' The total length of the block in bytes '''
+		return len(self._raw)
+
+	@property
+	def raw(self) -> memoryview:
+		''' The whole block '''
+		return memoryview(self._raw)
+
+	@property
+	def body(self) -> memoryview:
+		''' The block body and options, without the Type, Length1, and Length2 fields '''
+		return memoryview(self._raw)[block_header.size:-block_trailer.size]
+
+	@property
+	def parsed(self):
+		''' The block fully parsed with :py:data:`pcapng_block` '''
+		if self._parsed is None:
+			self._parsed = pcapng_block.parse(bytes(self._raw))
+		return self._parsed
+
+	def _packet_header(self) -> tuple[int, int, int, int, int]:
+		if self.type != BlockType.ENHANCED_PACKET:
+			raise ValueError(f'Block at offset {self.offset} is not an enhanced packet block')
+		return packet_header.unpack_from(self._raw, block_header.size)
+
+	@property
+	def interface_id(self) -> int:
+		''' The interface ID of an enhanced packet block '''
+		return self._packet_header()[0]
+
+	@property
+	def timestamp_raw(self) -> int:
+		''' The raw 64-bit timestamp of an enhanced packet block '''
+		_, high, low, _, _ = self._packet_header()
+		return (high << 32) | low
+
+	@property
+	def packet_data(self) -> memoryview:
+		''' The captured data of an enhanced packet block '''
+		_, _, _, captured_len, _ = self._packet_header()
+		start = block_header.size + packet_header.size
+		return memoryview(self._raw)[start:start + captured_len]
+
+	def options(self) -> Iterator[tuple[int, memoryview]]:
+		'''
+		Iterate over the options of the block without parsing the rest of it.
+
+		Returns
+		-------
+		Iterator[tuple[int, memoryview]]
+			The code and value of each option, up to but not including ``opt_endofopt``.
+
+		Raises
+		------
+		ValueError
+			If an option runs past the end of the block.
+
+		'''
+
+		offset = OPTIONS_OFFSET.get(self.type)
+		if offset is None:
+			return
+
+		if self.type == BlockType.ENHANCED_PACKET:
+			captured_len = self._packet_header()[3]
+			offset += (captured_len + 3) & ~3
+
+		raw = memoryview(self._raw)
+		end = len(raw) - block_trailer.size
+		while offset + option_header.size <= end:
+			code, length = option_header.unpack_from(raw, offset)
+			if code == 0:
+				return
+
+			offset += option_header.size
+			if offset + length > end:
+				raise ValueError(f'Option 0x{code:04X} of block at offset {self.offset} runs past the end of the block')
+
+			yield (code, raw[offset:offset + length])
+			offset += (length + 3) & ~3
+
+	@property
+	def ticks_per_second(self) -> int:
+		''' The timestamp resolution of an interface description block from its ``if_tsresol`` option '''
+		if self.type != BlockType.INTERFACE:
+			raise ValueError(f'Block at offset {self.offset} is not an interface description block')
+
+		for code, value in self.options():
+			if code == IF_TSRESOL and len(value) > 0:
+				return tsresol_to_ticks(value[0])
+		return DEFAULT_TICKS_PER_SECOND
+
+	def __repr__(self) -> str:
+		return f'<PcapngBlock type:0x{self.type:08X} offset:{self.offset} length:{self.length}>'
+
+def read_blocks(stream: BinaryIO, offset: int = 0, end: int | None = None) -> Iterator[PcapngBlock]:
+	'''
+	Read the blocks from a pcapng stream one at a time.
+
+	Only a single block is held in memory at a time, so this can be used on captures
+	of any size.
+
+	Parameters
+	----------
+	stream : BinaryIO
+		The stream to read from, it is read from its current position.
+
+	offset : int
+		The offset in the capture of the current position of the stream, used for the block offsets.
+
+	end : int | None
+		The offset in the capture to stop reading at, by default the end of the stream.
+
+	Returns
+	-------
+	Iterator[PcapngBlock]
+		Each block in the stream.
+
+	Raises
+	------
+	ValueError
+		If a block is truncated, has an invalid length, or the Length1 and Length2 fields differ.
+
+	'''
+
+	unpack_header = block_header.unpack
+	while end is None or offset < end:
+		header = stream.read(block_header.size)
+		if len(header) == 0:
+			return
+		if len(header) != block_header.size:
+			raise ValueError(f'Truncated block header at offset {offset}')
+
+		block_type, length = unpack_header(header)
+		if length < BLOCK_OVERHEAD or length % 4 != 0:
+			raise ValueError(f'Invalid block length {length} at offset {offset}')
+
+		remaining = stream.read(length - block_header.size)
+		if len(remaining) != length - block_header.size:
+			raise ValueError(f'Truncated block at offset {offset}, expected {length} bytes')
+
+		raw = header + remaining
+		if block_trailer.unpack_from(raw, length - block_trailer.size)[0] != length:
+			raise ValueError(f'Block Length1 and Length2 differ at offset {offset}')
+
+		yield PcapngBlock(offset, block_type, raw)
+		offset += length
+
+def scan_blocks(buffer: bytes | memoryview, offset: int = 0, end: int | None = None) -> Iterator[PcapngBlock]:
+	'''
+	Iterate over the blocks in an in-memory or memory-mapped capture.
+
+	Each block is a :py:class:`memoryview` slice of the buffer, so the capture is never copied.
+
+	Parameters
+	----------
+	buffer : bytes | memoryview
+		The capture.
+
+	offset : int
+		The offset of the first block in the buffer.
+
+	end : int | None
+		The offset to stop at, blocks that start at or after it are not returned. By default the end of the buffer.
+
+	Returns
+	-------
+	Iterator[PcapngBlock]
+		Each block in the buffer.
+
+	Raises
+	------
+	ValueError
+		If a block is truncated, has an invalid length, or the Length1 and Length2 fields differ.
+
+	'''
+
+	view          = memoryview(buffer)
+	size          = len(view)
+	end           = size if end is None else min(end, size)
+	unpack_header = block_header.unpack_from
+
+	while offset < end:
+		if offset + BLOCK_OVERHEAD > size:
+			raise ValueError(f'Truncated block header at offset {offset}')
+
+		block_type, length = unpack_header(view, offset)
+		if length < BLOCK_OVERHEAD or length % 4 != 0:
+			raise ValueError(f'Invalid block length {length} at offset {offset}')
+		if offset + length > size:
+			raise ValueError(f'Truncated block at offset {offset}, expected {length} bytes')
+		if block_trailer.unpack_from(view, offset + length - block_trailer.size)[0] != length:
+			raise ValueError(f'Block Length1 and Length2 differ at offset {offset}')
+
+		yield PcapngBlock(offset, block_type, view[offset:offset + length])
+		offset += length
+
+# Magic, version, capture size, capture modification time, block count
+index_header  = _Struct('<4sIQQQ')
+INDEX_MAGIC   = b'SQPX'
+INDEX_VERSION = 1
+
+NO_INTERFACE = 0xFFFFFFFF
+''' The interface ID recorded in the index for blocks that are not tied to an interface '''
+
+class PcapngIndex:
+	'''
+	An index of the blocks in a capture.
+
+	The index holds the offset, type, interface ID, and raw timestamp of every block in
+	flat :py:class:`array.array` columns, along with the block number of every enhanced
+	packet block, so that packets can be found without scanning the capture.
+
+	Blocks that are not enhanced packet blocks have an interface ID of :py:data:`NO_INTERFACE`
+	and a timestamp of ``0``.
+
+	Attributes
+	----------
+	offsets : array.array
+		The offset of each block.
+
+	types : array.array
+		The raw type of each block.
+
+	interfaces : array.array
+		The interface ID of each block.
+
+	timestamps : array.array
+		The raw timestamp of each block.
+
+	packets : array.array
+		The block number of each enhanced packet block.
+
+	packet_timestamps : array.array
+		The raw timestamp of each enhanced packet block. These are in the resolution of the interface
+		of each packet, so can only be compared between packets from interfaces with the same resolution,
+		see :py:attr:`PcapngFile.packet_ns` for times that can always be compared.
+
+	'''
+
+	__slots__ = ('offsets', 'types', 'interfaces', 'timestamps', 'packets', 'packet_timestamps')
+
+	def __init__(self, offsets: array, types: array, interfaces: array, timestamps: array) -> None:
+		self.offsets    = offsets
+		self.types      = types
+		self.interfaces = interfaces
+		self.timestamps = timestamps
+
+		self.packets = array('Q', (
+			block for block, block_type in enumerate(types) if block_type == BlockType.ENHANCED_PACKET
+		))
+		self.packet_timestamps = array('Q', (timestamps[block] for block in self.packets))
+
+	@classmethod
+	def from_buffer(cls, buffer: bytes | memoryview, offset: int = 0, end: int | None = None) -> 'PcapngIndex':
+		'''
+		Index an in-memory or memory-mapped capture.
+
+		This only follows the Length1 field of each block, reading the interface ID and
+		timestamp of enhanced packet blocks along the way.
+
+		Parameters
+		----------
+		buffer : bytes | memoryview
+			The capture.
+
+		offset : int
+			The offset of the first block to index.
+
+		end : int | None
+			The offset to stop at, blocks that start at or after it are not indexed. By default the end of the buffer.
+
+		Returns
+		-------
+		PcapngIndex
+			The index of the capture.
+
+		Raises
+		------
+		ValueError
+			If a block is truncated or has an invalid length.
+
+		'''
+
+		view       = memoryview(buffer)
+		size       = len(view)
+		end        = size if end is None else min(end, size)
+		offsets    = array('Q')
+		types      = array('I')
+		interfaces = array('I')
+		timestamps = array('Q')
+
+		unpack_header = block_header.unpack_from
+		unpack_packet = packet_header.unpack_from
+
+		while offset < end:
+			if offset + BLOCK_OVERHEAD > size:
+				raise ValueError(f'Truncated block header at offset {offset}')
+
+			block_type, length = unpack_header(view, offset)
+			if length < BLOCK_OVERHEAD or length % 4 != 0 or offset + length > size:
+				raise ValueError(f'Invalid block length {length} at offset {offset}')
+
+			offsets.append(offset)
+			types.append(block_type)
+			if block_type == BlockType.ENHANCED_PACKET:
+				interface, high, low, _, _ = unpack_packet(view, offset + block_header.size)
+				interfaces.append(interface)
+				timestamps.append((high << 32) | low)
+			else:
+				interfaces.append(NO_INTERFACE)
+				timestamps.append(0)
+
+			offset += length
+
+		return cls(offsets, types, interfaces, timestamps)
+
+	@classmethod
+	def from_blocks(cls, blocks: Iterator[PcapngBlock]) -> 'PcapngIndex':
+		'''
+		Index a capture from its blocks, for captures that can only be streamed.
+
+		Parameters
+		----------
+		blocks : Iterator[PcapngBlock]
+			The blocks of the capture.
+
+		Returns
+		-------
+		PcapngIndex
+			The index of the capture.
+
+		'''
+
+		offsets    = array('Q')
+		types      = array('I')
+		interfaces = array('I')
+		timestamps = array('Q')
+
+		for block in blocks:
+			offsets.append(block.offset)
+			types.append(block.type)
+			if block.type == BlockType.ENHANCED_PACKET:
+				interfaces.append(block.interface_id)
+				timestamps.append(block.timestamp_raw)
+			else:
+				interfaces.append(NO_INTERFACE)
+				timestamps.append(0)
+
+		return cls(offsets, types, interfaces, timestamps)
+
+	@classmethod
+	def load(cls, path: Path, size: int, mtime_ns: int) -> 'PcapngIndex | None':
+		'''
+		Load an index sidecar file.
+
+		Parameters
+		----------
+		path : Path
+			The sidecar file.
+
+		size : int
+			The current size of the capture.
+
+		mtime_ns : int
+			The current modification time of the capture.
+
+		Returns
+		-------
+		PcapngIndex | None
+			The index, or ``None`` if the sidecar doesn't exist, is corrupt, or is for a different
+			version of the capture.
+
+		'''
+
+		try:
+			data = path.read_bytes()
+		except OSError:
+			return None
+
+		if len(data) < index_header.size:
+			return None
+
+		magic, version, index_size, index_mtime, count = index_header.unpack_from(data)
+		if magic != INDEX_MAGIC or version != INDEX_VERSION or index_size != size or index_mtime != mtime_ns:
+			return None
+
+		columns = (array('Q'), array('I'), array('I'), array('Q'))
+		offset  = index_header.size
+		for column in columns:
+			length = count * column.itemsize
+			if offset + length > len(data):
+				return None
+			column.frombytes(data[offset:offset + length])
+			if sys.byteorder != 'little':
+				column.byteswap()
+			offset += length
+
+		return cls(*columns)
+
+	def save(self, path: Path, size: int, mtime_ns: int) -> None:
+		'''
+		Save the index to a sidecar file.
+
+		Parameters
+		----------
+		path : Path
+			The sidecar file.
+
+		size : int
+			The size of the capture.
+
+		mtime_ns : int
+			The modification time of the capture.
+
+		'''
+
+		tmp = path.with_name(f'{path.name}.tmp')
+		with tmp.open('wb') as f:
+			f.write(index_header.pack(INDEX_MAGIC, INDEX_VERSION, size, mtime_ns, len(self.offsets)))
+			for column in (self.offsets, self.types, self.interfaces, self.timestamps):
+				if sys.byteorder != 'little':
+					column = array(column.typecode, column)
+					column.byteswap()
+				column.tofile(f)
+		tmp.replace(path)
+
+	def __len__(self) -> int:
+		return len(self.offsets)
+
+class PcapngFile:
+	'''
+	A pcapng capture.
+
+	The capture is not read when it is opened, instead the blocks are read one at a time
+	when iterating over the file.
+
+	If the capture is a path or a file, it is memory-mapped and the blocks are :py:class:`memoryview`
+	slices of the mapping. An index of every block is built the first time one is needed for
+	random access, and for captures opened from a path it is kept in a ``.idx`` sidecar file
+	next to the capture so it is only built once.
+
+	Captures compressed with :py:class:`squishy.capture.compress.CompressedWriter` are
+	detected and decompressed a frame at a time as they are read, rather than being memory-mapped.
+
+	Parameters
+	----------
+	data_stream : str | PathLike | bytes | BinaryIO
+		The path to the capture, the capture itself, or a stream to read it from.
+
+	index_path : Path | None
+		Where to keep the index, by default ``{capture}.idx`` if the path of the capture is known.
+
+	workers : int
+		The number of processes to build the index of large uncompressed captures with, see
+		:py:func:`squishy.capture.scan.parallel_index`.
+
+	'''
+
+	def __init__(
+		self, *, data_stream: str | PathLike | bytes | BinaryIO, index_path: Path | None = None, workers: int = 1
+	) -> None:
+		self.workers = workers
+		self.path: Path | None = None
+		self._file: BinaryIO | None = None
+		self._map: mmap | None = None
+		self._buffer: memoryview | None = None
+		self._index: PcapngIndex | None = None
+		self._resolutions: tuple[array, list[list[int]]] | None = None
+		self._packet_ns: array | None = None
+		self._ordered: bool | None = None
+		self._rate: int | None = None
+		self._interfaces: tuple[array, list[list[tuple[int, int, int]]]] | None = None
+
+		if isinstance(data_stream, (str, PathLike)):
+			self.path  = Path(data_stream)
+			self._file = data_stream = self.path.open('rb')
+
+		# Compressed captures are read through a view of their uncompressed contents, block offsets
+		# are then offsets into the uncompressed capture, so the index works the same for both
+		self.compression: str | None = None
+		self._compressed: CompressedReader | None = None
+		if isinstance(data_stream, (bytes, bytearray, memoryview)):
+			self.compression = detect_compression(bytes(data_stream[:6]))
+			if self.compression is not None:
+				data_stream = BytesIO(data_stream)
+		elif data_stream.seekable():
+			start = data_stream.tell()
+			self.compression = detect_compression(data_stream.read(6))
+			data_stream.seek(start, SEEK_SET)
+
+		source = data_stream
+		if self.compression is not None:
+			self._compressed = data_stream = CompressedReader(data_stream, self.compression)
+
+		if isinstance(data_stream, (bytes, bytearray, memoryview)):
+			self._data   = None
+			self._buffer = memoryview(data_stream)
+			self.offset  = 0
+			self.end     = len(self._buffer)
+		else:
+			self._data = data_stream
+			self.offset = self._data.tell()
+			self._data.seek(0, SEEK_END)
+			self.end = self._data.tell()
+			self._data.seek(self.offset, SEEK_SET)
+
+			try:
+				fileno = self._data.fileno()
+			except (AttributeError, OSError, UnsupportedOperation):
+				fileno = None
+
+			# Empty files can't be mapped, but there is nothing to read in them anyway
+			if fileno is not None and self.end > self.offset:
+				self._map    = mmap(fileno, 0, access = ACCESS_READ)
+				self._buffer = memoryview(self._map)[self.offset:self.end]
+
+			name = getattr(source, 'name', None)
+			if self.path is None and isinstance(name, str) and self.offset == 0:
+				self.path = Path(name)
+
+		self.size = self.end - self.offset
+
+		if index_path is None and self.path is not None:
+			index_path = self.path.with_name(f'{self.path.name}.idx')
+		self._index_path = index_path
+
+	def blocks(self, start: int = 0, end: int | None = None) -> Iterator[PcapngBlock]:
+		'''
+		Iterate over the blocks in the capture.
+
+		Parameters
+		----------
+		start : int
+			The offset of the first block, which must be the start of a block.
+
+		end : int | None
+			The offset to stop at, blocks that start at or after it are not returned. By default the end of the capture.
+
+		Returns
+		-------
+		Iterator[PcapngBlock]
+			Each block in the capture, with its offset relative to the start of the capture.
+
+		'''
+
+		end = self.size if end is None else min(end, self.size)
+		if self._buffer is not None:
+			return scan_blocks(self._buffer, start, end)
+
+		self._data.seek(self.offset + start, SEEK_SET)
+		return read_blocks(self._data, start, end)
+
+	@property
+	def index(self) -> PcapngIndex:
+		''' The index of the blocks in the capture, loaded from the sidecar or built on first use '''
+		if self._index is None:
+			self._index = self._load_index()
+		return self._index
+
+	def _load_index(self) -> PcapngIndex:
+		stat = None
+		if self._index_path is not None and self.path is not None:
+			stat  = self.path.stat()
+			index = PcapngIndex.load(self._index_path, stat.st_size, stat.st_mtime_ns)
+			if index is not None:
+				return index
+
+		from .scan import PARALLEL_THRESHOLD, parallel_index
+
+		parallel = self._map is not None and self.path is not None and self.offset == 0
+		if parallel and self.workers > 1 and self.size >= PARALLEL_THRESHOLD:
+			index = parallel_index(self.path, workers = self.workers)
+		elif self._buffer is not None:
+			index = PcapngIndex.from_buffer(self._buffer)
+		else:
+			index = PcapngIndex.from_blocks(self.blocks())
+
+		if stat is not None:
+			try:
+				index.save(self._index_path, stat.st_size, stat.st_mtime_ns)
+			except OSError as e:
+				log.debug(f'Unable to save pcapng index to \'{self._index_path}\': {e}')
+
+		return index
+
+	def block(self, number: int) -> PcapngBlock:
+		'''
+		Get a block by its number.
+
+		Parameters
+		----------
+		number : int
+			The number of the block in the capture.
+
+		Returns
+		-------
+		PcapngBlock
+			The block, a zero-copy view of the capture if it is memory-mapped.
+
+		'''
+
+		index  = self.index
+		offset = index.offsets[number]
+
+		if self._buffer is not None:
+			_, length = block_header.unpack_from(self._buffer, offset)
+			return PcapngBlock(offset, index.types[number], self._buffer[offset:offset + length])
+
+		self._data.seek(self.offset + offset, SEEK_SET)
+		return next(read_blocks(self._data, offset))
+
+	@property
+	def packet_count(self) -> int:
+		''' The number of enhanced packet blocks in the capture '''
+		return len(self.index.packets)
+
+	def packet(self, number: int) -> PcapngBlock:
+		'''
+		Get an enhanced packet block by its number.
+
+		Parameters
+		----------
+		number : int
+			The number of the packet in the capture, counting only enhanced packet blocks.
+
+		Returns
+		-------
+		PcapngBlock
+			The block, use :py:attr:`PcapngBlock.packet_data` to get the packet data.
+
+		'''
+
+		return self.block(self.index.packets[number])
+
+	@property
+	def packet_ns(self) -> array:
+		'''
+		The time every packet was captured, in nanoseconds since the UNIX epoch.
+
+		Unlike :py:attr:`PcapngIndex.packet_timestamps` these take the resolution of the interface of
+		each packet into account, so they can be compared between any two packets.
+
+		Raises
+		------
+		ValueError
+			If a packet refers to an interface that has not been described.
+
+		'''
+
+		if self._packet_ns is None:
+			index = self.index
+			sections, rates = self.resolutions
+
+			rate = self._single_rate()
+			if rate == 1_000_000_000:
+				self._packet_ns = index.packet_timestamps
+			elif rate is not None:
+				self._packet_ns = array('Q', (ticks * 1_000_000_000 // rate for ticks in index.packet_timestamps))
+			else:
+				packet_ns = array('Q')
+				section   = -1
+				for block, ticks in zip(index.packets, index.packet_timestamps):
+					# The packets are in block order, so the section only ever moves forwards
+					while section + 1 < len(sections) and sections[section + 1] < block:
+						section += 1
+					try:
+						packet_ns.append(ticks * 1_000_000_000 // rates[section][index.interfaces[block]])
+					except IndexError:
+						raise ValueError(
+							f'Packet {len(packet_ns)} refers to interface {index.interfaces[block]} which has not been described'
+						) from None
+				self._packet_ns = packet_ns
+
+		return self._packet_ns
+
+	def _single_rate(self) -> int | None:
+		''' The ticks per second of every interface if they are all the same, so the raw timestamps can be compared '''
+
+		if self._rate is None:
+			_, rates = self.resolutions
+			distinct = { rate for section in rates for rate in section }
+			# 0 if the interfaces have different resolutions
+			self._rate = (distinct.pop() if distinct else DEFAULT_TICKS_PER_SECOND) if len(distinct) <= 1 else 0
+		return self._rate or None
+
+	@property
+	def ordered(self) -> bool:
+		''' If the packets are in time order, so they can be searched with a bisection '''
+
+		if self._ordered is None:
+			# Don't bother converting the timestamps when they are all in the same resolution
+			times = self.index.packet_timestamps if self._single_rate() is not None else self.packet_ns
+			self._ordered = all(first <= second for first, second in zip(times, times[1:]))
+		return self._ordered
+
+	def first_packet_after(self, timestamp: int) -> int | None:
+		'''
+		Find the first packet captured at or after a time.
+
+		Parameters
+		----------
+		timestamp : int
+			The time in nanoseconds since the UNIX epoch.
+
+		Returns
+		-------
+		int | None
+			The packet number, or ``None`` if all of the packets are before the time.
+
+		'''
+
+		rate = self._single_rate()
+		if rate is not None:
+			# The first raw timestamp that is at or after the time once it is converted to nanoseconds
+			times     = self.index.packet_timestamps
+			timestamp = -(-timestamp * rate // 1_000_000_000)
+		else:
+			times = self.packet_ns
+
+		if self.ordered:
+			packet = bisect_left(times, timestamp)
+			return packet if packet < len(times) else None
+
+		return next((packet for packet, value in enumerate(times) if value >= timestamp), None)
+
+	def _interface_table(self) -> tuple[array, list[list[tuple[int, int, int]]]]:
+		if self._interfaces is None:
+			index    = self.index
+			sections = array('Q')
+			table: list[list[tuple[int, int, int]]] = []
+
+			for number, block_type in enumerate(index.types):
+				if block_type == BlockType.SECTION_HEADER:
+					sections.append(number)
+					table.append([])
+				elif block_type == BlockType.INTERFACE:
+					# Tolerate a capture that is missing its section header
+					if not table:
+						sections.append(0)
+						table.append([])
+					block = self.block(number)
+					link  = int.from_bytes(block.raw[block_header.size:block_header.size + 2], 'little')
+					table[-1].append((number, link, block.ticks_per_second))
+
+			self._interfaces = (sections, table)
+		return self._interfaces
+
+	@property
+	def resolutions(self) -> tuple[array, list[list[int]]]:
+		'''
+		The timestamp resolution of every interface in the capture.
+
+		Interface IDs are only unique within a section, so this is the block number of each
+		section header block, and the ticks per second of each interface in that section.
+
+		'''
+
+		if self._resolutions is None:
+			sections, table = self._interface_table()
+			self._resolutions = (sections, [ [ rate for _, _, rate in section ] for section in table ])
+		return self._resolutions
+
+	def interfaces(self, block: int) -> tuple[tuple[int, int], ...]:
+		'''
+		Get the interfaces that have been described by the time a block is reached.
+
+		This is the state needed to start reading a capture part way through, see
+		:py:mod:`squishy.capture.scan`.
+
+		Parameters
+		----------
+		block : int
+			The block number.
+
+		Returns
+		-------
+		tuple[tuple[int, int], ...]
+			The link type and ticks per second of each interface described in the section of
+			the block before the block itself, in interface ID order.
+
+		'''
+
+		sections, table = self._interface_table()
+		section = bisect_right(sections, block) - 1
+		if section < 0:
+			return ()
+		return tuple((link, rate) for number, link, rate in table[section] if number < block)
+
+	def packet_ticks_per_second(self, number: int) -> int:
+		'''
+		Get the timestamp resolution of a packet.
+
+		Parameters
+		----------
+		number : int
+			The number of the packet in the capture.
+
+		Returns
+		-------
+		int
+			The number of ticks per second of the interface the packet was captured on.
+
+		'''
+
+		index = self.index
+		block = index.packets[number]
+		sections, rates = self.resolutions
+
+		section = bisect_right(sections, block) - 1
+		try:
+			return rates[section][index.interfaces[block]]
+		except IndexError:
+			raise ValueError(
+				f'Packet {number} refers to interface {index.interfaces[block]} which has not been described'
+			) from None
+
+	def packet_time(self, number: int) -> datetime:
+		'''
+		Get the time a packet was captured.
+
+		Parameters
+		----------
+		number : int
+			The number of the packet in the capture.
+
+		Returns
+		-------
+		datetime.datetime
+			The UTC time the packet was captured.
+
+		'''
+
+		block = self.index.packets[number]
+		return ticks_to_datetime(self.index.timestamps[block], self.packet_ticks_per_second(number))
+
+	def packet_times64(self):
+		'''
+		Get the time every packet was captured as a :py:mod:`numpy` array.
+
+		Returns
+		-------
+		numpy.ndarray
+			The UTC time of each packet as ``datetime64[ns]``.
+
+		Raises
+		------
+		ImportError
+			If :py:mod:`numpy` is not installed.
+
+		'''
+
+		index = self.index
+		sections, rates = self.resolutions
+
+		# Skip working out the rate of each packet in the common case of one resolution for everything
+		distinct = {rate for section in rates for rate in section}
+		if len(distinct) <= 1:
+			return ticks_to_datetime64(index.packet_timestamps, distinct.pop() if distinct else DEFAULT_TICKS_PER_SECOND)
+
+		import numpy as np
+
+		packets = np.frombuffer(index.packets, dtype = np.uint64)
+		section = np.searchsorted(np.frombuffer(sections, dtype = np.uint64), packets, side = 'right') - 1
+
+		# Flatten the per-section interface rates so each packet can be looked up in one go
+		bases = np.cumsum([0] + [len(section_rates) for section_rates in rates[:-1]])
+		table = np.array([rate for section_rates in rates for rate in section_rates], dtype = np.uint64)
+		interfaces = np.frombuffer(index.interfaces, dtype = np.uint32)[packets.astype(np.intp)]
+
+		return ticks_to_datetime64(index.packet_timestamps, table[bases[section] + interfaces])
+
+	def close(self) -> None:
+		'''
+		Close the capture.
+
+		If any blocks from a memory-mapped capture are still alive, the mapping is
+		only unmapped once they have all been released.
+
+		'''
+
+		if self._map is not None:
+			self._buffer.release()
+			self._buffer = None
+			try:
+				self._map.close()
+			except BufferError:
+				pass
+			self._map = None
+		if self._compressed is not None:
+			self._compressed.close()
+			self._compressed = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def __enter__(self) -> 'PcapngFile':
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		self.close()
+
+	def __iter__(self) -> Iterator[PcapngBlock]:
+		return self.blocks()
+
+	def __str__(self) -> str:
+		return '\n'.join(str(block.parsed) for block in self.blocks())
+
+if __name__ == '__main__':
+	def dump_img(file_name):
+		with PcapngFile(data_stream = file_name) as capture:
+			for block in capture:
+				print(block.parsed)
+
+	from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+	from os       import path
+
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+	)
+
+	global_options = parser.add_argument_group('Global Options')
+
+	global_options.add_argument(
+		'--file', '-f',
+		type = str,
+		required = True,
+	)
+
+	global_options.add_argument(
+		'--dump', '-d',
+		action = 'store_true',
+		default = False,
+	)
+
+	args = parser.parse_args()
+
+	if not path.exists(args.file):
+		print(f'Unable to open file \'{args.file}\' does it exist?')
+		sys.exit(1)
+
+	if args.dump:
+		sys.exit(dump_img(args.file))
+
+
+	sys.exit(1)
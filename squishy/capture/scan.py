@@ -0,0 +1,363 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging as log
+import os
+import re
+
+from array              import array
+from bisect             import bisect_left
+from collections        import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools          import islice, repeat
+from mmap               import mmap, ACCESS_READ
+from os                 import PathLike
+from pathlib            import Path
+from typing             import Callable, Iterator, NamedTuple, TypeVar
+
+from .pcapng            import BLOCK_OVERHEAD, BlockType, PcapngFile, PcapngIndex, block_header, block_trailer
+
+__all__ = (
+	'PARALLEL_THRESHOLD',
+	'ScanRange',
+	'default_workers',
+	'find_block_boundary',
+	'map_ranges',
+	'parallel_index',
+	'split_ranges',
+)
+
+__doc__ = '''\
+
+This module contains the tools for processing large pcapng captures on multiple cores.
+
+Blocks in a pcapng capture are self-delimiting, each one starts with its type and length and
+ends with the length again, so a capture can be split into byte ranges that are scanned
+independently. :py:func:`find_block_boundary` finds the first block in a range by looking for
+a chain of blocks with a known type and matching Length1 and Length2 fields. The block chain
+found by each range is checked against where the previous range actually ended, and any range
+that resynchronised on something that only looked like a block is scanned again from the
+right offset, so the result is always the same as scanning the capture in one go.
+
+:py:func:`parallel_index` uses this to build a :py:class:`squishy.capture.pcapng.PcapngIndex`
+with a process pool. Once a capture has an index the block boundaries are known, so
+:py:func:`split_ranges` and :py:func:`map_ranges` split the work of other passes over the capture,
+such as exporting it, without needing to resynchronise at all.
+
+.. code-block:: python
+
+	from squishy.capture.pcapng import PcapngFile
+	from squishy.capture.scan   import map_ranges, split_ranges
+
+	def count_packets(capture, scan_range):
+		return sum(block.type == 6 for block in capture.blocks(scan_range.start, scan_range.end))
+
+	with PcapngFile(data_stream = 'capture.pcapng', workers = 8) as capture:
+		total = sum(map_ranges(capture, count_packets, split_ranges(capture, 32), workers = 8))
+
+'''
+
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+''' The size below which a capture is not worth splitting up between processes '''
+
+# The smallest range worth handing to a worker process
+_MIN_RANGE = 4 * 1024 * 1024
+
+# Any known block type, the lookahead makes the matches overlap so no aligned match is skipped
+_BLOCK_TYPES = re.compile(
+	b'(?=' + b'|'.join(re.escape(int(block).to_bytes(4, 'little')) for block in BlockType) + b')'
+)
+_KNOWN_TYPES = frozenset(int(block) for block in BlockType)
+
+R = TypeVar('R')
+
+class ScanRange(NamedTuple):
+	''' A range of whole blocks in a capture and the state needed to start reading from it '''
+
+	start: int
+	''' The offset of the first block '''
+
+	end: int
+	''' The offset of the first block not in the range '''
+
+	packet: int
+	''' The number of the first packet in the range '''
+
+	interfaces: tuple[tuple[int, int], ...]
+	''' The link type and ticks per second of the interfaces described before the range, see :py:meth:`PcapngFile.interfaces` '''
+
+def default_workers() -> int:
+	''' The number of worker processes to use by default, one per usable core '''
+
+	try:
+		return len(os.sched_getaffinity(0))
+	except AttributeError: # :nocov:
+		return os.cpu_count() or 1
+
+def _valid_chain(view: memoryview, offset: int, size: int, chain: int) -> bool:
+	''' Check that there are ``chain`` valid blocks, or the end of the capture, starting at the offset '''
+
+	for _ in range(chain):
+		if offset == size:
+			return True
+		if offset + BLOCK_OVERHEAD > size:
+			return False
+
+		block_type, length = block_header.unpack_from(view, offset)
+		if block_type not in _KNOWN_TYPES or length < BLOCK_OVERHEAD or length % 4 != 0 or offset + length > size:
+			return False
+		if block_trailer.unpack_from(view, offset + length - block_trailer.size)[0] != length:
+			return False
+
+		offset += length
+	return True
+
+def find_block_boundary(buffer: bytes | memoryview, offset: int, end: int | None = None, *, chain: int = 4) -> int | None:
+	'''
+	Find the first block that starts in a range of a capture.
+
+	As blocks are always a multiple of 32-bits long, only offsets that are 32-bit aligned from
+	the start of the capture are considered.
+
+	Parameters
+	----------
+	buffer : bytes | memoryview
+		The whole capture.
+
+	offset : int
+		The offset to start looking from.
+
+	end : int | None
+		The offset to stop looking at, by default the end of the capture.
+
+	chain : int
+		The number of consecutive valid blocks needed to accept a boundary, fewer are needed
+		if the chain reaches the end of the capture.
+
+	Returns
+	-------
+	int | None
+		The offset of the block, or ``None`` if no block starts in the range.
+
+	'''
+
+	view = memoryview(buffer)
+	size = len(view)
+	end  = size if end is None else min(end, size)
+
+	for match in _BLOCK_TYPES.finditer(view, (offset + 3) & ~3, end):
+		candidate = match.start()
+		if candidate % 4 == 0 and _valid_chain(view, candidate, size, chain):
+			return candidate
+	return None
+
+class _IndexPart(NamedTuple):
+	start: int
+	next: int
+	offsets: array
+	types: array
+	interfaces: array
+	timestamps: array
+
+def _index_part(view: memoryview, start: int, end: int) -> _IndexPart:
+	index = PcapngIndex.from_buffer(view, start, end)
+	if len(index) == 0:
+		return _IndexPart(start, start, index.offsets, index.types, index.interfaces, index.timestamps)
+
+	last    = index.offsets[-1]
+	_, size = block_header.unpack_from(view, last)
+	return _IndexPart(start, last + size, index.offsets, index.types, index.interfaces, index.timestamps)
+
+def _index_range(path: str, start: int, end: int) -> _IndexPart | None:
+	''' Index the blocks starting in a range of a capture, run in a worker process '''
+
+	with open(path, 'rb') as f, mmap(f.fileno(), 0, access = ACCESS_READ) as mapping:
+		view = memoryview(mapping)
+		try:
+			boundary = 0 if start == 0 else find_block_boundary(view, start, end)
+			if boundary is None:
+				return None
+			try:
+				return _index_part(view, boundary, end)
+			except ValueError:
+				# Most likely a false boundary, the range is scanned again from where the last one ended
+				return None
+		finally:
+			view.release()
+
+def parallel_index(path: str | PathLike, *, workers: int | None = None, range_size: int | None = None) -> PcapngIndex:
+	'''
+	Index an uncompressed capture with a pool of worker processes.
+
+	Parameters
+	----------
+	path : str | PathLike
+		The capture.
+
+	workers : int | None
+		The number of worker processes, by default :py:func:`default_workers`.
+
+	range_size : int | None
+		The size of the range each worker indexes at a time, by default the capture is split
+		into four ranges per worker.
+
+	Returns
+	-------
+	PcapngIndex
+		The index of the capture, exactly as :py:meth:`PcapngIndex.from_buffer` would build it.
+
+	Raises
+	------
+	ValueError
+		If a block is truncated or has an invalid length.
+
+	'''
+
+	path    = Path(path)
+	size    = path.stat().st_size
+	workers = default_workers() if workers is None else max(workers, 1)
+	if range_size is None:
+		range_size = max(size // (workers * 4), _MIN_RANGE)
+
+	starts = list(range(0, size, range_size))
+	ends   = starts[1:] + [ size ]
+
+	if workers > 1 and len(starts) > 1:
+		with ProcessPoolExecutor(min(workers, len(starts))) as pool:
+			parts = list(pool.map(_index_range, repeat(str(path)), starts, ends))
+	else:
+		parts = [ None ] * len(starts)
+
+	offsets    = array('Q')
+	types      = array('I')
+	interfaces = array('I')
+	timestamps = array('Q')
+
+	with open(path, 'rb') as f, mmap(f.fileno(), 0, access = ACCESS_READ) if size > 0 else _Empty() as mapping:
+		view = memoryview(mapping)
+		try:
+			expected = 0
+			for start, end, part in zip(starts, ends, parts):
+				# The last block of the previous range ran over this one entirely
+				if expected >= end:
+					continue
+
+				if part is None or part.start != expected:
+					if part is not None:
+						log.debug(f'Range at offset {start} resynchronised at {part.start} rather than {expected}, rescanning')
+					part = _index_part(view, expected, end)
+
+				offsets.extend(part.offsets)
+				types.extend(part.types)
+				interfaces.extend(part.interfaces)
+				timestamps.extend(part.timestamps)
+				expected = part.next
+		finally:
+			view.release()
+
+	return PcapngIndex(offsets, types, interfaces, timestamps)
+
+class _Empty:
+	''' Stands in for the mapping of an empty capture, which can't be memory-mapped '''
+
+	def __enter__(self) -> bytes:
+		return b''
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		pass
+
+def split_ranges(capture: PcapngFile, parts: int) -> list[ScanRange]:
+	'''
+	Split an indexed capture into ranges of whole blocks of about the same size.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture, its index is built if it has not been already.
+
+	parts : int
+		The number of ranges to split the capture into, ranges smaller than a few MiB are
+		merged so there may be fewer.
+
+	Returns
+	-------
+	list[ScanRange]
+		The ranges, in capture order.
+
+	'''
+
+	index   = capture.index
+	offsets = index.offsets
+	parts   = max(min(parts, capture.size // _MIN_RANGE), 1)
+
+	blocks = sorted({ 0 } | {
+		bisect_left(offsets, capture.size * part // parts) for part in range(1, parts)
+	} - { len(offsets) })
+
+	ranges = []
+	for number, block in enumerate(blocks):
+		start = offsets[block] if block < len(offsets) else capture.size
+		end   = offsets[blocks[number + 1]] if number + 1 < len(blocks) else capture.size
+		ranges.append(ScanRange(start, end, bisect_left(index.packets, block), capture.interfaces(block)))
+	return ranges
+
+_worker_capture: PcapngFile | None = None
+
+def _open_worker(path: str) -> None:
+	global _worker_capture
+	_worker_capture = PcapngFile(data_stream = path)
+
+def _run_range(func: Callable[[PcapngFile, ScanRange], R], scan_range: ScanRange) -> R:
+	return func(_worker_capture, scan_range)
+
+def map_ranges(
+	capture: PcapngFile, func: Callable[[PcapngFile, ScanRange], R], ranges: list[ScanRange], *,
+	workers: int | None = None
+) -> Iterator[R]:
+	'''
+	Run a function over ranges of a capture in a pool of worker processes.
+
+	Each worker opens the capture itself, so the capture must have been opened from a path, otherwise
+	the ranges are processed one after the other in this process. Only a couple of ranges per worker
+	are in flight at once, so the results of a large capture don't all pile up in memory.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture.
+
+	func : Callable[[PcapngFile, ScanRange], R]
+		The function to run on each range, it must be a module level function so it can be pickled.
+
+	ranges : list[ScanRange]
+		The ranges, from :py:func:`split_ranges`.
+
+	workers : int | None
+		The number of worker processes, by default :py:func:`default_workers`.
+
+	Returns
+	-------
+	Iterator[R]
+		The result for each range, in the order of the ranges.
+
+	'''
+
+	workers = default_workers() if workers is None else workers
+	if workers <= 1 or len(ranges) <= 1 or capture.path is None:
+		for scan_range in ranges:
+			yield func(capture, scan_range)
+		return
+
+	pool = ProcessPoolExecutor(min(workers, len(ranges)), initializer = _open_worker, initargs = (str(capture.path),))
+	try:
+		remaining = iter(ranges)
+		pending: deque[Future] = deque(
+			pool.submit(_run_range, func, scan_range) for scan_range in islice(remaining, workers * 2)
+		)
+
+		while pending:
+			result = pending.popleft().result()
+			scan_range = next(remaining, None)
+			if scan_range is not None:
+				pending.append(pool.submit(_run_range, func, scan_range))
+			yield result
+	finally:
+		pool.shutdown(cancel_futures = True)
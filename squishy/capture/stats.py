@@ -0,0 +1,429 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from dataclasses import dataclass, field
+from struct      import Struct
+
+from .pcapng     import BlockType, PcapngBlock, PcapngFile, block_header, block_pen, block_trailer
+
+__all__ = (
+	'CUT_MARKER',
+	'CaptureCounters',
+	'InterfaceHealth',
+	'SQUISHY_COUNTERS',
+	'capture_health',
+	'cut_section_header',
+	'decode_statistics',
+	'encode_statistics',
+	'is_cut',
+)
+
+__doc__ = '''\
+
+This module contains the capture statistics kept in the interface statistics blocks of a capture.
+
+While capturing, :py:class:`squishy.capture.writer.PcapngWriter` keeps a set of
+:py:class:`CaptureCounters` for each interface and periodically writes them out in an interface
+statistics block, along with a final one when the capture is closed. The counters are cumulative,
+so the last block for an interface describes the whole capture.
+
+The standard ``isb_ifrecv``, ``isb_ifdrop``, ``isb_filteraccept``, ``isb_osdrop``, and ``isb_usrdeliv``
+options hold the number of phases the analyzer saw on the bus, dropped because its FIFO overflowed,
+accepted with its capture filter, that were lost on the way to the host, and that were written to
+the capture. The counters that are specific to Squishy, such as bus resets and parity errors, are
+held in custom options, each one the Squishy PEN, the ID of the counter from :py:data:`SQUISHY_COUNTERS`,
+and its value.
+
+.. code-block:: text
+
+	0                               4               6               8                              16
+	+-------------------------------+---------------+---------------+-------------------------------+
+	| PEN                           | Counter       | Reserved      | Value                         |
+	+-------------------------------+---------------+---------------+-------------------------------+
+
+:py:func:`capture_health` checks these against the packets actually in a capture to tell if it
+is complete.
+
+Captures that are cut out of another one, by slicing, splitting, or filtering it, keep its
+interface statistics blocks, which still count every packet in the original capture. Their section
+headers are written with :py:func:`cut_section_header`, which marks them with a custom option, the
+Squishy PEN and a marker ID, so that only the counters that don't depend on which packets are in
+the capture are checked.
+
+.. code-block:: text
+
+	0                               4               6               8
+	+-------------------------------+---------------+---------------+
+	| PEN                           | Marker        | Reserved      |
+	+-------------------------------+---------------+---------------+
+
+'''
+
+ISB_STARTTIME     = 0x0002
+ISB_ENDTIME       = 0x0003
+ISB_IFRECV        = 0x0004
+ISB_IFDROP        = 0x0005
+ISB_FILTERACCEPT  = 0x0006
+ISB_OSDROP        = 0x0007
+ISB_USRDELIV      = 0x0008
+OPT_CUSTOM_BINARY = 0x0BAD
+
+SQUISHY_COUNTERS = {
+	'bus_resets':    0x0001,
+	'parity_errors': 0x0002,
+}
+''' The ID of each Squishy specific counter in its custom option '''
+
+# The CaptureCounters field for each of the standard options
+_STANDARD = {
+	ISB_IFRECV:       'received',
+	ISB_IFDROP:       'dropped',
+	ISB_FILTERACCEPT: 'filtered',
+	ISB_OSDROP:       'host_dropped',
+	ISB_USRDELIV:     'delivered',
+}
+
+_COUNTER_NAMES = { counter: name for name, counter in SQUISHY_COUNTERS.items() }
+
+
+# The offset of the Section Length field of a section header block, and of its options
+_SECTION_LENGTH  = 16
+_SECTION_OPTIONS = 24
+
+# Timestamp (High), Timestamp (Low)
+_timestamp = Struct('<II')
+# Code, Length, Timestamp (High), Timestamp (Low)
+_time_option = Struct('<HHII')
+# Code, Length, Value
+_counter_option = Struct('<HHQ')
+# PEN, Counter, Reserved, Value
+_squishy_counter = Struct('<IH2xQ')
+# Code, Length
+_option_header = Struct('<HH')
+# InterfaceID, Timestamp (High), Timestamp (Low)
+_statistics_header = Struct('<III')
+# PEN, Marker, Reserved
+_squishy_marker = Struct('<IH2x')
+# Section Length
+_section_length = Struct('<q')
+
+CUT_MARKER = _squishy_marker.pack(block_pen, 0x0001)
+''' The value of the custom option that marks a section as cut out of a larger capture '''
+
+@dataclass(slots = True)
+class CaptureCounters:
+	'''
+	The statistics of one interface of a capture.
+
+	Counters that are ``None`` are not known, and are left out of the interface statistics block.
+
+	Attributes
+	----------
+	start : int | None
+		The raw timestamp of the first packet.
+
+	end : int | None
+		The raw timestamp of the last packet.
+
+	received : int | None
+		The number of phases the analyzer saw on the bus.
+
+	dropped : int | None
+		The number of phases the analyzer dropped because its FIFO overflowed.
+
+	filtered : int | None
+		The number of phases accepted by the capture filter of the analyzer.
+
+	host_dropped : int | None
+		The number of phases that were lost between the analyzer and the capture.
+
+	delivered : int
+		The number of packets written to the capture.
+
+	bus_resets : int | None
+		The number of times the bus was reset.
+
+	parity_errors : int | None
+		The number of parity errors seen on the bus.
+
+	'''
+
+	start: int | None = None
+	end: int | None = None
+	received: int | None = None
+	dropped: int | None = None
+	filtered: int | None = None
+	host_dropped: int | None = None
+	delivered: int = 0
+	bus_resets: int | None = None
+	parity_errors: int | None = None
+
+def encode_statistics(interface: int, timestamp: int, counters: CaptureCounters) -> bytes:
+	'''
+	Encode an interface statistics block.
+
+	Parameters
+	----------
+	interface : int
+		The interface ID the statistics are for.
+
+	timestamp : int
+		The raw timestamp of the statistics, in the units of the ``if_tsresol`` of the interface.
+
+	counters : CaptureCounters
+		The statistics.
+
+	Returns
+	-------
+	bytes
+		The whole block.
+
+	'''
+
+	options = bytearray()
+	for code, value in ((ISB_STARTTIME, counters.start), (ISB_ENDTIME, counters.end)):
+		if value is not None:
+			options += _time_option.pack(code, _timestamp.size, value >> 32, value & 0xFFFFFFFF)
+
+	for code, name in _STANDARD.items():
+		value = getattr(counters, name)
+		if value is not None:
+			options += _counter_option.pack(code, 8, value)
+
+	for name, counter in SQUISHY_COUNTERS.items():
+		value = getattr(counters, name)
+		if value is not None:
+			options += _option_header.pack(OPT_CUSTOM_BINARY, _squishy_counter.size)
+			options += _squishy_counter.pack(block_pen, counter, value)
+
+	# opt_endofopt
+	options += bytes(4)
+
+	length = block_header.size + _statistics_header.size + len(options) + block_trailer.size
+	return b''.join((
+		block_header.pack(BlockType.INTERFACE_STATS, length),
+		_statistics_header.pack(interface, timestamp >> 32, timestamp & 0xFFFFFFFF),
+		options, block_trailer.pack(length)
+	))
+
+def decode_statistics(block: PcapngBlock) -> tuple[int, int, CaptureCounters]:
+	'''
+	Decode an interface statistics block without parsing it with :py:mod:`construct`.
+
+	Parameters
+	----------
+	block : PcapngBlock
+		The block.
+
+	Returns
+	-------
+	tuple[int, int, CaptureCounters]
+		The interface ID, the raw timestamp, and the statistics.
+
+	Raises
+	------
+	ValueError
+		If the block is not an interface statistics block, or is truncated.
+
+	'''
+
+	if block.type != BlockType.INTERFACE_STATS:
+		raise ValueError(f'Block at offset {block.offset} is not an interface statistics block')
+	if block.length < block_header.size + _statistics_header.size + block_trailer.size:
+		raise ValueError(f'Interface statistics block at offset {block.offset} is truncated')
+
+	interface, high, low = _statistics_header.unpack_from(block.raw, block_header.size)
+	counters = CaptureCounters()
+
+	for code, value in block.options():
+		if code in (ISB_STARTTIME, ISB_ENDTIME) and len(value) == _timestamp.size:
+			high_time, low_time = _timestamp.unpack(value)
+			if code == ISB_STARTTIME:
+				counters.start = (high_time << 32) | low_time
+			else:
+				counters.end = (high_time << 32) | low_time
+		elif code in _STANDARD and len(value) == 8:
+			setattr(counters, _STANDARD[code], int.from_bytes(value, 'little'))
+		elif code == OPT_CUSTOM_BINARY and len(value) == _squishy_counter.size:
+			pen, counter, number = _squishy_counter.unpack(value)
+			name = _COUNTER_NAMES.get(counter)
+			if pen == block_pen and name is not None:
+				setattr(counters, name, number)
+
+	return (interface, (high << 32) | low, counters)
+
+def is_cut(block: PcapngBlock) -> bool:
+	'''
+	Check if a section header block is marked as being cut out of a larger capture.
+
+	Parameters
+	----------
+	block : PcapngBlock
+		The section header block.
+
+	Returns
+	-------
+	bool
+		If the section was written with :py:func:`cut_section_header`.
+
+	'''
+
+	return any(code == OPT_CUSTOM_BINARY and value == CUT_MARKER for code, value in block.options())
+
+def cut_section_header(raw: bytes | memoryview) -> bytes:
+	'''
+	Copy a section header block for a capture cut out of a larger one.
+
+	The section length is set to unknown, as the section is being cut up, and the section is
+	marked as cut, see :py:func:`is_cut`, if it is not already.
+
+	Parameters
+	----------
+	raw : bytes | memoryview
+		The whole section header block.
+
+	Returns
+	-------
+	bytes
+		The new section header block.
+
+	'''
+
+	raw = bytes(raw)
+	if is_cut(PcapngBlock(0, BlockType.SECTION_HEADER, raw)):
+		marker = b''
+	else:
+		marker = _option_header.pack(OPT_CUSTOM_BINARY, len(CUT_MARKER)) + CUT_MARKER
+
+	# The marker goes in front of any existing options, which then need ending if there weren't any
+	options = raw[_SECTION_OPTIONS:-block_trailer.size]
+	if marker and not options:
+		options = bytes(_option_header.size)
+
+	length = _SECTION_OPTIONS + len(marker) + len(options) + block_trailer.size
+	return b''.join((
+		block_header.pack(BlockType.SECTION_HEADER, length), raw[block_header.size:_SECTION_LENGTH],
+		_section_length.pack(-1), marker, options, block_trailer.pack(length)
+	))
+
+@dataclass
+class InterfaceHealth:
+	'''
+	How complete the capture of one interface is, see :py:func:`capture_health`.
+
+	Attributes
+	----------
+	section : int
+		The number of the section the interface is in.
+
+	interface : int
+		The interface ID within the section.
+
+	link : int
+		The link type of the interface.
+
+	packets : int
+		The number of packets from the interface in the capture.
+
+	statistics : CaptureCounters | None
+		The counters from the last interface statistics block for the interface, if there is one.
+
+	captured : int
+		The number of packets from the interface in the capture before its last interface statistics block.
+
+	cut : bool
+		If the section was cut out of a larger capture, so its statistics count packets that are not in it.
+
+	problems : list[str]
+		A description of everything that suggests the capture of the interface is not complete.
+
+	'''
+
+	section: int
+	interface: int
+	link: int
+	packets: int = 0
+	statistics: CaptureCounters | None = None
+	captured: int = 0
+	cut: bool = False
+	problems: list[str] = field(default_factory = list)
+
+	@property
+	def complete(self) -> bool:
+		''' If nothing suggests that any phases on the interface are missing from the capture '''
+		return not self.problems
+
+def _check(health: InterfaceHealth) -> None:
+	problems   = health.problems
+	statistics = health.statistics
+	if statistics is None:
+		# A cut capture can start before the first interface statistics of the capture it came from
+		if not health.cut:
+			problems.append('there are no interface statistics, so it can\'t be checked')
+		return
+
+	if statistics.dropped:
+		problems.append(f'{statistics.dropped} phases were dropped by the analyzer')
+	if statistics.host_dropped:
+		problems.append(f'{statistics.host_dropped} phases were lost on the way to the host')
+	# The packets left out of a cut capture on purpose can't be told apart from ones that are missing
+	if not health.cut and statistics.delivered > health.captured:
+		problems.append(f'{statistics.delivered - health.captured} packets are missing from the capture')
+	if not health.cut and health.packets > health.captured:
+		problems.append(
+			f'{health.packets - health.captured} packets were captured after the last interface statistics, '
+			'so the capture may not have been finished'
+		)
+	if statistics.parity_errors:
+		problems.append(f'{statistics.parity_errors} parity errors were seen on the bus')
+
+def capture_health(capture: PcapngFile) -> list[InterfaceHealth]:
+	'''
+	Check the interface statistics of a capture against the packets in it.
+
+	Only the section header, interface description, and interface statistics blocks are read, the
+	packets are counted with the index of the capture. For sections cut out of a larger capture, the
+	packets in the capture are not checked against the statistics.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to check.
+
+	Returns
+	-------
+	list[InterfaceHealth]
+		The health of every interface in the capture, in capture order.
+
+	'''
+
+	index = capture.index
+	health: dict[tuple[int, int], InterfaceHealth] = {}
+	section = 0
+	interfaces = 0
+	cut = False
+
+	for number, (block_type, interface) in enumerate(zip(index.types, index.interfaces)):
+		if block_type == BlockType.ENHANCED_PACKET:
+			entry = health.get((section, interface))
+			if entry is None:
+				# Should never happen, but keep track of packets on interfaces that were never described
+				entry = health[(section, interface)] = InterfaceHealth(section, interface, 0)
+			entry.packets += 1
+		elif block_type == BlockType.INTERFACE_STATS:
+			interface, _, counters = decode_statistics(capture.block(number))
+			entry = health.get((section, interface))
+			if entry is not None:
+				entry.statistics = counters
+				entry.captured   = entry.packets
+		elif block_type == BlockType.INTERFACE:
+			link = int.from_bytes(capture.block(number).raw[block_header.size:block_header.size + 2], 'little')
+			health[(section, interfaces)] = InterfaceHealth(section, interfaces, link, cut = cut)
+			interfaces += 1
+		elif block_type == BlockType.SECTION_HEADER:
+			section   += number > 0
+			interfaces = 0
+			cut        = is_cut(capture.block(number))
+
+	for entry in health.values():
+		_check(entry)
+	return list(health.values())
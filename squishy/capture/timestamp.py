@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from datetime import datetime, timedelta, timezone
+from typing   import Any, Sequence
+
+__all__ = (
+	'DEFAULT_TICKS_PER_SECOND',
+	'tsresol_to_ticks',
+	'ticks_to_datetime',
+	'datetime_to_ticks',
+	'ticks_to_datetime64',
+)
+
+__doc__ = '''\
+
+This module contains the conversions between pcapng timestamps and dates.
+
+Timestamps in pcapng captures are a 64-bit count of ticks since the UNIX epoch, where the length
+of a tick is set per-interface by the ``if_tsresol`` option of the interface description block,
+and defaults to a microsecond. Timestamps are kept as the raw integer tick count, and only
+converted to a :py:class:`datetime.datetime`, or a :py:mod:`numpy` ``datetime64`` array for
+a batch of timestamps, when needed.
+
+All of the conversions use integer arithmetic, so no precision is lost to floating point.
+
+'''
+
+DEFAULT_TICKS_PER_SECOND = 1_000_000
+''' The number of ticks per second for interfaces without an ``if_tsresol`` option '''
+
+EPOCH = datetime(1970, 1, 1, tzinfo = timezone.utc)
+
+def tsresol_to_ticks(tsresol: int) -> int:
+	'''
+	Get the number of ticks per second for an ``if_tsresol`` option value.
+
+	Parameters
+	----------
+	tsresol : int
+		The option value, if the most significant bit is clear the remaining bits are a
+		negative power of ten, otherwise they are a negative power of two.
+
+	Returns
+	-------
+	int
+		The number of ticks per second.
+
+	'''
+
+	if tsresol & 0x80:
+		return 1 << (tsresol & 0x7F)
+	return 10 ** tsresol
+
+def ticks_to_datetime(ticks: int, ticks_per_second: int = DEFAULT_TICKS_PER_SECOND) -> datetime:
+	'''
+	Convert a raw timestamp to a date.
+
+	Parameters
+	----------
+	ticks : int
+		The raw timestamp.
+
+	ticks_per_second : int
+		The resolution of the timestamp.
+
+	Returns
+	-------
+	datetime.datetime
+		The UTC date, truncated to the nearest microsecond.
+
+	'''
+
+	seconds, remainder = divmod(ticks, ticks_per_second)
+	return EPOCH + timedelta(seconds = seconds, microseconds = remainder * 1_000_000 // ticks_per_second)
+
+def datetime_to_ticks(value: Any, ticks_per_second: int = DEFAULT_TICKS_PER_SECOND) -> int:
+	'''
+	Convert a date to a raw timestamp.
+
+	Parameters
+	----------
+	value : datetime.datetime | arrow.Arrow
+		The date, naive dates are assumed to be UTC.
+
+	ticks_per_second : int
+		The resolution of the timestamp.
+
+	Returns
+	-------
+	int
+		The raw timestamp.
+
+	'''
+
+	# Allow for `arrow.Arrow` and the like without importing them
+	value = getattr(value, 'datetime', value)
+	if value.tzinfo is None:
+		value = value.replace(tzinfo = timezone.utc)
+
+	delta = value - EPOCH
+	return (
+		(delta.days * 86400 + delta.seconds) * ticks_per_second +
+		delta.microseconds * ticks_per_second // 1_000_000
+	)
+
+def ticks_to_datetime64(ticks: Sequence[int], ticks_per_second: int | Sequence[int] = DEFAULT_TICKS_PER_SECOND):
+	'''
+	Convert a batch of raw timestamps to a :py:mod:`numpy` ``datetime64[ns]`` array.
+
+	Parameters
+	----------
+	ticks : Sequence[int]
+		The raw timestamps, e.g. :py:attr:`squishy.capture.pcapng.PcapngIndex.packet_timestamps`.
+
+	ticks_per_second : int | Sequence[int]
+		The resolution of all of the timestamps, or of each timestamp.
+
+	Returns
+	-------
+	numpy.ndarray
+		The timestamps as ``datetime64[ns]``.
+
+	Raises
+	------
+	ImportError
+		If :py:mod:`numpy` is not installed.
+
+	'''
+
+	try:
+		import numpy as np
+	except ImportError:
+		raise ImportError(
+			'Converting timestamps to datetime64 requires numpy, install it with `pip install squishy[numpy]`'
+		) from None
+
+	ticks = np.asarray(ticks, dtype = np.uint64)
+	rate  = np.asarray(ticks_per_second, dtype = np.uint64)
+
+	# Nanosecond timestamps are already in the right units
+	if rate.ndim == 0 and int(rate) == 1_000_000_000:
+		return ticks.astype(np.int64).view('datetime64[ns]')
+
+	seconds, remainder = np.divmod(ticks, rate)
+	# The remainder is always less than the rate, but scaling it to nanoseconds can overflow 64-bits for very
+	# fine resolutions, so only those are scaled in floating point
+	if int(rate.max(initial = 0)) <= (1 << 34):
+		nanoseconds = remainder * np.uint64(1_000_000_000) // rate
+	else:
+		nanoseconds = (remainder.astype(np.float64) * 1e9 / rate).astype(np.uint64)
+
+	return (seconds.astype(np.int64) * 1_000_000_000 + nanoseconds.astype(np.int64)).view('datetime64[ns]')
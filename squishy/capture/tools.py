@@ -0,0 +1,429 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import logging as log
+
+from bisect    import bisect_left, bisect_right
+from heapq     import merge
+from os        import PathLike
+from pathlib   import Path
+from struct    import Struct
+from typing    import BinaryIO, Iterable, Iterator
+
+from .pcapng   import BlockType, PcapngFile, block_header
+from .stats    import CUT_MARKER, OPT_CUSTOM_BINARY, cut_section_header, is_cut
+from .writer   import PcapngWriter
+
+__all__ = (
+	'copy_range',
+	'merge_captures',
+	'packet_ns',
+	'slice_capture',
+	'split_capture',
+)
+
+__doc__ = '''\
+
+This module contains the tools for cutting captures up and putting them back together.
+
+:py:func:`slice_capture` cuts a window out of a capture, :py:func:`split_capture` cuts a
+capture into parts, and :py:func:`merge_captures` interleaves captures from more than one
+analyzer on the same bus by time.
+
+None of them parse the blocks they copy. Slices and parts are a run of whole blocks from the
+capture, found with its :py:class:`squishy.capture.pcapng.PcapngIndex`, which is copied
+with :py:meth:`squishy.capture.writer.PcapngWriter.copy_from` so the kernel can copy
+it without it ever being read in, other than any section headers in it, which are rewritten
+with :py:func:`squishy.capture.stats.cut_section_header`. Each one starts with the section header and interface
+descriptions it needs so it can be read on its own, even if it has no packets. Merged captures have to be written a block
+at a time, but only the interface ID of each packet is rewritten, the rest of the block is
+written straight from the memory-mapped capture.
+
+'''
+
+# InterfaceID, Timestamp (High), Timestamp (Low), shared by enhanced packet and interface statistics blocks
+_interface_header = Struct('<III')
+
+def packet_ns(capture: PcapngFile, number: int) -> int:
+	'''
+	Get the time a packet was captured.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture.
+
+	number : int
+		The number of the packet in the capture.
+
+	Returns
+	-------
+	int
+		The time the packet was captured, in nanoseconds since the UNIX epoch.
+
+	'''
+
+	index = capture.index
+	return index.packet_timestamps[number] * 1_000_000_000 // capture.packet_ticks_per_second(number)
+
+def _first_packet_at(capture: PcapngFile, timestamp: int) -> int:
+	''' The number of the first packet at or after a time, or the number of packets if there isn't one '''
+
+	packet = capture.first_packet_after(timestamp)
+	return capture.packet_count if packet is None else packet
+
+def copy_range(capture: PcapngFile, writer: PcapngWriter, start: int, end: int) -> None:
+	'''
+	Copy a run of whole blocks from a capture as they are.
+
+	Uncompressed captures are copied with :py:meth:`PcapngWriter.copy_from`, compressed ones are
+	decompressed and written a block at a time. The only blocks that are changed are section
+	headers, which are rewritten with :py:func:`squishy.capture.stats.cut_section_header`, as the
+	section is being cut up.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to copy from.
+
+	writer : PcapngWriter
+		The writer to copy to.
+
+	start : int
+		The offset of the first block.
+
+	end : int
+		The offset of the first block not to copy.
+
+	'''
+
+	if end <= start:
+		return
+
+	if capture._map is None:
+		for block in capture.blocks(start, end):
+			writer.write_block(cut_section_header(block.raw) if block.type == BlockType.SECTION_HEADER else block.raw)
+		return
+
+	index    = capture.index
+	offsets  = index.offsets
+	sections = capture._interface_table()[0]
+	fileno   = capture._data.fileno()
+
+	# Copy around the section headers in the run so they can be rewritten
+	first = bisect_left(sections, bisect_left(offsets, start))
+	last  = bisect_left(sections, bisect_left(offsets, end))
+	for section in sections[first:last]:
+		if index.types[section] != BlockType.SECTION_HEADER:
+			continue
+
+		offset = offsets[section]
+		if offset > start:
+			writer.copy_from(fileno, capture.offset + start, offset - start)
+		writer.write_block(cut_section_header(capture.block(section).raw))
+		start = _block_offset(capture, section + 1)
+
+	if end > start:
+		writer.copy_from(fileno, capture.offset + start, end - start)
+
+def _block_offset(capture: PcapngFile, block: int) -> int:
+	index = capture.index
+	return index.offsets[block] if block < len(index) else capture.size
+
+def _write_blocks(capture: PcapngFile, writer: PcapngWriter, first: int, last: int) -> None:
+	'''
+	Write a run of blocks, starting with the blocks from earlier in its section needed to read it on its own.
+
+	An empty run is still written as the section it is in without any of its packets, or the last
+	section if it is at the end of the capture, so that it can be read as a capture with no packets.
+
+	'''
+
+	types = capture.index.types
+	if len(types) > 0:
+		sections, table = capture._interface_table()
+		section = bisect_right(sections, min(first, len(types) - 1)) - 1
+
+		if section >= 0:
+			number = sections[section]
+			if types[number] == BlockType.SECTION_HEADER:
+				writer.write_block(cut_section_header(capture.block(number).raw))
+				number += 1
+
+			# The interfaces and metadata at the start of the section, then any interfaces described later on
+			while number < first and types[number] != BlockType.ENHANCED_PACKET:
+				if types[number] in (BlockType.INTERFACE, BlockType.CUSTOM):
+					writer.write_block(capture.block(number).raw)
+				number += 1
+
+			for interface, _, _ in table[section]:
+				if number <= interface < first:
+					writer.write_block(capture.block(interface).raw)
+
+		if first < len(types) and types[first] == BlockType.SECTION_HEADER:
+			first += 1
+
+	copy_range(capture, writer, _block_offset(capture, first), _block_offset(capture, last))
+
+def _packet_block(capture: PcapngFile, packet: int) -> int:
+	''' The block to cut a capture at so it starts with a packet, the end of the capture after the last packet '''
+
+	packets = capture.index.packets
+	return packets[packet] if packet < len(packets) else len(capture.index)
+
+def slice_capture(
+	capture: PcapngFile, output: str | PathLike | BinaryIO, *, start: int | None = None, end: int | None = None,
+	compression: str | None = None
+) -> int:
+	'''
+	Write the packets captured in a window of time to a new capture.
+
+	The slice is the run of blocks from the first packet at or after the start to the first packet
+	at or after the end, so any other blocks between the packets are kept too.
+
+	If the packets in the capture are not in time order, the packets are picked out one at a time
+	with a filter instead.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to slice.
+
+	output : str | PathLike | BinaryIO
+		The path or stream to write the slice to.
+
+	start : int | None
+		The start of the window in nanoseconds since the UNIX epoch, by default the start of the capture.
+
+	end : int | None
+		The end of the window in nanoseconds since the UNIX epoch, packets at the end are not
+		included, by default the end of the capture.
+
+	compression : str | None
+		Compress the slice, see :py:class:`squishy.capture.writer.PcapngWriter`.
+
+	Returns
+	-------
+	int
+		The number of packets in the slice.
+
+	'''
+
+	if not capture.ordered:
+		from .filter import filter_capture
+
+		log.debug('Capture is not in time order, slicing it with a filter')
+		terms = []
+		if start is not None:
+			terms.append(f'timestamp >= {start}')
+		if end is not None:
+			terms.append(f'timestamp < {end}')
+		return filter_capture(capture, output, ' && '.join(terms) or 'packet >= 0', compression = compression)
+
+	first = 0 if start is None else _first_packet_at(capture, start)
+	last  = capture.packet_count if end is None else max(_first_packet_at(capture, end), first)
+
+	with PcapngWriter(output, compression = compression) as writer:
+		_write_blocks(capture, writer, 0 if first == 0 else _packet_block(capture, first), _packet_block(capture, last))
+	return last - first
+
+def split_capture(
+	capture: PcapngFile, output: str | PathLike, *, packets: int | None = None, size: int | None = None,
+	duration: int | None = None, compression: str | None = None
+) -> list[Path]:
+	'''
+	Split a capture into parts.
+
+	Exactly one of ``packets``, ``size``, or ``duration`` must be given. Every block of the capture
+	ends up in one of the parts, and each part starts with the section header and interface
+	descriptions it needs to be read on its own.
+
+	Parameters
+	----------
+	capture : PcapngFile
+		The capture to split.
+
+	output : str | PathLike
+		The name of the parts, each part is named after it with its number added to the end of the
+		stem, so ``part.pcapng`` is split into ``part-000.pcapng``, ``part-001.pcapng``, and so on.
+
+	packets : int | None
+		The number of packets in each part.
+
+	size : int | None
+		The most bytes of the capture to put in each part, not counting the section header and
+		interface descriptions copied into the start of it. A part is only larger if it holds a
+		single packet that is.
+
+	duration : int | None
+		How much time each part covers, in nanoseconds, from the first packet in the capture.
+
+	compression : str | None
+		Compress the parts, see :py:class:`squishy.capture.writer.PcapngWriter`.
+
+	Returns
+	-------
+	list[Path]
+		The parts that were written.
+
+	Raises
+	------
+	ValueError
+		If not exactly one way to split the capture is given, or it is split by time and the
+		packets are not in time order.
+
+	'''
+
+	if sum(value is not None for value in (packets, size, duration)) != 1:
+		raise ValueError('Exactly one of the number of packets, size, or duration of each part must be given')
+	if any(value is not None and value <= 0 for value in (packets, size, duration)):
+		raise ValueError('The number of packets, size, or duration of each part must be more than 0')
+
+	index = capture.index
+	count = capture.packet_count
+
+	# The first packet of each part after the first
+	if packets is not None:
+		starts = list(range(packets, count, packets))
+	elif size is not None:
+		starts = []
+		start  = 0
+		while capture.size - start > size:
+			# Cut at the last packet that keeps the part under the size, unless it is the only one in it
+			packet = bisect_right(range(count), start + size, key = lambda packet: index.offsets[index.packets[packet]])
+			packet = max(packet - 1, starts[-1] + 1 if starts else 1)
+			if packet >= count:
+				break
+			starts.append(packet)
+			start = index.offsets[index.packets[packet]]
+	else:
+		if not capture.ordered:
+			raise ValueError('Unable to split a capture by time when its packets are not in time order')
+
+		starts = []
+		if count > 0:
+			first  = packet_ns(capture, 0)
+			window = 1
+			while True:
+				packet = _first_packet_at(capture, first + duration * window)
+				if packet >= count:
+					break
+				starts.append(packet)
+				# Skip over any windows without packets rather than writing empty parts
+				window = (packet_ns(capture, packet) - first) // duration + 1
+
+	output = Path(output)
+	stem, dot, suffix = output.name.partition('.')
+	width = max(len(str(len(starts))), 3)
+
+	blocks = [ 0 ] + [ _packet_block(capture, packet) for packet in starts ] + [ len(index) ]
+	parts  = []
+	for part, (first, last) in enumerate(zip(blocks, blocks[1:])):
+		path = output.with_name(f'{stem}-{part:0{width}}{dot}{suffix}')
+		with PcapngWriter(path, compression = compression) as writer:
+			_write_blocks(capture, writer, first, last)
+		parts.append(path)
+
+	return parts
+
+def _merge_source(
+	source: int, capture: PcapngFile, mapping: dict[tuple[int, int], int]
+) -> Iterator[tuple[int, int, int, memoryview, int]]:
+	''' Iterate over the packets and statistics of a capture being merged, with their new interface IDs '''
+
+	section = 0
+	rates: list[int] = []
+	number  = 0
+
+	for block in capture.blocks():
+		block_type = block.type
+		if block_type == BlockType.SECTION_HEADER:
+			section += block.offset > 0
+			rates = []
+			continue
+		elif block_type == BlockType.INTERFACE:
+			rates.append(block.ticks_per_second)
+			continue
+		elif block_type not in (BlockType.ENHANCED_PACKET, BlockType.INTERFACE_STATS):
+			continue
+
+		raw = block.raw
+		interface, high, low = _interface_header.unpack_from(raw, block_header.size)
+		if interface >= len(rates):
+			raise ValueError(f'Block at offset {block.offset} refers to interface {interface} which has not been described')
+
+		yield (((high << 32) | low) * 1_000_000_000 // rates[interface], source, number, raw, mapping[(section, interface)])
+		number += 1
+
+def merge_captures(
+	captures: Iterable[PcapngFile], output: str | PathLike | BinaryIO, *, compression: str | None = None
+) -> int:
+	'''
+	Merge captures into one, with the packets in time order.
+
+	The merged capture has a single section, holding the interface descriptions of every capture
+	one after the other, and the interface IDs of the packets and interface statistics are
+	rewritten to match. Any custom blocks that may be copied are kept, after the interface descriptions.
+	Packets at the same time stay in the order of the captures they came from.
+
+	Each capture should be in time order, as the captures are merged as they are read.
+
+	Parameters
+	----------
+	captures : Iterable[PcapngFile]
+		The captures to merge.
+
+	output : str | PathLike | BinaryIO
+		The path or stream to write the merged capture to.
+
+	compression : str | None
+		Compress the merged capture, see :py:class:`squishy.capture.writer.PcapngWriter`.
+
+	Returns
+	-------
+	int
+		The number of packets in the merged capture.
+
+	Raises
+	------
+	ValueError
+		If a packet refers to an interface that has not been described.
+
+	'''
+
+	captures = list(captures)
+
+	# If any of the captures were cut out of a larger one, then so was the merged capture
+	cut = any(
+		is_cut(capture.block(number))
+		for capture in captures for number, block_type in enumerate(capture.index.types)
+		if block_type == BlockType.SECTION_HEADER
+	)
+
+	with PcapngWriter(output, compression = compression) as writer:
+		writer.write_section_header([ (OPT_CUSTOM_BINARY, CUT_MARKER) ] if cut else None)
+
+		# Give every interface of every section of every capture its own interface ID
+		mappings: list[dict[tuple[int, int], int]] = []
+		interfaces = 0
+		for capture in captures:
+			mapping: dict[tuple[int, int], int] = {}
+			section   = 0
+			interface = 0
+			for number, block_type in enumerate(capture.index.types):
+				if block_type == BlockType.SECTION_HEADER:
+					section  += number > 0
+					interface = 0
+				elif block_type == BlockType.INTERFACE:
+					writer.write_block(capture.block(number).raw)
+					mapping[(section, interface)] = interfaces
+					interface  += 1
+					interfaces += 1
+				elif block_type == BlockType.CUSTOM:
+					writer.write_block(capture.block(number).raw)
+			mappings.append(mapping)
+
+		for _, _, _, raw, interface in merge(*(
+			_merge_source(source, capture, mapping) for source, (capture, mapping) in enumerate(zip(captures, mappings))
+		)):
+			writer.write_block(raw, interface = interface)
+
+		return writer.packets
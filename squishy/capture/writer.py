@@ -0,0 +1,576 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import errno
+import os
+
+from os        import PathLike
+from pathlib   import Path
+from struct    import Struct
+from typing    import BinaryIO, Iterable
+
+from .compress import CompressedWriter, compression_for_path
+from .pcapng   import (
+	BLOCK_OVERHEAD, BlockType, PcapngBlock, block_header, block_pen, block_trailer, link_type, packet_header, squishy_meta
+)
+from .stats    import CaptureCounters, encode_statistics
+
+__all__ = (
+	'PcapngWriter',
+	'encode_options',
+)
+
+__doc__ = '''\
+
+This module contains a writer for pcapng captures that is fast enough to keep up with a live capture.
+
+Rather than building each block with :py:mod:`construct`, the block headers are packed with pre-compiled
+:py:class:`struct.Struct` objects, the padding is worked out arithmetically, and the packet data is never
+copied. The blocks are queued up as a list of buffers and written out with a single :py:func:`os.writev`
+call once enough data has been queued.
+
+.. code-block:: python
+
+	from squishy.capture.writer import PcapngWriter
+
+	with PcapngWriter('capture.pcapng') as writer:
+		writer.write_section_header()
+		interface = writer.write_interface(0x0093)
+
+		for timestamp, data in packets:
+			writer.write_packet(interface, timestamp, data)
+
+'''
+
+# Type, Length1, BOM, Major, Minor, Section Length
+_section_header  = Struct('<IIIHHq')
+# Type, Length1, LinkType, Reserved, SnapLen
+_interface       = Struct('<IIHHI')
+# Type, Length1, InterfaceID, Timestamp (High), Timestamp (Low), CapturedLen, ActualLen
+_enhanced_packet = Struct('<IIIIIII')
+# Type, Length1, PEN
+_custom          = Struct('<III')
+# Code, Length
+_option          = Struct('<HH')
+# InterfaceID
+_interface_id    = Struct('<I')
+
+_PADDING = (b'', b'\x00\x00\x00', b'\x00\x00', b'\x00')
+''' The padding to add to a value of a given length modulo 4 to align it to 32-bits '''
+
+_END_OF_OPTIONS = _option.pack(0, 0)
+
+# Don't exceed the smallest IOV_MAX in the wild
+_IOV_MAX = min(getattr(os, 'IOV_MAX', 1024), 1024)
+
+def _copy_file_range(src: int, dst: int, offset: int, count: int) -> int:
+	return os.copy_file_range(src, dst, count, offset)
+
+def _sendfile(src: int, dst: int, offset: int, count: int) -> int:
+	return os.sendfile(dst, src, offset, count)
+
+_KERNEL_COPIES = tuple(
+	copy for copy, name in ((_copy_file_range, 'copy_file_range'), (_sendfile, 'sendfile')) if hasattr(os, name)
+)
+
+# The errors that mean a way of copying isn't supported for these files, rather than it failing
+_UNSUPPORTED = frozenset(
+	getattr(errno, name) for name in ('EXDEV', 'EINVAL', 'ENOSYS', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF') if hasattr(errno, name)
+)
+
+def _kernel_copy(src: int, dst: int, offset: int, length: int) -> int:
+	''' Copy as much as possible between two files in the kernel, returning how much was copied '''
+
+	copied = 0
+	for copy in _KERNEL_COPIES:
+		try:
+			while copied < length:
+				count = copy(src, dst, offset + copied, min(length - copied, 0x7FFFF000))
+				if count == 0:
+					break
+				copied += count
+		except OSError as e:
+			if e.errno not in _UNSUPPORTED:
+				raise
+			continue
+		break
+	return copied
+
+def encode_options(options: Iterable[tuple[int, bytes | str]] | None) -> bytes:
+	'''
+	Encode a set of block options.
+
+	Parameters
+	----------
+	options : Iterable[tuple[int, bytes | str]] | None
+		The option code and value of each option, strings are encoded as UTF-8.
+
+	Returns
+	-------
+	bytes
+		The encoded options, including the ``opt_endofopt`` option if there are any options.
+
+	'''
+
+	if not options:
+		return b''
+
+	encoded = bytearray()
+	for code, value in options:
+		if isinstance(value, str):
+			value = value.encode('utf-8')
+		encoded += _option.pack(code, len(value))
+		encoded += value
+		encoded += _PADDING[len(value) & 3]
+
+	encoded += _END_OF_OPTIONS
+	return bytes(encoded)
+
+class PcapngWriter:
+	'''
+	A buffered pcapng writer.
+
+	Parameters
+	----------
+	stream : str | PathLike | BinaryIO
+		The path to write the capture to, or a stream to write it to.
+
+	buffer_size : int
+		The number of bytes to queue up before writing them out.
+
+	compression : str | None
+		Compress the capture with :py:class:`squishy.capture.compress.CompressedWriter`, one of
+		``'zstd'`` or ``'xz'``. By default paths ending in ``.zst`` or ``.xz`` are compressed.
+
+	statistics_interval : float | None
+		Keep count of the packets written on each interface, and write an interface statistics block for
+		an interface once this many seconds of it have been captured since the last one, along with a final
+		one for every interface at the end of each section. By default no statistics are kept.
+
+	Attributes
+	----------
+	packets : int
+		The number of packets written.
+
+	bytes_written : int
+		The number of bytes written, including any that are still queued.
+
+	statistics : list[CaptureCounters]
+		The counters for each interface in the current section, if ``statistics_interval`` is set. The
+		packets written are counted automatically, the counters only known to the analyzer, such as
+		:py:attr:`CaptureCounters.dropped`, should be updated by whatever is reading from it.
+
+	'''
+
+	def __init__(
+		self, stream: str | PathLike | BinaryIO, *, buffer_size: int = 1024 * 1024, compression: str | None = None,
+		statistics_interval: float | None = None
+	) -> None:
+		if isinstance(stream, (str, PathLike)):
+			if compression is None:
+				compression = compression_for_path(stream)
+			if compression is None:
+				self._stream = Path(stream).open('wb', buffering = 0)
+			else:
+				self._stream = CompressedWriter(stream, compression)
+			self._owned  = True
+		elif compression is not None:
+			# The compressed writer has to be closed to finish the capture, but leaves the stream open
+			self._stream = CompressedWriter(stream, compression)
+			self._owned  = True
+		else:
+			self._stream = stream
+			self._owned  = False
+
+		try:
+			self._fd = self._stream.fileno()
+		except (AttributeError, OSError):
+			self._fd = None
+
+		self.buffer_size   = buffer_size
+		self.packets       = 0
+		self.bytes_written = 0
+
+		self._queue: list[bytes | memoryview] = []
+		self._queued     = 0
+		self._interfaces = 0
+
+		self.statistics: list[CaptureCounters] = []
+		self._statistics_interval = statistics_interval
+		# The timestamp the next statistics are due at, and the statistics interval in ticks, of each interface
+		self._statistics_due: list[int | None] = []
+		self._statistics_ticks: list[int] = []
+
+	def _append(self, *parts: bytes | memoryview, length: int) -> None:
+		self._queue.extend(parts)
+		self._queued       += length
+		self.bytes_written += length
+		if self._queued >= self.buffer_size:
+			self.flush()
+
+	def write_section_header(self, options: Iterable[tuple[int, bytes | str]] | None = None) -> None:
+		'''
+		Write a section header block.
+
+		Parameters
+		----------
+		options : Iterable[tuple[int, bytes | str]] | None
+			The options for the block, e.g. ``(0x0004, 'squishy')`` for ``shb_userappl``.
+
+		'''
+
+		encoded = encode_options(options)
+		length  = _section_header.size + len(encoded) + block_trailer.size
+
+		self._write_final_statistics()
+		self._interfaces = 0
+		self._append(
+			_section_header.pack(BlockType.SECTION_HEADER, length, 0x1A2B3C4D, 1, 0, -1),
+			encoded, block_trailer.pack(length), length = length
+		)
+
+	def write_interface(
+		self, link: int | str, snap_len: int = 0, options: Iterable[tuple[int, bytes | str]] | None = None
+	) -> int:
+		'''
+		Write an interface description block.
+
+		Parameters
+		----------
+		link : int | str
+			The link type, either the raw value or a name from :py:data:`squishy.capture.pcapng.link_type`.
+
+		snap_len : int
+			The maximum number of bytes captured from each packet, ``0`` for no limit.
+
+		options : Iterable[tuple[int, bytes | str]] | None
+			The options for the block, e.g. ``(0x0009, b'\\x09')`` for a nanosecond ``if_tsresol``.
+
+		Returns
+		-------
+		int
+			The interface ID to use for packets on this interface.
+
+		'''
+
+		if isinstance(link, str):
+			link = link_type.encmapping[link]
+
+		encoded = encode_options(options)
+		length  = _interface.size + len(encoded) + block_trailer.size
+
+		# Written as a whole block so the interface is kept track of the same way as copied ones
+		self.write_block(_interface.pack(BlockType.INTERFACE, length, link, 0, snap_len) + encoded + block_trailer.pack(length))
+		return self._interfaces - 1
+
+	def write_meta(self, meta: dict, *, copy: bool = True) -> None:
+		'''
+		Write a Squishy metadata custom block.
+
+		Parameters
+		----------
+		meta : dict
+			The metadata to build with :py:data:`squishy.capture.pcapng.squishy_meta`.
+
+		copy : bool
+			If the block may be copied into new captures by other tools.
+
+		'''
+
+		data    = squishy_meta.build(meta)
+		padding = _PADDING[len(data) & 3]
+		length  = _custom.size + len(data) + len(padding) + block_trailer.size
+
+		self._append(
+			_custom.pack(BlockType.CUSTOM if copy else BlockType.CUSTOM_NO_COPY, length, block_pen),
+			data, padding, block_trailer.pack(length), length = length
+		)
+
+	def write_packet(
+		self, interface: int, timestamp: int, data: bytes | bytearray | memoryview,
+		actual_len: int | None = None, options: bytes = b''
+	) -> None:
+		'''
+		Write an enhanced packet block.
+
+		The packet data is not copied, so it must not be modified until the writer has been flushed.
+
+		Parameters
+		----------
+		interface : int
+			The interface ID the packet was captured on.
+
+		timestamp : int
+			The raw timestamp, in the units of the ``if_tsresol`` of the interface.
+
+		data : bytes | bytearray | memoryview
+			The captured packet data.
+
+		actual_len : int | None
+			The original length of the packet, by default the length of the captured data.
+
+		options : bytes
+			The pre-encoded options for the block, see :py:func:`encode_options`.
+
+		'''
+
+		captured = len(data)
+		padding  = _PADDING[captured & 3]
+		length   = _enhanced_packet.size + captured + len(padding) + len(options) + block_trailer.size
+
+		self._queue += (
+			_enhanced_packet.pack(
+				BlockType.ENHANCED_PACKET, length, interface, timestamp >> 32, timestamp & 0xFFFFFFFF,
+				captured, captured if actual_len is None else actual_len
+			),
+			data, padding, options, block_trailer.pack(length)
+		)
+		self._queued       += length
+		self.bytes_written += length
+		self.packets       += 1
+
+		if self._statistics_interval is not None:
+			self._count_packet(interface, timestamp)
+
+		if self._queued >= self.buffer_size:
+			self.flush()
+
+	def _count_packet(self, interface: int, timestamp: int) -> None:
+		counters = self.statistics[interface]
+		counters.delivered += 1
+		counters.end = timestamp
+
+		due = self._statistics_due[interface]
+		if due is None:
+			counters.start = timestamp
+			self._statistics_due[interface] = timestamp + self._statistics_ticks[interface]
+		elif timestamp >= due:
+			self.write_statistics(interface, timestamp)
+			self._statistics_due[interface] = timestamp + self._statistics_ticks[interface]
+
+	def write_statistics(self, interface: int, timestamp: int | None = None) -> None:
+		'''
+		Write an interface statistics block with the current :py:attr:`statistics` of an interface.
+
+		Parameters
+		----------
+		interface : int
+			The interface ID.
+
+		timestamp : int | None
+			The raw timestamp of the statistics, by default the timestamp of the last packet on the interface.
+
+		Raises
+		------
+		ValueError
+			If the writer is not keeping statistics.
+
+		'''
+
+		if self._statistics_interval is None:
+			raise ValueError('Statistics are only kept when the writer has a statistics interval')
+
+		counters = self.statistics[interface]
+		if timestamp is None:
+			timestamp = counters.end or 0
+
+		block = encode_statistics(interface, timestamp, counters)
+		self._append(block, length = len(block))
+
+	def _write_final_statistics(self) -> None:
+		''' Write the statistics of every interface in the section, as it is about to end '''
+
+		if self._statistics_interval is None:
+			return
+
+		for interface in range(len(self.statistics)):
+			self.write_statistics(interface)
+
+		self.statistics = []
+		self._statistics_due   = []
+		self._statistics_ticks = []
+
+	def _add_interface(self, raw: bytes | memoryview) -> None:
+		''' Start keeping track of an interface described by an interface description block '''
+
+		self._interfaces += 1
+		if self._statistics_interval is None:
+			return
+
+		rate = PcapngBlock(0, BlockType.INTERFACE, raw).ticks_per_second
+		self.statistics.append(CaptureCounters())
+		self._statistics_due.append(None)
+		self._statistics_ticks.append(max(int(self._statistics_interval * rate), 1))
+
+	def write_block(self, raw: bytes | memoryview, *, interface: int | None = None) -> None:
+		'''
+		Write a whole block as it is, such as one read from another capture.
+
+		The block is not copied, so it must not be modified until the writer has been flushed.
+		Section headers, interface descriptions, and packets are kept track of the same as if
+		they had been written with :py:meth:`write_section_header`, :py:meth:`write_interface`,
+		and :py:meth:`write_packet`, so any statistics being kept still line up with them.
+
+		Parameters
+		----------
+		raw : bytes | memoryview
+			The whole block, from the Type field up to and including the Length2 field.
+
+		interface : int | None
+			Replace the interface ID of an enhanced packet or interface statistics block, such
+			as when merging captures. Only the interface ID is rewritten, the rest of the block
+			is still not copied.
+
+		Raises
+		------
+		ValueError
+			If the block is truncated, or the interface ID is given for a block that doesn't have one.
+
+		'''
+
+		length = len(raw)
+		if length < BLOCK_OVERHEAD or length % 4 != 0:
+			raise ValueError(f'Block of {length} bytes is not a valid pcapng block')
+
+		block_type = int.from_bytes(raw[:4], 'little')
+		if interface is not None and (
+			block_type not in (BlockType.ENHANCED_PACKET, BlockType.INTERFACE_STATS) or length < BLOCK_OVERHEAD + 4
+		):
+			raise ValueError(f'Block of type 0x{block_type:08X} has no interface ID to replace')
+		if block_type == BlockType.ENHANCED_PACKET and length < block_header.size + packet_header.size + block_trailer.size:
+			raise ValueError(f'Enhanced packet block of {length} bytes is too short for its header')
+
+		if block_type == BlockType.SECTION_HEADER:
+			self._write_final_statistics()
+			self._interfaces = 0
+		elif block_type == BlockType.INTERFACE:
+			self._add_interface(raw)
+
+		if interface is None:
+			self._append(raw, length = length)
+		else:
+			view = memoryview(raw)
+			self._append(view[:8], _interface_id.pack(interface), view[12:], length = length)
+
+		if block_type == BlockType.ENHANCED_PACKET:
+			self.packets += 1
+			if self._statistics_interval is not None:
+				packet_interface, high, low, _, _ = packet_header.unpack_from(raw, block_header.size)
+				self._count_packet(packet_interface if interface is None else interface, (high << 32) | low)
+
+	def copy_from(self, fd: int, offset: int, length: int) -> None:
+		'''
+		Copy whole blocks from another file as they are.
+
+		The blocks are copied by the kernel with :py:func:`os.copy_file_range`, or :py:func:`os.sendfile`
+		if the files are on different filesystems, so they never have to be read in. When the capture
+		is being compressed or written to a stream that isn't a file, they are read in and written
+		out in chunks instead.
+
+		The blocks are not counted in :py:attr:`packets`, unless the writer is keeping statistics,
+		as then they have to be read in and written with :py:meth:`write_block` to count the packets
+		in them.
+
+		Parameters
+		----------
+		fd : int
+			The file descriptor of the file to copy from, it is not read from its current position.
+
+		offset : int
+			The offset in the file of the first block.
+
+		length : int
+			The number of bytes to copy, which should end on a block boundary.
+
+		'''
+
+		if self._statistics_interval is not None:
+			self._write_blocks_from(fd, offset, length)
+			return
+
+		self.flush()
+		self.bytes_written += length
+
+		if self._fd is not None:
+			flush = getattr(self._stream, 'flush', None)
+			if flush is not None:
+				flush()
+
+			copied  = _kernel_copy(fd, self._fd, offset, length)
+			offset += copied
+			length -= copied
+
+		while length > 0:
+			chunk = os.pread(fd, min(length, self.buffer_size), offset)
+			if not chunk:
+				raise ValueError(f'Unexpected end of file copying {length} bytes at offset {offset}')
+			self._stream.write(chunk)
+			offset += len(chunk)
+			length -= len(chunk)
+
+	def _write_blocks_from(self, fd: int, offset: int, length: int) -> None:
+		''' Read whole blocks in from another file and write them a block at a time '''
+
+		end     = offset + length
+		pending = b''
+		while offset < end:
+			chunk = os.pread(fd, min(end - offset, self.buffer_size), offset)
+			if not chunk:
+				raise ValueError(f'Unexpected end of file copying {end - offset} bytes at offset {offset}')
+			offset += len(chunk)
+
+			data  = memoryview(pending + chunk)
+			start = 0
+			while len(data) - start >= block_header.size:
+				size = block_header.unpack_from(data, start)[1]
+				if len(data) - start < size:
+					break
+				self.write_block(data[start:start + size])
+				start += size
+			pending = bytes(data[start:])
+
+		if pending:
+			raise ValueError(f'Copied {length} bytes which do not end on a block boundary')
+
+	def flush(self) -> None:
+		''' Write out all of the queued blocks '''
+
+		queue = self._queue
+		if not queue:
+			return
+
+		self._queue  = []
+		self._queued = 0
+
+		if self._fd is None:
+			self._stream.write(b''.join(queue))
+			return
+
+		# Make sure anything already buffered by the stream is written before us
+		flush = getattr(self._stream, 'flush', None)
+		if flush is not None:
+			flush()
+
+		for start in range(0, len(queue), _IOV_MAX):
+			parts   = queue[start:start + _IOV_MAX]
+			total   = sum(len(part) for part in parts)
+			written = os.writev(self._fd, parts)
+
+			# Short writes are rare, so just fall back to writing the remainder in one go
+			if written < total:
+				remaining = memoryview(b''.join(parts))[written:]
+				while len(remaining) > 0:
+					remaining = remaining[os.write(self._fd, remaining):]
+
+	def close(self) -> None:
+		''' Write the final statistics, flush the writer, and close the stream if it was opened by the writer '''
+
+		self._write_final_statistics()
+		self.flush()
+		if self._owned:
+			self._stream.close()
+
+	def __enter__(self) -> 'PcapngWriter':
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		self.close()
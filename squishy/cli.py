@@ -1,19 +1,35 @@
 # SPDX-License-Identifier: BSD-3-Clause
 import logging          as log
 from argparse           import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from functools          import partial
 
 from rich               import traceback
 from rich.logging       import RichHandler
 
 from .                  import config
-from .actions.applet    import Applet as ActionApplet
-from .actions.cache     import Cache  as ActionCache
-from .actions.provision import Provision as ActionProvision
+from .actions           import SquishyAction, SquishyLazySubparsers
+from .core.collect      import load_member
 
 __all__ = (
 	'main',
+	'build_parser',
 )
 
+ACTIONS = (
+	{ 'name': 'applet',    'module': 'squishy.actions.applet',    'class': 'Applet',    'short_help': 'Squishy applet subsystem'        },
+	{ 'name': 'cache',     'module': 'squishy.actions.cache',     'class': 'Cache',     'short_help': 'Manage the Squishy cache'        },
+	{ 'name': 'provision', 'module': 'squishy.actions.provision', 'class': 'Provision', 'short_help': 'Squishy first-time provisioning' },
+	{ 'name': 'daemon',    'module': 'squishy.actions.daemon',    'class': 'Daemon',    'short_help': 'Run the Squishy daemon'          },
+	{ 'name': 'analyzer',  'module': 'squishy.actions.analyzer',  'class': 'Analyzer',  'short_help': 'Work with analyzer captures'     },
+)
+'''
+The manifest of the built-in actions.
+
+Only the module for the action that is actually invoked is imported, so the ``short_help``
+here must be kept in sync with that of the action itself.
+
+'''
+
 def setup_logging(args: Namespace = None) -> None:
 	'''
 	Initialize logging subscriber
@@ -71,6 +87,62 @@ def init_dirs() -> None:
 			d.mkdir(parents = True, exist_ok = True)
 
 
+def build_parser() -> tuple[ArgumentParser, dict[str, SquishyAction]]:
+	'''
+	Build the Squishy CLI argument parser.
+
+	The actions in :py:data:`ACTIONS` are registered lazily, so the returned dictionary of
+	actions is only populated with the action that was selected once the arguments are parsed.
+
+	Returns
+	-------
+	tuple[argparse.ArgumentParser, dict[str, squishy.actions.SquishyAction]]
+		The argument parser, and the action instances by name.
+
+	'''
+
+	parser = ArgumentParser(
+		formatter_class = ArgumentDefaultsHelpFormatter,
+		description     = 'Squishy SCSI Multitool',
+		prog            = 'squishy'
+	)
+
+	parser.add_argument(
+		'--device', '-d',
+		type = str,
+		help = 'The serial number of the squishy to use if more than one is attached'
+	)
+
+	core_options = parser.add_argument_group('Core configuration options')
+
+	core_options.add_argument(
+		'--verbose', '-v',
+		action = 'store_true',
+		help   = 'Enable verbose output during synth and pnr'
+	)
+
+	action_parser = parser.add_subparsers(
+		dest     = 'action',
+		required = True,
+		action   = SquishyLazySubparsers
+	)
+
+	actions: dict[str, SquishyAction] = {}
+
+	def load_action(act: dict[str, str], p: ArgumentParser) -> None:
+		action = load_member(act)()
+		action.register_args(p)
+		actions[act['name']] = action
+
+	for act in ACTIONS:
+		action_parser.add_lazy_parser(
+			act['name'],
+			partial(load_action, act),
+			help = act['short_help'],
+		)
+
+	return (parser, actions)
+
 def main() -> int:
 	'''
 	Squishy CLI/REPL Runner
@@ -90,52 +162,12 @@ def main() -> int:
 		init_dirs()
 		setup_logging()
 
-		ACTIONS = (
-			{ 'name': 'applet',    'instance': ActionApplet()    },
-			{ 'name': 'cache',     'instance': ActionCache()     },
-			{ 'name': 'provision', 'instance': ActionProvision() }
-		)
-
-		parser = ArgumentParser(
-			formatter_class = ArgumentDefaultsHelpFormatter,
-			description     = 'Squishy SCSI Multitool',
-			prog            = 'squishy'
-		)
-
-		parser.add_argument(
-			'--device', '-d',
-			type = str,
-			help = 'The serial number of the squishy to use if more than one is attached'
-		)
-
-		core_options = parser.add_argument_group('Core configuration options')
-
-		core_options.add_argument(
-			'--verbose', '-v',
-			action = 'store_true',
-			help   = 'Enable verbose output during synth and pnr'
-		)
-
-		action_parser = parser.add_subparsers(
-			dest = 'action',
-			required = True
-		)
-
-		if len(ACTIONS) > 0:
-			for act in ACTIONS:
-				action = act['instance']
-				p = action_parser.add_parser(
-						act['name'],
-						help = action.short_help,
-					)
-				action.register_args(p)
-
+		parser, actions = build_parser()
 		args = parser.parse_args()
 
 		setup_logging(args)
 
-		act = list(filter(lambda a: a['name'] == args.action, ACTIONS))[0]
-		return act['instance'].run(args)
+		return actions[args.action].run(args)
 
 	except KeyboardInterrupt:
 		log.info('bye!')
@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: BSD-3-Clause
+import sys
+import os
+from argparse          import ArgumentParser, REMAINDER
+from pathlib           import Path
+from typing            import Any
+
+from .config           import SQUISHY_DAEMON_SOCKET
+from .core.daemon      import daemon_request
+from .core.exceptions  import SquishyException
+
+__all__ = (
+	'main',
+)
+
+__doc__ = '''\
+
+This is the thin client for the Squishy daemon, it is installed as ``squishyc``. It takes the same
+arguments as ``squishy``, but rather than running the command itself it hands it off to a running
+``squishy daemon start`` and relays the output, so it only imports what it needs to talk to the socket.
+
+'''
+
+def main() -> int:
+	'''
+	Squishy daemon client
+
+	Returns
+	-------
+	int
+		The exit status of the command run by the daemon.
+
+	'''
+
+	parser = ArgumentParser(
+		prog        = 'squishyc',
+		description = 'Run Squishy commands through the Squishy daemon',
+		epilog      = 'Any other arguments are passed to the daemon as if they were given to `squishy`'
+	)
+
+	parser.add_argument(
+		'--socket', '-S',
+		type    = Path,
+		default = Path(os.environ.get('SQUISHY_DAEMON_SOCKET', SQUISHY_DAEMON_SOCKET)),
+		help    = 'The UNIX socket the daemon listens on'
+	)
+
+	ops = parser.add_mutually_exclusive_group()
+
+	ops.add_argument(
+		'--ping',
+		action = 'store_true',
+		help   = 'Check the daemon is running'
+	)
+
+	ops.add_argument(
+		'--devices',
+		action = 'store_true',
+		help   = 'List the devices the daemon has open'
+	)
+
+	ops.add_argument(
+		'--reset',
+		action = 'store_true',
+		help   = 'Reset the device'
+	)
+
+	ops.add_argument(
+		'--upload',
+		type    = Path,
+		metavar = 'FILE',
+		help    = 'Upload the given file into --slot on the device'
+	)
+
+	parser.add_argument(
+		'--slot',
+		type    = int,
+		default = 1,
+		help    = 'The slot to upload into'
+	)
+
+	parser.add_argument(
+		'--device', '-d',
+		type    = str,
+		default = None,
+		help    = 'The serial number of the squishy to use if more than one is attached'
+	)
+
+	parser.add_argument(
+		'--verbose', '-v',
+		action = 'store_true',
+		help   = 'Enable verbose output'
+	)
+
+	parser.add_argument(
+		'argv',
+		nargs = REMAINDER,
+		help  = 'The squishy command to run'
+	)
+
+	args = parser.parse_args()
+
+	request: dict[str, Any]
+	if args.ping:
+		request = { 'op': 'ping' }
+	elif args.devices:
+		request = { 'op': 'devices' }
+	elif args.reset:
+		request = { 'op': 'reset', 'device': args.device }
+	elif args.upload is not None:
+		request = { 'op': 'upload', 'device': args.device, 'file': str(args.upload.resolve()), 'slot': args.slot }
+	elif len(args.argv) > 0:
+		# The global `squishy` options are taken by squishyc itself, so pass them on in front of the command
+		argv = [ *(('--device', args.device) if args.device is not None else ()), *(('--verbose',) if args.verbose else ()) ]
+		request = {
+			'op'     : 'exec',
+			'argv'   : [ *argv, *args.argv ],
+			'cwd'    : os.getcwd(),
+			'verbose': args.verbose,
+		}
+	else:
+		parser.print_usage(sys.stderr)
+		return 1
+
+	try:
+		for message in daemon_request(args.socket, request):
+			if message['type'] == 'log':
+				print(f'{message["level"]:<8} {message["message"]}', file = sys.stderr)
+			elif message['type'] == 'output':
+				(sys.stderr if message['stream'] == 'stderr' else sys.stdout).write(message['data'])
+			elif message['type'] == 'result':
+				result = message
+	except SquishyException as e:
+		print(f'squishyc: {e}', file = sys.stderr)
+		return 1
+
+	if 'error' in result:
+		print(f'squishyc: {result["error"]}', file = sys.stderr)
+
+	if args.ping:
+		print(f'Squishy daemon {result["version"]} running as pid {result["pid"]}, up for {result["uptime"]:.0f}s')
+	elif args.devices:
+		for dev in result['devices']:
+			# Devices that are busy running a command aren't checked
+			state = { True: '', False: ' (gone)', None: ' (in use)' }[dev['alive']]
+			print(f'rev{dev["rev"]} SN: {dev["serial"]}{state}')
+
+	return int(result['status'])
+
+if __name__ == '__main__':
+	sys.exit(main())
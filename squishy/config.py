@@ -15,6 +15,8 @@ SQUISHY_APPLET_CACHE = (SQUISHY_CACHE / 'applets')
 
 SQUISHY_BUILD_DIR    = (SQUISHY_CACHE / 'build')
 
+SQUISHY_DAEMON_SOCKET = (SQUISHY_CACHE / 'daemon.sock')
+
 # File path constants
 
 # Hardware Metadata, etc
@@ -1,10 +1,14 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from .device import (
-	SquishyHardwareDevice
-)
-
-
 __all__ = (
 	'SquishyHardwareDevice',
 )
+
+# The device module pulls in libusb and the USB descriptor machinery, so it's only imported
+# on first use rather than whenever anything in `squishy.core` is.
+def __getattr__(name: str):
+	if name == 'SquishyHardwareDevice':
+		from .device import SquishyHardwareDevice
+		return SquishyHardwareDevice
+
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
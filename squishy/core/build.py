@@ -0,0 +1,818 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import logging       as log
+import re
+import sys
+import json
+from os              import environ, access, W_OK
+from pathlib         import Path
+from shutil          import copy2
+from tempfile        import TemporaryDirectory, gettempdir
+from subprocess      import CompletedProcess, Popen, PIPE, STDOUT, run
+from collections     import deque
+from datetime        import datetime, timezone
+from time            import monotonic
+from typing          import Any
+
+from rich.progress   import Progress, TaskID
+
+from torii.build.run import BuildPlan, LocalBuildProducts
+
+from .exceptions     import SquishyBuildError
+
+__all__ = (
+	'SquishyBuildMonitor',
+	'run_build_plan',
+	'SANDBOX_PRODUCTS',
+	'run_sandboxed_build_plan',
+	'scratch_root',
+	'write_placement_lock',
+	'abc9_script',
+	'abc9_netlist_script',
+	'explore_abc9_passes',
+)
+
+__doc__ = '''\
+
+This module contains the machinery used to actually run the toolchain for a
+:py:class:`torii.build.run.BuildPlan`. Rather than handing the build script off
+to the system and waiting for it to return, the script output is streamed and
+fed into a :py:class:`SquishyBuildMonitor`, which picks out the stage markers
+that Yosys and nextpnr emit and turns them into progress tasks.
+
+The per-stage timings are also written out to ``{name}.stages.json`` in the build
+directory so they can be inspected after the fact.
+
+Builds can also be run in a throw-away scratch directory on tmpfs with
+:py:func:`run_sandboxed_build_plan`, where only the final products are copied out.
+
+It also contains the support for ECO style rebuilds, where the placement of the parts of a
+design that have not changed is taken from a previous routed nextpnr JSON and locked in
+place, see :py:func:`write_placement_lock`.
+
+Finally, it contains the iterative ABC9 mapping used for ``--aggressive-mapping``, where
+LUT mapping is repeated with an increasing number of ABC9 optimisation passes until it stops
+improving the design, see :py:func:`explore_abc9_passes`. The best netlist is then used for
+the real build in place of synthesis, see :py:func:`abc9_netlist_script`.
+
+'''
+
+_TOOL_NAMES = {
+	'yosys'        : 'Synthesis',
+	'nextpnr-ice40': 'Place and Route',
+	'nextpnr-ecp5' : 'Place and Route',
+	'icepack'      : 'Packing',
+	'ecppack'      : 'Packing',
+}
+'''
+Toolchain programs we know about and the name of the build step they perform.
+
+'''
+
+# `sh -x` trace of a command in the build script, e.g. `+ yosys -l top.rpt top.ys`, the
+# prefix is `PS4`, which the build script is always run with set to `+ `
+_SCRIPT_TRACE = re.compile(r'^\+ (?P<cmd>\S+)')
+
+# Yosys pass headers, e.g. `2.47. Executing ABC9 pass.`, only the top two levels are tracked
+_YOSYS_PASS = re.compile(r'^(?P<index>\d+(?:\.\d+)?)\. Executing (?P<pass>[A-Za-z0-9_]+)')
+
+_NEXTPNR_STAGES = (
+	(re.compile(r'^Info: Packing'), 'Packing'),
+	(re.compile(
+		r'^Info: (Creating initial (analytic )?placement|Running main analytical placer|'
+		r'Starting placement|Running simulated annealing placer)'
+	), 'Placement'),
+	(re.compile(r'^Info: (Routing\.\.|Setting up routing queue|Running router2)'), 'Routing'),
+	(re.compile(r'^Info: (Critical path report|Max frequency for clock)'), 'Timing Analysis'),
+)
+'''
+nextpnr log lines that mark the start of a PnR stage.
+
+'''
+
+# Placer progress, e.g. `Info:   at iteration #10: temp = 0.50, timing cost = 123, wirelen = 4567`
+_NEXTPNR_PLACE_ITER = re.compile(r'^Info:\s+at (?:initial placer )?iter(?:ation)? #?(?P<iter>\d+).*wirelen = (?P<wirelen>\d+)')
+# router1 progress, e.g. `Info:       1000 |       12        988 |   12   988 |       234`
+_NEXTPNR_ROUTE1_ITER = re.compile(
+	r'^Info:\s+(?P<iter>\d+)\s*\|\s*\d+\s+\d+\s*\|\s*\d+\s+\d+\s*\|\s*(?P<remaining>\d+)\s*$'
+)
+# router2 progress, e.g. `Info:     iter=1 wires=  1234 overused=   56 overuse=   78 archfail=NA`
+_NEXTPNR_ROUTE2_ITER = re.compile(
+	r'^Info:\s+iter=(?P<iter>\d+)\s+wires=\s*(?P<wires>\d+)\s+overused=\s*(?P<overused>\d+)\s+overuse=\s*(?P<overuse>\d+)'
+)
+_NEXTPNR_FMAX = re.compile(r'^Info: Max frequency for clock\s+\'(?P<clock>[^\']+)\': (?P<fmax>[\d.]+) MHz')
+_NEXTPNR_UTIL = re.compile(r'^Info:\s+(?P<bel>[A-Z][A-Z0-9_]+):\s+(?P<used>\d+)/\s*(?P<avail>\d+)\s+\d+%')
+
+class SquishyBuildMonitor:
+	'''
+	Squishy toolchain build monitor.
+
+	This consumes the merged stdout/stderr of a build script line by line and tracks
+	which toolchain program is running, and which stage of it, exposing that as
+	:py:class:`rich.progress.Progress` tasks.
+
+	For each stage the wall-clock time is recorded along with any metrics that could be
+	pulled from the log, such as the number of overused wires in each routing iteration.
+
+	Parameters
+	----------
+	name : str
+		The name of the design being built.
+
+	progress : rich.progress.Progress | None
+		The progress bar to attach tasks to, if any.
+
+	Attributes
+	----------
+	stages : list[dict[str, Any]]
+		The completed and currently running stages.
+
+	fmax : dict[str, float]
+		The max frequency for each clock as reported by nextpnr.
+
+	utilisation : dict[str, dict[str, int]]
+		The device utilisation as reported by nextpnr.
+
+	'''
+
+	def __init__(self, name: str, progress: Progress | None = None) -> None:
+		self.name        = name
+		self.stages: list[dict[str, Any]] = []
+		self.fmax: dict[str, float] = {}
+		self.utilisation: dict[str, dict[str, int]] = {}
+
+		self._progress   = progress
+		self._task: TaskID | None = None
+		self._tool: str | None    = None
+		self._stage: dict[str, Any] | None = None
+		self._started    = datetime.now(timezone.utc)
+		self._start      = monotonic()
+		self._route_peak = 0
+
+	@property
+	def elapsed(self) -> float:
+		''' The time since the build was started in seconds '''
+		return monotonic() - self._start
+
+	def _end_stage(self) -> None:
+		if self._stage is None:
+			return
+
+		self._stage['duration'] = round(monotonic() - self._start - self._stage['start'], 3)
+		log.debug(f'{self._stage["tool"]}: {self._stage["stage"]} took {self._stage["duration"]}s')
+		self._stage = None
+
+	def _begin_stage(self, stage: str) -> None:
+		if self._stage is not None and self._stage['stage'] == stage:
+			return
+
+		self._end_stage()
+		self._stage = {
+			'tool'    : self._tool,
+			'stage'   : stage,
+			'start'   : round(self.elapsed, 3),
+			'duration': None,
+			'metrics' : {},
+		}
+		self.stages.append(self._stage)
+		self._route_peak = 0
+
+		if self._progress is not None and self._task is not None:
+			self._progress.reset(self._task, total = None, description = f'{_TOOL_NAMES[self._tool]}: {stage}')
+
+	def _begin_tool(self, tool: str) -> None:
+		self._end_stage()
+
+		if self._progress is not None:
+			if self._task is not None:
+				self._progress.remove_task(self._task)
+			self._task = self._progress.add_task(_TOOL_NAMES[tool], total = None)
+
+		self._tool = tool
+		self._begin_stage('Startup')
+
+	def _update_route(self, iteration: int, remaining: int, **metrics) -> None:
+		self._stage['metrics'].setdefault('iterations', []).append({
+			'iter': iteration, 'remaining': remaining, **metrics
+		})
+
+		# Routing converges on zero, so show it as progress towards that
+		self._route_peak = max(self._route_peak, remaining)
+		if self._progress is not None and self._task is not None:
+			self._progress.update(
+				self._task, total = self._route_peak, completed = self._route_peak - remaining
+			)
+
+	def _feed_yosys(self, line: str) -> None:
+		if (match := _YOSYS_PASS.match(line)) is not None:
+			self._begin_stage(match.group('pass'))
+
+	def _feed_nextpnr(self, line: str) -> None:
+		for pattern, stage in _NEXTPNR_STAGES:
+			if pattern.match(line) is not None:
+				self._begin_stage(stage)
+				break
+
+		if (match := _NEXTPNR_ROUTE2_ITER.match(line)) is not None:
+			self._update_route(
+				int(match.group('iter')), int(match.group('overused')),
+				wires = int(match.group('wires')), overuse = int(match.group('overuse'))
+			)
+		elif (match := _NEXTPNR_ROUTE1_ITER.match(line)) is not None:
+			self._update_route(int(match.group('iter')), int(match.group('remaining')))
+		elif (match := _NEXTPNR_PLACE_ITER.match(line)) is not None:
+			self._stage['metrics']['wirelen'] = int(match.group('wirelen'))
+		elif (match := _NEXTPNR_FMAX.match(line)) is not None:
+			self.fmax[match.group('clock')] = float(match.group('fmax'))
+		elif (match := _NEXTPNR_UTIL.match(line)) is not None:
+			self.utilisation[match.group('bel')] = {
+				'used': int(match.group('used')), 'available': int(match.group('avail'))
+			}
+
+	def feed(self, line: str) -> None:
+		'''
+		Feed a line of toolchain output into the monitor.
+
+		Parameters
+		----------
+		line : str
+			The line of output, without the trailing newline.
+
+		'''
+
+		if (match := _SCRIPT_TRACE.match(line)) is not None:
+			tool = Path(match.group('cmd').strip('"\'')).name
+			if tool in _TOOL_NAMES:
+				self._begin_tool(tool)
+			return
+
+		if self._tool is None:
+			return
+
+		if self._tool == 'yosys':
+			self._feed_yosys(line)
+		elif self._tool.startswith('nextpnr'):
+			self._feed_nextpnr(line)
+
+	def finish(self, status: int) -> dict[str, Any]:
+		'''
+		Finish monitoring the build.
+
+		Parameters
+		----------
+		status : int
+			The exit status of the build script.
+
+		Returns
+		-------
+		dict[str, Any]
+			The build summary, as written by :py:meth:`write_log`.
+
+		'''
+
+		self._end_stage()
+		if self._progress is not None and self._task is not None:
+			self._progress.remove_task(self._task)
+			self._task = None
+
+		return {
+			'name'       : self.name,
+			'started'    : self._started.isoformat(),
+			'duration'   : round(self.elapsed, 3),
+			'status'     : status,
+			'stages'     : self.stages,
+			'fmax'       : self.fmax,
+			'utilisation': self.utilisation,
+		}
+
+	def write_log(self, summary: dict[str, Any], path: Path) -> None:
+		'''
+		Write the build summary out as JSON.
+
+		Parameters
+		----------
+		summary : dict[str, Any]
+			The summary returned from :py:meth:`finish`.
+
+		path : pathlib.Path
+			The file to write the summary to.
+
+		'''
+
+		log.debug(f'Writing build stage log to {path}')
+		with path.open('w') as f:
+			json.dump(summary, f, indent = '\t')
+
+
+def run_build_plan(
+	plan: BuildPlan, build_dir: Path, name: str, progress: Progress | None = None, *,
+	echo: bool = False, env: dict[str, str] | None = None
+) -> LocalBuildProducts:
+	'''
+	Execute a build plan locally, monitoring the toolchain as it goes.
+
+	This is a replacement for :py:meth:`torii.build.run.BuildPlan.execute_local` that streams
+	the output of the build script rather than letting it go straight to the terminal.
+
+	The build script is run with ``sh -x`` so the trace of each command it runs tells the monitor
+	which toolchain program has started. For the stage markers of each program to be present in
+	the output the plan must have been prepared with ``verbose = True``, the output is only echoed
+	to the terminal if ``echo`` is set.
+
+	Parameters
+	----------
+	plan : torii.build.run.BuildPlan
+		The build plan to execute.
+
+	build_dir : pathlib.Path
+		The directory to extract the plan into and run the build in.
+
+	name : str
+		The name of the design.
+
+	progress : rich.progress.Progress | None
+		The progress bar to add the toolchain tasks to, if any.
+
+	Keyword Arguments
+	-----------------
+	echo : bool
+		Echo the toolchain output as it is received.
+
+	env : dict[str, str] | None
+		Any additional environment variables to set for the build.
+
+	Returns
+	-------
+	torii.build.run.LocalBuildProducts
+		The products of the build.
+
+	Raises
+	------
+	SquishyBuildError
+		If the build script exits with a non-zero status.
+
+	'''
+
+	build_dir = plan.extract(build_dir)
+	monitor   = SquishyBuildMonitor(name, progress)
+	tail: deque[str] = deque(maxlen = 25)
+
+	script_env = dict(environ)
+	if env is not None:
+		script_env.update(env)
+	# Make sure the command traces look like what the monitor expects
+	script_env['PS4'] = '+ '
+
+	if sys.platform.startswith('win32'):
+		cmd = [ 'cmd', '/c', f'call {plan.script}.bat' ]
+	else:
+		cmd = [ 'sh', '-x', f'{plan.script}.sh' ]
+
+	with Popen(
+		cmd, cwd = build_dir, env = script_env, stdout = PIPE, stderr = STDOUT,
+		text = True, errors = 'replace', bufsize = 1
+	) as proc:
+		for line in proc.stdout:
+			line = line.rstrip()
+			tail.append(line)
+			monitor.feed(line)
+
+			if echo:
+				if progress is not None:
+					progress.console.print(line, markup = False, highlight = False)
+				else:
+					print(line)
+
+	summary = monitor.finish(proc.returncode)
+	monitor.write_log(summary, build_dir / f'{name}.stages.json')
+
+	if proc.returncode != 0:
+		for line in tail:
+			log.error(line)
+		raise SquishyBuildError(f'Build of \'{name}\' failed with exit status {proc.returncode}')
+
+	return LocalBuildProducts(build_dir)
+
+SANDBOX_PRODUCTS = (
+	'{name}.bin',
+	'{name}.il',
+	'{name}.debug.v',
+	'{name}.stages.json',
+	'timing.json',
+)
+'''
+The files that are copied out of the scratch directory of a sandboxed build.
+
+These are the products that the :py:class:`squishy.core.cache.SquishyBitstreamCache` stores,
+as well as the build stage log and the nextpnr timing report if one was requested.
+
+'''
+
+def scratch_root() -> Path:
+	'''
+	Get the directory sandboxed builds should create their scratch directories in.
+
+	If the ``SQUISHY_SCRATCH_DIR`` environment variable is set, then that is used, otherwise
+	``/dev/shm`` is used if it is available, falling back to the system temporary directory.
+
+	Returns
+	-------
+	pathlib.Path
+		The scratch root directory.
+
+	'''
+
+	if 'SQUISHY_SCRATCH_DIR' in environ:
+		return Path(environ['SQUISHY_SCRATCH_DIR'])
+
+	shm = Path('/dev/shm')
+	if shm.is_dir() and access(shm, W_OK):
+		return shm
+
+	return Path(gettempdir())
+
+def run_sandboxed_build_plan(
+	plan: BuildPlan, out_dir: Path, name: str, progress: Progress | None = None, *,
+	echo: bool = False, env: dict[str, str] | None = None
+) -> LocalBuildProducts:
+	'''
+	Execute a build plan in an isolated scratch directory.
+
+	The plan is run with :py:func:`run_build_plan` inside of a fresh directory under
+	:py:func:`scratch_root`, so all of the intermediate files the toolchain generates never
+	touch the disk. Once the build is complete the files listed in :py:data:`SANDBOX_PRODUCTS`
+	are copied into ``out_dir`` and the scratch directory is removed, even if the build failed.
+
+	Parameters
+	----------
+	plan : torii.build.run.BuildPlan
+		The build plan to execute.
+
+	out_dir : pathlib.Path
+		The directory to copy the build products into.
+
+	name : str
+		The name of the design.
+
+	progress : rich.progress.Progress | None
+		The progress bar to add the toolchain tasks to, if any.
+
+	Keyword Arguments
+	-----------------
+	echo : bool
+		Echo the toolchain output as it is received.
+
+	env : dict[str, str] | None
+		Any additional environment variables to set for the build.
+
+	Returns
+	-------
+	torii.build.run.LocalBuildProducts
+		The products of the build, rooted at ``out_dir``.
+
+	'''
+
+	with TemporaryDirectory(prefix = f'squishy-{name}-', dir = scratch_root()) as scratch:
+		log.debug(f'Running sandboxed build in {scratch}')
+		scratch_dir = Path(scratch)
+
+		run_build_plan(plan, scratch_dir, name, progress, echo = echo, env = env)
+
+		out_dir.mkdir(parents = True, exist_ok = True)
+		for product in SANDBOX_PRODUCTS:
+			product_file = scratch_dir / product.format(name = name)
+			if product_file.exists():
+				copy2(product_file, out_dir / product_file.name)
+
+	return LocalBuildProducts(out_dir)
+
+# Flattened cell names are either `usb.foo.bar` or `$flatten\usb.$procdff$123`
+_CELL_SCOPE = re.compile(r'^(?:\$flatten)?\\?(?P<scope>[^.$\\]+)\.')
+
+def _cell_scope(name: str, attrs: dict[str, str]) -> str | None:
+	''' Get the name of the top-level submodule a flattened cell came from '''
+	if 'hdlname' in attrs:
+		return attrs['hdlname'].split(' ')[0]
+
+	if (match := _CELL_SCOPE.match(name)) is not None:
+		return match.group('scope')
+
+	return None
+
+def write_placement_lock(routed_json: Path, script: Path, scopes: tuple[str, ...]) -> int:
+	'''
+	Generate a nextpnr pre-place script that locks cells to their previous placement.
+
+	This takes the routed JSON written by nextpnr (``--write``) from a previous build and
+	collects the BEL for each cell that belongs to one of the given top-level submodules. It
+	then generates a script for nextpnr's ``--pre-place`` hook that sets the ``BEL``
+	constraint on each of those cells, so only the remainder of the design is placed.
+
+	Cells are matched by name, any cell that no longer exists or whose name changed is simply
+	left unconstrained. Routing is not preserved, only placement.
+
+	Note
+	----
+	The nextpnr used must be built with Python support for ``--pre-place`` to be available.
+
+	Parameters
+	----------
+	routed_json : pathlib.Path
+		The routed JSON from the previous nextpnr run.
+
+	script : pathlib.Path
+		The path to write the pre-place script to.
+
+	scopes : tuple[str, ...]
+		The names of the top-level submodules to lock the placement of.
+
+	Returns
+	-------
+	int
+		The number of cells that had their placement locked.
+
+	Raises
+	------
+	SquishyBuildError
+		If the routed JSON is not a nextpnr netlist with placement information.
+
+	'''
+
+	with routed_json.open('r') as f:
+		try:
+			netlist = json.load(f)
+		except json.JSONDecodeError as e:
+			raise SquishyBuildError(f'\'{routed_json}\' is not a nextpnr netlist: {e}') from e
+
+	if not isinstance(netlist, dict):
+		raise SquishyBuildError(f'\'{routed_json}\' is not a nextpnr netlist')
+
+	locks: dict[str, str] = {}
+
+	for module in netlist.get('modules', {}).values():
+		for name, cell in module.get('cells', {}).items():
+			attrs = cell.get('attributes', {})
+			bel   = attrs.get('NEXTPNR_BEL')
+			if bel is None or _cell_scope(name, attrs) not in scopes:
+				continue
+
+			locks[name] = bel
+
+	if len(locks) == 0:
+		raise SquishyBuildError(f'No placed cells for {", ".join(scopes)} found in \'{routed_json}\'')
+
+	log.debug(f'Locking placement of {len(locks)} cells from {routed_json}')
+
+	with script.open('w') as f:
+		f.write(f'# Generated by squishy from {routed_json.name}, do not edit\n')
+		f.write(f'locks = {locks!r}\n')
+		f.write(
+			'for name, cell in ctx.cells:\n'
+			'\tbel = locks.get(name)\n'
+			'\tif bel is not None:\n'
+			'\t\tcell.setAttr(\'BEL\', bel)\n'
+		)
+
+	return len(locks)
+
+# The body of Yosys' `abc9.script.flow3`, each pass re-synthesizes the AIG a few different ways
+# and keeps the best mapping with `&save`/`&load`. Commas are turned into spaces by ABC9, and
+# the `{C}`, `{W}`, `{D}`, `{R}` placeholders are filled in with the LUT library and delay target.
+_ABC9_FLOW_PREAMBLE = ( '&scorr', '&sweep', '&if,{C},{W},{D}', '&save' )
+_ABC9_FLOW_PASS     = (
+	'&st', '&syn2', '&if,{C},{W},{D},{R}', '&save', '&load',
+	'&st', '&if,{C},-g,-K,6', '&dch,-f', '&if,{C},{W},{D},{R}', '&save', '&load',
+	'&st', '&if,{C},-g,-K,6', '&synch2', '&if,{C},{W},{D},{R}', '&save', '&load',
+)
+_ABC9_FLOW_POSTAMBLE = ( '&mfs', '&ps' )
+
+# `stat` cell count, either `   SB_LUT4    123` or `   123   SB_LUT4` depending on the Yosys version
+_YOSYS_STAT_LUTS = re.compile(r'^\s+(?:SB_LUT4\s+(?P<count>\d+)|(?P<count_pre>\d+)\s+(?:[\d.]+\s+)?SB_LUT4)\s*$', re.MULTILINE)
+# `ltp` result, e.g. `Longest topological path in top (length=42):`
+_YOSYS_LTP = re.compile(r'^Longest topological path in \S+ \(length=(?P<length>\d+)\)', re.MULTILINE)
+
+def abc9_script(passes: int) -> str:
+	'''
+	Generate an ABC9 script that runs the given number of optimisation passes.
+
+	A single pass is equivalent to Yosys\' ``abc9.script.flow3``.
+
+	Parameters
+	----------
+	passes : int
+		The number of optimisation passes to run.
+
+	Returns
+	-------
+	str
+		The inline script, suitable for ``scratchpad -set abc9.script``.
+
+	'''
+
+	return '+' + ';'.join((
+		*_ABC9_FLOW_PREAMBLE, *(_ABC9_FLOW_PASS * passes), *_ABC9_FLOW_POSTAMBLE
+	))
+
+def abc9_netlist_script(name: str, script_after_synth: str = '') -> str:
+	'''
+	Generate the Yosys script for a build that uses the netlist kept by :py:func:`explore_abc9_passes`.
+
+	The script stands in for the usual ``{name}.ys``, rather than synthesizing the design again it
+	reads in ``{name}.abc9.json`` and writes it back out as ``{name}.json`` for nextpnr.
+
+	Parameters
+	----------
+	name : str
+		The name of the design.
+
+	script_after_synth : str
+		Any Yosys commands to run on the netlist, as they would have been after synthesis.
+
+	Returns
+	-------
+	str
+		The Yosys script.
+
+	'''
+
+	return (
+		f'read_json {name}.abc9.json\n'
+		f'{script_after_synth}\n'
+		f'write_json {name}.json\n'
+	)
+
+def explore_abc9_passes(
+	build_dir: Path, name: str, max_passes: int, progress: Progress | None = None, *,
+	synth_opts: str = '', script_after_read: str = '', env: dict[str, str] | None = None
+) -> dict[str, Any]:
+	'''
+	Find the number of ABC9 optimisation passes that gives the best mapping for a design.
+
+	The design in ``{name}.il`` in ``build_dir`` is first synthesized with Yosys up to, but not
+	including, LUT mapping, and saved. The LUT mapping is then run from that checkpoint, starting
+	with a single pass of :py:func:`abc9_script` and adding another pass each time. After each run
+	the number of LUTs and the length of the longest topological path are measured, and once a run
+	fails to improve on the best so far the search stops. A shorter path is always better, with the
+	LUT count breaking any ties.
+
+	The netlist from the best run is kept as ``{name}.abc9.json``, ready to be used in place of
+	synthesis with :py:func:`abc9_netlist_script`, and a summary of all of the runs is written to
+	``{name}.abc9.log.json``.
+
+	Parameters
+	----------
+	build_dir : pathlib.Path
+		The directory containing the extracted build plan.
+
+	name : str
+		The name of the design.
+
+	max_passes : int
+		The maximum number of passes to try.
+
+	progress : rich.progress.Progress | None
+		The progress bar to add the mapping task to, if any.
+
+	Keyword Arguments
+	-----------------
+	synth_opts : str
+		The options passed to ``synth_ice40``.
+
+	script_after_read : str
+		Any Yosys commands to run after the design is read in.
+
+	env : dict[str, str] | None
+		Any additional environment variables to set when running Yosys.
+
+	Returns
+	-------
+	dict[str, Any]
+		The ``passes`` that gave the best result, and the ``results`` of each run.
+
+	Raises
+	------
+	SquishyBuildError
+		If Yosys fails before or on the first pass, or no measurements could be taken from it.
+
+	ValueError
+		If ``max_passes`` is less than 1.
+
+	'''
+
+	if max_passes < 1:
+		raise ValueError(f'At least 1 ABC9 pass has to be explored, not {max_passes}')
+
+	script_env = dict(environ)
+	if env is not None:
+		script_env.update(env)
+
+	yosys = script_env.get('YOSYS', 'yosys')
+
+	def _yosys(script: Path) -> CompletedProcess[str]:
+		return run(
+			[ yosys, '-q', '-s', script.name ], cwd = build_dir, env = script_env,
+			stdout = PIPE, stderr = STDOUT, text = True, errors = 'replace'
+		)
+
+	task = None
+	if progress is not None:
+		task = progress.add_task('ABC9 Mapping (synthesis)', total = max_passes)
+
+	# Everything before LUT mapping is the same no matter how many passes ABC9 does, so only do it once
+	checkpoint = f'{name}.abc9-pre.il'
+	script     = build_dir / f'{name}.abc9-pre.ys'
+	script.write_text(
+		f'read_rtlil {name}.il\n'
+		f'{script_after_read}\n'
+		f'synth_ice40 {synth_opts} -top {name} -run :map_luts\n'
+		f'write_rtlil {checkpoint}\n'
+	)
+
+	proc = _yosys(script)
+	if proc.returncode != 0 or not (build_dir / checkpoint).exists():
+		for line in proc.stdout.splitlines()[-25:]:
+			log.error(line)
+		raise SquishyBuildError(f'Synthesis of \'{name}\' for ABC9 mapping failed with exit status {proc.returncode}')
+
+	results: list[dict[str, Any]] = []
+	best: dict[str, Any] | None = None
+
+	for passes in range(1, max_passes + 1):
+		run_name = f'{name}.abc9-{passes}'
+		report   = build_dir / f'{run_name}.rpt'
+		script   = build_dir / f'{run_name}.ys'
+
+		script.write_text(
+			f'read_rtlil {checkpoint}\n'
+			f'scratchpad -set abc9.script {abc9_script(passes)}\n'
+			f'synth_ice40 {synth_opts} -top {name} -run map_luts:\n'
+			f'tee -q -o {report.name} stat\n'
+			f'tee -q -a {report.name} ltp -noff\n'
+			f'write_json {run_name}.json\n'
+		)
+
+		if progress is not None:
+			progress.update(task, description = f'ABC9 Mapping (pass {passes}/{max_passes})')
+
+		started = monotonic()
+		proc = _yosys(script)
+		duration = monotonic() - started
+
+		luts = depth = None
+		if proc.returncode == 0 and report.exists():
+			rpt = report.read_text()
+			if (match := _YOSYS_STAT_LUTS.search(rpt)) is not None:
+				luts = int(match.group('count') or match.group('count_pre'))
+			if (match := _YOSYS_LTP.search(rpt)) is not None:
+				depth = int(match.group('length'))
+
+		if luts is None or depth is None:
+			for line in proc.stdout.splitlines()[-25:]:
+				log.error(line)
+
+			if best is None:
+				raise SquishyBuildError(f'ABC9 mapping of \'{name}\' failed with exit status {proc.returncode}')
+
+			log.warning(f'ABC9 pass {passes} failed, using the result from pass {best["passes"]}')
+			break
+
+		result = {
+			'passes'  : passes,
+			'luts'    : luts,
+			'depth'   : depth,
+			'duration': round(duration, 3),
+		}
+		results.append(result)
+		log.debug(f'ABC9 pass {passes}: {luts} LUTs, depth {depth}, took {duration:.1f}s')
+
+		if progress is not None:
+			progress.advance(task)
+
+		if best is not None and (depth, luts) >= (best['depth'], best['luts']):
+			log.debug(f'ABC9 pass {passes} did not improve on pass {best["passes"]}, stopping')
+			break
+
+		best = result
+		(build_dir / f'{run_name}.json').replace(build_dir / f'{name}.abc9.json')
+
+	for passes in range(1, max_passes + 1):
+		for suffix in ('rpt', 'ys', 'json'):
+			(build_dir / f'{name}.abc9-{passes}.{suffix}').unlink(missing_ok = True)
+	for suffix in ('ys', 'il'):
+		(build_dir / f'{name}.abc9-pre.{suffix}').unlink(missing_ok = True)
+
+	if progress is not None:
+		progress.remove_task(task)
+
+	if best is None:
+		raise SquishyBuildError(f'No ABC9 mapping of \'{name}\' was found')
+
+	summary = {
+		'passes' : best['passes'],
+		'results': results,
+	}
+
+	with (build_dir / f'{name}.abc9.log.json').open('w') as f:
+		json.dump(summary, f, indent = '\t')
+
+	return summary
@@ -1,8 +1,10 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import logging       as log
+import json
 from pathlib         import Path
-from lzma            import LZMACompressor
+from typing          import Any
+from lzma            import LZMACompressor, LZMADecompressor
 from shutil          import rmtree
 
 from torii.build.run import LocalBuildProducts
@@ -104,3 +106,31 @@ class SquishyBitstreamCache:
 				with open(rtl, 'wb') as r:
 					r.write(cpr.compress(products.get(f'{name}.{rtl_ext}')))
 					r.write(cpr.flush())
+
+	def get_mapping(self, digest: str) -> tuple[dict[str, Any], bytes] | None:
+		''' Attempt to retrieve the result and netlist of an aggressive mapping run based on it's elaboration digest '''
+		cache_dir = self._get_cache_dir(digest)
+		mapping = cache_dir / f'{digest}.abc9.json'
+		netlist = cache_dir / f'{digest}.abc9.netlist.json.xz'
+
+		if not mapping.exists() or not netlist.exists():
+			return None
+
+		with mapping.open('r') as f:
+			return (json.load(f), LZMADecompressor().decompress(netlist.read_bytes()))
+
+	def store_mapping(self, digest: str, mapping: dict[str, Any], netlist: bytes) -> None:
+		''' Store the result and netlist of an aggressive mapping run in the cache '''
+		cache_dir = self._get_cache_dir(digest)
+
+		log.debug(f'Caching ABC9 mapping results in {cache_dir}')
+
+		cpr = LZMACompressor()
+
+		with (cache_dir / f'{digest}.abc9.netlist.json.xz').open('wb') as f:
+			f.write(cpr.compress(netlist))
+			f.write(cpr.flush())
+
+		# Written last, so there is never a result without its netlist
+		with (cache_dir / f'{digest}.abc9.json').open('w') as f:
+			json.dump(mapping, f)
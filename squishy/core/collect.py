@@ -1,17 +1,146 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from pkgutil    import walk_packages
+import logging  as log
+import json
+from pkgutil    import iter_modules
 from importlib  import import_module
 from inspect    import getmembers, isclass
-from typing     import Callable
+from pathlib    import Path
+from typing     import Callable, Iterator
 
 __all__ = (
+	'SquishyDiscoveryCache',
 	'collect_members',
 	'predicate_applet',
 	'predicate_action',
 	'predicate_class',
+	'collect_member_index',
+	'load_member',
 )
 
+__doc__ = '''\
+
+This module contains the machinery used to discover actions and applets, both those bundled
+with Squishy, in the user applet directory, and those registered by third-party packages with
+Python entry points.
+
+Discovery normally means importing every module in a package and checking each of its members,
+which is slow, so the result of checking each file is recorded in a :py:class:`SquishyDiscoveryCache`
+keyed on the path, size, and modification time of the file. On later runs, files that are
+unchanged and had nothing of interest in them are never imported.
+
+'''
+
+class SquishyDiscoveryCache:
+	'''
+	Plugin discovery cache.
+
+	This records which members of each module matched a given predicate, and any requested class
+	attributes of those members, so that they can be listed without importing the module.
+
+	Entries for module files are keyed on their path and are invalidated if the size or modification
+	time of the file changes. Entries for entry points are keyed on the distribution name, version,
+	and entry point value. The whole cache is discarded if the Squishy version changes.
+
+	Parameters
+	----------
+	cache_file : pathlib.Path
+		The file to load the cache from, and save it to.
+
+	'''
+
+	def __init__(self, cache_file: Path) -> None:
+		from .. import __version__
+
+		self.cache_file = cache_file
+		self._version   = __version__
+		self._dirty     = False
+		self._entries: dict[str, dict] = {}
+
+		try:
+			with cache_file.open('r') as f:
+				cache = json.load(f)
+
+			if cache['version'] == self._version:
+				self._entries = cache['entries']
+		except (OSError, ValueError, KeyError):
+			pass
+
+	def lookup(self, key: str, stamp: list[int] | str, query: str) -> list[dict[str, str]] | None:
+		'''
+		Look up the members recorded for a module or entry point.
+
+		Parameters
+		----------
+		key : str
+			The path of the module file, or the entry point key.
+
+		stamp : list[int] | str
+			The current stamp of the file or entry point.
+
+		query : str
+			The predicate and attributes the members were collected with.
+
+		Returns
+		-------
+		list[dict[str, str]] | None
+			The recorded members, or None if there is no up to date entry.
+
+		'''
+
+		entry = self._entries.get(key)
+		if entry is None or entry['stamp'] != stamp:
+			return None
+
+		return entry['members'].get(query)
+
+	def store(self, key: str, stamp: list[int] | str, query: str, members: list[dict[str, str]]) -> None:
+		'''
+		Record the members found in a module or entry point.
+
+		Parameters
+		----------
+		key : str
+			The path of the module file, or the entry point key.
+
+		stamp : list[int] | str
+			The current stamp of the file or entry point.
+
+		query : str
+			The predicate and attributes the members were collected with.
+
+		members : list[dict[str, str]]
+			The members that were found.
+
+		'''
+
+		entry = self._entries.get(key)
+		if entry is None or entry['stamp'] != stamp:
+			entry = self._entries[key] = { 'stamp': stamp, 'members': {} }
+
+		entry['members'][query] = members
+		self._dirty = True
+
+	def save(self) -> None:
+		'''
+		Write the cache out if it has changed, dropping any entries for files that no longer exist.
+		'''
+
+		if not self._dirty:
+			return
+
+		self._entries = {
+			key: entry for key, entry in self._entries.items()
+			if isinstance(entry['stamp'], str) or Path(key).exists()
+		}
+
+		try:
+			self.cache_file.parent.mkdir(parents = True, exist_ok = True)
+			with self.cache_file.open('w') as f:
+				json.dump({ 'version': self._version, 'entries': self._entries }, f)
+			self._dirty = False
+		except OSError as e:
+			log.debug(f'Unable to write discovery cache {self.cache_file}: {e}')
 
 def predicate_applet(member: object) -> bool:
 	'''
@@ -66,8 +195,92 @@ def predicate_class(member: object) -> bool:
 
 	return isclass(member)
 
+def _query(pred: Callable[[object], bool], attrs: tuple[str, ...]) -> str:
+	''' The discovery cache query string for a predicate and set of attributes '''
+	return ':'.join((f'{pred.__module__}.{pred.__qualname__}', *attrs))
+
+def _describe(name: str, member: type, attrs: tuple[str, ...]) -> dict[str, str]:
+	''' Describe a member for the discovery cache '''
+	return {
+		'name'  : name.lower(),
+		'module': member.__module__,
+		'class' : member.__qualname__,
+		**{ attr: getattr(member, attr) for attr in attrs }
+	}
+
+def _iter_modules(pkg: Path, prefix: str) -> Iterator[tuple[str, Path]]:
+	''' Recursively find all of the modules in a package directory without importing them '''
+	for info in iter_modules(path = (str(pkg),), prefix = prefix):
+		spec = info.module_finder.find_spec(info.name)
+		if spec is None or spec.origin is None:
+			continue
+
+		yield (info.name, Path(spec.origin))
+
+		if info.ispkg:
+			yield from _iter_modules(pkg / info.name[len(prefix):], f'{info.name}.')
+
+def _discover(
+	pkg: Path, pred: Callable[[object], bool], prefix: str, attrs: tuple[str, ...],
+	cache: SquishyDiscoveryCache | None
+) -> list[dict[str, str]]:
+	''' Find the members of every module in a package matching the predicate, using the cache if possible '''
+	query = _query(pred, attrs)
+	found: list[dict[str, str]] = []
+
+	for mod_name, mod_file in _iter_modules(Path(pkg), prefix):
+		key = str(mod_file.resolve())
+		st  = mod_file.stat()
+		stamp = [ st.st_size, st.st_mtime_ns ]
+
+		members = None if cache is None else cache.lookup(key, stamp, query)
+		if members is None:
+			members = [
+				_describe(name, member, attrs) for name, member in getmembers(import_module(mod_name), pred)
+			]
+			if cache is not None:
+				cache.store(key, stamp, query, members)
+
+		found.extend(members)
+
+	return found
+
+def _discover_entry_points(
+	group: str, pred: Callable[[object], bool], attrs: tuple[str, ...], cache: SquishyDiscoveryCache | None
+) -> list[dict[str, str]]:
+	''' Find the entry points in the given group matching the predicate, using the cache if possible '''
+	from importlib.metadata import entry_points
+
+	query = _query(pred, attrs)
+	found: list[dict[str, str]] = []
+
+	for ep in entry_points(group = group):
+		dist  = ep.dist
+		key   = f'{group}:{ep.name}'
+		stamp = f'{dist.name if dist else ""}=={dist.version if dist else ""}:{ep.value}'
+
+		members = None if cache is None else cache.lookup(key, stamp, query)
+		if members is None:
+			try:
+				member = ep.load()
+			except Exception as e:
+				log.warning(f'Unable to load entry point \'{ep.name}\' ({ep.value}): {e}')
+				continue
+
+			members = [ _describe(ep.name, member, attrs) ] if pred(member) else []
+			if len(members) == 0:
+				log.warning(f'Entry point \'{ep.name}\' ({ep.value}) in \'{group}\' is not of the expected type')
+
+			if cache is not None:
+				cache.store(key, stamp, query, members)
+
+		found.extend(members)
+
+	return found
+
 def collect_members(
-	pkg: str, pred: Callable[[object], bool], prefix: str = '', make_instance: bool = True
+	pkg: str | Path, pred: Callable[[object], bool], prefix: str = '', make_instance: bool = True,
+	cache: SquishyDiscoveryCache | None = None
 ) -> list[dict[str, str | object]]:
 	'''
 	Collect members from package
@@ -75,6 +288,9 @@ def collect_members(
 	This method collects list of members from a given package, and optionally creates
 	and instance of them.
 
+	If a discovery cache is given, then any unchanged module that is known to not contain any
+	matching members is not imported.
+
 	Returns
 	-------
 	list[dict[str, str | object]]
@@ -84,18 +300,84 @@ def collect_members(
 
 	members: list[dict[str, str | object]] = list()
 
-	for _, pkg_name, __ in walk_packages(
-		path  = (pkg,),
-		prefix = prefix
-	):
-		pkg_import    = import_module(pkg_name)
-		found_members = getmembers(pkg_import, pred)
+	for entry in _discover(Path(pkg), pred, prefix, (), cache):
+		member = load_member(entry)
+		members.append({
+			'name'    : entry['name'],
+			'instance': member() if make_instance else member
+		})
+
+	return members
+
+def collect_member_index(
+	index_file: Path, sources: tuple[tuple[Path, str], ...], pred: Callable[[object], bool],
+	attrs: tuple[str, ...] = (), entry_point_group: str | None = None
+) -> list[dict[str, str]]:
+	'''
+	Collect an index of members from a set of packages
+
+	This is like :py:func:`collect_members`, but rather than returning the members themselves it
+	returns the name of the module and class for each, along with the values of the requested
+	class attributes, so they can be listed without having to import anything.
+
+	The results are kept in a :py:class:`SquishyDiscoveryCache` in ``index_file``, so only the
+	modules that were added or changed since the last run are imported. Use :py:func:`load_member`
+	to import the member for an index entry when it is actually needed.
+
+	Parameters
+	----------
+	index_file : pathlib.Path
+		The file to cache the index in.
 
-		if len(found_members) > 0:
-			for name, member in found_members:
-				members.append({
-					'name'    : name.lower(),
-					'instance': member() if make_instance else member
-				})
+	sources : tuple[tuple[pathlib.Path, str], ...]
+		The package directories to collect from, along with the prefix for their module names.
 
+	pred : Callable[[object], bool]
+		The predicate to filter the members on.
+
+	attrs : tuple[str, ...]
+		The class attributes to store in the index for each member.
+
+	entry_point_group : str | None
+		The entry point group to also collect members from, if any.
+
+	Returns
+	-------
+	list[dict[str, str]]
+		The ``name``, ``module``, and ``class`` for each member, along with any requested attributes.
+
+	'''
+
+	cache = SquishyDiscoveryCache(index_file)
+
+	members: list[dict[str, str]] = []
+	for path, prefix in sources:
+		if path.exists():
+			members.extend(_discover(path, pred, prefix, attrs, cache))
+
+	if entry_point_group is not None:
+		members.extend(_discover_entry_points(entry_point_group, pred, attrs, cache))
+
+	cache.save()
 	return members
+
+def load_member(entry: dict[str, str]) -> type:
+	'''
+	Load a member from an index entry
+
+	Parameters
+	----------
+	entry : dict[str, str]
+		The entry from :py:func:`collect_member_index`.
+
+	Returns
+	-------
+	type
+		The member class.
+
+	'''
+
+	member = import_module(entry['module'])
+	for name in entry['class'].split('.'):
+		member = getattr(member, name)
+	return member
@@ -0,0 +1,434 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import logging       as log
+import json
+import os
+import io
+import sys
+import socket
+from contextlib      import redirect_stdout, redirect_stderr
+from pathlib         import Path
+from threading       import Lock, Thread
+from time            import monotonic
+from typing          import Any, Callable, Iterator, TYPE_CHECKING
+
+from .exceptions     import SquishyException
+
+if TYPE_CHECKING:
+	from .device     import SquishyHardwareDevice
+
+__all__ = (
+	'SquishyDaemon',
+	'daemon_request',
+)
+
+__doc__ = '''\
+
+This module contains the Squishy daemon, a long running process that listens on a UNIX socket
+and runs commands on behalf of the thin ``squishyc`` client. Because the daemon stays running,
+the cost of importing the gateware tree, setting up libusb, and enumerating and opening devices
+is only paid once, rather than on every invocation.
+
+The protocol is newline delimited JSON. The client sends a request object with an ``op`` and any
+arguments, and the daemon replies with zero or more ``log`` and ``output`` messages followed by a
+single ``result`` message with the exit ``status``. The following ops are supported:
+
+* ``ping`` - Check the daemon is alive, the result also has the daemon ``pid``, ``version``, and ``uptime``.
+* ``exec`` - Run a ``squishy`` command, the ``argv`` (excluding ``squishy``) and ``cwd`` to run it in.
+* ``devices`` - List the devices the daemon currently has open, the result has ``devices``.
+* ``reset`` - Reset the ``device`` with the given serial number, or the only attached device.
+* ``upload`` - Upload the ``file`` into ``slot`` on the ``device``.
+* ``shutdown`` - Stop the daemon.
+
+Each client is served on its own thread, so a client holding its connection open does not keep
+anyone else waiting. The ``exec``, ``reset``, and ``upload`` ops are handled one at a time, so
+commands from multiple clients never touch the hardware at the same time, the rest are answered
+straight away, even while one of them is running.
+
+'''
+
+# How often the accept loop checks if the daemon has been shut down or has been idle for too long
+_POLL_INTERVAL = 0.1
+
+# The ops that use the hardware and redirect the process-wide logging and stdio, so can only run one at a time
+_EXCLUSIVE_OPS = frozenset(('exec', 'reset', 'upload'))
+
+class _ForwardHandler(log.Handler):
+	''' Logging handler that forwards records to the daemon client '''
+
+	def __init__(self, send: Callable[[dict[str, Any]], None]) -> None:
+		super().__init__()
+		self._send = send
+
+	def emit(self, record: log.LogRecord) -> None:
+		message = record.getMessage()
+
+		if getattr(record, 'markup', False):
+			from rich.text import Text
+			message = Text.from_markup(message).plain
+
+		self._send({ 'type': 'log', 'level': record.levelname, 'message': message })
+
+class _ForwardWriter(io.TextIOBase):
+	''' File-like object that forwards anything written to it to the daemon client '''
+
+	def __init__(self, send: Callable[[dict[str, Any]], None], stream: str) -> None:
+		super().__init__()
+		self._send   = send
+		self._stream = stream
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, data: str) -> int:
+		if len(data) > 0:
+			self._send({ 'type': 'output', 'stream': self._stream, 'data': data })
+		return len(data)
+
+class SquishyDaemon:
+	'''
+	Squishy daemon.
+
+	Parameters
+	----------
+	socket_path : pathlib.Path
+		The path of the UNIX socket to listen on.
+
+	idle_timeout : float | None
+		Shut down if no request is received for this many seconds.
+
+	Raises
+	------
+	SquishyException
+		If there is already a daemon listening on the socket.
+
+	'''
+
+	def __init__(self, socket_path: Path, idle_timeout: float | None = None) -> None:
+		self.socket_path  = socket_path
+		self.idle_timeout = idle_timeout
+
+		self._running  = False
+		self._started  = monotonic()
+		self._last_request = self._started
+		# Held while one of the exclusive ops is being handled
+		self._lock     = Lock()
+		self._devices: dict[str | None, 'SquishyHardwareDevice'] = {}
+
+		self._ops: dict[str, Callable[[dict[str, Any], Callable[[dict[str, Any]], None]], dict[str, Any]]] = {
+			'ping'    : self._op_ping,
+			'exec'    : self._op_exec,
+			'devices' : self._op_devices,
+			'reset'   : self._op_reset,
+			'upload'  : self._op_upload,
+			'shutdown': self._op_shutdown,
+		}
+
+	def _get_device(self, serial: str | None) -> 'SquishyHardwareDevice | None':
+		''' Get an open device, re-using the existing handle if it is still alive '''
+		from .device import SquishyHardwareDevice
+
+		dev = self._devices.get(serial)
+		if dev is not None:
+			if dev.is_alive():
+				log.debug(f'Re-using open device {dev}')
+				return dev
+
+			log.debug(f'Device {dev} went away, re-opening')
+			del self._devices[serial]
+
+		dev = SquishyHardwareDevice.get_device(serial = serial)
+		if dev is not None:
+			self._devices[serial] = dev
+
+		return dev
+
+	def _op_ping(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		from .. import __version__
+
+		return {
+			'status' : 0,
+			'pid'    : os.getpid(),
+			'version': __version__,
+			'uptime' : round(monotonic() - self._started, 3),
+		}
+
+	def _op_devices(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		devices = list(self._devices.values())
+
+		# Only check the devices are still there if nothing is using them, rather than waiting for it to finish
+		if not self._lock.acquire(blocking = False):
+			alive: list[bool | None] = [ None ] * len(devices)
+		else:
+			try:
+				alive = [ dev.is_alive() for dev in devices ]
+			finally:
+				self._lock.release()
+
+		return {
+			'status' : 0,
+			'devices': [
+				{ 'serial': dev.serial, 'rev': dev.rev, 'alive': dev_alive }
+				for dev, dev_alive in zip(devices, alive)
+			],
+		}
+
+	def _op_exec(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		from ..cli import build_parser
+
+		argv = request.get('argv', [])
+		parser, actions = build_parser()
+
+		try:
+			args = parser.parse_args(argv)
+		except SystemExit as e:
+			return { 'status': e.code if isinstance(e.code, int) else 1 }
+
+		if args.action == 'daemon':
+			log.error('Can not run daemon commands through the daemon')
+			return { 'status': 1 }
+
+		action = actions[args.action]
+		dev    = None
+		if action.requires_dev and not getattr(args, 'build_only', False):
+			dev = self._get_device(args.device)
+			if dev is None:
+				return { 'status': 1 }
+
+		try:
+			return { 'status': action.run(args, dev) }
+		except SystemExit as e:
+			return { 'status': e.code if isinstance(e.code, int) else 1 }
+
+	def _op_reset(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		dev = self._get_device(request.get('device'))
+		if dev is None:
+			return { 'status': 1 }
+
+		return { 'status': 0 if dev.reset() else 1 }
+
+	def _op_upload(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		from rich.progress import Progress
+
+		dev = self._get_device(request.get('device'))
+		if dev is None:
+			return { 'status': 1 }
+
+		data = Path(request['file']).read_bytes()
+		with Progress(transient = True) as progress:
+			ok = dev.upload(bytearray(data), int(request.get('slot', 1)), progress)
+
+		return { 'status': 0 if ok else 1 }
+
+	def _op_shutdown(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> dict[str, Any]:
+		log.info('Shutdown requested')
+		self._running = False
+		return { 'status': 0 }
+
+	def handle(self, request: dict[str, Any], send: Callable[[dict[str, Any]], None]) -> None:
+		'''
+		Handle a single request.
+
+		The ``exec``, ``reset``, and ``upload`` ops wait for any other one of them to finish first,
+		and while they are running, all logging as well as anything written to stdout and stderr is
+		forwarded to the client, and stdin is empty. The other ops are answered straight away.
+
+		Parameters
+		----------
+		request : dict[str, Any]
+			The decoded request.
+
+		send : Callable[[dict[str, Any]], None]
+			Called with each message to send to the client.
+
+		'''
+
+		name = request.get('op', '')
+		op   = self._ops.get(name)
+		if op is None:
+			send({ 'type': 'result', 'status': 1, 'error': f'Unknown op \'{request.get("op")}\'' })
+			return
+
+		if name not in _EXCLUSIVE_OPS:
+			try:
+				result = op(request, send)
+			except Exception as e:
+				log.exception(f'Request \'{name}\' failed')
+				result = { 'status': 1, 'error': str(e) }
+
+			send({ 'type': 'result', **result })
+			return
+
+		with self._lock:
+			if not self._running:
+				send({ 'type': 'result', 'status': 1, 'error': 'The Squishy daemon is shutting down' })
+				return
+
+			self._handle_exclusive(op, request, send)
+
+	def _handle_exclusive(
+		self, op: Callable[[dict[str, Any], Callable[[dict[str, Any]], None]], dict[str, Any]],
+		request: dict[str, Any], send: Callable[[dict[str, Any]], None]
+	) -> None:
+		root     = log.getLogger()
+		handlers = root.handlers
+		cwd      = os.getcwd()
+		forward  = _ForwardHandler(send)
+		forward.setLevel(log.DEBUG if request.get('verbose', False) else log.INFO)
+
+		level    = root.level
+		stdin    = sys.stdin
+
+		root.handlers = [ forward ]
+		root.setLevel(log.DEBUG)
+		# There is nobody on the other end to answer any prompts
+		sys.stdin = io.StringIO('')
+		try:
+			os.chdir(request.get('cwd', cwd))
+			with (
+				redirect_stdout(_ForwardWriter(send, 'stdout')),
+				redirect_stderr(_ForwardWriter(send, 'stderr')),
+			):
+				result = op(request, send)
+		except Exception as e:
+			log.exception(f'Request \'{request.get("op")}\' failed')
+			result = { 'status': 1, 'error': str(e) }
+		finally:
+			root.handlers = handlers
+			root.setLevel(level)
+			sys.stdin = stdin
+			os.chdir(cwd)
+
+		send({ 'type': 'result', **result })
+
+	def _serve_client(self, conn: socket.socket) -> None:
+		try:
+			with conn, conn.makefile('rwb') as stream:
+				def send(message: dict[str, Any]) -> None:
+					stream.write(json.dumps(message).encode('utf-8') + b'\n')
+					stream.flush()
+
+				for line in stream:
+					try:
+						request = json.loads(line)
+					except ValueError:
+						send({ 'type': 'result', 'status': 1, 'error': 'Malformed request' })
+						continue
+
+					if not self._running:
+						send({ 'type': 'result', 'status': 1, 'error': 'The Squishy daemon is shutting down' })
+						break
+
+					try:
+						self.handle(request, send)
+					finally:
+						self._last_request = monotonic()
+
+					if not self._running:
+						break
+		except (BrokenPipeError, ConnectionResetError):
+			log.debug('Client went away')
+
+	def _idle(self) -> bool:
+		''' If no request has been handled or is being handled for longer than the idle timeout '''
+		return (
+			self.idle_timeout is not None and not self._lock.locked() and
+			monotonic() - self._last_request >= self.idle_timeout
+		)
+
+	def serve(self) -> None:
+		'''
+		Listen for and handle requests until shutdown.
+
+		Raises
+		------
+		SquishyException
+			If there is already a daemon listening on the socket.
+
+		'''
+
+		if self.socket_path.exists():
+			try:
+				with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+					probe.connect(str(self.socket_path))
+				raise SquishyException(f'A Squishy daemon is already listening on \'{self.socket_path}\'')
+			except ConnectionRefusedError:
+				log.debug(f'Removing stale socket {self.socket_path}')
+				self.socket_path.unlink()
+
+		self.socket_path.parent.mkdir(parents = True, exist_ok = True)
+
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+			# Anyone who can connect can drive the hardware, so keep it to the current user from the start,
+			# rather than tightening the permissions after it has already been created
+			umask = os.umask(0o177)
+			try:
+				server.bind(str(self.socket_path))
+			finally:
+				os.umask(umask)
+			server.listen()
+			server.settimeout(_POLL_INTERVAL)
+
+			log.info(f'Squishy daemon listening on {self.socket_path}')
+			self._running      = True
+			self._last_request = monotonic()
+			try:
+				while self._running:
+					try:
+						conn, _ = server.accept()
+					except socket.timeout:
+						if self._idle():
+							log.info(f'No requests for {self.idle_timeout}s, shutting down')
+							break
+						continue
+
+					conn.settimeout(None)
+					Thread(target = self._serve_client, args = (conn,), daemon = True).start()
+			finally:
+				self._running = False
+				self.socket_path.unlink(missing_ok = True)
+				with self._lock:
+					self._devices.clear()
+
+def daemon_request(socket_path: Path, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+	'''
+	Send a request to a running Squishy daemon.
+
+	Parameters
+	----------
+	socket_path : pathlib.Path
+		The path to the daemon socket.
+
+	request : dict[str, Any]
+		The request to send.
+
+	Returns
+	-------
+	Iterator[dict[str, Any]]
+		The messages sent back by the daemon, the last of which is the ``result``.
+
+	Raises
+	------
+	SquishyException
+		If the daemon is not running, or the connection is closed before the result is received.
+
+	'''
+
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+		try:
+			conn.connect(str(socket_path))
+		except (FileNotFoundError, ConnectionRefusedError):
+			raise SquishyException(f'No Squishy daemon listening on \'{socket_path}\'')
+
+		with conn.makefile('rwb') as stream:
+			stream.write(json.dumps(request).encode('utf-8') + b'\n')
+			stream.flush()
+
+			for line in stream:
+				message = json.loads(line)
+				yield message
+
+				if message['type'] == 'result':
+					return
+
+	raise SquishyException('The Squishy daemon closed the connection before sending a result')
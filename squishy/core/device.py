@@ -465,6 +465,26 @@ class SquishyHardwareDevice:
 					log.error('Maybe check your udev rules?')
 		return devices
 
+	def is_alive(self) -> bool:
+		'''
+		Check if the device handle is still usable.
+
+		The handle becomes stale if the device is detached, or re-enumerates after
+		a reset or DFU upload.
+
+		Returns
+		-------
+		bool
+			True if the device still responds to requests, otherwise False.
+
+		'''
+
+		try:
+			self._usb_hndl.getConfiguration()
+			return True
+		except USBError:
+			return False
+
 	def get_altmodes(self):
 		return self._get_dfu_altmodes()
 
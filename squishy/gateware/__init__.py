@@ -49,6 +49,15 @@ of the SCSI machinery is for use in torii HDL projects.
 ''' # noqa: E101
 
 class Squishy(Elaboratable):
+	shared_submodules = ('pll', 'usb', 'scsi')
+	'''
+	The submodules that are the same for every applet.
+
+	These are the ones that can have their placement re-used between applet builds,
+	see :py:func:`squishy.core.build.write_placement_lock`.
+
+	'''
+
 	def _rev1_init(self) -> None:
 		# USB
 		# Re-work so the USB device is passed into the applet
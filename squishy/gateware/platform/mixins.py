@@ -1,9 +1,19 @@
 # SPDX-License-Identifier: BSD-3-Clause
 import logging          as log
 
+from hashlib            import blake2b
+from pathlib            import Path
+from tempfile           import TemporaryDirectory
+from typing             import Any
+
 from rich.progress      import Progress
 
+from torii.build.run    import BuildPlan
+
 from ...core.cache      import SquishyBitstreamCache
+from ...core.build      import (
+	run_build_plan, run_sandboxed_build_plan, scratch_root, abc9_netlist_script, explore_abc9_passes
+)
 
 __all__ = (
 	'SquishyCacheMixin',
@@ -26,17 +36,63 @@ class SquishyCacheMixin:
 
 	This shortens build times, and removes the need to re-build unchanged applets.
 
+	Parameters
+	----------
+	cache : squishy.core.cache.SquishyBitstreamCache | None
+		The bitstream cache to use, this allows for multiple platform instances to share a
+		single cache. If not set a new one is created.
+
 	'''
-	def __init__(self, *args, **kwargs) -> None:
+	def __init__(self, *args, cache: SquishyBitstreamCache | None = None, **kwargs) -> None:
 		super().__init__(*args, **kwargs)
 
-		self._cache = SquishyBitstreamCache()
+		self._cache = SquishyBitstreamCache() if cache is None else cache
+
+	@staticmethod
+	def _build_digest(plan: BuildPlan, abc9_passes: int | None) -> str:
+		''' The cache key for a build plan, including the options that change the build outside of the plan '''
+		digest = plan.digest(size = 32)
+		if abc9_passes is None:
+			return digest.hex()
+
+		hasher = blake2b(digest, digest_size = 32)
+		hasher.update(f'abc9-passes={abc9_passes}'.encode('utf-8'))
+		return hasher.hexdigest()
+
+	def _explore_mapping(
+		self, plan: BuildPlan, name: str, build_dir: str, abc9_passes: int, progress: Progress, *,
+		sandbox: bool, synth_opts: str, script_after_read: str
+	) -> tuple[dict[str, Any], bytes]:
+		''' Explore the ABC9 mapping of a design, returning the results and the best netlist '''
+
+		log.info(f'Exploring up to {abc9_passes} ABC9 mapping passes')
+
+		if not sandbox:
+			explore_dir = plan.extract(build_dir)
+			mapping = explore_abc9_passes(
+				explore_dir, name, abc9_passes, progress, synth_opts = synth_opts, script_after_read = script_after_read
+			)
+			return (mapping, (explore_dir / f'{name}.abc9.json').read_bytes())
+
+		with TemporaryDirectory(prefix = f'squishy-{name}-abc9-', dir = scratch_root()) as scratch:
+			explore_dir = plan.extract(Path(scratch))
+			mapping = explore_abc9_passes(
+				explore_dir, name, abc9_passes, progress, synth_opts = synth_opts, script_after_read = script_after_read
+			)
+			return (mapping, (explore_dir / f'{name}.abc9.json').read_bytes())
 
 	def _build_elaboratable(self, elaboratable, progress: Progress, name: str = 'top',
 				build_dir: str = 'build', do_build: bool = False,
 				program_opts: str = None, **kwargs):
 
 		skip_cache = kwargs.get('skip_cache', False)
+		# The toolchain is always run verbosely so the build monitor can see the stage markers,
+		# `verbose` then only controls whether or not that output is echoed to the terminal.
+		echo = kwargs.pop('verbose', False)
+		sandbox = kwargs.pop('sandbox', False)
+		# The maximum number of ABC9 passes to try if doing aggressive mapping
+		abc9_passes = kwargs.pop('abc9_passes', None)
+		script_after_read = kwargs.pop('script_after_read', '')
 
 		if skip_cache:
 			log.warning('Skipping cache lookup, this might take a [yellow][i]while[/][/]', extra = { 'markup': True })
@@ -45,13 +101,15 @@ class SquishyCacheMixin:
 
 		plan = super().build(elaboratable, name,
 				build_dir, do_build = False,
-				program_opts = program_opts, do_program = False, **kwargs)
+				program_opts = program_opts, do_program = False, verbose = True,
+				script_after_read = script_after_read, **kwargs)
 
 
 		if not do_build:
 			return (name, plan)
 
-		digest = plan.digest(size = 32).hex()
+		# The number of passes is only known once the mapping has been explored, so the cache is keyed on the limit
+		digest = self._build_digest(plan, abc9_passes)
 		cache_obj = self._cache.get(digest)
 
 		progress.update(task, description = 'Building Bitstream')
@@ -60,7 +118,33 @@ class SquishyCacheMixin:
 			if not skip_cache:
 				log.debug('Bitstream is not cached, building. This might take a [yellow][i]while[/][/]', extra = { 'markup': True })
 
-			prod = plan.execute_local(build_dir)
+			if abc9_passes is not None:
+				cached_mapping = None if skip_cache else self._cache.get_mapping(digest)
+
+				if cached_mapping is None:
+					synth_opts = kwargs.get('synth_opts', '')
+					if not isinstance(synth_opts, str):
+						synth_opts = ' '.join(synth_opts)
+
+					mapping, netlist = self._explore_mapping(
+						plan, name, build_dir, abc9_passes, progress,
+						sandbox = sandbox, synth_opts = synth_opts, script_after_read = script_after_read
+					)
+					if not skip_cache:
+						self._cache.store_mapping(digest, mapping, netlist)
+				else:
+					mapping, netlist = cached_mapping
+
+				log.info(f'Using the netlist from {mapping["passes"]} ABC9 mapping pass(es)')
+				# The design is already synthesized, so the build only needs to pass the netlist on to nextpnr
+				plan.files[f'{name}.abc9.json'] = netlist
+				plan.files[f'{name}.ys'] = abc9_netlist_script(name, kwargs.get('script_after_synth', ''))
+
+			if sandbox:
+				# Each design gets its own output directory so concurrent builds don't clobber each other
+				prod = run_sandboxed_build_plan(plan, Path(build_dir) / digest, name, progress, echo = echo)
+			else:
+				prod = run_build_plan(plan, Path(build_dir), name, progress, echo = echo)
 			log.debug('Bitstream built')
 
 			if not skip_cache:
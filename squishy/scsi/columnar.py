@@ -0,0 +1,267 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from typing    import NamedTuple
+
+try:
+	import numpy as np
+except ImportError: # :nocov:
+	raise ImportError(
+		'The columnar SCSI decoder requires numpy, install it with `pip install squishy[numpy]`'
+	) from None
+
+from .command  import SCSICommand
+from .device   import PeripheralDeviceType
+from .layout   import LayoutField
+from .registry import SCSICommandRegistry
+
+__all__ = (
+	'CommandColumns',
+	'cdb_array',
+	'decode_columns',
+	'decode_batch',
+)
+
+__doc__ = '''\
+
+This module contains a vectorised decoder for large numbers of CDBs, such as when post-processing
+a capture, it requires :py:mod:`numpy`.
+
+Rather than parsing each CDB into a :py:class:`construct.Container`, a buffer of fixed-size CDBs is
+viewed as a :py:mod:`numpy` array without copying it, and each field of the command is extracted for
+every CDB at once with vectorised shifts and masks, giving one array per field.
+
+The columns are named after the fields of the :py:class:`squishy.scsi.command.SCSICommand`, with the
+``opcode`` and ``control`` byte sub-fields being named by their path, e.g. ``control.link``.
+
+.. code-block:: python
+
+	from squishy.scsi.columnar        import decode_columns
+	from squishy.scsi.commands.common import Inquiry
+
+	columns = decode_columns(Inquiry, capture)
+	large   = columns['AllocLen'] > 0x24
+
+'''
+
+_CONTROL_FIELDS = (
+	('control.vendor',   6, 2),
+	('control.reserved', 2, 4),
+	('control.flag',     1, 1),
+	('control.link',     0, 1),
+)
+
+def _dtype_for(width: int, signed: bool) -> np.dtype:
+	''' Get the smallest integer type that can hold a field '''
+	for bits in (8, 16, 32, 64):
+		if width <= bits:
+			return np.dtype(f'{"i" if signed else "u"}{bits // 8}')
+	return np.dtype(object)
+
+def cdb_array(buffer: bytes | bytearray | memoryview, size: int) -> np.ndarray:
+	'''
+	View a buffer of back-to-back fixed-size CDBs as a 2D array.
+
+	Parameters
+	----------
+	buffer : bytes | bytearray | memoryview
+		The buffer of CDBs, it is not copied.
+
+	size : int
+		The size of each CDB in bytes.
+
+	Returns
+	-------
+	numpy.ndarray
+		A ``(count, size)`` ``uint8`` array.
+
+	Raises
+	------
+	ValueError
+		If the buffer is not a whole number of CDBs.
+
+	'''
+
+	data = np.frombuffer(buffer, dtype = np.uint8)
+	if data.size % size != 0:
+		raise ValueError(f'Buffer of {data.size} bytes is not a whole number of {size} byte CDBs')
+
+	return data.reshape(-1, size)
+
+def _aligned_view(cdbs: np.ndarray, fields: tuple[LayoutField, ...]) -> np.ndarray | None:
+	''' Get a structured view of the CDBs covering all of the byte-aligned power-of-two sized fields '''
+	names, formats, offsets = [], [], []
+
+	for idx, field in enumerate(fields):
+		if field.offset % 8 != 0 or field.width not in (8, 16, 32, 64):
+			continue
+
+		endian = '<' if field.little_endian else '>'
+		names.append(f'f{idx}')
+		formats.append(f'{endian}{"i" if field.signed else "u"}{field.width // 8}')
+		offsets.append(field.offset // 8)
+
+	if len(names) == 0 or not cdbs.flags.c_contiguous:
+		return None
+
+	dtype = np.dtype({ 'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': cdbs.shape[1] })
+	return cdbs.reshape(-1).view(dtype)
+
+def _field_column(cdbs: np.ndarray, field: LayoutField) -> np.ndarray:
+	''' Extract a single field from every CDB with shifts and masks '''
+
+	first = field.offset // 8
+	last  = (field.offset + field.width - 1) // 8
+
+	# A field wider than 64-bits, or spanning more than 8 bytes, won't fit in a uint64
+	if last - first >= 8:
+		return np.array([
+			_field_value(bytes(cdb), field) for cdb in cdbs
+		], dtype = object)
+
+	value = np.zeros(cdbs.shape[0], dtype = np.uint64)
+	for byte in range(first, last + 1):
+		value = (value << np.uint64(8)) | cdbs[:, byte]
+
+	value = (value >> np.uint64((last + 1) * 8 - field.offset - field.width)) & np.uint64(field.mask)
+
+	if field.little_endian:
+		count   = field.width // 8
+		swapped = np.zeros_like(value)
+		for idx in range(count):
+			swapped |= ((value >> np.uint64(8 * (count - 1 - idx))) & np.uint64(0xFF)) << np.uint64(8 * idx)
+		value = swapped
+
+	if field.signed:
+		half  = 1 << (field.width - 1)
+		value = (value.astype(np.int64) ^ half) - half
+
+	return value.astype(_dtype_for(field.width, field.signed))
+
+def _field_value(cdb: bytes, field: LayoutField) -> int:
+	''' Extract a single field from a CDB, for fields that are too wide to vectorise '''
+	bits  = len(cdb) * 8
+	value = (int.from_bytes(cdb, 'big') >> (bits - field.offset - field.width)) & field.mask
+
+	if field.little_endian:
+		value = int.from_bytes(value.to_bytes(field.width // 8, 'big'), 'little')
+	if field.signed and value >> (field.width - 1):
+		value -= 1 << field.width
+
+	return value
+
+def decode_columns(command: SCSICommand, buffer: bytes | bytearray | memoryview | np.ndarray) -> dict[str, np.ndarray]:
+	'''
+	Decode a buffer of CDBs for the same command into columns.
+
+	Parameters
+	----------
+	command : squishy.scsi.command.SCSICommand
+		The command the CDBs are for, it must have a compiled layout.
+
+	buffer : bytes | bytearray | memoryview | numpy.ndarray
+		The back-to-back CDBs, or a ``(count, size)`` array of them.
+
+	Returns
+	-------
+	dict[str, numpy.ndarray]
+		An array for each field, along with the ``opcode`` and ``control`` bytes and their sub-fields.
+
+	Raises
+	------
+	ValueError
+		If the command has no compiled layout, or the CDBs are not all for the command.
+
+	'''
+
+	layout = command.layout
+	if layout is None:
+		raise ValueError(f'{command!r} has no compiled layout and can\'t be decoded into columns')
+
+	cdbs = buffer if isinstance(buffer, np.ndarray) else cdb_array(buffer, layout.size)
+	if cdbs.shape[1] != layout.size:
+		raise ValueError(f'Expected {layout.size} byte CDBs, got {cdbs.shape[1]} byte CDBs')
+
+	opcode = cdbs[:, 0]
+	if not np.all(opcode == layout.opcode):
+		raise ValueError(f'Not all CDBs have the opcode 0x{layout.opcode:02X}')
+
+	control = cdbs[:, -1]
+	columns = {
+		'opcode'        : opcode,
+		'opcode.group'  : opcode >> 5,
+		'opcode.command': opcode & 0x1F,
+	}
+
+	aligned = _aligned_view(cdbs, layout.fields)
+	for idx, field in enumerate(layout.fields):
+		if aligned is not None and f'f{idx}' in aligned.dtype.names:
+			column = aligned[f'f{idx}'].astype(_dtype_for(field.width, field.signed))
+		else:
+			column = _field_column(cdbs, field)
+
+		# As with parsing, when a field name is repeated the last one wins
+		columns[field.name] = column
+
+	columns['control'] = control
+	for name, shift, width in _CONTROL_FIELDS:
+		columns[name] = (control >> shift) & ((1 << width) - 1)
+
+	return columns
+
+class CommandColumns(NamedTuple):
+	''' The CDBs in a batch for a single opcode '''
+
+	command: SCSICommand | None
+	''' The command, or ``None`` if there is no command registered for the opcode '''
+
+	index: np.ndarray
+	''' The index of each of the CDBs in the batch '''
+
+	columns: dict[str, np.ndarray]
+	''' The decoded fields, or just the ``opcode`` if the command is unknown '''
+
+def decode_batch(
+	registry: SCSICommandRegistry, device_type: PeripheralDeviceType,
+	buffer: bytes | bytearray | memoryview, size: int
+) -> dict[int, CommandColumns]:
+	'''
+	Decode a buffer of back-to-back CDBs of the same size.
+
+	The CDBs are grouped by opcode, and each group is decoded into columns with :py:func:`decode_columns`.
+
+	Parameters
+	----------
+	registry : squishy.scsi.registry.SCSICommandRegistry
+		The registry to look the commands up in.
+
+	device_type : squishy.scsi.device.PeripheralDeviceType
+		The type of the device the commands were sent to.
+
+	buffer : bytes | bytearray | memoryview
+		The buffer of CDBs.
+
+	size : int
+		The size of each CDB, i.e. 6, 10, or 12 for group 0, group 1, and group 5 commands.
+
+	Returns
+	-------
+	dict[int, CommandColumns]
+		The decoded CDBs for each opcode in the buffer.
+
+	'''
+
+	cdbs    = cdb_array(buffer, size)
+	opcodes = cdbs[:, 0]
+	batches = {}
+
+	for opcode in np.unique(opcodes):
+		opcode  = int(opcode)
+		index   = np.flatnonzero(opcodes == opcode)
+		command = registry.lookup(device_type, opcode)
+
+		if command is None or command.layout is None or command.layout.size != size:
+			batches[opcode] = CommandColumns(None, index, { 'opcode': opcodes[index] })
+		else:
+			batches[opcode] = CommandColumns(command, index, decode_columns(command, cdbs[index]))
+
+	return batches
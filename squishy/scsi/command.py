@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from enum      import IntEnum, unique
+from functools import cached_property
 from itertools import takewhile
 from typing    import Any
 
@@ -11,9 +12,11 @@ from construct import (
 	Int8ub, Int16ub, Int24ub, Int32ub, Int64ub,
 	Int8sb, Int16sb, Int24sb, Int32sb, Int64sb,
 	BytesInteger, Bytewise,
-	BitStruct, BitsInteger, Bitwise
+	BitStruct, BitsInteger, Bitwise, Container
 )
 
+from .layout   import CommandLayout
+
 __all__ = (
 	'GroupCode',
 	'SCSICommand',
@@ -633,14 +636,104 @@ class SCSICommand(Struct):
 
 		return self.sizeof() // 8
 
-	def parse(self, data, **ctxkw):
+	@cached_property
+	def layout(self) -> CommandLayout | None:
+		''' The compiled layout of this command, or ``None`` if it can't be compiled '''
+		return CommandLayout.from_command(self)
+
+	@cached_property
+	def field_names(self) -> frozenset[str]:
+		''' The names of all of the fields in this command '''
+		return frozenset(sc.name for sc in self.subcons if sc.name is not None)
+
+	@cached_property
+	def _bitwise(self) -> Bitwise:
+		return Bitwise(self)
+
+	def parse(self, data: bytes | bytearray | memoryview, **ctxkw) -> Container:
+		'''
+		Parse a SCSI command descriptor block.
+
+		If the command has a compiled :py:attr:`layout` then it is used, otherwise the
+		command is parsed with :py:mod:`construct`.
 
-		res = super().parse(bytes(data), **ctxkw)
+		Parameters
+		----------
+		data : bytes | bytearray | memoryview
+			The CDB to parse.
+
+		Returns
+		-------
+		construct.Container
+			The parsed command.
+
+		'''
+
+		layout = self.layout
+		if layout is None or len(ctxkw) > 0:
+			res = self._bitwise.parse(bytes(data), **ctxkw)
+		else:
+			res = layout.parse(data)
 
 		res._format = self
 
 		return res
 
+	def build(self, obj: dict[str, Any], **ctxkw) -> bytes:
+		'''
+		Build a SCSI command descriptor block.
+
+		If the command has a compiled :py:attr:`layout` then it is used, otherwise the
+		command is built with :py:mod:`construct`.
+
+		Parameters
+		----------
+		obj : dict[str, Any]
+			The values of the command fields.
+
+		Returns
+		-------
+		bytes
+			The CDB.
+
+		'''
+
+		layout = self.layout
+		if layout is None or len(ctxkw) > 0:
+			return self._bitwise.build(obj, **ctxkw)
+
+		return layout.build(obj)
+
+	def build_into(self, obj: dict[str, Any], buffer: bytearray | memoryview, offset: int = 0) -> int:
+		'''
+		Build a SCSI command descriptor block directly into a buffer.
+
+		Parameters
+		----------
+		obj : dict[str, Any]
+			The values of the command fields.
+
+		buffer : bytearray | memoryview
+			The buffer to write the CDB into.
+
+		offset : int
+			The offset into ``buffer`` to write the CDB at.
+
+		Returns
+		-------
+		int
+			The number of bytes written.
+
+		'''
+
+		layout = self.layout
+		if layout is None:
+			data = self._bitwise.build(obj)
+			buffer[offset:offset + len(data)] = data
+			return len(data)
+
+		return layout.build_into(obj, buffer, offset)
+
 class SCSICommand6(SCSICommand):
 	'''
 	Six-byte SCSI Command
@@ -861,6 +954,18 @@ class CommandEmitter:
 		# b\'\\x00\\x15\'
 		cmd.emit()
 
+	When generating lots of commands, the emitter can be re-used, and the commands written
+	straight into a pre-allocated buffer:
+
+	.. code-block:: python
+
+		buffer = bytearray(len(values) * Command.len())
+		e = CommandEmitter(Command)
+
+		for idx, value in enumerate(values):
+			e.Bar = value
+			e.emit_into(buffer, idx * Command.len())
+
 	Parameters
 	----------
 	command : SCSICommand
@@ -871,6 +976,7 @@ class CommandEmitter:
 	def __init__(self, command: SCSICommand) -> None:
 		self.__dict__['format'] = command
 		self.__dict__['fields'] = {}
+		self.__dict__['_names'] = command.field_names
 
 	def __enter__(self) -> 'CommandEmitter':
 		return self
@@ -905,7 +1011,7 @@ class CommandEmitter:
 			super().__setattr__(name, value)
 			return
 
-		if not any(filter(lambda f: f.name == name, self.format.subcons)):
+		if name not in self._names:
 			raise AttributeError(f'command contains no field called \'{name}\'')
 
 		self.fields[name] = value
@@ -942,11 +1048,6 @@ class CommandEmitter:
 
 		Takes the assigned fields and generates a byte string from the specified format.
 
-		Warning
-		-------
-		This method wraps the internal :py:class:`construct.Subconstruct` in a :py:func:`construct.Bitwise`
-		to serialize the structure to bytes.
-
 		Returns
 		-------
 		bytes
@@ -960,6 +1061,41 @@ class CommandEmitter:
 		'''
 
 		try:
-			return Bitwise(self.format).build(self.fields)
+			return self.format.build(self.fields)
+		except KeyError as e:
+			raise KeyError(f'Missing required field {e}')
+
+	def emit_into(self, buffer: bytearray | memoryview, offset: int = 0) -> int:
+		'''
+		Emit bytes into a buffer
+
+		Takes the assigned fields and writes the serialized command directly into ``buffer``.
+
+		Parameters
+		----------
+		buffer : bytearray | memoryview
+			The buffer to write the command into.
+
+		offset : int
+			The offset into ``buffer`` to write the command at.
+
+		Returns
+		-------
+		int
+			The number of bytes written.
+
+		Raises
+		------
+		KeyError
+			If missing a required field for the command.
+
+		'''
+
+		try:
+			return self.format.build_into(self.fields, buffer, offset)
 		except KeyError as e:
 			raise KeyError(f'Missing required field {e}')
+
+	def reset(self) -> None:
+		''' Clear all of the assigned fields so the emitter can be re-used '''
+		self.fields.clear()
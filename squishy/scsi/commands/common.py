@@ -179,7 +179,8 @@ logical block length of the data on the medium.
 
 The value of the ``Sense Key`` field is described as follows:
 
-.. todo:: Move this to an enum in command.py
+These are also available as :py:class:`squishy.scsi.response.SenseKey`, and sense data can be
+inspected with :py:func:`squishy.scsi.response.parse_sense`.
 
 +-----------+---------------------------------------------------+
 | Sense Key | Description                                       |
@@ -678,7 +679,7 @@ CopyAndVerify = SCSICommand10(0x1A,
 	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
 	'Reserved' / SCSICommandField(default = 0, length = 3),
 	'BytChk'   / SCSICommandField('', default = 0, length = 1),
-	'Reserved' / SCSICommandField('', default = 0, length = 1),
+	'Reserved' / SCSICommandField('', default = 0, length = 9),
 	'ParamLen' / SCSICommandField('Length of the parameter list in bytes', length = 24),
 	'Reserved' / SCSICommandField(default = 0, length = 24)
 )
@@ -1,208 +1,240 @@
 # SPDX-License-Identifier: BSD-3-Clause
-from construct import *
+
+from ..command import (
+	SCSICommand6, SCSICommand10,
+	SCSICommandField
+)
 
 __doc__ = '''
 This module defines the commands that are specific to direct
 access devices.
+
+Many of these commands are shared with WORM and read-only direct access
+devices, see :py:mod:`squishy.scsi.commands.worm` and :py:mod:`squishy.scsi.commands.ro_direct`.
 '''
 
 __all__ = (
-	'rezero_unit',
-	'format_unit',
-	'reassign_blocks',
-	'read',
-	'write',
-	'seek',
-	'mode_select',
-	'reserve',
-	'release',
-	'mode_sense',
-	'start_stop_unit',
-	'prevent_allow_media_removal',
-	'read_capacity',
-	'read',
-	'write',
-	'seek',
-	'write_and_verify',
-	'verify',
-	'search_data',
-	'set_limits',
-)
-
-rezero_unit = 'Re-Zero Unit' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(29),
-)
-''' Re-Zero Unit - Group: 0 | Peripheral Device: Direct Access | Type: Optional '''
-
-format_unit = 'Format Unit' / BitStruct(
-	'LUN'           / BitsInteger(3),
-	'FormatData'    / Flag,
-	'CompareList'   / Flag,
-	'DefectListFmt' / BitsInteger(3),
-	'Vendor'        / Int8ul,
-	'Interleave'    / Int16ul,
+	'RezeroUnit',
+	'FormatUnit',
+	'ReassignBlocks',
+	'Read6',
+	'Write6',
+	'Seek6',
+	'ModeSelect',
+	'Reserve',
+	'Release',
+	'ModeSense',
+	'StartStopUnit',
+	'PreventAllowMediaRemoval',
+	'ReadCapacity',
+	'Read10',
+	'Write10',
+	'Seek10',
+	'WriteAndVerify',
+	'Verify',
+	'SearchDataHigh',
+	'SearchDataEqual',
+	'SearchDataLow',
+	'SetLimits',
+)
+
+RezeroUnit = SCSICommand6(0x01,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 29),
+)
+''' Re-Zero Unit - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
+
+FormatUnit = SCSICommand6(0x04,
+	'LUN'           / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'FormatData'    / SCSICommandField('Format data is sent to the target', default = 0, length = 1),
+	'CompareList'   / SCSICommandField('Replace the existing defect list', default = 0, length = 1),
+	'DefectListFmt' / SCSICommandField('Format of the defect list', default = 0, length = 3),
+	'Vendor'        / SCSICommandField(default = 0, length = 8),
+	'Interleave'    / SCSICommandField('Interleave factor', default = 0, length = 16),
 )
 ''' Format Unit - Group: 0 | Peripheral Device: Direct Access | Type: Mandatory '''
 
-reassign_blocks = 'Reassign Blocks' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(29),
+ReassignBlocks = SCSICommand6(0x07,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 29),
 )
 ''' Reassign Blocks - Group: 0 | Peripheral Device: Direct Access, WORM | Type: Optional '''
 
-read = 'Read' / BitStruct(
-	'LUN'   / BitsInteger(3),
-	'LBA'   / BitsInteger(21),
-	'TxLen' / Int8ul,
+Read6 = SCSICommand6(0x08,
+	'LUN'   / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'LBA'   / SCSICommandField('Logical Block Address', length = 21),
+	'TxLen' / SCSICommandField('Number of blocks to transfer', length = 8),
 )
-''' Read - Group: 0 | Peripheral Device: Direct Access | Type: Mandatory '''
+''' Read - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Mandatory '''
 
-write = 'Write' / BitStruct(
-	'LUN'   / BitsInteger(3),
-	'LBA'   / BitsInteger(21),
-	'TxLen' / Int8ul,
+Write6 = SCSICommand6(0x0A,
+	'LUN'   / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'LBA'   / SCSICommandField('Logical Block Address', length = 21),
+	'TxLen' / SCSICommandField('Number of blocks to transfer', length = 8),
 )
-''' Write - Group: 0 | Peripheral Device: Direct Access | Type: Mandatory '''
+''' Write - Group: 0 | Peripheral Device: Direct Access, WORM | Type: Mandatory '''
 
-seek = 'Seek' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'LBA'      / BitsInteger(21),
-	'Reserved' / Int8ul,
+Seek6 = SCSICommand6(0x0B,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'LBA'      / SCSICommandField('Logical Block Address', length = 21),
+	'Reserved' / SCSICommandField(default = 0, length = 8),
 )
 ''' Seek - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-mode_select = 'Mode Select' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(21),
-	'ParamLen' / Int8ul,
+ModeSelect = SCSICommand6(0x15,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 21),
+	'ParamLen' / SCSICommandField('Length of the parameter list in bytes', length = 8),
 )
-''' Mode Select - Group: 0 | Peripheral Device: Direct Access | Type: Optional '''
+''' Mode Select - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-reserve = 'Reserve' / BitStruct(
-	'LUN'           / BitsInteger(3),
-	'ThirdParty'    / Flag,
-	'ThirdPartyDID' / BitsInteger(3),
-	'Extent'        / Flag,
-	'ReservationID' / Int8ul,
-	'ExtentListLen' / Int16ul,
+Reserve = SCSICommand6(0x16,
+	'LUN'           / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'ThirdParty'    / SCSICommandField('Reserve for a third party device', default = 0, length = 1),
+	'ThirdPartyDID' / SCSICommandField('Third party device ID', default = 0, length = 3),
+	'Extent'        / SCSICommandField('Reserve extents rather than the whole unit', default = 0, length = 1),
+	'ReservationID' / SCSICommandField('Reservation identification', default = 0, length = 8),
+	'ExtentListLen' / SCSICommandField('Length of the extent list in bytes', default = 0, length = 16),
 )
 ''' Reserve - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-release = 'Release' / BitStruct(
-	'LUN'           / BitsInteger(3),
-	'ThirdParty'    / Flag,
-	'ThirdPartyDID' / BitsInteger(3),
-	'Extent'        / Flag,
-	'ReservationID' / Int8ul,
-	'Reserved'      / Int16ul,
+Release = SCSICommand6(0x17,
+	'LUN'           / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'ThirdParty'    / SCSICommandField('Release for a third party device', default = 0, length = 1),
+	'ThirdPartyDID' / SCSICommandField('Third party device ID', default = 0, length = 3),
+	'Extent'        / SCSICommandField('Release an extent rather than the whole unit', default = 0, length = 1),
+	'ReservationID' / SCSICommandField('Reservation identification', default = 0, length = 8),
+	'Reserved'      / SCSICommandField(default = 0, length = 16),
 )
 ''' Release - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-mode_sense = 'Mode Sense' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(21),
-	'AllocLen' / Int8ul,
+ModeSense = SCSICommand6(0x1A,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 21),
+	'AllocLen' / SCSICommandField('Receive buffer size allocation', length = 8),
 )
-''' Mode Sense - Group: 0 | Peripheral Device: Direct Access | Type: Optional '''
+''' Mode Sense - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-start_stop_unit = 'Start/Stop Unit' / BitStruct(
-	'LUN'       / BitsInteger(3),
-	'Reserved'  / BitsInteger(4),
-	'Immediate' / Flag,
-	'Reserved'  / BitsInteger(23),
-	'Start'     / Flag,
+StartStopUnit = SCSICommand6(0x1B,
+	'LUN'       / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'  / SCSICommandField(default = 0, length = 4),
+	'Immediate' / SCSICommandField('Return status as soon as the operation is started', default = 0, length = 1),
+	'Reserved'  / SCSICommandField(default = 0, length = 23),
+	'Start'     / SCSICommandField('Start rather than stop the unit', default = 0, length = 1),
 )
-''' Start/Stop Unit - Group: 0 | Peripheral Device: Direct Access | Type: Optional '''
+''' Start/Stop Unit - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-prevent_allow_media_removal = 'Prevent/Allow Media Removal' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(28),
-	'Prevent'  / Flag,
+PreventAllowMediaRemoval = SCSICommand6(0x1E,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 28),
+	'Prevent'  / SCSICommandField('Prevent the removal of the media', default = 0, length = 1),
 )
 ''' Prevent/Allow Media Removal - Group: 0 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
 
-read_capacity = 'Read Capacity' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(4),
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int16ul,
-	'Vendor'       / BitsInteger(2),
-	'Reserved'     / BitsInteger(5),
-	'PMI'          / Flag,
+ReadCapacity = SCSICommand10(0x05,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 4),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', default = 0, length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 16),
+	'Reserved'     / SCSICommandField(default = 0, length = 7),
+	'PMI'          / SCSICommandField('Partial Medium Indicator', default = 0, length = 1),
 )
 ''' Read Capacity - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Extended '''
 
-read = 'Read (Direct Access)' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(4),
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'TXLen'        / Int16ul,
-)
-''' Direct Access Read - Group: 1 | Peripheral Device: Direct Access | Type: Extended '''
-
-write = 'Write (Direct Access)' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(4),
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'TXLen'        / Int16ul,
-)
-''' Direct Access Write - Group: 1 | Peripheral Device: Direct Access | Type: Extended '''
-
-seek = 'Seek (Direct Access)' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(5),
-	'LBA'          / Int32ul,
-	'Reserved'     / Int24ul,
-)
-''' Direct Access Seek - Group: 1 | Peripheral Device: Direct Access | Type: Extended '''
-
-write_and_verify = 'Write and Verify' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(3),
-	'ByteCheck'    / Flag,
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'TXLen'        / Int16ul,
-)
-''' Write and Verify - Group: 1 | Peripheral Device: Direct Access | Type: Optional '''
-
-verify = 'Verify' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(3),
-	'ByteCheck'    / Flag,
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'VerifLen'     / Int16ul,
-)
-''' Verify - Group: 1 | Peripheral Device: Direct Access | Type: Optional '''
-
-search_data = 'Search Data' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Invert'       / Flag,
-	'Reserved'     / BitsInteger(2),
-	'SpannedData'  / Flag,
-	'RelativeAddr' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'TXLen'        / Int16ul,
-)
-''' Search Data - Group: 1 | Peripheral Device: Direct Access | Type: Optional '''
-
-set_limits = 'Set Limits' / BitStruct(
-	'LUN'          / BitsInteger(3),
-	'Reserved'     / BitsInteger(3),
-	'ReadInhibit'  / Flag,
-	'WriteInhibit' / Flag,
-	'LBA'          / Int32ul,
-	'Reserved'     / Int8ul,
-	'BlkCount'     / Int16ul,
-)
-''' Set Limits - Group: 1 | Peripheral Device: Direct Access | Type: Optional '''
+Read10 = SCSICommand10(0x08,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 4),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to transfer', length = 16),
+)
+''' Direct Access Read - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Extended '''
+
+Write10 = SCSICommand10(0x0A,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 4),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to transfer', length = 16),
+)
+''' Direct Access Write - Group: 1 | Peripheral Device: Direct Access, WORM | Type: Extended '''
+
+Seek10 = SCSICommand10(0x0B,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 5),
+	'LBA'      / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved' / SCSICommandField(default = 0, length = 24),
+)
+''' Direct Access Seek - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Extended '''
+
+WriteAndVerify = SCSICommand10(0x0E,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 3),
+	'ByteCheck'    / SCSICommandField('Compare the data byte by byte', default = 0, length = 1),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to transfer', length = 16),
+)
+''' Write and Verify - Group: 1 | Peripheral Device: Direct Access, WORM | Type: Optional '''
+
+Verify = SCSICommand10(0x0F,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 3),
+	'ByteCheck'    / SCSICommandField('Compare the data byte by byte', default = 0, length = 1),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'VerifLen'     / SCSICommandField('Number of blocks to verify', length = 16),
+)
+''' Verify - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
+
+SearchDataHigh = SCSICommand10(0x10,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Invert'       / SCSICommandField('Invert the search condition', default = 0, length = 1),
+	'Reserved'     / SCSICommandField(default = 0, length = 2),
+	'SpannedData'  / SCSICommandField('Records may span blocks', default = 0, length = 1),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to search', length = 16),
+)
+''' Search Data High - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
+
+SearchDataEqual = SCSICommand10(0x11,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Invert'       / SCSICommandField('Invert the search condition', default = 0, length = 1),
+	'Reserved'     / SCSICommandField(default = 0, length = 2),
+	'SpannedData'  / SCSICommandField('Records may span blocks', default = 0, length = 1),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to search', length = 16),
+)
+''' Search Data Equal - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
+
+SearchDataLow = SCSICommand10(0x12,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Invert'       / SCSICommandField('Invert the search condition', default = 0, length = 1),
+	'Reserved'     / SCSICommandField(default = 0, length = 2),
+	'SpannedData'  / SCSICommandField('Records may span blocks', default = 0, length = 1),
+	'RelativeAddr' / SCSICommandField('The LBA is relative to the last linked command', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'TxLen'        / SCSICommandField('Number of blocks to search', length = 16),
+)
+''' Search Data Low - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
+
+SetLimits = SCSICommand10(0x13,
+	'LUN'          / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'     / SCSICommandField(default = 0, length = 3),
+	'ReadInhibit'  / SCSICommandField('Inhibit reads outside of the limits', default = 0, length = 1),
+	'WriteInhibit' / SCSICommandField('Inhibit writes outside of the limits', default = 0, length = 1),
+	'LBA'          / SCSICommandField('Logical Block Address', length = 32),
+	'Reserved'     / SCSICommandField(default = 0, length = 8),
+	'BlkCount'     / SCSICommandField('Number of blocks in the limits', length = 16),
+)
+''' Set Limits - Group: 1 | Peripheral Device: Direct Access, WORM, RO DA | Type: Optional '''
@@ -1,42 +1,67 @@
 # SPDX-License-Identifier: BSD-3-Clause
-from construct import *
+
+from ..command   import (
+	SCSICommand6,
+	SCSICommandField
+)
+from .sequential import RecoverBufferedData, ModeSelect, Reserve, Release, ModeSense
 
 __doc__ = '''
-This module defines the commands that are specific to printers
+This module defines the commands that are specific to printers.
+
+Printers share ``RECOVER BUFFERED DATA``, ``MODE SELECT``, ``RESERVE UNIT``, ``RELEASE UNIT``
+and ``MODE SENSE`` with sequential access devices, so those are re-exported from
+:py:mod:`squishy.scsi.commands.sequential`.
 '''
 
 __all__ = (
-	'format_printer',
-	'print_cmd',
-	'slew_and_print',
-	'flush_buffer',
-	'recover_buffered_data',
+	'Format',
+	'Print',
+	'SlewAndPrint',
+	'FlushBuffer',
+	'RecoverBufferedData',
+	'ModeSelect',
+	'Reserve',
+	'Release',
+	'ModeSense',
+	'StopPrint',
 )
 
-format_printer = 'Format (Printer)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(3),
-	'Type'     / BitsInteger(2),
-	'TxLen'    / Int24ul,
+Format = SCSICommand6(0x04,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 3),
+	'Type'     / SCSICommandField('Format type', default = 0, length = 2),
+	'TxLen'    / SCSICommandField('Number of bytes of format data', length = 24),
 )
 ''' Format - Group: 0 | Peripheral Device: Printer | Type: Optional '''
 
-print_cmd = 'Print' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(5),
-	'TxLen'    / Int24ul,
+Print = SCSICommand6(0x0A,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 5),
+	'TxLen'    / SCSICommandField('Number of bytes to print', length = 24),
 )
 ''' Print - Group: 0 | Peripheral Device: Printer | Type: Mandatory '''
 
-slew_and_print = 'Slew and Print' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Channel'  / BitsInteger(1),
+SlewAndPrint = SCSICommand6(0x0B,
+	'LUN'       / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'  / SCSICommandField(default = 0, length = 4),
+	'Channel'   / SCSICommandField('The slew value is a channel number rather than a line count', default = 0, length = 1),
+	'SlewValue' / SCSICommandField('Number of lines or channel to slew to', default = 0, length = 8),
+	'TxLen'     / SCSICommandField('Number of bytes to print', length = 16),
 )
 ''' Slew and Print - Group: 0 | Peripheral Device: Printer | Type: Optional '''
 
-flush_buffer = 'Flush Buffer' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(28),
+FlushBuffer = SCSICommand6(0x10,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 29),
 )
 ''' Flush Buffer - Group: 0 | Peripheral Device: Printer | Type: Optional '''
+
+StopPrint = SCSICommand6(0x1B,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Retain'   / SCSICommandField('Retain the buffered data so printing can be resumed', default = 0, length = 1),
+	'Vendor'   / SCSICommandField(default = 0, length = 16),
+	'Reserved' / SCSICommandField(default = 0, length = 8),
+)
+''' Stop Print - Group: 0 | Peripheral Device: Printer | Type: Optional '''
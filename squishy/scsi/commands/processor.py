@@ -1,9 +1,29 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from ..command import (
+	SCSICommand6,
+	SCSICommandField
+)
+
 __doc__ = '''
 This module defines the commands that are specific to processors.
 '''
 
 __all__ = (
+	'Receive',
+	'Send',
+)
+
+Receive = SCSICommand6(0x08,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 5),
+	'AllocLen' / SCSICommandField('Receive buffer size allocation', length = 24),
+)
+''' Receive - Group: 0 | Peripheral Device: Processor | Type: Optional '''
 
+Send = SCSICommand6(0x0A,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 5),
+	'TxLen'    / SCSICommandField('Number of bytes to send', length = 24),
 )
+''' Send - Group: 0 | Peripheral Device: Processor | Type: Mandatory '''
@@ -1,10 +1,35 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from .direct import (
+	RezeroUnit, Read6, Seek6, ModeSelect, Reserve, Release, ModeSense, StartStopUnit,
+	PreventAllowMediaRemoval, ReadCapacity, Read10, Seek10, Verify, SearchDataHigh,
+	SearchDataEqual, SearchDataLow, SetLimits
+)
+
 __doc__ = '''
 This module defines the commands that are specific to read-only direct
 access devices.
+
+Read-only direct access devices use the commands of direct access devices that
+don't write to the medium, so they are re-exported from :py:mod:`squishy.scsi.commands.direct`.
 '''
 
 __all__ = (
-
+	'RezeroUnit',
+	'Read6',
+	'Seek6',
+	'ModeSelect',
+	'Reserve',
+	'Release',
+	'ModeSense',
+	'StartStopUnit',
+	'PreventAllowMediaRemoval',
+	'ReadCapacity',
+	'Read10',
+	'Seek10',
+	'Verify',
+	'SearchDataHigh',
+	'SearchDataEqual',
+	'SearchDataLow',
+	'SetLimits',
 )
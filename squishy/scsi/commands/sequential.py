@@ -1,5 +1,9 @@
 # SPDX-License-Identifier: BSD-3-Clause
-from construct import *
+
+from ..command import (
+	SCSICommand6,
+	SCSICommandField
+)
 
 __doc__ = '''
 This module defines the commands that are specific to sequential
@@ -7,152 +11,153 @@ access devices.
 '''
 
 __all__ = (
-	'rewind',
-	'read_block_limits',
-	'read',
-	'write',
-	'track_select',
-	'read_reverse',
-	'write_filemarks',
-	'space',
-	'verify',
-	'recover_buffered_data',
-	'mode_select',
-	'reserve',
-	'release',
-	'erase',
-	'mode_sense',
-	'load_unload',
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory
-rewind = 'Rewind' / BitStruct(
-	'LUN'       / BitsInteger(3),
-	'Reserved'  / BitsInteger(4),
-	'Immediate' / Flag,
-	'Reserved'  / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Extended
-read_block_limits = 'Read Block Limits' / BitStruct(
-	'LUN'       / BitsInteger(3),
-	'Reserved'  / BitsInteger(29),
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory
-read = 'Read (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Fixed'    / Flag,
-	'TXLen'    / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory
-write = 'Write (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Fixed'    / Flag,
-	'TXLen'    / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-track_select = 'Track Select' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(21),
-	'TrackVal' / Int8ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-read_reverse = 'Read Reversed' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Fixed'    / Flag,
-	'TXLen'    / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory
-write_filemarks = 'Write Filemarks' / BitStruct(
-	'LUN'         / BitsInteger(3),
-	'Reserved'    / BitsInteger(5),
-	'FilemarkNum' / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-space = 'Space' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(3),
-	'Code'     / BitsInteger(2),
-	'Count'    / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-verify = 'Verify (Sequential)' / BitStruct(
-	'LUN'       / BitsInteger(3),
-	'Reserved'  / BitsInteger(3),
-	'ByteCmp'   / Flag,
-	'Fixed'     / Flag,
-	'VerifyLen' / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-recover_buffered_data = 'Recover Buffered Date' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Fixed'    / Flag,
-	'TXLen'    / Int24ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-mode_select = 'Mode Select (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(21),
-	'ParamLen' / Int8ul,
-)
-
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-reserve = 'Reserve Unit (Sequential)' / BitStruct(
-	'LUN'           / BitsInteger(3),
-	'ThirdParty'    / Flag,
-	'ThirdPartyDID' / BitsInteger(3),
-	'Reserved'      / BitsInteger(25),
+	'Rewind',
+	'ReadBlockLimits',
+	'Read',
+	'Write',
+	'TrackSelect',
+	'ReadReverse',
+	'WriteFilemarks',
+	'Space',
+	'Verify',
+	'RecoverBufferedData',
+	'ModeSelect',
+	'Reserve',
+	'Release',
+	'Erase',
+	'ModeSense',
+	'LoadUnload',
+	'PreventAllowMediaRemoval',
+)
+
+Rewind = SCSICommand6(0x01,
+	'LUN'       / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'  / SCSICommandField(default = 0, length = 4),
+	'Immediate' / SCSICommandField('Return status as soon as the operation is started', default = 0, length = 1),
+	'Reserved'  / SCSICommandField(default = 0, length = 24),
+)
+''' Rewind - Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory '''
+
+ReadBlockLimits = SCSICommand6(0x05,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 29),
+)
+''' Read Block Limits - Group: 0 | Peripheral Device: Sequential Access | Type: Extended '''
+
+Read = SCSICommand6(0x08,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Fixed'    / SCSICommandField('The transfer length is in blocks rather than bytes', default = 0, length = 1),
+	'TxLen'    / SCSICommandField('Number of blocks or bytes to transfer', length = 24),
+)
+''' Read - Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory '''
+
+Write = SCSICommand6(0x0A,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Fixed'    / SCSICommandField('The transfer length is in blocks rather than bytes', default = 0, length = 1),
+	'TxLen'    / SCSICommandField('Number of blocks or bytes to transfer', length = 24),
+)
+''' Write - Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory '''
+
+TrackSelect = SCSICommand6(0x0B,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 21),
+	'TrackVal' / SCSICommandField('Track to select', length = 8),
+)
+''' Track Select - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+ReadReverse = SCSICommand6(0x0F,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Fixed'    / SCSICommandField('The transfer length is in blocks rather than bytes', default = 0, length = 1),
+	'TxLen'    / SCSICommandField('Number of blocks or bytes to transfer', length = 24),
+)
+''' Read Reverse - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+WriteFilemarks = SCSICommand6(0x10,
+	'LUN'         / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'    / SCSICommandField(default = 0, length = 5),
+	'FilemarkNum' / SCSICommandField('Number of filemarks to write', length = 24),
+)
+''' Write Filemarks - Group: 0 | Peripheral Device: Sequential Access | Type: Mandatory '''
+
+Space = SCSICommand6(0x11,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 3),
+	'Code'     / SCSICommandField('What to space over', default = 0, length = 2),
+	'Count'    / SCSICommandField('Number of items to space over', length = 24),
+)
+''' Space - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+Verify = SCSICommand6(0x13,
+	'LUN'       / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'  / SCSICommandField(default = 0, length = 3),
+	'ByteCmp'   / SCSICommandField('Compare the data byte by byte', default = 0, length = 1),
+	'Fixed'     / SCSICommandField('The verify length is in blocks rather than bytes', default = 0, length = 1),
+	'VerifyLen' / SCSICommandField('Number of blocks or bytes to verify', length = 24),
+)
+''' Verify - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+RecoverBufferedData = SCSICommand6(0x14,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Fixed'    / SCSICommandField('The transfer length is in blocks rather than bytes', default = 0, length = 1),
+	'TxLen'    / SCSICommandField('Number of blocks or bytes to transfer', length = 24),
+)
+''' Recover Buffered Data - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+ModeSelect = SCSICommand6(0x15,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 21),
+	'ParamLen' / SCSICommandField('Length of the parameter list in bytes', length = 8),
+)
+''' Mode Select - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
+
+Reserve = SCSICommand6(0x16,
+	'LUN'           / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'ThirdParty'    / SCSICommandField('Reserve for a third party device', default = 0, length = 1),
+	'ThirdPartyDID' / SCSICommandField('Third party device ID', default = 0, length = 3),
+	'Reserved'      / SCSICommandField(default = 0, length = 25),
 )
+''' Reserve Unit - Group: 0 | Peripheral Device: Sequential Access, Printer | Type: Optional '''
 
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-release = 'Release Unit (Sequential)' / BitStruct(
-	'LUN'           / BitsInteger(3),
-	'ThirdParty'    / Flag,
-	'ThirdPartyDID' / BitsInteger(3),
-	'Reserved'      / BitsInteger(25),
+Release = SCSICommand6(0x17,
+	'LUN'           / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'ThirdParty'    / SCSICommandField('Release for a third party device', default = 0, length = 1),
+	'ThirdPartyDID' / SCSICommandField('Third party device ID', default = 0, length = 3),
+	'Reserved'      / SCSICommandField(default = 0, length = 25),
 )
+''' Release Unit - Group: 0 | Peripheral Device: Sequential Access, Printer | Type: Optional '''
 
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-erase = 'Erase (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(4),
-	'Long'     / Flag,
-	'Reserved' / Int24ul,
+Erase = SCSICommand6(0x19,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 4),
+	'Long'     / SCSICommandField('Erase the remainder of the medium', default = 0, length = 1),
+	'Reserved' / SCSICommandField(default = 0, length = 24),
 )
+''' Erase - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
 
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-mode_sense = 'Mode Sense (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(21),
-	'AllocLen' / Int8ul,
+ModeSense = SCSICommand6(0x1A,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 21),
+	'AllocLen' / SCSICommandField('Receive buffer size allocation', length = 8),
 )
+''' Mode Sense - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
 
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-load_unload = 'Load/Unload' / BitStruct(
-	'LUN'       / BitsInteger(3),
-	'Reserved'  / BitsInteger(4),
-	'Immediate' / Flag,
-	'Reserved'  / BitsInteger(22),
-	'ReTension' / Flag,
-	'Load'      / Flag,
+LoadUnload = SCSICommand6(0x1B,
+	'LUN'       / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved'  / SCSICommandField(default = 0, length = 4),
+	'Immediate' / SCSICommandField('Return status as soon as the operation is started', default = 0, length = 1),
+	'Reserved'  / SCSICommandField(default = 0, length = 22),
+	'ReTension' / SCSICommandField('Re-tension the medium', default = 0, length = 1),
+	'Load'      / SCSICommandField('Load rather than unload the medium', default = 0, length = 1),
 )
+''' Load/Unload - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
 
-# Group: 0 | Peripheral Device: Sequential Access | Type: Optional
-prevent_allow_media_removal = 'Prevent/Allow Media Removal (Sequential)' / BitStruct(
-	'LUN'      / BitsInteger(3),
-	'Reserved' / BitsInteger(28),
-	'Prevent'  / Flag,
+PreventAllowMediaRemoval = SCSICommand6(0x1E,
+	'LUN'      / SCSICommandField('Logical Unit Number', default = 0, length = 3),
+	'Reserved' / SCSICommandField(default = 0, length = 28),
+	'Prevent'  / SCSICommandField('Prevent the removal of the media', default = 0, length = 1),
 )
+''' Prevent/Allow Media Removal - Group: 0 | Peripheral Device: Sequential Access | Type: Optional '''
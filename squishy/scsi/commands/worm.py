@@ -1,10 +1,38 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from .direct import (
+	RezeroUnit, ReassignBlocks, Read6, Write6, Seek6, ModeSelect, Reserve, Release, ModeSense,
+	StartStopUnit, PreventAllowMediaRemoval, ReadCapacity, Read10, Write10, Seek10, WriteAndVerify,
+	Verify, SearchDataHigh, SearchDataEqual, SearchDataLow, SetLimits
+)
 
 __doc__ = '''
 This module defines the commands that are specific to WORM devices.
+
+WORM devices use the same commands as direct access devices, less
+``FORMAT UNIT``, so they are re-exported from :py:mod:`squishy.scsi.commands.direct`.
 '''
 
 __all__ = (
-
+	'RezeroUnit',
+	'ReassignBlocks',
+	'Read6',
+	'Write6',
+	'Seek6',
+	'ModeSelect',
+	'Reserve',
+	'Release',
+	'ModeSense',
+	'StartStopUnit',
+	'PreventAllowMediaRemoval',
+	'ReadCapacity',
+	'Read10',
+	'Write10',
+	'Seek10',
+	'WriteAndVerify',
+	'Verify',
+	'SearchDataHigh',
+	'SearchDataEqual',
+	'SearchDataLow',
+	'SetLimits',
 )
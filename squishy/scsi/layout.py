@@ -0,0 +1,328 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from struct    import Struct
+from typing    import Any, Callable, TYPE_CHECKING
+
+from construct import (
+	Container, Renamed, Default, Transformed, BitsInteger, BytesInteger, FormatField,
+	StreamError, ConstError, IntegerError, bits2bytes
+)
+
+if TYPE_CHECKING:
+	from .command import SCSICommand
+
+__all__ = (
+	'LayoutField',
+	'CommandLayout',
+)
+
+__doc__ = '''\
+
+This module contains the compiled fast path for :py:class:`squishy.scsi.command.SCSICommand` definitions.
+
+The SCSI command definitions are :py:mod:`construct` structures, which are interpreted field by field,
+bit by bit, every time a command is parsed or built. As every command is a fixed size and every field
+is at a fixed bit offset, the layout of a command can instead be worked out once, and then turned into
+a pair of specialized Python functions that parse and build the whole CDB with integer shifts and masks.
+
+Commands that use constructs that the layout can't be worked out for, such as arbitrary nested
+structures, have no :py:class:`CommandLayout` and fall back to the :py:mod:`construct` implementation.
+
+'''
+
+class LayoutField:
+	'''
+	A single field in a command layout.
+
+	Parameters
+	----------
+	name : str
+		The name of the field.
+
+	offset : int
+		The offset of the field in bits from the most significant bit of the first byte of the CDB.
+
+	width : int
+		The width of the field in bits.
+
+	default : int | None
+		The default value of the field if any.
+
+	little_endian : bool
+		If the field is a multi-byte little-endian integer.
+
+	signed : bool
+		If the field is signed.
+
+	'''
+
+	__slots__ = ('name', 'offset', 'width', 'default', 'little_endian', 'signed')
+
+	def __init__(
+		self, name: str, offset: int, width: int, default: int | None = None,
+		little_endian: bool = False, signed: bool = False
+	) -> None:
+		self.name          = name
+		self.offset        = offset
+		self.width         = width
+		self.default       = default
+		self.little_endian = little_endian
+		self.signed        = signed
+
+	@property
+	def mask(self) -> int:
+		''' The mask for the field value '''
+		return (1 << self.width) - 1
+
+	def __repr__(self) -> str:
+		return f'<LayoutField {self.name} offset:{self.offset} width:{self.width}>'
+
+def _field_type(subcon) -> tuple[int, bool, bool, int | None] | None:
+	'''
+	Work out the width, endianness, signedness and default of a field.
+
+	Returns
+	-------
+	tuple[int, bool, bool, int | None] | None
+		The width in bits, if the field is little-endian, if it is signed, and the default if any.
+		Or ``None`` if the field is not a plain integer.
+
+	'''
+
+	default = None
+	while True:
+		if isinstance(subcon, Renamed):
+			subcon = subcon.subcon
+		elif isinstance(subcon, Default):
+			# Defaults computed from the context can't be known ahead of time
+			if not isinstance(subcon.value, int):
+				return None
+			default = subcon.value
+			subcon  = subcon.subcon
+		else:
+			break
+
+	if isinstance(subcon, BitsInteger):
+		if subcon.swapped is not False or not isinstance(subcon.length, int):
+			return None
+		return (subcon.length, False, bool(subcon.signed), default)
+
+	# Byte-sized fields are wrapped in a `Bytewise`
+	if not isinstance(subcon, Transformed) or subcon.decodefunc is not bits2bytes:
+		return None
+
+	subcon = subcon.subcon
+	if isinstance(subcon, FormatField):
+		if subcon.fmtstr[1] not in 'bBhHiIlLqQ':
+			return None
+		return (subcon.length * 8, subcon.fmtstr[0] == '<', subcon.fmtstr[1].islower(), default)
+
+	if isinstance(subcon, BytesInteger):
+		if not isinstance(subcon.length, int) or not isinstance(subcon.swapped, bool):
+			return None
+		return (subcon.length * 8, subcon.swapped, bool(subcon.signed), default)
+
+	return None
+
+class CommandLayout:
+	'''
+	The compiled layout of a SCSI command.
+
+	The layout is made up of the ``opcode`` byte, the fields of the command, and
+	the ``control`` byte. The ``parse`` and ``build`` functions are generated from the layout
+	and give the same results as the :py:mod:`construct` definition.
+
+	Parameters
+	----------
+	opcode : int
+		The full opcode byte of the command, including the group code.
+
+	fields : tuple[LayoutField, ...]
+		The fields between the ``opcode`` and ``control`` bytes.
+
+	Attributes
+	----------
+	size : int
+		The size of the command in bytes.
+
+	parse : Callable[[bytes | bytearray | memoryview], construct.Container]
+		Parse a CDB.
+
+	build : Callable[[dict[str, Any]], bytes]
+		Build a CDB from a dictionary of field values.
+
+	build_into : Callable[[dict[str, Any], bytearray | memoryview, int], int]
+		Build a CDB from a dictionary of field values directly into a buffer at the given
+		offset, returning the number of bytes written.
+
+	field_map : dict[str, LayoutField]
+		The fields by name, for fields with the same name (e.g. ``Reserved``) this is the first one.
+
+	source : str
+		The generated Python source for ``parse`` and ``build``.
+
+	'''
+
+	def __init__(self, opcode: int, fields: tuple[LayoutField, ...]) -> None:
+		self.opcode    = opcode
+		self.fields    = fields
+		self.size      = (sum(f.width for f in fields) + 16) // 8
+		self.field_map = {}
+		for field in fields:
+			self.field_map.setdefault(field.name, field)
+
+		# The CDB is packed as a run of big-endian words, e.g. a 10-byte CDB is a `Q` and a `H`
+		self._words: list[tuple[int, int]] = []
+		remaining = self.size
+		for word in (8, 4, 2, 1):
+			while remaining >= word:
+				remaining -= word
+				self._words.append((word, remaining * 8))
+
+		self.source = self._generate()
+
+		namespace: dict[str, Any] = {
+			'from_bytes'  : int.from_bytes,
+			'pack_into'   : Struct('>' + ''.join({ 8: 'Q', 4: 'I', 2: 'H', 1: 'B' }[w] for w, _ in self._words)).pack_into,
+			'Container'   : Container,
+			'StreamError' : StreamError,
+			'ConstError'  : ConstError,
+			'IntegerError': IntegerError,
+		}
+		exec(compile(self.source, f'<SCSICommand {opcode:02X} layout>', 'exec'), namespace)
+
+		self.parse: Callable[[bytes | bytearray | memoryview], Container]              = namespace['parse']
+		self.build: Callable[[dict[str, Any]], bytes]                                  = namespace['build']
+		self.build_into: Callable[[dict[str, Any], bytearray | memoryview, int], int] = namespace['build_into']
+
+	@classmethod
+	def from_command(cls, command: 'SCSICommand') -> 'CommandLayout | None':
+		'''
+		Work out the layout of a SCSI command.
+
+		Parameters
+		----------
+		command : squishy.scsi.command.SCSICommand
+			The command to get the layout of.
+
+		Returns
+		-------
+		CommandLayout | None
+			The layout of the command, or ``None`` if the command contains fields that
+			are not fixed-size integers.
+
+		'''
+
+		subcons = command.subcons
+		if len(subcons) < 2 or subcons[0].name != 'opcode' or subcons[-1].name != 'control':
+			return None
+
+		fields = []
+		offset = 8
+		for subcon in subcons[1:-1]:
+			field_type = _field_type(subcon)
+			if field_type is None or subcon.name is None:
+				return None
+
+			width, little_endian, signed, default = field_type
+			if little_endian and width > 8:
+				if width % 8 != 0:
+					return None
+			else:
+				little_endian = False
+
+			fields.append(LayoutField(subcon.name, offset, width, default, little_endian, signed))
+			offset += width
+
+		if offset % 8 != 0:
+			return None
+
+		return cls((command.group_code << 5) | command.opcode, tuple(fields))
+
+	def _generate(self) -> str:
+		''' Generate the source for the ``parse``, ``build``, and ``build_into`` functions '''
+
+		bits   = self.size * 8
+		parse  = [
+			'def parse(data):',
+			f'	if len(data) < {self.size}:',
+			f'		raise StreamError(f\'stream read less than specified amount, expected {self.size}, found {{len(data)}}\')',
+			f'	v = from_bytes(data[:{self.size}], \'big\')',
+			f'	if (v >> {bits - 8}) != {self.opcode}:',
+			f'		raise ConstError(f\'parsing expected opcode 0x{self.opcode:02X} but parsed 0x{{v >> {bits - 8}:02X}}\')',
+			'	return Container({',
+			f'		\'opcode\': Container(group = {self.opcode >> 5}, command = {self.opcode & 0x1F}),',
+		]
+		build  = [
+			f'	v = {self.opcode << (bits - 8)}',
+		]
+
+		for field in self.fields:
+			shift = bits - field.offset - field.width
+			mask  = field.mask
+			name  = repr(field.name)
+
+			value = 'v' if shift == 0 else f'(v >> {shift})'
+			if field.offset + field.width != bits:
+				value = f'({value} & {mask})'
+
+			if field.little_endian:
+				if field.offset % 8 == 0:
+					start = field.offset // 8
+					value = f'from_bytes(data[{start}:{start + field.width // 8}], \'little\')'
+				else:
+					value = f'from_bytes({value}.to_bytes({field.width // 8}, \'big\'), \'little\')'
+
+			if field.signed:
+				half  = 1 << (field.width - 1)
+				value = f'(({value} ^ {half}) - {half})'
+
+			parse.append(f'		{name}: {value},')
+
+			if field.default is None:
+				build.append(f'	x = obj[{name}]')
+			else:
+				build += [
+					f'	x = obj.get({name})',
+					'	if x is None:',
+					f'		x = {field.default}',
+				]
+
+			low, high = (-(1 << (field.width - 1)), (1 << (field.width - 1)) - 1) if field.signed else (0, mask)
+			build += [
+				f'	if not {low} <= x <= {high}:',
+				f'		raise IntegerError(f\'value {{x}} is out of range for the {field.width} bit field {field.name}\')',
+			]
+			if field.signed:
+				build.append(f'	x &= {mask}')
+			if field.little_endian:
+				build.append(f'	x = from_bytes(x.to_bytes({field.width // 8}, \'little\'), \'big\')')
+			build.append(f'	v |= x << {shift}' if shift != 0 else '	v |= x')
+
+		parse += [
+			'		\'control\': Container(vendor = (v >> 6) & 3, reserved = (v >> 2) & 15, flag = (v >> 1) & 1, link = v & 1),',
+			'	})',
+		]
+		build += [
+			'	c = obj.get(\'control\')',
+			'	if c is not None:',
+		]
+		for name, shift, width in (('vendor', 6, 2), ('reserved', 2, 4), ('flag', 1, 1), ('link', 0, 1)):
+			build += [
+				f'		x = c[\'{name}\']',
+				f'		if not 0 <= x < {1 << width}:',
+				f'			raise IntegerError(f\'value {{x}} is out of range for the {width} bit field {name}\')',
+				f'		v |= x << {shift}' if shift != 0 else '		v |= x',
+			]
+		words = ', '.join(
+			('v' if shift == 0 else f'v >> {shift}') + ('' if i == 0 else f' & {(1 << (width * 8)) - 1}')
+			for i, (width, shift) in enumerate(self._words)
+		)
+
+		return '\n'.join(
+			parse + [ '', 'def build(obj):' ] + build + [ f'	return v.to_bytes({self.size}, \'big\')' ] +
+			[ '', 'def build_into(obj, buffer, offset):' ] + build + [ f'	pack_into(buffer, offset, {words})', f'	return {self.size}' ]
+		) + '\n'
+
+	def __repr__(self) -> str:
+		return f'<CommandLayout opcode:{self.opcode:02X} size:{self.size} fields:{len(self.fields)}>'
@@ -0,0 +1,290 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from types     import ModuleType
+from typing    import Iterable, Iterator
+
+from construct import Container
+
+from .command  import SCSICommand, GroupCode, _KNOWN_SIZED_GROUPS
+from .device   import PeripheralDeviceType
+
+__all__ = (
+	'STANDARD_DEVICE_TYPES',
+	'SCSICommandRegistry',
+	'default_registry',
+)
+
+__doc__ = '''\
+
+This module contains the SCSI command registry, which maps a CDB to the :py:class:`squishy.scsi.command.SCSICommand`
+definition that describes it.
+
+As the meaning of an opcode depends on the type of the device it is sent to, commands are registered
+against one or more :py:class:`squishy.scsi.device.PeripheralDeviceType`. Each device type has a
+256 entry table indexed by the opcode byte, so looking up the command for a CDB is a single list index.
+
+.. code-block:: python
+
+	from squishy.scsi.device   import PeripheralDeviceType
+	from squishy.scsi.registry import default_registry
+
+	registry = default_registry()
+
+	# Container(opcode=Container(group=0, command=18), LUN=0, Reserved=0, AllocLen=36, control=...)
+	registry.parse(PeripheralDeviceType.DirectAccess, b'\\x12\\x00\\x00\\x00\\x24\\x00')
+
+	# Decode a buffer of back-to-back CDBs
+	for offset, command, cdb in registry.decode_many(PeripheralDeviceType.DirectAccess, capture):
+		...
+
+'''
+
+STANDARD_DEVICE_TYPES = (
+	PeripheralDeviceType.DirectAccess,
+	PeripheralDeviceType.SequentialAccess,
+	PeripheralDeviceType.Printer,
+	PeripheralDeviceType.Processor,
+	PeripheralDeviceType.WORM,
+	PeripheralDeviceType.ReadOnlyDirectAccess,
+)
+''' The device types that have standard command sets '''
+
+_GROUP_SIZES = tuple(
+	_KNOWN_SIZED_GROUPS.get(GroupCode(opcode >> 5), 0) for opcode in range(256)
+)
+''' The size of the CDB for each opcode byte based on its group, or 0 if the group has no fixed size '''
+
+class SCSICommandRegistry:
+	'''
+	SCSI command registry.
+
+	Commands are registered for a set of device types, and can then be looked up by device type
+	and opcode byte, the opcode byte being the group code and command code together, i.e. the
+	first byte of the CDB.
+
+	'''
+
+	def __init__(self) -> None:
+		self._tables: dict[int, list[SCSICommand | None]] = {}
+		self._sizes: dict[int, list[int]] = {}
+
+	def _table(self, device_type: PeripheralDeviceType) -> list[SCSICommand | None]:
+		table = self._tables.get(device_type)
+		if table is None:
+			table = self._tables[device_type] = [ None ] * 256
+			self._sizes[device_type] = list(_GROUP_SIZES)
+		return table
+
+	def register(self, command: SCSICommand, device_types: Iterable[PeripheralDeviceType] = STANDARD_DEVICE_TYPES) -> SCSICommand:
+		'''
+		Register a command.
+
+		Parameters
+		----------
+		command : squishy.scsi.command.SCSICommand
+			The command to register.
+
+		device_types : Iterable[squishy.scsi.device.PeripheralDeviceType]
+			The device types the command applies to, by default all of the standard device types.
+
+		Returns
+		-------
+		squishy.scsi.command.SCSICommand
+			The command, so this can be used to register a command as it is defined.
+
+		Raises
+		------
+		ValueError
+			If a different command is already registered with the same opcode for one of the device types.
+
+		'''
+
+		opcode = (command.group_code << 5) | command.opcode
+
+		for device_type in device_types:
+			table    = self._table(device_type)
+			existing = table[opcode]
+			if existing is not None and existing is not command:
+				raise ValueError(
+					f'Opcode 0x{opcode:02X} is already registered for {device_type.name} as {existing!r}'
+				)
+
+			table[opcode] = command
+			self._sizes[device_type][opcode] = command.command_size
+
+		return command
+
+	def register_module(self, module: ModuleType, device_types: Iterable[PeripheralDeviceType] = STANDARD_DEVICE_TYPES) -> None:
+		'''
+		Register all of the commands exported by a module.
+
+		Parameters
+		----------
+		module : types.ModuleType
+			The module, every :py:class:`squishy.scsi.command.SCSICommand` in its ``__all__`` is registered.
+
+		device_types : Iterable[squishy.scsi.device.PeripheralDeviceType]
+			The device types the commands apply to.
+
+		'''
+
+		device_types = tuple(device_types)
+		for name in getattr(module, '__all__', ()):
+			command = getattr(module, name, None)
+			if isinstance(command, SCSICommand):
+				self.register(command, device_types)
+
+	def lookup(self, device_type: PeripheralDeviceType, opcode: int) -> SCSICommand | None:
+		'''
+		Look up a command.
+
+		Parameters
+		----------
+		device_type : squishy.scsi.device.PeripheralDeviceType
+			The type of the device the command was sent to.
+
+		opcode : int
+			The opcode byte of the command.
+
+		Returns
+		-------
+		squishy.scsi.command.SCSICommand | None
+			The command, or ``None`` if there is no command registered for the opcode.
+
+		'''
+
+		table = self._tables.get(device_type)
+		if table is None:
+			return None
+		return table[opcode]
+
+	def parse(self, device_type: PeripheralDeviceType, data: bytes | bytearray | memoryview) -> Container | None:
+		'''
+		Parse a CDB.
+
+		Parameters
+		----------
+		device_type : squishy.scsi.device.PeripheralDeviceType
+			The type of the device the command was sent to.
+
+		data : bytes | bytearray | memoryview
+			The CDB.
+
+		Returns
+		-------
+		construct.Container | None
+			The parsed command, or ``None`` if there is no command registered for the opcode.
+
+		'''
+
+		command = self.lookup(device_type, data[0])
+		if command is None:
+			return None
+		return command.parse(data)
+
+	def decode_many(
+		self, device_type: PeripheralDeviceType, buffer: bytes | bytearray | memoryview, offset: int = 0,
+		end: int | None = None
+	) -> Iterator[tuple[int, SCSICommand | None, Container | None]]:
+		'''
+		Decode a buffer of back-to-back CDBs.
+
+		The size of each CDB is taken from the registered command, or the group code of the opcode
+		if no command is registered, so unknown commands are skipped over.
+
+		Parameters
+		----------
+		device_type : squishy.scsi.device.PeripheralDeviceType
+			The type of the device the commands were sent to.
+
+		buffer : bytes | bytearray | memoryview
+			The buffer containing the CDBs, it is not copied.
+
+		offset : int
+			The offset of the first CDB in the buffer.
+
+		end : int | None
+			The offset to stop decoding at, by default the end of the buffer.
+
+		Returns
+		-------
+		Iterator[tuple[int, squishy.scsi.command.SCSICommand | None, construct.Container | None]]
+			The offset, command, and parsed CDB for each CDB in the buffer. The command and parsed CDB
+			are ``None`` if there is no command registered for the opcode.
+
+		Raises
+		------
+		ValueError
+			If a CDB with an unknown size is found, or the last CDB is truncated.
+
+		'''
+
+		table = self._table(device_type)
+		sizes = self._sizes[device_type]
+		view  = memoryview(buffer).cast('B')
+		end   = len(view) if end is None else end
+
+		# Look up the compiled parser for each opcode once rather than once per CDB
+		parsers = {}
+
+		while offset < end:
+			opcode = view[offset]
+			size   = sizes[opcode]
+			if size == 0:
+				raise ValueError(f'Unable to determine the size of the CDB with opcode 0x{opcode:02X} at offset {offset}')
+			if offset + size > end:
+				raise ValueError(f'Truncated CDB with opcode 0x{opcode:02X} at offset {offset}')
+
+			command = table[opcode]
+			if command is None:
+				yield (offset, None, None)
+			else:
+				parse = parsers.get(opcode)
+				if parse is None:
+					parse = parsers[opcode] = command.parse if command.layout is None else command.layout.parse
+
+				cdb = parse(view[offset:offset + size])
+				cdb._format = command
+				yield (offset, command, cdb)
+
+			offset += size
+
+	def __contains__(self, key: tuple[PeripheralDeviceType, int]) -> bool:
+		return self.lookup(*key) is not None
+
+	def __iter__(self) -> Iterator[tuple[PeripheralDeviceType, int, SCSICommand]]:
+		for device_type, table in self._tables.items():
+			for opcode, command in enumerate(table):
+				if command is not None:
+					yield (PeripheralDeviceType(device_type), opcode, command)
+
+_DEFAULT_REGISTRY: SCSICommandRegistry | None = None
+
+def default_registry() -> SCSICommandRegistry:
+	'''
+	Get the registry of all of the commands defined in :py:mod:`squishy.scsi.commands`.
+
+	Returns
+	-------
+	SCSICommandRegistry
+		The registry, it is only built the first time this is called.
+
+	'''
+
+	global _DEFAULT_REGISTRY
+
+	if _DEFAULT_REGISTRY is None:
+		from .commands import common, direct, sequential, printer, processor, worm, ro_direct
+
+		registry = SCSICommandRegistry()
+		registry.register_module(common)
+		registry.register_module(direct,     (PeripheralDeviceType.DirectAccess,))
+		registry.register_module(sequential, (PeripheralDeviceType.SequentialAccess,))
+		registry.register_module(printer,    (PeripheralDeviceType.Printer,))
+		registry.register_module(processor,  (PeripheralDeviceType.Processor,))
+		registry.register_module(worm,       (PeripheralDeviceType.WORM,))
+		registry.register_module(ro_direct,  (PeripheralDeviceType.ReadOnlyDirectAccess,))
+
+		_DEFAULT_REGISTRY = registry
+
+	return _DEFAULT_REGISTRY
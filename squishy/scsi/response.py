@@ -0,0 +1,493 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from enum    import IntEnum, unique
+from typing  import Iterator
+
+from .device import PeripheralDeviceType
+from .vid    import VID_MAP
+
+__all__ = (
+	'SenseKey',
+	'ResponseView',
+	'SenseData',
+	'ExtendedSenseData',
+	'parse_sense',
+	'InquiryData',
+	'BlockDescriptor',
+	'ModePage',
+	'ModeParameters',
+)
+
+__doc__ = '''\
+
+This module contains parsers for the data returned by the target in the ``DATA IN`` phase for
+:py:data:`squishy.scsi.commands.common.RequestSense`, :py:data:`squishy.scsi.commands.common.Inquiry`,
+and ``MODE SENSE``.
+
+Unlike the command definitions, the responses are not parsed up front. Each response is a thin
+wrapper around a :py:class:`memoryview` of the buffer it was received into, and each field is
+decoded from the buffer when it is accessed, so inspecting a single field of a response never
+copies the buffer or builds a container of every field.
+
+As the responses are views, the buffer they are created from must not be modified while they
+are in use.
+
+.. code-block:: python
+
+	from squishy.scsi.response import InquiryData, SenseKey, parse_sense
+
+	sense = parse_sense(buffer)
+	if sense.sense_key == SenseKey.UNIT_ATTENTION:
+		...
+
+	inquiry = InquiryData(buffer)
+	inquiry.peripheral_device_type
+
+'''
+
+@unique
+class SenseKey(IntEnum):
+	''' The sense key of extended sense data '''
+
+	NO_SENSE        = 0x0
+	''' No specific sense key information to be reported '''
+
+	RECOVERED_ERROR = 0x1
+	''' The last command completed successfully with some recovery action performed by the target '''
+
+	NOT_READY       = 0x2
+	''' The logical unit addressed cannot be accessed '''
+
+	MEDIUM_ERROR    = 0x3
+	''' The command terminated with a non-recovered error likely caused by a flaw in the medium '''
+
+	HARDWARE_ERROR  = 0x4
+	''' The target detected a non-recoverable hardware failure '''
+
+	ILLEGAL_REQUEST = 0x5
+	''' There was an illegal parameter in the command descriptor block or the additional parameters '''
+
+	UNIT_ATTENTION  = 0x6
+	''' The removable medium may have been changed or the target has been reset '''
+
+	DATA_PROTECT    = 0x7
+	''' A read or write was attempted on a protected block '''
+
+	BLANK_CHECK     = 0x8
+	''' A blank block was read, or a non-blank block was written on a WORM device '''
+
+	VENDOR_UNIQUE   = 0x9
+	''' A vendor unique condition '''
+
+	COPY_ABORTED    = 0xA
+	''' A copy, compare, or copy and verify command was aborted '''
+
+	ABORTED_COMMAND = 0xB
+	''' The target aborted the command '''
+
+	EQUAL           = 0xC
+	''' A search data command has satisfied an equal comparison '''
+
+	VOLUME_OVERFLOW = 0xD
+	''' A buffered device has reached the end-of-medium with data remaining in the buffer '''
+
+	MISCOMPARE      = 0xE
+	''' The source data did not match the data read from the medium '''
+
+	RESERVED        = 0xF
+	''' Reserved '''
+
+class ResponseView:
+	'''
+	A view over the response data for a command.
+
+	Parameters
+	----------
+	data : bytes | bytearray | memoryview
+		The response data, it is not copied.
+
+	Raises
+	------
+	ValueError
+		If the data is shorter than the fixed portion of the response.
+
+	'''
+
+	__slots__ = ('_data',)
+
+	MIN_LENGTH = 0
+	''' The minimum length of the response in bytes '''
+
+	def __init__(self, data: bytes | bytearray | memoryview) -> None:
+		view = memoryview(data)
+		if view.format != 'B' or view.ndim != 1:
+			view = view.cast('B')
+
+		if len(view) < self.MIN_LENGTH:
+			raise ValueError(
+				f'{type(self).__name__} must be at least {self.MIN_LENGTH} bytes long, got {len(view)} bytes'
+			)
+
+		self._data = view
+
+	@property
+	def raw(self) -> memoryview:
+		''' The underlying response data '''
+		return self._data
+
+	def _tail(self, start: int, length: int) -> memoryview:
+		''' Get a trailing variable-length field, truncated to the data that was actually transferred '''
+		return self._data[start:start + length]
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def __bytes__(self) -> bytes:
+		return self._data.tobytes()
+
+	def __repr__(self) -> str:
+		return f'<{type(self).__name__} {self._data.hex()}>'
+
+class SenseData(ResponseView):
+	'''
+	Non-extended sense data, for error classes ``0`` through ``6``.
+
+	See :py:data:`squishy.scsi.commands.common.RequestSense` for a description of the fields.
+
+	'''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 4
+
+	@property
+	def addr_valid(self) -> bool:
+		''' If the ``lba`` is valid '''
+		return bool(self._data[0] & 0x80)
+
+	@property
+	def error_class(self) -> int:
+		''' The error class '''
+		return (self._data[0] >> 4) & 0x7
+
+	@property
+	def error_code(self) -> int:
+		''' The error code '''
+		return self._data[0] & 0xF
+
+	@property
+	def vendor(self) -> int:
+		''' The vendor unique bits '''
+		return self._data[1] >> 5
+
+	@property
+	def lba(self) -> int:
+		''' The logical block address associated with the error '''
+		data = self._data
+		return ((data[1] & 0x1F) << 16) | (data[2] << 8) | data[3]
+
+class ExtendedSenseData(ResponseView):
+	'''
+	Extended sense data, for error class ``7``.
+
+	See :py:data:`squishy.scsi.commands.common.RequestSense` for a description of the fields.
+
+	'''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 8
+
+	@property
+	def valid(self) -> bool:
+		''' If the ``information`` field is valid '''
+		return bool(self._data[0] & 0x80)
+
+	@property
+	def error_class(self) -> int:
+		''' The error class, always ``7`` '''
+		return (self._data[0] >> 4) & 0x7
+
+	@property
+	def error_code(self) -> int:
+		''' The error code, ``0`` for the standard format and ``15`` for a vendor unique format '''
+		return self._data[0] & 0xF
+
+	@property
+	def segment(self) -> int:
+		''' The number of the current segment descriptor for copy and compare commands '''
+		return self._data[1]
+
+	@property
+	def filemark(self) -> bool:
+		''' If a file mark was read '''
+		return bool(self._data[2] & 0x80)
+
+	@property
+	def eom(self) -> bool:
+		''' If an end-of-medium condition exists '''
+		return bool(self._data[2] & 0x40)
+
+	@property
+	def ili(self) -> bool:
+		''' If the requested logical block length did not match the length on the medium '''
+		return bool(self._data[2] & 0x20)
+
+	@property
+	def sense_key(self) -> SenseKey:
+		''' The sense key '''
+		return SenseKey(self._data[2] & 0xF)
+
+	@property
+	def information(self) -> int:
+		''' The information bytes '''
+		return int.from_bytes(self._data[3:7], 'big')
+
+	@property
+	def additional_length(self) -> int:
+		''' The number of additional sense bytes the target has, including any that were not transferred '''
+		return self._data[7]
+
+	@property
+	def additional(self) -> memoryview:
+		''' The additional sense bytes that were transferred '''
+		return self._tail(8, self._data[7])
+
+def parse_sense(data: bytes | bytearray | memoryview) -> SenseData | ExtendedSenseData:
+	'''
+	Get a view of sense data in the right format for its error class.
+
+	Parameters
+	----------
+	data : bytes | bytearray | memoryview
+		The sense data, it is not copied.
+
+	Returns
+	-------
+	SenseData | ExtendedSenseData
+		The extended sense data if the error class is ``7``, otherwise the non-extended sense data.
+
+	Raises
+	------
+	ValueError
+		If the data is too short for its format.
+
+	'''
+
+	if len(data) > 0 and (data[0] >> 4) & 0x7 == 0x7:
+		return ExtendedSenseData(data)
+	return SenseData(data)
+
+class InquiryData(ResponseView):
+	'''
+	Standard ``INQUIRY`` data.
+
+	See :py:data:`squishy.scsi.commands.common.Inquiry` for a description of the fields.
+
+	Most devices use the vendor unique bytes for the common command set vendor, product, and
+	revision fields, which are available as :py:attr:`vendor_id`, :py:attr:`product_id`,
+	and :py:attr:`revision` when they were transferred.
+
+	'''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 5
+
+	@property
+	def peripheral_device_type(self) -> PeripheralDeviceType | int:
+		''' The peripheral device type, or the raw value if it is reserved or vendor unique '''
+		value = self._data[0]
+		try:
+			return PeripheralDeviceType(value)
+		except ValueError:
+			return value
+
+	@property
+	def removable(self) -> bool:
+		''' If the medium is removable '''
+		return bool(self._data[1] & 0x80)
+
+	@property
+	def device_type_qualifier(self) -> int:
+		''' The user specified device type qualifier '''
+		return self._data[1] & 0x7F
+
+	@property
+	def iso_version(self) -> int:
+		''' The ISO version '''
+		return self._data[2] >> 6
+
+	@property
+	def ecma_version(self) -> int:
+		''' The ECMA version '''
+		return (self._data[2] >> 3) & 0x7
+
+	@property
+	def ansi_version(self) -> int:
+		''' The ANSI version '''
+		return self._data[2] & 0x7
+
+	@property
+	def additional_length(self) -> int:
+		''' The number of vendor unique bytes the target has, including any that were not transferred '''
+		return self._data[4]
+
+	@property
+	def vendor_unique(self) -> memoryview:
+		''' The vendor unique bytes that were transferred '''
+		return self._tail(5, self._data[4])
+
+	def _ascii(self, start: int, end: int) -> str | None:
+		if len(self._data) < end:
+			return None
+		return self._data[start:end].tobytes().decode('ascii', errors = 'replace').rstrip(' \0')
+
+	@property
+	def vendor_id(self) -> str | None:
+		''' The vendor identification, or ``None`` if it was not transferred '''
+		return self._ascii(8, 16)
+
+	@property
+	def vendor_name(self) -> str | None:
+		''' The name of the vendor from the vendor identification, or ``None`` if it is unknown '''
+		vendor_id = self.vendor_id
+		if vendor_id is None:
+			return None
+		return VID_MAP.get(vendor_id)
+
+	@property
+	def product_id(self) -> str | None:
+		''' The product identification, or ``None`` if it was not transferred '''
+		return self._ascii(16, 32)
+
+	@property
+	def revision(self) -> str | None:
+		''' The product revision level, or ``None`` if it was not transferred '''
+		return self._ascii(32, 36)
+
+class BlockDescriptor(ResponseView):
+	''' A ``MODE SENSE`` block descriptor '''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 8
+
+	@property
+	def density_code(self) -> int:
+		''' The density code of the medium '''
+		return self._data[0]
+
+	@property
+	def block_count(self) -> int:
+		''' The number of logical blocks the descriptor applies to, ``0`` for all of the remaining blocks '''
+		return int.from_bytes(self._data[1:4], 'big')
+
+	@property
+	def block_length(self) -> int:
+		''' The length of each logical block in bytes '''
+		return int.from_bytes(self._data[5:8], 'big')
+
+class ModePage(ResponseView):
+	''' A ``MODE SENSE`` page '''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 2
+
+	@property
+	def saveable(self) -> bool:
+		''' If the page can be saved by the target '''
+		return bool(self._data[0] & 0x80)
+
+	@property
+	def page_code(self) -> int:
+		''' The page code '''
+		return self._data[0] & 0x3F
+
+	@property
+	def page_length(self) -> int:
+		''' The length of the page parameters in bytes '''
+		return self._data[1]
+
+	@property
+	def parameters(self) -> memoryview:
+		''' The page parameters that were transferred '''
+		return self._tail(2, self._data[1])
+
+class ModeParameters(ResponseView):
+	'''
+	``MODE SENSE`` parameter data.
+
+	This is made up of a four byte header, followed by zero or more eight byte block
+	descriptors, and then zero or more mode pages.
+
+	'''
+
+	__slots__ = ()
+
+	MIN_LENGTH = 4
+
+	@property
+	def mode_data_length(self) -> int:
+		''' The length of the parameter data following this field, including any that were not transferred '''
+		return self._data[0]
+
+	@property
+	def medium_type(self) -> int:
+		''' The medium type '''
+		return self._data[1]
+
+	@property
+	def device_specific(self) -> int:
+		''' The device specific parameter byte '''
+		return self._data[2]
+
+	@property
+	def write_protected(self) -> bool:
+		''' If the medium is write protected, for direct access and sequential access devices '''
+		return bool(self._data[2] & 0x80)
+
+	@property
+	def block_descriptor_length(self) -> int:
+		''' The length of the block descriptors in bytes '''
+		return self._data[3]
+
+	@property
+	def block_descriptors(self) -> Iterator[BlockDescriptor]:
+		''' The block descriptors that were transferred in full '''
+		end = min(4 + self._data[3], len(self._data))
+		for offset in range(4, end - 7, 8):
+			yield BlockDescriptor(self._data[offset:offset + 8])
+
+	@property
+	def pages(self) -> Iterator[ModePage]:
+		''' The mode pages that were transferred, the last may be truncated '''
+		data   = self._data
+		end    = min(self._data[0] + 1, len(data))
+		offset = 4 + data[3]
+		while offset + 2 <= end:
+			length = data[offset + 1]
+			yield ModePage(data[offset:min(offset + 2 + length, end)])
+			offset += 2 + length
+
+	def page(self, page_code: int) -> ModePage | None:
+		'''
+		Find a mode page.
+
+		Parameters
+		----------
+		page_code : int
+			The page code of the page.
+
+		Returns
+		-------
+		ModePage | None
+			The page, or ``None`` if it was not transferred.
+
+		'''
+
+		for page in self.pages:
+			if page.page_code == page_code:
+				return page
+		return None
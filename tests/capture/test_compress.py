@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import lzma
+
+from importlib.util           import find_spec
+from io                       import BytesIO, SEEK_END
+from pathlib                  import Path
+from tempfile                 import TemporaryDirectory
+from unittest                 import TestCase, skipIf
+
+from squishy.capture.compress import (
+	CompressedReader, CompressedWriter, compression_for_path, detect_compression
+)
+from squishy.capture.pcapng import PcapngFile
+from squishy.capture.writer import PcapngWriter
+
+def _write_capture(stream, packets: int) -> None:
+	with PcapngWriter(stream) as writer:
+		writer.write_section_header()
+		interface = writer.write_interface('user_00')
+		for idx in range(packets):
+			writer.write_packet(interface, idx, bytes([ idx & 0xFF ]) * (idx % 97))
+
+class _FailingStream(BytesIO):
+	def write(self, data: bytes) -> int:
+		raise OSError('disk full')
+
+class CompressionTests(TestCase):
+	def _round_trip(self, compression: str) -> None:
+		plain = BytesIO()
+		_write_capture(plain, 2000)
+
+		compressed = BytesIO()
+		with CompressedWriter(compressed, compression, frame_size = 4096) as writer:
+			_write_capture(writer, 2000)
+		data = compressed.getvalue()
+
+		self.assertEqual(detect_compression(data), compression)
+		self.assertLess(len(data), len(plain.getvalue()))
+
+		reader = CompressedReader(BytesIO(data))
+		self.assertEqual(reader.compression, compression)
+		self.assertGreater(reader.frames, 10)
+		self.assertEqual(reader.seek(0, SEEK_END), len(plain.getvalue()))
+
+		# Reads that straddle frames, and seeking backwards
+		for offset in (len(plain.getvalue()) - 10, 4090, 0, 12345):
+			reader.seek(offset)
+			self.assertEqual(reader.read(100), plain.getvalue()[offset:offset + 100])
+		reader.seek(0)
+		self.assertEqual(reader.read(), plain.getvalue())
+
+		with TemporaryDirectory() as tmp:
+			path = Path(tmp) / 'capture.pcapng'
+			path.write_bytes(data)
+
+			with PcapngFile(data_stream = path) as capture, PcapngFile(data_stream = plain.getvalue()) as expected:
+				self.assertEqual(capture.compression, compression)
+				self.assertEqual(capture.packet_count, 2000)
+				self.assertEqual(capture.index.offsets, expected.index.offsets)
+				self.assertEqual(bytes(capture.packet(1999).packet_data), bytes(expected.packet(1999).packet_data))
+				self.assertEqual(capture.packet(3).timestamp_raw, 3)
+
+			self.assertTrue((Path(tmp) / 'capture.pcapng.idx').exists())
+
+	def test_xz(self) -> None:
+		self._round_trip('xz')
+
+	@skipIf(find_spec('zstandard') is None, 'zstandard is not installed')
+	def test_zstd(self) -> None:
+		self._round_trip('zstd')
+
+	def test_xz_compatible(self) -> None:
+		plain = BytesIO()
+		_write_capture(plain, 100)
+
+		compressed = BytesIO()
+		with CompressedWriter(compressed, 'xz', frame_size = 1024) as writer:
+			_write_capture(writer, 100)
+
+		# Each frame is a separate stream, which regular xz decoders handle
+		self.assertEqual(lzma.decompress(compressed.getvalue()), plain.getvalue())
+
+		# As do captures compressed as one stream
+		reader = CompressedReader(BytesIO(lzma.compress(plain.getvalue()) + bytes(8)))
+		self.assertEqual(reader.frames, 1)
+		self.assertEqual(reader.read(), plain.getvalue())
+
+	def test_writer_suffix(self) -> None:
+		self.assertEqual(compression_for_path('capture.pcapng.xz'), 'xz')
+		self.assertEqual(compression_for_path('capture.pcapng.zst'), 'zstd')
+		self.assertIsNone(compression_for_path('capture.pcapng'))
+
+		with TemporaryDirectory() as tmp:
+			path = Path(tmp) / 'capture.pcapng.xz'
+			_write_capture(path, 10)
+			self.assertEqual(detect_compression(path.read_bytes()), 'xz')
+
+			with PcapngFile(data_stream = path) as capture:
+				self.assertEqual(capture.packet_count, 10)
+
+	def test_errors(self) -> None:
+		with self.assertRaises(ValueError):
+			CompressedReader(BytesIO(b'\x0A\x0D\x0D\x0A' + bytes(64)))
+		with self.assertRaises(ValueError):
+			CompressedWriter(BytesIO(), 'lz4')
+
+		writer = CompressedWriter(_FailingStream(), 'xz', frame_size = 16)
+		writer.write(bytes(64))
+		with self.assertRaises(OSError):
+			writer.close()
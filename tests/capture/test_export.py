@@ -0,0 +1,123 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import csv
+
+from importlib.util          import find_spec
+from io                      import BytesIO
+from pathlib                 import Path
+from tempfile                import TemporaryDirectory
+from unittest                import TestCase, skipIf
+
+from squishy.capture.export  import EXPORT_COLUMNS, export_capture, iter_commands, iter_phases
+from squishy.capture.pcapng  import PcapngFile
+from squishy.capture.payload import BusPhase, NO_ID, cdb_fields, decode_payload, encode_payload
+from squishy.capture.writer  import PcapngWriter
+
+START = 1704067200 * 1_000_000
+
+READ10 = bytes.fromhex('28 00 00 00 00 10 00 00 08 00')
+INQUIRY = bytes.fromhex('12 00 00 00 24 00')
+
+def _trace() -> bytes:
+	stream = BytesIO()
+	with PcapngWriter(stream) as writer:
+		writer.write_section_header()
+		scsi = writer.write_interface('user_01')
+		usb  = writer.write_interface('usb_linux')
+		nano = writer.write_interface('user_01', options = [ (0x0009, b'\x09') ])
+
+		def phase(interface: int, time: int, bus_phase: BusPhase, data: bytes = b'', duration: int = 10) -> None:
+			writer.write_packet(interface, time, encode_payload(
+				bus_phase, data, initiator = 7, target = 0, lun = 0, duration = duration
+			))
+
+		writer.write_packet(scsi, START, encode_payload(BusPhase.ARBITRATION))
+		phase(scsi, START + 100, BusPhase.COMMAND, READ10)
+		phase(scsi, START + 200, BusPhase.DATA_IN, bytes(4096), 50)
+		writer.write_packet(usb, START + 210, b'\x00')
+		phase(scsi, START + 300, BusPhase.STATUS, b'\x02')
+		phase(scsi, START + 320, BusPhase.MESSAGE_IN, b'\x00')
+
+		# This one never completes
+		phase(nano, START * 1000 + 500_000, BusPhase.COMMAND, INQUIRY, 1000)
+		phase(nano, START * 1000 + 502_000, BusPhase.DATA_IN, bytes(36), 3000)
+
+	return stream.getvalue()
+
+class PayloadTests(TestCase):
+	def test_payload(self) -> None:
+		data = encode_payload(BusPhase.STATUS, b'\x00', initiator = 7, target = 3, duration = 1234)
+		self.assertEqual(len(data), 9)
+		phase, initiator, target, lun, duration, status = decode_payload(data)
+		self.assertEqual((phase, initiator, target, lun, duration), (BusPhase.STATUS, 7, 3, NO_ID, 1234))
+		self.assertEqual(bytes(status), b'\x00')
+
+		with self.assertRaises(ValueError):
+			decode_payload(b'\x00' * 7)
+
+	def test_cdb_fields(self) -> None:
+		self.assertEqual(cdb_fields(READ10), (0x28, 0x10, 8))
+		self.assertEqual(cdb_fields(INQUIRY), (0x12, 0, 0x24))
+		self.assertEqual(cdb_fields(READ10[:6]), (0x28, None, None))
+		self.assertEqual(cdb_fields(b''), (None, None, None))
+
+class ExportTests(TestCase):
+	def test_phases(self) -> None:
+		capture = PcapngFile(data_stream = _trace())
+		rows    = list(iter_phases(capture))
+
+		self.assertEqual([ row[5] for row in rows ], [
+			'arbitration', 'command', 'data_in', 'status', 'message_in', 'command', 'data_in'
+		])
+		self.assertTrue(all(len(row) == len(EXPORT_COLUMNS) for row in rows))
+
+		arbitration, command, data, status, _, inquiry, _ = rows
+		self.assertEqual(arbitration[2:5], (None, None, None))
+		self.assertEqual(command[0], START * 1000 + 100_000)
+		self.assertEqual(command[6:10], (0x28, 0x10, 8, None))
+		self.assertEqual(data[6:12], (0x28, 0x10, 8, None, 50_000, 4096))
+		self.assertEqual(status[9], 0x02)
+		self.assertEqual(inquiry[0], START * 1000 + 500_000)
+		self.assertEqual(inquiry[6:9], (0x12, 0, 0x24))
+		self.assertEqual(inquiry[10], 1000)
+
+		# The USB packet is skipped, but still counts towards the packet numbers
+		self.assertEqual(status[12], 4)
+
+		# The offset points at the phase data in the capture
+		self.assertEqual(bytes(capture._buffer[command[13]:command[13] + command[11]]), READ10)
+
+	def test_commands(self) -> None:
+		rows = list(iter_commands(PcapngFile(data_stream = _trace())))
+
+		self.assertEqual(len(rows), 2)
+		read, inquiry = rows
+		self.assertEqual(read[5:12], ('command', 0x28, 0x10, 8, 0x02, 210_000, 4096))
+		self.assertEqual(inquiry[5:12], ('command', 0x12, 0, 0x24, None, 5000, 36))
+
+	def test_csv(self) -> None:
+		with TemporaryDirectory() as tmp:
+			output = Path(tmp) / 'trace.csv'
+			self.assertEqual(export_capture(PcapngFile(data_stream = _trace()), output), 7)
+
+			with output.open(newline = '') as f:
+				rows = list(csv.DictReader(f))
+			self.assertEqual(list(rows[0].keys()), [ name for name, _ in EXPORT_COLUMNS ])
+			self.assertEqual(rows[3]['status'], '2')
+			self.assertEqual(rows[0]['initiator'], '')
+
+			with self.assertRaises(ValueError):
+				export_capture(PcapngFile(data_stream = _trace()), Path(tmp) / 'trace.txt')
+
+	@skipIf(find_spec('pyarrow') is None, 'pyarrow is not installed')
+	def test_parquet(self) -> None:
+		import pyarrow.parquet as pq
+
+		with TemporaryDirectory() as tmp:
+			output = Path(tmp) / 'trace.parquet'
+			self.assertEqual(export_capture(PcapngFile(data_stream = _trace()), output, commands = True, batch_size = 1), 2)
+
+			table = pq.read_table(output)
+			self.assertEqual(table.column_names, [ name for name, _ in EXPORT_COLUMNS ])
+			self.assertEqual(table.column('opcode').to_pylist(), [ 0x28, 0x12 ])
+			self.assertEqual(table.column('status').to_pylist(), [ 0x02, None ])
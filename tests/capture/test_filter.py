@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from io                      import BytesIO
+from unittest                import TestCase
+
+from squishy.capture.filter  import compile_filter, filter_capture, filter_packets
+from squishy.capture.pcapng  import BlockType, PcapngFile
+from squishy.capture.payload import BusPhase, decode_payload, encode_payload
+from squishy.capture.writer  import PcapngWriter
+
+START = 1704067200 * 1_000_000
+
+def _cdb(opcode: int, lba: int) -> bytes:
+	return bytes((opcode, 0)) + lba.to_bytes(4, 'big') + bytes((0, 0, 8, 0))
+
+def _trace() -> bytes:
+	stream = BytesIO()
+	with PcapngWriter(stream) as writer:
+		writer.write_section_header()
+		scsi = writer.write_interface('user_01')
+		usb  = writer.write_interface('usb_linux')
+
+		time = START
+		for target, opcode, lba in ((3, 0x28, 2000), (3, 0x2A, 10), (4, 0x28, 5000), (3, 0x35, 0)):
+			for bus_phase, data in ((BusPhase.COMMAND, _cdb(opcode, lba)), (BusPhase.DATA_IN, bytes(16)), (BusPhase.STATUS, b'\x02')):
+				writer.write_packet(scsi, time, encode_payload(
+					bus_phase, data, initiator = 7, target = target, lun = 0, duration = 5
+				))
+				time += 10
+			writer.write_packet(usb, time, b'\x00')
+
+	return stream.getvalue()
+
+def _phases(blocks) -> list[tuple[int, int]]:
+	return [ decode_payload(block.packet_data)[:3:2] for block in blocks ]
+
+class FilterTests(TestCase):
+	def test_stages(self) -> None:
+		packet_filter = compile_filter('target == 3 && opcode in (0x28, 0x2A) && (lba > 1000 || interface == 1)')
+		self.assertIsNone(packet_filter.header)
+		self.assertIsNotNone(packet_filter.payload)
+		self.assertIsNotNone(packet_filter.command)
+		self.assertTrue(packet_filter.context)
+
+		packet_filter = compile_filter('interface == 0 and not phase in (data_in, status)')
+		self.assertIsNotNone(packet_filter.header)
+		self.assertIsNone(packet_filter.command)
+		self.assertFalse(packet_filter.context)
+
+	def test_errors(self) -> None:
+		for expression in ('', 'bogus == 1', 'target ==', 'target == 3 &&', 'lba == data_in', 'target = 3', '(target == 3', 'target == 3)'):
+			with self.subTest(expression = expression), self.assertRaises(ValueError):
+				compile_filter(expression)
+
+	def test_filter(self) -> None:
+		capture = PcapngFile(data_stream = _trace())
+
+		# Every phase of the matching command, found by its CDB
+		self.assertEqual(
+			_phases(filter_packets(capture, 'target == 3 && opcode in (0x28, 0x2A) && lba > 1000')),
+			[ (BusPhase.COMMAND, 3), (BusPhase.DATA_IN, 3), (BusPhase.STATUS, 3) ]
+		)
+
+		# The CDB is still tracked for the commands before the packets the header stage lets through
+		self.assertEqual(
+			_phases(filter_packets(capture, f'timestamp >= {(START + 40) * 1000} && opcode == 0x2A')),
+			[ (BusPhase.DATA_IN, 3), (BusPhase.STATUS, 3) ]
+		)
+
+		self.assertEqual(len(list(filter_packets(capture, 'phase == status && status == 2'))), 4)
+		self.assertEqual(len(list(filter_packets(capture, 'lba < 100'))), 6)
+
+		# Header only filters also match packets that aren't SCSI phases
+		self.assertEqual(len(list(filter_packets(capture, 'interface == 1'))), 4)
+
+	def test_filter_capture(self) -> None:
+		output = BytesIO()
+		self.assertEqual(filter_capture(PcapngFile(data_stream = _trace()), output, 'target == 4'), 3)
+
+		filtered = PcapngFile(data_stream = output.getvalue())
+		self.assertEqual(
+			[ block.type for block in filtered ],
+			[ BlockType.SECTION_HEADER, BlockType.INTERFACE, BlockType.INTERFACE ] + [ BlockType.ENHANCED_PACKET ] * 3
+		)
+		self.assertEqual(_phases(filtered.packet(number) for number in range(3)), [
+			(BusPhase.COMMAND, 4), (BusPhase.DATA_IN, 4), (BusPhase.STATUS, 4)
+		])
+		self.assertEqual(filtered.packet(0).timestamp_raw, START + 60)
@@ -0,0 +1,200 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from datetime               import datetime, timezone
+from importlib.util         import find_spec
+from io                     import BytesIO
+from pathlib                import Path
+from tempfile               import TemporaryDirectory
+from unittest               import TestCase, skipIf
+
+from arrow                  import Arrow
+
+from squishy.capture.pcapng import (
+	BlockType, NO_INTERFACE, PcapngFile, PcapngIndex, pcapng, pcapng_block
+)
+from squishy.capture.writer  import PcapngWriter
+
+def _capture(packets: int, order: list[int] | None = None) -> bytes:
+	capture = bytearray()
+	capture += pcapng_block.build({ 'Type': 'section_header', 'Data': {}, 'Options': None })
+	capture += pcapng_block.build({
+		'Type': 'interface', 'Data': { 'LinkType': 'user_00', 'SnapLen': 0 }, 'Options': None
+	})
+	for idx in range(packets):
+		second = idx if order is None else order[idx]
+		capture += pcapng_block.build({
+			'Type': 'enhanced_packet',
+			'Data': {
+				'InterfaceID': 0, 'TimestampRaw': { 'Value': Arrow(2024, 1, 1).shift(seconds = second) },
+				'ActualLen': idx + 1, 'PacketData': bytes(range(idx + 1)),
+			},
+			'Options': None,
+		})
+	return bytes(capture)
+
+class _CountingStream(BytesIO):
+	def __init__(self, data: bytes) -> None:
+		super().__init__(data)
+		self.largest = 0
+
+	def read(self, size: int = -1) -> bytes:
+		data = super().read(size)
+		self.largest = max(self.largest, len(data))
+		return data
+
+class PcapngReaderTests(TestCase):
+	def test_blocks(self) -> None:
+		capture = _capture(8)
+		blocks  = list(PcapngFile(data_stream = capture))
+
+		self.assertEqual(
+			[ block.type for block in blocks ],
+			[ BlockType.SECTION_HEADER, BlockType.INTERFACE ] + [ BlockType.ENHANCED_PACKET ] * 8
+		)
+		self.assertEqual(blocks[0].offset, 0)
+		self.assertEqual(blocks[1].offset, blocks[0].length)
+		self.assertEqual(sum(block.length for block in blocks), len(capture))
+
+		# The lazily parsed blocks match parsing the whole capture at once
+		self.assertEqual([ block.parsed for block in blocks ], list(pcapng.parse(capture)))
+		self.assertEqual(bytes(blocks[-1].parsed.Data.PacketData), bytes(range(8)))
+
+	def test_streaming(self) -> None:
+		stream = _CountingStream(b'\xFF' * 4 + _capture(64))
+		stream.seek(4)
+
+		capture = PcapngFile(data_stream = stream)
+		self.assertEqual(capture.offset, 4)
+
+		count = 0
+		for block in capture:
+			self.assertIsNone(block._parsed)
+			count += 1
+
+		self.assertEqual(count, 66)
+		# Only a single block is ever read at a time
+		self.assertLess(stream.largest, 128)
+
+	def test_errors(self) -> None:
+		capture = _capture(2)
+
+		blocks = PcapngFile(data_stream = capture[:-2]).blocks()
+		self.assertEqual(next(blocks).type, BlockType.SECTION_HEADER)
+		with self.assertRaises(ValueError):
+			list(blocks)
+
+		mangled = bytearray(capture)
+		mangled[-4] ^= 0xFF
+		with self.assertRaises(ValueError):
+			list(PcapngFile(data_stream = bytes(mangled)))
+
+		with self.assertRaises(ValueError):
+			list(PcapngFile(data_stream = b'\x06\x00\x00\x00\x04\x00\x00\x00\x04\x00\x00\x00'))
+
+# 2024-01-01T00:00:00 in microseconds
+START = 1704067200 * 1_000_000
+
+class PcapngIndexTests(TestCase):
+	def test_index(self) -> None:
+		capture = PcapngFile(data_stream = _capture(16))
+		index   = capture.index
+
+		self.assertEqual(len(index), 18)
+		self.assertEqual(index.types[0], BlockType.SECTION_HEADER)
+		self.assertEqual(index.interfaces[1], NO_INTERFACE)
+		self.assertEqual(list(index.packets), list(range(2, 18)))
+		self.assertTrue(capture.ordered)
+
+		self.assertEqual(capture.packet_count, 16)
+		self.assertEqual(capture.packet(5).timestamp_raw, START + 5_000_000)
+		self.assertEqual(capture.packet(5).interface_id, 0)
+		self.assertEqual(bytes(capture.packet(5).packet_data), bytes(range(6)))
+
+		self.assertEqual(capture.first_packet_after(0), 0)
+		self.assertEqual(capture.first_packet_after((START + 4_500_000) * 1000), 5)
+		self.assertEqual(capture.first_packet_after((START + 15_000_000) * 1000), 15)
+		self.assertIsNone(capture.first_packet_after((START + 15_000_000) * 1000 + 1))
+
+		with self.assertRaises(ValueError):
+			capture.block(0).packet_data
+
+	def test_streamed(self) -> None:
+		data     = _capture(4)
+		buffered = PcapngFile(data_stream = data).index
+		streamed = PcapngFile(data_stream = BytesIO(data))
+
+		self.assertEqual(streamed.index.offsets, buffered.offsets)
+		self.assertEqual(streamed.index.timestamps, buffered.timestamps)
+		self.assertEqual(bytes(streamed.packet(3).packet_data), bytes(range(4)))
+
+	def test_unordered(self) -> None:
+		capture = PcapngFile(data_stream = _capture(4, [ 3, 1, 2, 0 ]))
+
+		self.assertFalse(capture.ordered)
+		self.assertEqual(capture.first_packet_after((START + 1_500_000) * 1000), 0)
+		self.assertEqual(capture.first_packet_after(START * 1000), 0)
+		self.assertIsNone(capture.first_packet_after((START + 4_000_000) * 1000))
+
+	def test_sidecar(self) -> None:
+		with TemporaryDirectory() as tmp:
+			path    = Path(tmp) / 'capture.pcapng'
+			sidecar = Path(tmp) / 'capture.pcapng.idx'
+			path.write_bytes(_capture(8))
+
+			with PcapngFile(data_stream = path) as capture:
+				self.assertIsNotNone(capture._map)
+				self.assertEqual(capture.packet_count, 8)
+				packet = capture.packet(7)
+				self.assertIsInstance(packet.raw.obj, type(capture._map))
+				self.assertEqual(bytes(packet.packet_data), bytes(range(8)))
+				del packet
+
+			self.assertTrue(sidecar.exists())
+			stat   = path.stat()
+			loaded = PcapngIndex.load(sidecar, stat.st_size, stat.st_mtime_ns)
+			self.assertIsNotNone(loaded)
+			self.assertEqual(list(loaded.packets), list(range(2, 10)))
+
+			# A stale sidecar is ignored and rebuilt
+			path.write_bytes(_capture(3))
+			with open(path, 'rb') as f, PcapngFile(data_stream = f) as capture:
+				self.assertEqual(capture.packet_count, 3)
+
+			stat = path.stat()
+			self.assertEqual(len(PcapngIndex.load(sidecar, stat.st_size, stat.st_mtime_ns).packets), 3)
+
+	def test_resolutions(self) -> None:
+		stream = BytesIO()
+		with PcapngWriter(stream) as writer:
+			writer.write_section_header()
+			micro = writer.write_interface('user_00')
+			nano  = writer.write_interface('user_00', options = [ (0x0009, b'\x09'), (0x0002, 'scsi0') ])
+			writer.write_packet(micro, START, b'\x00\x01\x02')
+			writer.write_packet(nano, START * 1000 + 1500, b'\x00', options = b'\x01\x00\x01\x00x\x00\x00\x00')
+			# Interface IDs start again from zero in a new section
+			writer.write_section_header()
+			binary = writer.write_interface('user_00', options = [ (0x0009, b'\x8A') ])
+			writer.write_packet(binary, (START // 1_000_000) * 1024 + 512, b'')
+
+		capture = PcapngFile(data_stream = stream.getvalue())
+
+		self.assertEqual(list(capture.block(2).options()), [ (0x0009, b'\x09'), (0x0002, b'scsi0') ])
+		self.assertEqual(list(capture.packet(1).options()), [ (0x0001, b'x') ])
+		self.assertEqual(list(capture.packet(0).options()), [])
+
+		self.assertEqual([ capture.packet_ticks_per_second(packet) for packet in range(3) ], [ 10**6, 10**9, 1024 ])
+		self.assertEqual(capture.packet_time(0), datetime(2024, 1, 1, tzinfo = timezone.utc))
+		self.assertEqual(capture.packet_time(1), datetime(2024, 1, 1, 0, 0, 0, 1, tzinfo = timezone.utc))
+		self.assertEqual(capture.packet_time(2), datetime(2024, 1, 1, 0, 0, 0, 500000, tzinfo = timezone.utc))
+
+		with self.assertRaises(ValueError):
+			capture.block(0).ticks_per_second
+
+	@skipIf(find_spec('numpy') is None, 'numpy is not installed')
+	def test_times64(self) -> None:
+		import numpy as np
+
+		capture = PcapngFile(data_stream = _capture(3))
+		self.assertEqual(list(capture.packet_times64()), [
+			np.datetime64('2024-01-01T00:00:00', 'ns') + np.timedelta64(second, 's') for second in range(3)
+		])
@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from io                      import BytesIO
+from itertools               import chain
+from pathlib                 import Path
+from tempfile                import TemporaryDirectory
+from unittest                import TestCase
+
+from squishy.capture.export  import _range_rows, iter_commands, iter_phases
+from squishy.capture.pcapng  import BlockType, PcapngFile, PcapngIndex
+from squishy.capture.payload import BusPhase, encode_payload
+from squishy.capture.scan    import ScanRange, find_block_boundary, parallel_index, split_ranges
+from squishy.capture.writer  import PcapngWriter
+
+START = 1704067200 * 1_000_000
+
+READ10 = bytes.fromhex('28 00 00 00 00 10 00 00 08 00')
+
+def _trace(commands: int = 64) -> bytes:
+	stream = BytesIO()
+	with PcapngWriter(stream) as writer:
+		writer.write_section_header()
+		scsi = writer.write_interface('user_01')
+
+		time = START
+		for number in range(commands):
+			# Two initiators interleaved, so commands straddle the ranges in different ways
+			initiator = number % 2
+			for bus_phase, data in (
+				(BusPhase.COMMAND, READ10), (BusPhase.DATA_IN, bytes(512)), (BusPhase.STATUS, b'\x00')
+			):
+				# A block that looks valid, hidden in the packet data
+				if bus_phase == BusPhase.DATA_IN:
+					data = (BlockType.ENHANCED_PACKET.to_bytes(4, 'little') + (32).to_bytes(4, 'little')) * 8 + data
+				# Every so often a command never completes
+				if bus_phase == BusPhase.STATUS and number % 7 == 3:
+					continue
+
+				writer.write_packet(scsi, time, encode_payload(
+					bus_phase, data, initiator = initiator, target = 0, lun = 0, duration = 5
+				))
+				time += 10
+
+			if number == commands // 2:
+				writer.write_interface('user_01', options = [ (0x0009, b'\x09') ])
+
+	return stream.getvalue()
+
+class ScanTests(TestCase):
+	def test_find_block_boundary(self) -> None:
+		data    = _trace(8)
+		capture = PcapngFile(data_stream = data)
+		offsets = list(capture.index.offsets)
+
+		# Searching from inside a block finds the start of the next one, not the fake block in the data
+		for block, offset in enumerate(offsets[:-1]):
+			self.assertEqual(find_block_boundary(data, offset + 1), offsets[block + 1])
+			self.assertEqual(find_block_boundary(data, offset), offset)
+
+		self.assertIsNone(find_block_boundary(data, offsets[-1] + 1))
+		self.assertIsNone(find_block_boundary(data, offsets[1] + 1, offsets[1] + 4))
+
+	def test_parallel_index(self) -> None:
+		data = _trace()
+		with TemporaryDirectory() as tmp:
+			path = Path(tmp) / 'trace.pcapng'
+			path.write_bytes(data)
+
+			expected = PcapngIndex.from_buffer(data)
+			for range_size in (256, 1000, len(data)):
+				index = parallel_index(path, workers = 2, range_size = range_size)
+				self.assertEqual(index.offsets, expected.offsets)
+				self.assertEqual(index.types, expected.types)
+				self.assertEqual(index.interfaces, expected.interfaces)
+				self.assertEqual(index.timestamps, expected.timestamps)
+
+			(Path(tmp) / 'empty.pcapng').write_bytes(b'')
+			self.assertEqual(len(parallel_index(Path(tmp) / 'empty.pcapng', workers = 2)), 0)
+
+	def test_split_ranges(self) -> None:
+		capture = PcapngFile(data_stream = _trace())
+		ranges  = split_ranges(capture, 4)
+
+		# Small captures aren't worth splitting
+		self.assertEqual(ranges, [ ScanRange(0, capture.size, 0, ()) ])
+
+		block = len(capture.index) - 1
+		self.assertEqual(capture.interfaces(block), ((0x0094, 1_000_000), (0x0094, 1_000_000_000)))
+		self.assertEqual(capture.interfaces(1), ())
+
+	def test_export_ranges(self) -> None:
+		with TemporaryDirectory() as tmp:
+			path = Path(tmp) / 'trace.pcapng'
+			path.write_bytes(_trace())
+
+			with PcapngFile(data_stream = path) as capture:
+				index  = capture.index
+				blocks = len(index)
+
+				for step in (1, 2, 5, 13):
+					ranges = [
+						ScanRange(
+							index.offsets[block],
+							index.offsets[block + step] if block + step < blocks else capture.size,
+							sum(kind == BlockType.ENHANCED_PACKET for kind in index.types[:block]),
+							capture.interfaces(block)
+						) for block in range(0, blocks, step)
+					]
+
+					for commands, serial in ((False, iter_phases), (True, iter_commands)):
+						with self.subTest(step = step, commands = commands):
+							self.assertEqual(
+								list(chain.from_iterable(_range_rows(capture, commands, ranges, 2))),
+								list(serial(capture))
+							)
@@ -0,0 +1,182 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from io                      import BytesIO
+from pathlib                 import Path
+from tempfile                import TemporaryDirectory, TemporaryFile
+from unittest                import TestCase
+
+from squishy.capture.pcapng  import BlockType, PcapngFile
+from squishy.capture.payload import BusPhase, encode_payload
+from squishy.capture.filter  import filter_capture
+from squishy.capture.stats   import (
+	CaptureCounters, capture_health, cut_section_header, decode_statistics, encode_statistics, is_cut
+)
+from squishy.capture.tools   import merge_captures, packet_ns, slice_capture, split_capture
+from squishy.capture.writer  import PcapngWriter
+
+START = 1704067200 * 1_000_000
+
+def _trace(packets: int = 25, **counters) -> bytes:
+	stream = BytesIO()
+	with PcapngWriter(stream, statistics_interval = 0.001) as writer:
+		writer.write_section_header()
+		writer.write_interface('user_01')
+
+		# The packets are 100us apart, so there are statistics every 10 packets
+		for number in range(packets):
+			writer.write_packet(0, START + number * 100, encode_payload(BusPhase.DATA_IN, bytes(4), initiator = 7, target = 3))
+
+		for name, value in counters.items():
+			setattr(writer.statistics[0], name, value)
+
+	return stream.getvalue()
+
+class StatisticsTests(TestCase):
+	def test_round_trip(self) -> None:
+		counters = CaptureCounters(
+			start = START, end = START + (1 << 33), received = 100, dropped = 3, filtered = 97,
+			delivered = 97, bus_resets = 1, parity_errors = 0
+		)
+		capture = PcapngFile(data_stream = encode_statistics(2, START + 5, counters))
+		block   = capture.block(0)
+
+		self.assertEqual(decode_statistics(block), (2, START + 5, counters))
+
+		# The standard counters are the ones construct knows about
+		options = { int(option.Code): option.Value for option in block.parsed.Options }
+		self.assertEqual(options[0x0004], 100)
+		self.assertEqual(options[0x0005], 3)
+		self.assertEqual(options[0x0008], 97)
+
+		self.assertEqual(decode_statistics(PcapngFile(data_stream = encode_statistics(0, 0, CaptureCounters())).block(0)), (
+			0, 0, CaptureCounters()
+		))
+
+	def test_writer(self) -> None:
+		capture = PcapngFile(data_stream = _trace())
+		statistics = [
+			decode_statistics(block) for block in capture if block.type == BlockType.INTERFACE_STATS
+		]
+
+		# Periodic statistics after packets 10 and 20, then the final ones when the capture is closed
+		self.assertEqual([ counters.delivered for _, _, counters in statistics ], [ 11, 21, 25 ])
+		self.assertEqual([ timestamp for _, timestamp, _ in statistics ], [ START + 1000, START + 2000, START + 2400 ])
+		self.assertTrue(all(counters.start == START for _, _, counters in statistics))
+
+		with self.assertRaises(ValueError):
+			PcapngWriter(BytesIO()).write_statistics(0)
+
+	def test_copied_blocks(self) -> None:
+		# A capture without statistics, with a microsecond and a nanosecond interface
+		source = BytesIO()
+		with PcapngWriter(source) as writer:
+			writer.write_section_header()
+			writer.write_interface('user_01')
+			writer.write_interface('user_01', options = [ (0x0009, '\x09') ])
+			for number in range(25):
+				data = encode_payload(BusPhase.DATA_IN, bytes(4), initiator = 7, target = 3)
+				writer.write_packet(0, START + number * 100, data)
+				writer.write_packet(1, (START + number * 100) * 1000, data)
+
+		def statistics(data: bytes) -> list[tuple[int, int]]:
+			return [
+				(interface, counters.delivered) for interface, _, counters in map(decode_statistics, (
+					block for block in PcapngFile(data_stream = data) if block.type == BlockType.INTERFACE_STATS
+				))
+			]
+
+		# Both interfaces get statistics every millisecond, whatever their resolution
+		expected = [ (0, 11), (1, 11), (0, 21), (1, 21), (0, 25), (1, 25) ]
+
+		output = BytesIO()
+		with PcapngWriter(output, statistics_interval = 0.001) as writer:
+			for block in PcapngFile(data_stream = source.getvalue()):
+				writer.write_block(block.raw)
+			self.assertEqual(writer.packets, 50)
+		self.assertEqual(statistics(output.getvalue()), expected)
+
+		with TemporaryFile() as file:
+			file.write(source.getvalue())
+			file.flush()
+
+			output = BytesIO()
+			with PcapngWriter(output, statistics_interval = 0.001) as writer:
+				writer.copy_from(file.fileno(), 0, len(source.getvalue()))
+				# Packets can still be written on the copied interfaces
+				writer.write_packet(1, (START + 2500) * 1000, bytes(8))
+		self.assertEqual(statistics(output.getvalue()), expected[:-1] + [ (1, 26) ])
+
+		# Section headers end the statistics of the section before them
+		output = BytesIO()
+		with PcapngWriter(output, statistics_interval = 0.001) as writer:
+			writer.write_section_header()
+			writer.write_interface('user_01')
+			writer.write_packet(0, START, bytes(8))
+			writer.write_block(PcapngFile(data_stream = source.getvalue()).block(0).raw)
+			self.assertEqual(writer.statistics, [])
+
+	def test_health(self) -> None:
+		health, = capture_health(PcapngFile(data_stream = _trace(received = 25, dropped = 0)))
+		self.assertTrue(health.complete)
+		self.assertEqual((health.link, health.packets, health.captured), (0x0094, 25, 25))
+		self.assertEqual(health.statistics.received, 25)
+
+		health, = capture_health(PcapngFile(data_stream = _trace(dropped = 4, parity_errors = 2)))
+		self.assertFalse(health.complete)
+		self.assertEqual(len(health.problems), 2)
+
+		# A packet that was delivered but is missing from the capture
+		data    = _trace()
+		capture = PcapngFile(data_stream = data)
+		packet  = capture.block(capture.index.packets[3])
+		health, = capture_health(PcapngFile(data_stream = data[:packet.offset] + data[packet.offset + packet.length:]))
+		self.assertEqual(health.problems, [ '1 packets are missing from the capture' ])
+
+		# The capture was cut off before it was closed
+		last = capture.block(capture.index.packets[-1])
+		health, = capture_health(PcapngFile(data_stream = data[:last.offset + last.length]))
+		self.assertFalse(health.complete)
+		self.assertEqual(health.captured, 21)
+
+		health, = capture_health(PcapngFile(data_stream = data[:capture.block(capture.index.packets[0]).offset]))
+		self.assertEqual(health.problems, [ 'there are no interface statistics, so it can\'t be checked' ])
+
+	def test_cut_captures(self) -> None:
+		with TemporaryDirectory() as tmp:
+			source = Path(tmp) / 'capture.pcapng'
+			source.write_bytes(_trace(received = 25, dropped = 0))
+
+			sliced   = Path(tmp) / 'slice.pcapng'
+			filtered = Path(tmp) / 'filter.pcapng'
+			merged   = Path(tmp) / 'merged.pcapng'
+			with PcapngFile(data_stream = source) as capture:
+				slice_capture(capture, sliced, start = packet_ns(capture, 5), end = packet_ns(capture, 15))
+				filter_capture(capture, filtered, 'packet in (1, 2, 3, 11, 12, 21)')
+				parts = split_capture(capture, Path(tmp) / 'part.pcapng', packets = 8)
+			with PcapngFile(data_stream = sliced) as first, PcapngFile(data_stream = filtered) as second:
+				merge_captures([ first, second ], merged)
+
+			# They keep the statistics of the whole capture, so only the counters that don't depend on the packets are checked
+			for path in [ sliced, filtered, merged, *parts ]:
+				with self.subTest(capture = path.name), PcapngFile(data_stream = path) as capture:
+					self.assertTrue(is_cut(capture.block(0)))
+					self.assertTrue(all(health.cut and health.complete for health in capture_health(capture)))
+
+			with PcapngFile(data_stream = source) as capture:
+				self.assertFalse(is_cut(capture.block(0)))
+				self.assertFalse(capture_health(capture)[0].cut)
+
+			source.write_bytes(_trace(dropped = 4))
+			with PcapngFile(data_stream = source) as capture:
+				filter_capture(capture, filtered, 'packet in (1, 2, 3, 11, 12, 21)')
+			with PcapngFile(data_stream = filtered) as capture:
+				health, = capture_health(capture)
+			self.assertEqual(health.problems, [ '4 phases were dropped by the analyzer' ])
+
+		# Section headers are only marked once, and keep their options
+		header  = PcapngFile(data_stream = _trace()).block(0).raw
+		once    = cut_section_header(header)
+		block   = PcapngFile(data_stream = once).block(0)
+		self.assertEqual(cut_section_header(once), once)
+		self.assertEqual(block.parsed.Data['Section Len'], -1)
+		self.assertEqual(len(list(block.options())), 1)
@@ -0,0 +1,50 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from datetime                  import datetime, timedelta, timezone
+from importlib.util            import find_spec
+from unittest                  import TestCase, skipIf
+
+from arrow                     import Arrow
+
+from squishy.capture.timestamp import (
+	DEFAULT_TICKS_PER_SECOND, datetime_to_ticks, ticks_to_datetime, ticks_to_datetime64, tsresol_to_ticks
+)
+
+DATE = datetime(2024, 1, 1, 12, 34, 56, 789012, tzinfo = timezone.utc)
+
+class TimestampTests(TestCase):
+	def test_tsresol(self) -> None:
+		self.assertEqual(tsresol_to_ticks(6), DEFAULT_TICKS_PER_SECOND)
+		self.assertEqual(tsresol_to_ticks(9), 1_000_000_000)
+		self.assertEqual(tsresol_to_ticks(0x80 | 10), 1024)
+
+	def test_round_trip(self) -> None:
+		for rate in (1_000_000, 1_000_000_000, 1 << 20):
+			with self.subTest(rate = rate):
+				ticks = datetime_to_ticks(DATE, rate)
+				self.assertEqual(ticks // rate, int(DATE.timestamp()))
+				# Binary fractions can't hold every microsecond, so allow them to round down
+				self.assertLessEqual(ticks_to_datetime(ticks, rate), DATE)
+				self.assertLessEqual(DATE - ticks_to_datetime(ticks, rate), timedelta(microseconds = 1))
+
+		self.assertEqual(ticks_to_datetime(datetime_to_ticks(DATE)), DATE)
+		self.assertEqual(datetime_to_ticks(DATE, 1_000_000_000), 1704112496_789012000)
+
+	def test_conversions(self) -> None:
+		self.assertEqual(datetime_to_ticks(Arrow.fromdatetime(DATE)), datetime_to_ticks(DATE))
+		self.assertEqual(datetime_to_ticks(DATE.replace(tzinfo = None)), datetime_to_ticks(DATE))
+		self.assertEqual(ticks_to_datetime(0), datetime(1970, 1, 1, tzinfo = timezone.utc))
+
+	@skipIf(find_spec('numpy') is None, 'numpy is not installed')
+	def test_datetime64(self) -> None:
+		import numpy as np
+
+		ticks = datetime_to_ticks(DATE, 1_000_000_000)
+		self.assertEqual(
+			list(ticks_to_datetime64([ ticks, ticks + 1 ], 1_000_000_000)),
+			[ np.datetime64('2024-01-01T12:34:56.789012000'), np.datetime64('2024-01-01T12:34:56.789012001') ]
+		)
+
+		times = ticks_to_datetime64([ datetime_to_ticks(DATE), datetime_to_ticks(DATE, 1 << 20) ], [ 1_000_000, 1 << 20 ])
+		self.assertEqual(times[0], np.datetime64('2024-01-01T12:34:56.789012000'))
+		self.assertLess(abs(times[1] - times[0]), np.timedelta64(1, 'us'))
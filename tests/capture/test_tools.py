@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from io                      import BytesIO
+from pathlib                 import Path
+from tempfile                import TemporaryDirectory
+from unittest                import TestCase
+
+from squishy.capture.pcapng  import BlockType, PcapngFile
+from squishy.capture.payload import BusPhase, decode_payload, encode_payload
+from squishy.capture.tools   import merge_captures, packet_ns, slice_capture, split_capture
+from squishy.capture.writer  import PcapngWriter
+
+START = 1704067200 * 1_000_000
+
+META = {
+	'StartTimestamp' : { 'Value': START },
+	'SquishyMetadata': {
+		'SerialNumber' : 0x5155,
+		'GatewareHash' : bytes(range(20)),
+		'SCSIInterface': { 'VID': 0x1209, 'DID': 0x5A4C, 'MODE': 'tap' },
+	},
+	'PythonVersion'  : { 'Major': 3, 'Minor': 11 },
+	'BusMetadata'    : { 'BusInfo': { 'BusType': 'se', 'ConType': 'fifty', 'SCSIVer': 'scsi1' } },
+}
+
+def _trace(path: Path, target: int, offset: int = 0, packets: int = 30) -> None:
+	with PcapngWriter(path) as writer:
+		writer.write_section_header()
+		writer.write_interface('user_01')
+		writer.write_meta(META)
+
+		for number in range(packets):
+			writer.write_packet(0, START + offset + number * 100, encode_payload(
+				BusPhase.DATA_IN, number.to_bytes(4, 'little'), initiator = 7, target = target
+			))
+			# A second section half way through, with another interface
+			if number == packets // 2:
+				writer.write_section_header()
+				writer.write_interface('user_01')
+				writer.write_interface('usb_linux')
+
+def _packets(path: Path) -> list[tuple[int, int]]:
+	with PcapngFile(data_stream = path) as capture:
+		packets = (block.packet_data for block in capture.blocks() if block.type == BlockType.ENHANCED_PACKET)
+		return [ (target, int.from_bytes(data, 'little')) for _, _, target, _, _, data in map(decode_payload, packets) ]
+
+class ToolTests(TestCase):
+	def setUp(self) -> None:
+		self._tmp = TemporaryDirectory()
+		self.tmp  = Path(self._tmp.name)
+		self.capture = self.tmp / 'capture.pcapng'
+		_trace(self.capture, 3)
+
+	def tearDown(self) -> None:
+		self._tmp.cleanup()
+
+	def test_slice(self) -> None:
+		output = self.tmp / 'slice.pcapng'
+		with PcapngFile(data_stream = self.capture) as capture:
+			self.assertEqual(
+				slice_capture(capture, output, start = packet_ns(capture, 20), end = packet_ns(capture, 25) - 1), 5
+			)
+
+		self.assertEqual(_packets(output), [ (3, number) for number in range(20, 25) ])
+
+		# The slice starts part way through the second section, so it starts with its header and interfaces
+		with PcapngFile(data_stream = output) as capture:
+			types = list(capture.index.types)
+			self.assertEqual(types, [
+				BlockType.SECTION_HEADER, BlockType.INTERFACE, BlockType.INTERFACE
+			] + [ BlockType.ENHANCED_PACKET ] * 5)
+
+		with PcapngFile(data_stream = self.capture) as capture:
+			self.assertEqual(slice_capture(capture, output, start = packet_ns(capture, 10), end = packet_ns(capture, 20)), 10)
+		self.assertEqual(_packets(output), [ (3, number) for number in range(10, 20) ])
+
+		with PcapngFile(data_stream = output) as capture:
+			self.assertEqual(list(capture.index.types)[:4], [
+				BlockType.SECTION_HEADER, BlockType.INTERFACE, BlockType.CUSTOM, BlockType.ENHANCED_PACKET
+			])
+
+	def test_slice_stream(self) -> None:
+		data = bytearray(self.capture.read_bytes())
+
+		# Give the second section a known length, which is no longer right once it is sliced
+		with PcapngFile(data_stream = bytes(data)) as capture:
+			section = capture.index.offsets[list(capture.index.types).index(BlockType.SECTION_HEADER, 1)]
+		data[section + 16:section + 24] = (len(data) - section).to_bytes(8, 'little')
+
+		# Copied from a memory-mapped capture into a stream rather than a file
+		self.capture.write_bytes(data)
+		output = BytesIO()
+		with PcapngFile(data_stream = self.capture) as capture:
+			self.assertEqual(slice_capture(capture, output, start = packet_ns(capture, 25)), 5)
+
+		capture = PcapngFile(data_stream = output.getvalue())
+		self.assertEqual(capture.packet_count, 5)
+		self.assertEqual(capture.block(0).parsed.Data['Section Len'], -1)
+
+		# The second section header is copied along with the packets around it, and parts of it are split off
+		output = BytesIO()
+		with PcapngFile(data_stream = self.capture) as capture:
+			self.assertEqual(slice_capture(capture, output, start = packet_ns(capture, 10), end = packet_ns(capture, 20)), 10)
+			parts = split_capture(capture, self.tmp / 'part.pcapng', packets = 8)
+
+		for data in [ output.getvalue(), *(part.read_bytes() for part in parts) ]:
+			with PcapngFile(data_stream = data) as capture:
+				sections = [ block for block in capture.blocks() if block.type == BlockType.SECTION_HEADER ]
+				self.assertEqual([ block.parsed.Data['Section Len'] for block in sections ], [ -1 ] * len(sections))
+
+	def test_empty_slice(self) -> None:
+		output = self.tmp / 'slice.pcapng'
+		with PcapngFile(data_stream = self.capture) as capture:
+			# Between two packets, and after the last one
+			self.assertEqual(
+				slice_capture(capture, output, start = packet_ns(capture, 20) + 1, end = packet_ns(capture, 21)), 0
+			)
+			self.assertEqual(slice_capture(capture, output, start = packet_ns(capture, 29) + 1), 0)
+
+		# Still a capture with the interfaces of the last section, just without any packets
+		with PcapngFile(data_stream = output) as capture:
+			self.assertEqual(capture.packet_count, 0)
+			self.assertEqual(list(capture.index.types), [
+				BlockType.SECTION_HEADER, BlockType.INTERFACE, BlockType.INTERFACE
+			])
+
+	def test_split(self) -> None:
+		with PcapngFile(data_stream = self.capture) as capture:
+			parts = split_capture(capture, self.tmp / 'part.pcapng', packets = 8)
+		self.assertEqual([ part.name for part in parts ], [ f'part-00{number}.pcapng' for number in range(4) ])
+		self.assertEqual(sum((_packets(part) for part in parts), []), _packets(self.capture))
+		self.assertEqual(len(_packets(parts[-1])), 6)
+
+		with PcapngFile(data_stream = self.capture) as capture:
+			parts = split_capture(capture, self.tmp / 'size.pcapng', size = 512)
+			self.assertTrue(all(part.stat().st_size <= 512 + 256 for part in parts))
+		self.assertEqual(sum((_packets(part) for part in parts), []), _packets(self.capture))
+
+		# The packets are 100us apart
+		with PcapngFile(data_stream = self.capture) as capture:
+			parts = split_capture(capture, self.tmp / 'time.pcapng', duration = 1_000_000)
+		self.assertEqual([ len(_packets(part)) for part in parts ], [ 10, 10, 10 ])
+
+		with PcapngFile(data_stream = self.capture) as capture, self.assertRaises(ValueError):
+			split_capture(capture, self.tmp / 'part.pcapng', packets = 8, size = 512)
+
+	def test_merge(self) -> None:
+		other = self.tmp / 'other.pcapng'
+		_trace(other, 4, 50, 10)
+
+		output = self.tmp / 'merged.pcapng'
+		with PcapngFile(data_stream = self.capture) as capture, PcapngFile(data_stream = other) as second:
+			self.assertEqual(merge_captures([ capture, second ], output), 40)
+
+		packets = _packets(output)
+		self.assertEqual(packets[:4], [ (3, 0), (4, 0), (3, 1), (4, 1) ])
+		self.assertEqual(sorted(packets), sorted(_packets(self.capture) + _packets(other)))
+
+		with PcapngFile(data_stream = output) as merged:
+			self.assertEqual(list(merged.index.types).count(BlockType.SECTION_HEADER), 1)
+			self.assertEqual(list(merged.index.types).count(BlockType.INTERFACE), 6)
+			self.assertTrue(merged.ordered)
+
+			# Every packet still points at an interface of the right kind
+			links = [ link for link, _ in merged.interfaces(len(merged.index)) ]
+			self.assertEqual(links, [ 0x0094, 0x0094, 0x00BD ] * 2)
+			self.assertEqual({ merged.index.interfaces[block] for block in merged.index.packets }, { 0, 1, 3, 4 })
+
+	def test_mixed_resolutions(self) -> None:
+		# The same bus captured with a nanosecond resolution, 50us after each of the microsecond packets
+		other = self.tmp / 'ns.pcapng'
+		with PcapngWriter(other) as writer:
+			writer.write_section_header()
+			writer.write_interface('user_01', options = [ (0x0009, b'\x09') ])
+			for number in range(5):
+				writer.write_packet(0, (START + number * 100 + 50) * 1000, encode_payload(
+					BusPhase.DATA_IN, number.to_bytes(4, 'little'), initiator = 7, target = 4
+				))
+
+		output = self.tmp / 'merged.pcapng'
+		with PcapngFile(data_stream = self.capture) as capture, PcapngFile(data_stream = other) as second:
+			merge_captures([ capture, second ], output)
+
+		with PcapngFile(data_stream = output) as merged:
+			self.assertTrue(merged.ordered)
+			self.assertEqual(merged.first_packet_after((START + 250) * 1000), 5)
+			self.assertEqual(
+				slice_capture(merged, self.tmp / 'slice.pcapng', start = (START + 250) * 1000, end = (START + 450) * 1000), 4
+			)
+
+		self.assertEqual(_packets(self.tmp / 'slice.pcapng'), [ (4, 2), (3, 3), (4, 3), (3, 4) ])
@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from io                     import BytesIO
+from pathlib                import Path
+from tempfile               import TemporaryDirectory
+from unittest               import TestCase
+
+from arrow                  import Arrow
+
+from squishy.capture.pcapng import BlockType, PcapngFile, pcapng, squishy_meta
+from squishy.capture.writer import PcapngWriter, encode_options
+
+META = {
+	'StartTimestamp' : { 'Value': Arrow(2024, 1, 1) },
+	'SquishyMetadata': {
+		'SerialNumber' : 0x5155,
+		'GatewareHash' : bytes(range(20)),
+		'SCSIInterface': { 'VID': 0x1209, 'DID': 0x5A4C, 'MODE': 'tap' },
+	},
+	'PythonVersion'  : { 'Major': 3, 'Minor': 11 },
+	'BusMetadata'    : { 'BusInfo': { 'BusType': 'se', 'ConType': 'fifty', 'SCSIVer': 'scsi1' } },
+}
+
+class PcapngWriterTests(TestCase):
+	def test_options(self) -> None:
+		self.assertEqual(encode_options(None), b'')
+		self.assertEqual(
+			encode_options([ (0x0001, 'abcde'), (0x0009, b'\x09') ]),
+			b'\x01\x00\x05\x00abcde\x00\x00\x00' b'\x09\x00\x01\x00\x09\x00\x00\x00' b'\x00\x00\x00\x00'
+		)
+
+	def test_matches_construct(self) -> None:
+		stream = BytesIO()
+		with PcapngWriter(stream) as writer:
+			writer.write_section_header([ (0x0004, 'squishy') ])
+			self.assertEqual(writer.write_interface('user_00', options = [ (0x0002, 'scsi0') ]), 0)
+			self.assertEqual(writer.write_interface(0x0094), 1)
+			for idx in range(5):
+				writer.write_packet(idx & 1, (1 << 40) + idx, bytes(range(idx)), actual_len = 64)
+
+		self.assertEqual(writer.packets, 5)
+		self.assertEqual(writer.bytes_written, len(stream.getvalue()))
+
+		blocks = pcapng.parse(stream.getvalue())
+
+		self.assertEqual(len(blocks), 8)
+		self.assertEqual(blocks[0].Options[0].Value, 'squishy')
+		self.assertEqual(blocks[1].Options[0].Value, 'scsi0')
+		self.assertEqual(int(blocks[2].Data.LinkType), 0x0094)
+		for idx, block in enumerate(blocks[3:]):
+			self.assertEqual(block.Data.InterfaceID, idx & 1)
+			self.assertEqual(block.Data.TimestampRaw.Raw.High, 1 << 8)
+			self.assertEqual(block.Data.TimestampRaw.Raw.Low, idx)
+			self.assertEqual(block.Data.ActualLen, 64)
+			self.assertEqual(block.Data.PacketData, bytes(range(idx)))
+
+	def test_meta(self) -> None:
+		stream = BytesIO()
+		with PcapngWriter(stream) as writer:
+			writer.write_section_header()
+			writer.write_meta(META)
+
+		block = list(PcapngFile(data_stream = stream.getvalue()))[1]
+		self.assertEqual(block.type, BlockType.CUSTOM)
+		meta = squishy_meta.parse(bytes(block.body[4:]))
+		self.assertEqual(meta.SquishyMetadata.SerialNumber, 0x5155)
+		self.assertEqual(meta.SquishyMetadata.GatewareHash, bytes(range(20)))
+
+	def test_file(self) -> None:
+		with TemporaryDirectory() as tmp:
+			path = Path(tmp) / 'capture.pcapng'
+
+			# A tiny buffer forces a flush, and so a writev, for almost every packet
+			with PcapngWriter(path, buffer_size = 64) as writer:
+				writer.write_section_header()
+				writer.write_interface('user_00')
+				for idx in range(2000):
+					writer.write_packet(0, idx, idx.to_bytes(2, 'little') * (idx % 7))
+
+			with PcapngFile(data_stream = path) as capture:
+				self.assertEqual(capture.packet_count, 2000)
+				self.assertEqual(capture.packet(1234).timestamp_raw, 1234)
+				self.assertEqual(bytes(capture.packet(1234).packet_data), (1234).to_bytes(2, 'little') * 2)
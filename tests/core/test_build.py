@@ -0,0 +1,237 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from os                             import environ
+from pathlib                        import Path
+from tempfile                       import TemporaryDirectory
+from unittest                       import TestCase, mock, skipIf
+from sys                            import platform
+
+from torii                          import Elaboratable, Module
+from torii.build.run                import BuildPlan
+
+from squishy.core.build             import (
+	SquishyBuildMonitor, run_build_plan, run_sandboxed_build_plan, write_placement_lock,
+	abc9_script, abc9_netlist_script, explore_abc9_passes
+)
+from squishy.core.exceptions        import SquishyBuildError
+from squishy.gateware.platform.rev1 import SquishyRev1
+
+_BUILD_LOG = '''\
++ : yosys
++ yosys -l top.rpt top.ys
+1. Executing RTLIL frontend.
+2. Executing SYNTH_ICE40 pass.
+2.1. Executing HIERARCHY pass (managing design hierarchy).
+2.1.1. Finding top of design hierarchy..
+2.47. Executing ABC9 pass.
+2.47.1. Executing ABC9_OPS pass (helper functions for ABC9).
+3. Executing JSON backend.
+End of script.
++ nextpnr-ice40 --log top.tim --hx8k --package bg121 --json top.json
+Info: Packing constraints..
+Info: Packing IOs..
+Info: Device utilisation:
+Info: 	         ICESTORM_LC:  1234/ 7680    16%
+Info: 	        ICESTORM_RAM:     4/   32    12%
+Info: Creating initial analytic placement for 1234 cells, random placement wirelen = 45678.
+Info:     at initial placer iter 0, wirelen = 1234
+Info: Running simulated annealing placer for refinement.
+Info:   at iteration #5: temp = 0.000000, timing cost = 107, wirelen = 9876
+Info: Routing..
+Info: Running router2...
+Info:     iter=1 wires=  4321 overused=  120 overuse=  150 archfail=NA
+Info:     iter=2 wires=  4300 overused=   12 overuse=   14 archfail=NA
+Info:     iter=3 wires=  4290 overused=    0 overuse=    0 archfail=NA
+Info: Max frequency for clock 'clk_usb': 75.31 MHz (PASS at 60.00 MHz)
++ icepack top.asc top.bin
+'''
+
+class SquishyBuildMonitorTests(TestCase):
+	def setUp(self) -> None:
+		self.monitor = SquishyBuildMonitor('top')
+		for line in _BUILD_LOG.splitlines():
+			self.monitor.feed(line)
+		self.summary = self.monitor.finish(0)
+
+	def test_stages(self) -> None:
+		stages = [ (stage['tool'], stage['stage']) for stage in self.summary['stages'] ]
+
+		self.assertEqual(stages, [
+			('yosys', 'Startup'),
+			('yosys', 'RTLIL'),
+			('yosys', 'SYNTH_ICE40'),
+			('yosys', 'HIERARCHY'),
+			('yosys', 'ABC9'),
+			('yosys', 'JSON'),
+			('nextpnr-ice40', 'Startup'),
+			('nextpnr-ice40', 'Packing'),
+			('nextpnr-ice40', 'Placement'),
+			('nextpnr-ice40', 'Routing'),
+			('nextpnr-ice40', 'Timing Analysis'),
+			('icepack', 'Startup'),
+		])
+
+		self.assertTrue(all(stage['duration'] is not None for stage in self.summary['stages']))
+
+	def test_metrics(self) -> None:
+		routing = next(stage for stage in self.summary['stages'] if stage['stage'] == 'Routing')
+
+		self.assertEqual(
+			[ it['remaining'] for it in routing['metrics']['iterations'] ], [ 120, 12, 0 ]
+		)
+		self.assertEqual(self.summary['fmax'], { 'clk_usb': 75.31 })
+		self.assertEqual(self.summary['utilisation']['ICESTORM_LC'], { 'used': 1234, 'available': 7680 })
+
+class PlacementLockTests(TestCase):
+	def test_lock(self) -> None:
+		netlist = { 'modules': { 'top': { 'cells': {
+			'usb.phy.rx_LC'           : { 'attributes': { 'NEXTPNR_BEL': 'X1/Y2/lc0' } },
+			'$flatten\\scsi.$dff$1_LC': { 'attributes': { 'NEXTPNR_BEL': 'X3/Y4/lc1' } },
+			'$abc$123$lut_LC'         : { 'attributes': { 'NEXTPNR_BEL': 'X5/Y6/lc2', 'hdlname': 'pll clk' } },
+			'applet.core_LC'          : { 'attributes': { 'NEXTPNR_BEL': 'X7/Y8/lc3' } },
+			'usb.unplaced'            : { 'attributes': { } },
+		} } } }
+
+		with TemporaryDirectory() as tmp:
+			routed = Path(tmp) / 'routed.json'
+			script = Path(tmp) / 'lock.py'
+			routed.write_text(json.dumps(netlist))
+
+			self.assertEqual(write_placement_lock(routed, script, ('pll', 'usb', 'scsi')), 3)
+			with self.assertRaises(SquishyBuildError):
+				write_placement_lock(routed, script, ('spi_flash',))
+
+			scope: dict = {}
+			exec(script.read_text().split('for name')[0], scope)
+
+		self.assertEqual(scope['locks'], {
+			'usb.phy.rx_LC'           : 'X1/Y2/lc0',
+			'$flatten\\scsi.$dff$1_LC': 'X3/Y4/lc1',
+			'$abc$123$lut_LC'         : 'X5/Y6/lc2',
+		})
+
+class _Blinky(Elaboratable):
+	def elaborate(self, platform) -> Module:
+		m   = Module()
+		led = platform.request('led', 0)
+		m.d.sync += led.o.eq(~led.o)
+		return m
+
+@skipIf(platform.startswith('win32'), 'Build scripts are run with sh')
+class BuildScriptTests(TestCase):
+	def test_monitor(self) -> None:
+		# The script Torii generates, with stand-ins for each tool that print their part of the log
+		plan  = SquishyRev1().prepare(_Blinky(), name = 'top', verbose = True)
+		log   = _BUILD_LOG.splitlines()
+		yosys = log.index('+ yosys -l top.rpt top.ys')
+		pnr   = next(number for number, line in enumerate(log) if line.startswith('+ nextpnr-ice40'))
+		tools = {
+			'yosys'        : log[yosys + 1:pnr],
+			'nextpnr-ice40': log[pnr + 1:-1],
+			'icepack'      : [],
+		}
+
+		with TemporaryDirectory() as tmp:
+			env = {}
+			for tool, lines in tools.items():
+				path = Path(tmp) / tool
+				path.write_text('#!/bin/sh\ncat <<\'EOF\'\n' + '\n'.join(lines) + '\nEOF\n')
+				path.chmod(0o755)
+				env[tool.upper().replace('-', '_')] = str(path)
+
+			run_build_plan(plan, Path(tmp) / 'build', 'top', env = env)
+			summary = json.loads((Path(tmp) / 'build' / 'top.stages.json').read_text())
+
+		# The same stages as the hand written trace
+		monitor = SquishyBuildMonitor('top')
+		for line in log:
+			monitor.feed(line)
+		self.assertEqual(
+			[ (stage['tool'], stage['stage']) for stage in summary['stages'] ],
+			[ (stage['tool'], stage['stage']) for stage in monitor.finish(0)['stages'] ]
+		)
+		self.assertEqual(summary['fmax'], { 'clk_usb': 75.31 })
+		self.assertEqual(summary['utilisation']['ICESTORM_LC'], { 'used': 1234, 'available': 7680 })
+
+@skipIf(platform.startswith('win32'), 'Build scripts are run with sh')
+class SandboxedBuildTests(TestCase):
+	def test_sandbox(self) -> None:
+		plan = BuildPlan('build_top')
+		plan.add_file('build_top.sh', 'echo bitstream > top.bin\necho rtl > top.il\necho scratch > top.json\n')
+
+		with TemporaryDirectory() as scratch, TemporaryDirectory() as out:
+			with mock.patch.dict(environ, { 'SQUISHY_SCRATCH_DIR': scratch }):
+				prod = run_sandboxed_build_plan(plan, Path(out) / 'abcd', 'top')
+
+			self.assertEqual(prod.get('top.bin'), b'bitstream\n')
+			self.assertEqual(
+				sorted(f.name for f in (Path(out) / 'abcd').iterdir()), [ 'top.bin', 'top.il', 'top.stages.json' ]
+			)
+			self.assertEqual(list(Path(scratch).iterdir()), [])
+
+# Stand-in for Yosys, the LUT count and path length depend on how many ABC9 passes are in the script
+_FAKE_YOSYS = '''\
+#!/bin/sh
+echo "$3" >> yosys.runs
+pre=$(sed -n 's/^write_rtlil \\(.*\\)$/\\1/p' "$3")
+if [ -n "$pre" ]; then
+	grep -q -- '-run :map_luts' "$3" && echo checkpoint > "$pre"
+	exit 0
+fi
+grep -q '^read_rtlil top.abc9-pre.il$' "$3" || exit 1
+passes=$(grep -o '&syn2' "$3" | wc -l)
+rpt=$(sed -n 's/^tee -q -o \\(.*\\) stat$/\\1/p' "$3")
+out=$(sed -n 's/^write_json \\(.*\\)$/\\1/p' "$3")
+case $passes in
+	1) luts=120; depth=12 ;;
+	2) luts=110; depth=10 ;;
+	3) luts=100; depth=10 ;;
+	*) luts=105; depth=10 ;;
+esac
+printf '   Number of cells:   %s\\n     SB_LUT4     %s\\n' "$luts" "$luts" > "$rpt"
+printf 'Longest topological path in top (length=%s):\\n' "$depth" >> "$rpt"
+echo "{ \\"passes\\": $passes }" > "$out"
+'''
+
+@skipIf(platform.startswith('win32'), 'The fake Yosys is a shell script')
+class ABC9MappingTests(TestCase):
+	def test_script(self) -> None:
+		self.assertEqual(abc9_script(1).count('&syn2'), 1)
+		self.assertEqual(abc9_script(3).count('&syn2'), 3)
+		self.assertTrue(abc9_script(2).startswith('+&scorr;'))
+		self.assertNotIn(' ', abc9_script(2))
+
+	def test_explore(self) -> None:
+		with TemporaryDirectory() as tmp:
+			build_dir = Path(tmp)
+			yosys = build_dir / 'yosys'
+			yosys.write_text(_FAKE_YOSYS)
+			yosys.chmod(0o755)
+
+			result = explore_abc9_passes(build_dir, 'top', 8, env = { 'YOSYS': str(yosys) })
+
+			self.assertEqual(result['passes'], 3)
+			self.assertEqual(
+				[ (r['passes'], r['luts'], r['depth']) for r in result['results'] ],
+				[ (1, 120, 12), (2, 110, 10), (3, 100, 10), (4, 105, 10) ]
+			)
+			self.assertEqual(json.loads((build_dir / 'top.abc9.json').read_text()), { 'passes': 3 })
+			# Synthesis up to LUT mapping is only run once for all of the passes
+			self.assertEqual((build_dir / 'yosys.runs').read_text().split(), [
+				'top.abc9-pre.ys', 'top.abc9-1.ys', 'top.abc9-2.ys', 'top.abc9-3.ys', 'top.abc9-4.ys'
+			])
+			self.assertEqual(
+				sorted(f.name for f in build_dir.iterdir()),
+				[ 'top.abc9.json', 'top.abc9.log.json', 'yosys', 'yosys.runs' ]
+			)
+
+	def test_no_passes(self) -> None:
+		with TemporaryDirectory() as tmp, self.assertRaises(ValueError):
+			explore_abc9_passes(Path(tmp), 'top', 0)
+
+	def test_netlist_script(self) -> None:
+		script = abc9_netlist_script('top', 'opt_clean')
+
+		self.assertEqual(script.splitlines(), [ 'read_json top.abc9.json', 'opt_clean', 'write_json top.json' ])
+		self.assertNotIn('synth_ice40', script)
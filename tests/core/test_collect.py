@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import sys
+from pathlib              import Path
+from tempfile             import TemporaryDirectory
+from unittest             import TestCase, mock
+from importlib.metadata   import EntryPoint
+
+from squishy.core.collect import (
+	SquishyDiscoveryCache, collect_member_index, collect_members, load_member, predicate_class
+)
+
+class MemberIndexTests(TestCase):
+	def setUp(self) -> None:
+		self._tmp = TemporaryDirectory()
+		self.root = Path(self._tmp.name)
+		self.pkg  = self.root / 'squishy_index_test'
+		self.pkg.mkdir()
+		(self.pkg / '__init__.py').write_text('')
+		(self.pkg / 'first.py').write_text('class First:\n\tshort_help = \'the first\'\n')
+		(self.pkg / 'unrelated.py').write_text('VALUE = 1\n')
+
+		self.index = self.root / 'index.json'
+		self.sources = ((self.pkg, 'squishy_index_test.'),)
+		sys.path.insert(0, str(self.root))
+
+	def tearDown(self) -> None:
+		sys.path.remove(str(self.root))
+		for mod in [ mod for mod in sys.modules if mod.startswith('squishy_index_test') ]:
+			del sys.modules[mod]
+		self._tmp.cleanup()
+
+	def test_index(self) -> None:
+		members = collect_member_index(self.index, self.sources, predicate_class, ('short_help',))
+
+		self.assertEqual(members, [
+			{ 'name': 'first', 'module': 'squishy_index_test.first', 'class': 'First', 'short_help': 'the first' }
+		])
+		self.assertTrue(self.index.exists())
+		self.assertEqual(load_member(members[0]).short_help, 'the first')
+
+	def test_cached(self) -> None:
+		collect_member_index(self.index, self.sources, predicate_class, ('short_help',))
+		del sys.modules['squishy_index_test.first']
+
+		collect_member_index(self.index, self.sources, predicate_class, ('short_help',))
+		self.assertNotIn('squishy_index_test.first', sys.modules)
+
+	def test_collect_skips_unrelated(self) -> None:
+		collect_member_index(self.index, self.sources, predicate_class)
+		for mod in ('squishy_index_test.first', 'squishy_index_test.unrelated'):
+			del sys.modules[mod]
+
+		index = collect_member_index(self.index, self.sources, predicate_class)
+		self.assertEqual(len(index), 1)
+
+		members = collect_members(self.pkg, predicate_class, 'squishy_index_test.', False, SquishyDiscoveryCache(self.index))
+		self.assertEqual([ member['name'] for member in members ], [ 'first' ])
+		self.assertIn('squishy_index_test.first', sys.modules)
+		self.assertNotIn('squishy_index_test.unrelated', sys.modules)
+
+	def test_entry_points(self) -> None:
+		eps = (
+			EntryPoint('third_party', 'squishy_index_test.first:First', 'squishy.applets'),
+			EntryPoint('broken', 'squishy_index_test.missing:Nope', 'squishy.applets'),
+		)
+
+		with mock.patch('importlib.metadata.entry_points', return_value = eps) as entry_points:
+			members = collect_member_index(self.index, (), predicate_class, ('short_help',), 'squishy.applets')
+
+		entry_points.assert_called_once_with(group = 'squishy.applets')
+		self.assertEqual(members, [
+			{ 'name': 'third_party', 'module': 'squishy_index_test.first', 'class': 'First', 'short_help': 'the first' }
+		])
+
+	def test_invalidate(self) -> None:
+		collect_member_index(self.index, self.sources, predicate_class, ('short_help',))
+		(self.pkg / 'second.py').write_text('class Second:\n\tshort_help = \'the second\'\n')
+
+		members = collect_member_index(self.index, self.sources, predicate_class, ('short_help',))
+		self.assertEqual([ member['name'] for member in members ], [ 'first', 'second' ])
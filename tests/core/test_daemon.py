@@ -0,0 +1,105 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from pathlib             import Path
+from socket              import AF_UNIX, SOCK_STREAM, socket
+from tempfile            import TemporaryDirectory
+from threading           import Thread
+from time                import sleep
+from unittest            import TestCase, skipIf
+from sys                 import platform
+
+from squishy.core.daemon     import SquishyDaemon, daemon_request
+from squishy.core.exceptions import SquishyException
+
+@skipIf(platform.startswith('win32'), 'The daemon uses UNIX sockets')
+class SquishyDaemonTests(TestCase):
+	def setUp(self) -> None:
+		self._tmp   = TemporaryDirectory()
+		self.socket = Path(self._tmp.name) / 'daemon.sock'
+		self.daemon = SquishyDaemon(self.socket, idle_timeout = 10)
+		self.thread = Thread(target = self.daemon.serve, daemon = True)
+		self.thread.start()
+
+		for _ in range(100):
+			if self.socket.exists():
+				break
+			sleep(0.01)
+
+	def tearDown(self) -> None:
+		if self.thread.is_alive():
+			list(daemon_request(self.socket, { 'op': 'shutdown' }))
+		self.thread.join(5)
+		self._tmp.cleanup()
+
+	def request(self, request: dict) -> list[dict]:
+		return list(daemon_request(self.socket, request))
+
+	def test_ping(self) -> None:
+		messages = self.request({ 'op': 'ping' })
+
+		self.assertEqual(len(messages), 1)
+		self.assertEqual(messages[0]['type'], 'result')
+		self.assertEqual(messages[0]['status'], 0)
+
+	def test_exec(self) -> None:
+		messages = self.request({ 'op': 'exec', 'argv': [ 'daemon', 'status' ] })
+
+		self.assertEqual(messages[-1], { 'type': 'result', 'status': 1 })
+		self.assertIn(
+			{ 'type': 'log', 'level': 'ERROR', 'message': 'Can not run daemon commands through the daemon' },
+			messages
+		)
+
+	def test_exec_bad_args(self) -> None:
+		messages = self.request({ 'op': 'exec', 'argv': [ 'not-an-action' ] })
+
+		self.assertEqual(messages[-1]['status'], 2)
+		self.assertTrue(any(
+			message['type'] == 'output' and message['stream'] == 'stderr' for message in messages
+		))
+
+	def test_unknown_op(self) -> None:
+		messages = self.request({ 'op': 'nyaa' })
+		self.assertEqual(messages[-1]['status'], 1)
+		self.assertIn('error', messages[-1])
+
+	def test_socket_permissions(self) -> None:
+		self.assertEqual(self.socket.stat().st_mode & 0o777, 0o600)
+
+	def test_concurrent_clients(self) -> None:
+		# A client that is connected but idle doesn't hold up anyone else
+		with socket(AF_UNIX, SOCK_STREAM) as idle:
+			idle.connect(str(self.socket))
+			self.assertEqual(self.request({ 'op': 'ping' })[-1]['status'], 0)
+
+	def test_busy(self) -> None:
+		# While a command is using the hardware anything that doesn't need it is still answered
+		def request(request: dict) -> list[dict]:
+			messages: list[dict] = []
+			thread = Thread(target = lambda: messages.extend(self.request(request)), daemon = True)
+			thread.start()
+			thread.join(5)
+			self.assertFalse(thread.is_alive(), f'\'{request["op"]}\' waited for the running command')
+			return messages
+
+		with self.daemon._lock:
+			self.assertEqual(request({ 'op': 'ping' })[-1]['status'], 0)
+			self.assertEqual(request({ 'op': 'devices' })[-1]['devices'], [])
+			self.assertEqual(request({ 'op': 'shutdown' })[-1]['status'], 0)
+
+		# The daemon only forgets the devices once the command has finished
+		self.thread.join(5)
+		self.assertFalse(self.thread.is_alive())
+
+	def test_already_running(self) -> None:
+		with self.assertRaises(SquishyException):
+			SquishyDaemon(self.socket).serve()
+
+	def test_shutdown(self) -> None:
+		self.assertEqual(self.request({ 'op': 'shutdown' })[-1]['status'], 0)
+		self.thread.join(5)
+
+		self.assertFalse(self.thread.is_alive())
+		self.assertFalse(self.socket.exists())
+		with self.assertRaises(SquishyException):
+			self.request({ 'op': 'ping' })
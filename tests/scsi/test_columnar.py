@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from importlib.util               import find_spec
+from random                       import Random
+from unittest                     import TestCase, skipIf
+
+from squishy.scsi.command         import SCSICommand
+from squishy.scsi.commands        import common
+from squishy.scsi.device          import PeripheralDeviceType
+from squishy.scsi.registry        import default_registry
+
+from .test_command                import Signed12
+
+COMMANDS = tuple(cmd for cmd in vars(common).values() if isinstance(cmd, SCSICommand))
+
+@skipIf(find_spec('numpy') is None, 'numpy is not installed')
+class ColumnarDecodeTests(TestCase):
+	def test_matches_parse(self) -> None:
+		from squishy.scsi.columnar import decode_columns
+
+		rng = Random(0x5C53)
+
+		for cmd in (*COMMANDS, Signed12):
+			with self.subTest(command = cmd):
+				size   = cmd.len()
+				buffer = bytearray(rng.randbytes(size * 64))
+				for idx in range(64):
+					buffer[idx * size] = cmd.layout.opcode
+
+				columns = decode_columns(cmd, buffer)
+
+				for idx in range(64):
+					parsed = cmd.parse(buffer[idx * size:(idx + 1) * size])
+					for name, value in parsed.items():
+						if name.startswith('_'):
+							continue
+						if isinstance(value, dict):
+							for sub_name, sub_value in value.items():
+								if not sub_name.startswith('_'):
+									self.assertEqual(columns[f'{name}.{sub_name}'][idx], sub_value)
+						else:
+							self.assertEqual(columns[name][idx], value)
+
+	def test_errors(self) -> None:
+		from squishy.scsi.columnar import decode_columns
+
+		with self.assertRaises(ValueError):
+			decode_columns(common.Inquiry, bytes(7))
+
+		with self.assertRaises(ValueError):
+			decode_columns(common.Inquiry, common.RequestSense.build({ 'AllocLen': 1 }))
+
+	def test_decode_batch(self) -> None:
+		from squishy.scsi.columnar import decode_batch
+
+		buffer = b''.join((
+			common.Inquiry.build({ 'AllocLen': 1 }),
+			common.RequestSense.build({ 'AllocLen': 2 }),
+			b'\x1F\x00\x00\x00\x00\x00',
+			common.Inquiry.build({ 'AllocLen': 3 }),
+		))
+
+		batch = decode_batch(default_registry(), PeripheralDeviceType.DirectAccess, buffer, 6)
+
+		self.assertEqual(sorted(batch.keys()), [ 0x03, 0x12, 0x1F ])
+		self.assertIs(batch[0x12].command, common.Inquiry)
+		self.assertEqual(batch[0x12].index.tolist(), [ 0, 3 ])
+		self.assertEqual(batch[0x12].columns['AllocLen'].tolist(), [ 1, 3 ])
+		self.assertEqual(batch[0x03].columns['AllocLen'].tolist(), [ 2 ])
+		self.assertIsNone(batch[0x1F].command)
+		self.assertEqual(batch[0x1F].index.tolist(), [ 2 ])
@@ -0,0 +1,124 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from random                       import Random
+from unittest                     import TestCase
+
+from construct                    import Bitwise, Struct, BitsInteger, ConstError, IntegerError, StreamError
+
+from squishy.scsi.command         import SCSICommand, SCSICommand6, SCSICommand12, SCSICommandField, CommandEmitter
+from squishy.scsi.commands        import common, direct, sequential, printer, processor
+
+COMMANDS = tuple(
+	cmd for module in (common, direct, sequential, printer, processor)
+	for name, cmd in vars(module).items() if isinstance(cmd, SCSICommand) and name in module.__all__
+)
+
+Signed12 = SCSICommand12(0x08,
+	'Flags'    / SCSICommandField(default = 0, length = 5),
+	'Offset'   / SCSICommandField(length = 19),
+	'LBA'      / SCSICommandField(length = 32),
+	'TxLen'    / SCSICommandField(length = 16),
+	'Signed'   / BitsInteger(8, signed = True),
+)
+
+class CompiledLayoutTests(TestCase):
+	def test_compiled(self) -> None:
+		for cmd in (*COMMANDS, Signed12):
+			with self.subTest(command = cmd):
+				self.assertIsNotNone(cmd.layout)
+				self.assertEqual(cmd.layout.size, cmd.len())
+
+	def test_matches_construct(self) -> None:
+		rng = Random(0x5C51)
+
+		for cmd in (*COMMANDS, Signed12):
+			interpreted = Bitwise(cmd)
+			with self.subTest(command = cmd):
+				for _ in range(250):
+					cdb = bytearray(rng.randbytes(cmd.len()))
+					cdb[0] = cmd.layout.opcode
+
+					expected = interpreted.parse(bytes(cdb))
+					parsed   = cmd.parse(memoryview(cdb))
+					self.assertEqual(parsed, expected)
+					self.assertEqual(list(parsed.keys())[:-1], list(expected.keys())[1:])
+
+					# Commands with repeated field names can't round-trip, so leave them at their defaults
+					fields = { k: v for k, v in parsed.items() if k not in ('Reserved', '_format') }
+					self.assertEqual(cmd.build(fields), interpreted.build(fields))
+
+	def test_errors(self) -> None:
+		with self.assertRaises(StreamError):
+			common.Inquiry.parse(b'\x12\x00')
+
+		with self.assertRaises(ConstError):
+			common.Inquiry.parse(b'\x03\x00\x00\x00\x00\x00')
+
+		with self.assertRaises(IntegerError):
+			common.Inquiry.build({ 'AllocLen': 0x100 })
+
+		with self.assertRaises(KeyError):
+			common.Inquiry.build({})
+
+	def test_fallback(self) -> None:
+		cmd = SCSICommand6(0x01,
+			'Nested' / Struct(
+				'Foo' / BitsInteger(16),
+				'Bar' / BitsInteger(16),
+			)
+		)
+
+		self.assertIsNone(cmd.layout)
+		self.assertEqual(cmd.parse(cmd.build({ 'Nested': { 'Foo': 1, 'Bar': 2 } })).Nested.Bar, 2)
+
+		buffer = bytearray(8)
+		self.assertEqual(cmd.build_into({ 'Nested': { 'Foo': 1, 'Bar': 2 } }, buffer, 1), 6)
+		self.assertEqual(buffer, b'\x00\x01\x00\x01\x00\x02\x00\x00')
+
+	def test_build_into(self) -> None:
+		rng = Random(0x5C52)
+
+		for cmd in (*COMMANDS, Signed12):
+			with self.subTest(command = cmd):
+				size   = cmd.len()
+				buffer = bytearray(size * 4)
+				for idx in range(4):
+					fields = { f.name: rng.getrandbits(f.width) for f in cmd.layout.fields if f.name != 'Reserved' }
+					fields['Signed'] = -1
+
+					self.assertEqual(cmd.build_into(fields, memoryview(buffer), idx * size), size)
+					self.assertEqual(buffer[idx * size:(idx + 1) * size], cmd.build(fields))
+
+class CommandEmitterTests(TestCase):
+	def test_emit(self) -> None:
+		with CommandEmitter(common.Inquiry) as cmd:
+			cmd.AllocLen = 0x24
+
+		self.assertEqual(cmd.emit(), b'\x12\x00\x00\x00\x24\x00')
+
+	def test_missing_field(self) -> None:
+		with self.assertRaises(KeyError):
+			CommandEmitter(common.Inquiry).emit()
+
+		with self.assertRaises(KeyError):
+			CommandEmitter(common.Inquiry).emit_into(bytearray(6))
+
+	def test_unknown_field(self) -> None:
+		cmd = CommandEmitter(common.Inquiry)
+
+		with self.assertRaises(AttributeError):
+			cmd.Nya = 1
+
+		with self.assertRaises(AttributeError):
+			cmd.Reserved = 1
+
+	def test_emit_into(self) -> None:
+		buffer = bytearray(18)
+		cmd    = CommandEmitter(common.Inquiry)
+
+		for idx in range(3):
+			cmd.reset()
+			cmd.AllocLen = idx + 1
+			self.assertEqual(cmd.emit_into(buffer, idx * 6), 6)
+
+		self.assertEqual(buffer, b''.join(bytes((0x12, 0, 0, 0, idx + 1, 0)) for idx in range(3)))
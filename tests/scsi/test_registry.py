@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest                     import TestCase
+
+from squishy.scsi.command         import SCSICommand6, SCSICommandField
+from squishy.scsi.commands        import common, direct, sequential, printer, processor
+from squishy.scsi.device          import PeripheralDeviceType
+from squishy.scsi.registry        import SCSICommandRegistry, STANDARD_DEVICE_TYPES, default_registry
+
+VendorCommand = SCSICommand6(0x12,
+	'Reserved' / SCSICommandField(default = 0, length = 24),
+	'Mode'     / SCSICommandField(length = 8),
+)
+
+class SCSICommandRegistryTests(TestCase):
+	def test_default(self) -> None:
+		registry = default_registry()
+
+		self.assertIs(registry, default_registry())
+		for device_type in STANDARD_DEVICE_TYPES:
+			with self.subTest(device_type = device_type):
+				self.assertIs(registry.lookup(device_type, 0x12), common.Inquiry)
+				self.assertIs(registry.lookup(device_type, 0x39), common.Compare)
+				self.assertIsNone(registry.lookup(device_type, 0x1F))
+
+		self.assertIsNone(registry.lookup(PeripheralDeviceType.LogicalUnitNotPresent, 0x12))
+
+	def test_default_device_commands(self) -> None:
+		registry = default_registry()
+		DA, SA   = PeripheralDeviceType.DirectAccess, PeripheralDeviceType.SequentialAccess
+		WORM, RO = PeripheralDeviceType.WORM, PeripheralDeviceType.ReadOnlyDirectAccess
+
+		# The same opcode means different things to different device types
+		self.assertIs(registry.lookup(DA, 0x08), direct.Read6)
+		self.assertIs(registry.lookup(SA, 0x08), sequential.Read)
+		self.assertIs(registry.lookup(PeripheralDeviceType.Processor, 0x08), processor.Receive)
+		self.assertIs(registry.lookup(PeripheralDeviceType.Printer, 0x0A), printer.Print)
+		self.assertIs(registry.lookup(PeripheralDeviceType.Printer, 0x14), sequential.RecoverBufferedData)
+
+		for device_type in (DA, WORM, RO):
+			with self.subTest(device_type = device_type):
+				self.assertIs(registry.lookup(device_type, 0x0B), direct.Seek6)
+				self.assertIs(registry.lookup(device_type, 0x16), direct.Reserve)
+				self.assertIs(registry.lookup(device_type, 0x28), direct.Read10)
+				self.assertIs(registry.lookup(device_type, 0x25), direct.ReadCapacity)
+
+		self.assertIs(registry.lookup(WORM, 0x2A), direct.Write10)
+		self.assertIsNone(registry.lookup(RO, 0x2A))
+		self.assertIsNone(registry.lookup(WORM, 0x04))
+
+	def test_device_types(self) -> None:
+		registry = SCSICommandRegistry()
+		registry.register(VendorCommand, (PeripheralDeviceType.Processor,))
+		registry.register(common.Inquiry, (PeripheralDeviceType.DirectAccess,))
+
+		self.assertIs(registry.lookup(PeripheralDeviceType.Processor, 0x12), VendorCommand)
+		self.assertIs(registry.lookup(PeripheralDeviceType.DirectAccess, 0x12), common.Inquiry)
+		self.assertIn((PeripheralDeviceType.Processor, 0x12), registry)
+		self.assertNotIn((PeripheralDeviceType.Printer, 0x12), registry)
+
+		self.assertEqual(registry.parse(PeripheralDeviceType.Processor, b'\x12\x00\x00\x00\x05\x00').Mode, 5)
+
+		with self.assertRaises(ValueError):
+			registry.register(VendorCommand, (PeripheralDeviceType.DirectAccess,))
+
+	def test_decode_many(self) -> None:
+		registry = default_registry()
+		buffer   = bytearray()
+		buffer  += common.Inquiry.build({ 'AllocLen': 0x24 })
+		buffer  += common.Compare.build({ 'ParamLen': 0x100 })
+		# Unknown group 0 command, skipped over based on its group code
+		buffer  += b'\x1F\x00\x00\x00\x00\x00'
+		buffer  += common.RequestSense.build({ 'AllocLen': 0x12 })
+
+		decoded = list(registry.decode_many(PeripheralDeviceType.DirectAccess, buffer))
+
+		self.assertEqual([ offset for offset, _, _ in decoded ], [ 0, 6, 16, 22 ])
+		self.assertEqual([ cmd for _, cmd, _ in decoded ], [ common.Inquiry, common.Compare, None, common.RequestSense ])
+		self.assertEqual(decoded[0][2].AllocLen, 0x24)
+		self.assertEqual(decoded[1][2].ParamLen, 0x100)
+		self.assertEqual(decoded[3][2].AllocLen, 0x12)
+		self.assertIs(decoded[3][2]._format, common.RequestSense)
+
+	def test_decode_errors(self) -> None:
+		registry = default_registry()
+
+		with self.assertRaises(ValueError):
+			list(registry.decode_many(PeripheralDeviceType.DirectAccess, b'\xC0\x00\x00\x00\x00\x00'))
+
+		with self.assertRaises(ValueError):
+			list(registry.decode_many(PeripheralDeviceType.DirectAccess, b'\x12\x00\x00'))
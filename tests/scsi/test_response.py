@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest              import TestCase
+
+from squishy.scsi.device   import PeripheralDeviceType
+from squishy.scsi.response import (
+	SenseKey, SenseData, ExtendedSenseData, parse_sense, InquiryData, ModeParameters
+)
+
+class SenseDataTests(TestCase):
+	def test_non_extended(self) -> None:
+		sense = parse_sense(b'\x94\xA1\x23\x45')
+
+		self.assertIsInstance(sense, SenseData)
+		self.assertTrue(sense.addr_valid)
+		self.assertEqual(sense.error_class, 1)
+		self.assertEqual(sense.error_code, 4)
+		self.assertEqual(sense.vendor, 5)
+		self.assertEqual(sense.lba, 0x012345)
+
+	def test_extended(self) -> None:
+		data  = bytearray(b'\xF0\x02\xA6\xDE\xAD\xBE\xEF\x04\x01\x02\x03\x04')
+		sense = parse_sense(memoryview(data)[:10])
+
+		self.assertIsInstance(sense, ExtendedSenseData)
+		self.assertTrue(sense.valid)
+		self.assertEqual(sense.error_class, 7)
+		self.assertEqual(sense.segment, 2)
+		self.assertTrue(sense.filemark)
+		self.assertFalse(sense.eom)
+		self.assertTrue(sense.ili)
+		self.assertIs(sense.sense_key, SenseKey.UNIT_ATTENTION)
+		self.assertEqual(sense.information, 0xDEADBEEF)
+		self.assertEqual(sense.additional_length, 4)
+		# Only the bytes that were transferred are available
+		self.assertEqual(bytes(sense.additional), b'\x01\x02')
+
+		# The view tracks the underlying buffer rather than copying it
+		data[2] = 0x05
+		self.assertIs(sense.sense_key, SenseKey.ILLEGAL_REQUEST)
+
+	def test_too_short(self) -> None:
+		with self.assertRaises(ValueError):
+			parse_sense(b'\x70\x00\x05')
+
+		with self.assertRaises(ValueError):
+			parse_sense(b'')
+
+class InquiryDataTests(TestCase):
+	def test_standard(self) -> None:
+		data = (
+			b'\x05\x80\x01\x00\x1F\x00\x00\x00' + b'ADAPTEC ' + b'Squishy Test    ' + b'1.0 '
+		)
+		inquiry = InquiryData(data)
+
+		self.assertIs(inquiry.peripheral_device_type, PeripheralDeviceType.ReadOnlyDirectAccess)
+		self.assertTrue(inquiry.removable)
+		self.assertEqual(inquiry.device_type_qualifier, 0)
+		self.assertEqual(inquiry.ansi_version, 1)
+		self.assertEqual(inquiry.additional_length, 31)
+		self.assertEqual(len(inquiry.vendor_unique), 31)
+		self.assertEqual(inquiry.vendor_id, 'ADAPTEC')
+		self.assertEqual(inquiry.vendor_name, 'Adaptec (now part of Microchip Technology Inc.)')
+		self.assertEqual(inquiry.product_id, 'Squishy Test')
+		self.assertEqual(inquiry.revision, '1.0')
+
+	def test_truncated(self) -> None:
+		inquiry = InquiryData(b'\x42\x7F\xC9\x00\x20\xAA')
+
+		self.assertEqual(inquiry.peripheral_device_type, 0x42)
+		self.assertFalse(inquiry.removable)
+		self.assertEqual(inquiry.device_type_qualifier, 0x7F)
+		self.assertEqual(inquiry.iso_version, 3)
+		self.assertEqual(inquiry.ecma_version, 1)
+		self.assertEqual(inquiry.ansi_version, 1)
+		self.assertEqual(bytes(inquiry.vendor_unique), b'\xAA')
+		self.assertIsNone(inquiry.vendor_id)
+		self.assertIsNone(inquiry.vendor_name)
+
+class ModeParametersTests(TestCase):
+	def test_pages(self) -> None:
+		data = (
+			b'\x1B\x00\x80\x08' +
+			b'\x00\x00\x10\x00\x00\x00\x02\x00' +
+			b'\x81\x06\x00\x01\x02\x03\x04\x05' +
+			b'\x03\x0A\x00\x01\x02\x03'
+		)
+		params = ModeParameters(data)
+
+		self.assertEqual(params.mode_data_length, 0x1B)
+		self.assertTrue(params.write_protected)
+		self.assertEqual(params.block_descriptor_length, 8)
+
+		descriptors = list(params.block_descriptors)
+		self.assertEqual(len(descriptors), 1)
+		self.assertEqual(descriptors[0].block_count, 0x1000)
+		self.assertEqual(descriptors[0].block_length, 512)
+
+		pages = list(params.pages)
+		self.assertEqual([ page.page_code for page in pages ], [ 0x01, 0x03 ])
+		self.assertTrue(pages[0].saveable)
+		self.assertEqual(bytes(pages[0].parameters), b'\x00\x01\x02\x03\x04\x05')
+		# The last page was truncated by the allocation length
+		self.assertEqual(pages[1].page_length, 10)
+		self.assertEqual(bytes(pages[1].parameters), b'\x00\x01\x02\x03')
+
+		self.assertIs(params.page(0x03).raw.obj, data)
+		self.assertIsNone(params.page(0x08))
@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+
+from argparse                   import ArgumentParser, Namespace
+from contextlib                 import redirect_stderr
+from io                         import StringIO
+from pathlib                    import Path
+from tempfile                   import TemporaryDirectory
+from unittest                   import TestCase
+
+from squishy.actions.provision  import Provision
+from squishy.api                import BuildOptions, SquishySession, build_gateware, cache_usage
+from squishy.core.cache         import SquishyBitstreamCache
+from squishy.core.exceptions    import SquishyException
+from squishy.gateware.platform  import AVAILABLE_PLATFORMS
+
+class _RecordingPlatform:
+	def __init__(self) -> None:
+		self.kwargs = None
+
+	def build(self, elaboratable, **kwargs):
+		self.kwargs = kwargs
+		return (kwargs['name'], None)
+
+class _Applet:
+	def register_args(self, parser: ArgumentParser) -> None:
+		parser.add_argument('--count', type = int, default = 4)
+		parser.add_argument('--mode', type = str, default = 'fast')
+
+class _SharedDesign:
+	shared_submodules = ('usb', 'scsi')
+
+class BuildOptionsTests(TestCase):
+	def test_from_args(self) -> None:
+		parser = ArgumentParser()
+		Provision().register_args(parser)
+
+		options = BuildOptions.from_args(parser.parse_args([
+			'--no-abc9', '--use-router2', '--pnr-seed', '3', '--build-dir', 'out'
+		]))
+
+		self.assertEqual(options, BuildOptions(
+			build_dir = Path('out'), abc9 = False, use_router2 = True, pnr_seed = 3
+		))
+
+	def test_defaults_match_cli(self) -> None:
+		parser = ArgumentParser()
+		Provision().register_args(parser)
+
+		self.assertEqual(BuildOptions.from_args(parser.parse_args([])), BuildOptions())
+
+	def test_aggressive_mapping(self) -> None:
+		parser = ArgumentParser()
+		Provision().register_args(parser)
+
+		self.assertEqual(parser.parse_args([ '--aggressive-mapping' ]).aggressive_mapping, 4)
+		self.assertEqual(parser.parse_args([ '--aggressive-mapping', '2' ]).aggressive_mapping, 2)
+		for passes in ('0', '-1'):
+			with self.assertRaises(SystemExit), redirect_stderr(StringIO()):
+				parser.parse_args([ '--aggressive-mapping', passes ])
+
+		# Options built directly don't go through the parser
+		with TemporaryDirectory() as tmp:
+			plat = _RecordingPlatform()
+			with self.assertLogs(level = 'ERROR'):
+				build_gateware(plat, None, 'design', BuildOptions(
+					build_dir = Path(tmp) / 'build', aggressive_mapping = 0
+				), cacheable = False)
+		self.assertIsNone(plat.kwargs['abc9_passes'])
+
+	def test_toolchain_options(self) -> None:
+		with TemporaryDirectory() as tmp:
+			plat = _RecordingPlatform()
+			name, _ = build_gateware(plat, None, 'design', BuildOptions(
+				build_dir = Path(tmp) / 'build', tmg_ripup = True, aggressive_mapping = 2, pnr_seed = 7
+			), cacheable = False)
+
+			self.assertEqual(name, 'design')
+			self.assertTrue((Path(tmp) / 'build').is_dir())
+
+		self.assertEqual(plat.kwargs['synth_opts'], [ '-abc9' ])
+		self.assertEqual(plat.kwargs['nextpnr_opts'], [ '--router router1', '--tmg-ripup', '--seed 7' ])
+		self.assertEqual(plat.kwargs['abc9_passes'], 2)
+		self.assertTrue(plat.kwargs['skip_cache'])
+
+	def test_eco_from(self) -> None:
+		with TemporaryDirectory() as tmp:
+			routed = Path(tmp) / 'routed.json'
+			routed.write_text(json.dumps({ 'modules': { 'top': { 'cells': {
+				'usb.phy.rx_LC': { 'attributes': { 'NEXTPNR_BEL': 'X1/Y2/lc0' } },
+			} } } }))
+
+			plat = _RecordingPlatform()
+			build_gateware(plat, _SharedDesign(), 'design', BuildOptions(
+				build_dir = Path(tmp) / 'build', eco_from = routed
+			), cacheable = False)
+			self.assertIn(f'--pre-place {(Path(tmp) / "build" / "design.eco.py").resolve()}', plat.kwargs['nextpnr_opts'])
+
+			# None of the placed cells are in the shared submodules, so the option is ignored
+			routed.write_text(json.dumps({ 'modules': { 'top': { 'cells': {
+				'applet.core_LC': { 'attributes': { 'NEXTPNR_BEL': 'X7/Y8/lc3' } },
+			} } } }))
+
+			plat = _RecordingPlatform()
+			with self.assertLogs(level = 'ERROR') as logs:
+				build_gateware(plat, _SharedDesign(), 'design', BuildOptions(
+					build_dir = Path(tmp) / 'build', eco_from = routed
+				), cacheable = False)
+
+		self.assertIn('ignoring `--eco-from`', logs.output[0])
+		self.assertFalse(any(opt.startswith('--pre-place') for opt in plat.kwargs['nextpnr_opts']))
+
+class SquishySessionTests(TestCase):
+	def setUp(self) -> None:
+		self.cache = SquishyBitstreamCache(do_init = False)
+
+	def test_platform(self) -> None:
+		name, plat = list(AVAILABLE_PLATFORMS.items())[-1]
+
+		session = SquishySession(plat, cache = self.cache)
+		self.assertEqual(session.platform_name, name)
+
+		first  = session.new_platform()
+		second = session.new_platform()
+
+		self.assertIsNot(first, second)
+		self.assertIs(first._cache, self.cache)
+		self.assertIs(second._cache, self.cache)
+
+	def test_unknown_platform(self) -> None:
+		with self.assertRaises(SquishyException):
+			SquishySession('rev0', cache = self.cache)
+
+	def test_applet_args(self) -> None:
+		session = SquishySession(list(AVAILABLE_PLATFORMS.keys())[-1], cache = self.cache)
+		applet  = _Applet()
+
+		self.assertEqual(session.applet_args(applet), Namespace(count = 4, mode = 'fast'))
+		self.assertEqual(session.applet_args(applet, { 'count': 9 }), Namespace(count = 9, mode = 'fast'))
+
+		args = Namespace(count = 1)
+		self.assertIs(session.applet_args(applet, args), args)
+
+class CacheUsageTests(TestCase):
+	def test_build_dir(self) -> None:
+		with TemporaryDirectory() as tmp:
+			build_dir = Path(tmp)
+			(build_dir / 'top.bin').write_bytes(bytes(100))
+			(build_dir / 'top.il').write_bytes(bytes(28))
+
+			usage = cache_usage(build_dir)
+
+		self.assertEqual(len(usage.build_files), 2)
+		self.assertEqual(usage.build_size, 128)
+		self.assertEqual(usage.total_size, usage.applet_size + 128)
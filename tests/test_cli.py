@@ -0,0 +1,14 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest             import TestCase
+
+from squishy.cli          import ACTIONS
+from squishy.core.collect import load_member
+
+class ActionManifestTests(TestCase):
+	def test_manifest(self) -> None:
+		for act in ACTIONS:
+			with self.subTest(action = act['name']):
+				action = load_member(act)
+				self.assertEqual(action.short_help, act['short_help'])
+				self.assertEqual(action.__name__.lower(), act['name'])